@@ -0,0 +1,314 @@
+"""
+BSD 2-Clause License
+
+Copyright (c) 2024, Hilda Romero-Velo
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+
+* Redistributions of source code must retain the above copyright notice, this
+  list of conditions and the following disclaimer.
+
+* Redistributions in binary form must reproduce the above copyright notice, this
+  list of conditions and the following disclaimer in the documentation
+  and/or other materials provided with the distribution.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+
+"""
+Binary corpus index for the approximate alignment.
+
+The feature texts of the corpus (`<feature>_text.txt`) store one melodic line per text line,
+in UTF-8, so the symbols of the approximate dictionary above 127 take two bytes, and the
+identifiers are stored in a separate text file. The corpus index stores, in a single file
+per feature, the melodic lines with one byte per symbol (the Latin-1 value of the
+notation, see `notation_codec`) and their identifiers.
+
+Many melodic lines have the same feature sequence (doubled staves and repeated voices are
+split into separate lines), so identical lines are stored once, as unique entries in order
+of first appearance, each with the fan-out list of the melodic lines that have it:
+
+    offset 0    magic (4 bytes, "FCIX")
+    offset 4    format version (uint32, 2)
+    offset 8    number of melodic lines (uint64)
+    offset 16   number of unique entries (uint64)
+    offset 24   number of symbols of the entries (uint64)
+    offset 32   size of the identifiers (uint64, bytes)
+    offset 40   entry offsets (uint64, number of entries + 1)
+                symbols of all the entries, concatenated (uint8), padded to 8 bytes
+                fan-out offsets (uint64, number of entries + 1)
+                fan-out lists: melodic line indexes, increasing within each entry (uint32,
+                number of melodic lines), padded to 8 bytes
+                identifier offsets (uint64, number of melodic lines + 1)
+                identifiers of all the melodic lines, concatenated (UTF-8)
+
+Entry e spans symbols[offsets[e]:offsets[e + 1]] and is the sequence of the melodic lines
+fanout[fanout_offsets[e]:fanout_offsets[e + 1]]; the identifier of melodic line i spans
+ids_data[id_offsets[i]:id_offsets[i + 1]]. Indexes of version 1, without fan-out lists
+(one entry per melodic line, with the header of version 1 up to the size of the
+identifiers), are still read. The index is opened with `mmap` and its arrays are NumPy views
+of the mapping, so opening it does not read or copy the corpus (only the fan-out lists are
+read, to find the entry of every melodic line).
+"""
+
+import mmap
+import struct
+
+import numpy as np
+
+MAGIC = b"FCIX"
+VERSION = 2
+HEADER = struct.Struct("<4sIQQQQ")
+HEADER_V1 = struct.Struct("<4sIQQQ")
+OFFSET_DTYPE = np.dtype("<u8")
+FANOUT_DTYPE = np.dtype("<u4")
+ALIGNMENT = 8  # Bytes; the offset arrays start at multiples of it
+
+
+def padding(size):
+    """
+    Returns the number of bytes that pad a section to the alignment of the offset arrays.
+
+    Args:
+        size (int): Size of the section in bytes.
+
+    Returns:
+        int: Number of padding bytes.
+    """
+    return -size % ALIGNMENT
+
+
+def build_offsets(lengths):
+    """
+    Builds an offset array from the lengths of the lines.
+
+    Args:
+        lengths (list): Length of every line.
+
+    Returns:
+        np.ndarray: Offsets (number of lines + 1), starting at 0.
+    """
+    offsets = np.zeros(len(lengths) + 1, dtype=OFFSET_DTYPE)
+    np.cumsum(lengths, out=offsets[1:])
+    return offsets
+
+
+def deduplicate(lines):
+    """
+    Collapses identical melodic lines into unique entries, in order of first appearance.
+
+    Args:
+        lines (list): Melodic lines (bytes).
+
+    Returns:
+        tuple: (unique entries (list of bytes), entry of every melodic line (np.ndarray))
+    """
+    first_lines = {}
+    entries = np.array(
+        [first_lines.setdefault(line, len(first_lines)) for line in lines],
+        dtype=np.int64,
+    )
+    return list(first_lines), entries
+
+
+def build_fanout(entries, num_entries):
+    """
+    Builds the fan-out lists of the unique entries: the melodic lines of every entry.
+
+    Args:
+        entries (np.ndarray): Entry of every melodic line.
+        num_entries (int): Number of unique entries.
+
+    Returns:
+        tuple: (fan-out offsets (number of entries + 1), melodic line indexes grouped by
+               entry, increasing within each entry)
+    """
+    fanout = np.argsort(entries, kind="stable")
+    return build_offsets(np.bincount(entries, minlength=num_entries)), fanout
+
+
+def write_corpus_index(filename, lines, ids):
+    """
+    Writes the corpus index of a feature, storing identical melodic lines once.
+
+    Args:
+        filename (str): Path of the index file.
+        lines (list): Melodic lines with one byte per symbol (bytes).
+        ids (list): Identifier of every melodic line (str).
+
+    Returns:
+        None
+
+    Raises:
+        ValueError: If there is not one identifier per melodic line.
+    """
+    if len(lines) != len(ids):
+        raise ValueError(f"{len(lines)} melodic lines but {len(ids)} identifiers.")
+    unique_lines, entries = deduplicate(lines)
+    fanout_offsets, fanout = build_fanout(entries, len(unique_lines))
+    encoded_ids = [line_id.encode("utf-8") for line_id in ids]
+    offsets = build_offsets([len(line) for line in unique_lines])
+    id_offsets = build_offsets([len(line_id) for line_id in encoded_ids])
+    num_symbols = int(offsets[-1])
+
+    with open(filename, "wb") as file:
+        file.write(
+            HEADER.pack(
+                MAGIC,
+                VERSION,
+                len(lines),
+                len(unique_lines),
+                num_symbols,
+                int(id_offsets[-1]),
+            )
+        )
+        file.write(offsets.tobytes())
+        file.write(b"".join(unique_lines))
+        file.write(bytes(padding(num_symbols)))
+        file.write(fanout_offsets.tobytes())
+        file.write(fanout.astype(FANOUT_DTYPE).tobytes())
+        file.write(bytes(padding(fanout.size * FANOUT_DTYPE.itemsize)))
+        file.write(id_offsets.tobytes())
+        file.write(b"".join(encoded_ids))
+
+
+def open_corpus_index(filename):
+    """
+    Opens the corpus index of a feature, mapping it into memory (read-only).
+
+    Args:
+        filename (str): Path of the index file.
+
+    Returns:
+        dict: Index with the number of melodic lines ("num_lines") and of unique entries
+              ("num_entries"), the entry offsets ("offsets"), the symbols ("symbols"), the
+              fan-out offsets ("fanout_offsets") and lists ("fanout"), the identifier offsets
+              ("id_offsets") and the identifiers ("ids_data"), as NumPy views of the mapping
+              (the fan-out of a version 1 index is built, one entry per line), and the
+              entry of every melodic line ("entries").
+
+    Raises:
+        ValueError: If the file is not a corpus index of a supported version.
+    """
+    with open(filename, "rb") as file:
+        if len(file.read(HEADER.size)) < HEADER_V1.size:
+            raise ValueError(f"'{filename}' is not a corpus index file.")
+        data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    magic, version = struct.unpack_from("<4sI", data)
+    if magic != MAGIC:
+        raise ValueError(f"'{filename}' is not a corpus index file.")
+    if version == 1:
+        _, _, num_lines, num_symbols, ids_size = HEADER_V1.unpack_from(data)
+        num_entries = num_lines
+        position = HEADER_V1.size
+    elif version == VERSION:
+        _, _, num_lines, num_entries, num_symbols, ids_size = HEADER.unpack_from(data)
+        position = HEADER.size
+    else:
+        raise ValueError(f"Unsupported corpus index version {version} in '{filename}'.")
+
+    offsets = np.frombuffer(data, OFFSET_DTYPE, num_entries + 1, position)
+    position += offsets.nbytes
+    symbols = np.frombuffer(data, np.uint8, num_symbols, position)
+    position += num_symbols + padding(num_symbols)
+    if version == 1:
+        fanout_offsets = np.arange(num_lines + 1, dtype=OFFSET_DTYPE)
+        fanout = np.arange(num_lines, dtype=FANOUT_DTYPE)
+    else:
+        fanout_offsets = np.frombuffer(data, OFFSET_DTYPE, num_entries + 1, position)
+        position += fanout_offsets.nbytes
+        fanout = np.frombuffer(data, FANOUT_DTYPE, num_lines, position)
+        position += fanout.nbytes + padding(fanout.nbytes)
+    id_offsets = np.frombuffer(data, OFFSET_DTYPE, num_lines + 1, position)
+    position += id_offsets.nbytes
+    ids_data = np.frombuffer(data, np.uint8, ids_size, position)
+
+    # Entry of every melodic line, inverting the fan-out lists
+    entries = np.empty(num_lines, dtype=np.int64)
+    entries[fanout] = np.repeat(
+        np.arange(num_entries), np.diff(fanout_offsets.astype(np.int64))
+    )
+    return {
+        "num_lines": num_lines,
+        "num_entries": num_entries,
+        "offsets": offsets,
+        "symbols": symbols,
+        "fanout_offsets": fanout_offsets,
+        "fanout": fanout,
+        "entries": entries,
+        "id_offsets": id_offsets,
+        "ids_data": ids_data,
+    }
+
+
+def get_line(index, line):
+    """
+    Returns the symbols of a melodic line, without copying them.
+
+    Args:
+        index (dict): Index opened with `open_corpus_index`.
+        line (int): Index of the melodic line.
+
+    Returns:
+        np.ndarray: Symbols (uint8) of the line, as a view of the mapping.
+    """
+    entry = index["entries"][line]
+    offsets = index["offsets"]
+    return index["symbols"][offsets[entry] : offsets[entry + 1]]
+
+
+def get_unique_lines(index):
+    """
+    Returns the symbols of every unique entry.
+
+    Args:
+        index (dict): Index opened with `open_corpus_index`.
+
+    Returns:
+        list: Unique melodic lines with one byte per symbol (bytes).
+    """
+    symbols = index["symbols"].tobytes()
+    offsets = index["offsets"].tolist()
+    return [symbols[start:end] for start, end in zip(offsets, offsets[1:])]
+
+
+def get_lines(index):
+    """
+    Returns the symbols of every melodic line (lines with the same entry share its bytes).
+
+    Args:
+        index (dict): Index opened with `open_corpus_index`.
+
+    Returns:
+        list: Melodic lines with one byte per symbol (bytes).
+    """
+    unique_lines = get_unique_lines(index)
+    return [unique_lines[entry] for entry in index["entries"].tolist()]
+
+
+def get_ids(index):
+    """
+    Returns the identifier of every melodic line.
+
+    Args:
+        index (dict): Index opened with `open_corpus_index`.
+
+    Returns:
+        list: Identifiers (str).
+    """
+    ids_data = index["ids_data"].tobytes()
+    offsets = index["id_offsets"].tolist()
+    return [
+        ids_data[start:end].decode("utf-8") for start, end in zip(offsets, offsets[1:])
+    ]
@@ -0,0 +1,196 @@
+"""
+BSD 2-Clause License
+
+Copyright (c) 2024, Hilda Romero-Velo
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+
+* Redistributions of source code must retain the above copyright notice, this
+  list of conditions and the following disclaimer.
+
+* Redistributions in binary form must reproduce the above copyright notice, this
+  list of conditions and the following disclaimer in the documentation
+  and/or other materials provided with the distribution.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+
+"""
+Dense cost matrices for the approximate and global alignments.
+
+The alignment dictionaries (`approx_dictionary`) map every feature value to a character in
+the Latin-1 range (see `notation_codec`), so a cost map can be stored as a 256x256 matrix
+of float32 costs indexed by the byte values of the two symbols (text symbol, query symbol).
+Pairs missing from the cost map are NaN.
+
+The matrix is saved after a small header and loaded with a memory map, so loading does not
+depend on the number of symbols:
+
+    offset 0   magic (4 bytes, "FCMX")
+    offset 4   format version (uint32)
+    offset 8   rows (uint32, 256)
+    offset 12  columns (uint32, 256)
+    offset 16  rows x columns little-endian float32 costs, row-major
+
+The nested dictionary format of `utility_functions.save_cost_map`, read by the C++
+programs, can be produced from a matrix with `to_cost_map` and converted to a matrix with
+`from_cost_map`.
+"""
+
+import math
+import struct
+from fractions import Fraction
+
+import numpy as np
+
+MAGIC = b"FCMX"
+VERSION = 1
+HEADER = struct.Struct("<4sIII")
+NUM_CODES = 256  # One row and column per byte value
+COST_DTYPE = np.dtype("<f4")
+
+
+def symbol_codes(symbols):
+    """
+    Returns the byte values of single-character symbols.
+
+    Args:
+        symbols (iterable): Single-character symbols (str).
+
+    Returns:
+        np.ndarray: Byte value of every symbol.
+
+    Raises:
+        ValueError: If a symbol does not fit in a single byte.
+    """
+    codes = []
+    for symbol in symbols:
+        if len(symbol) != 1 or ord(symbol) >= NUM_CODES:
+            raise ValueError(f"Symbol {symbol!r} does not fit in a single byte.")
+        codes.append(ord(symbol))
+    return np.array(codes, dtype=np.intp)
+
+
+def build_cost_matrix(dictionary, match_value, mismatch_sign):
+    """
+    Builds the cost matrix of a dictionary from the difference of its feature values: a
+    symbol against itself costs match_value, and two different symbols cost mismatch_sign
+    times the absolute difference of their values. Every value is parsed once.
+
+    Args:
+        dictionary (dict): Mapping of feature values (numbers or fractions as str) to
+                           single characters.
+        match_value (float): Cost of a match.
+        mismatch_sign (float): Sign (and scale) of the cost of a mismatch.
+
+    Returns:
+        np.ndarray: Cost matrix (NUM_CODES x NUM_CODES, float32, NaN for missing pairs).
+    """
+    values = np.array([float(Fraction(key)) for key in dictionary], dtype=np.float64)
+    codes = symbol_codes(dictionary.values())
+    costs = mismatch_sign * np.abs(values[:, None] - values[None, :])
+    np.fill_diagonal(costs, match_value)
+
+    # As in a dictionary of dictionaries, the last value of repeated symbols is kept
+    matrix = np.full((NUM_CODES, NUM_CODES), np.nan, dtype=COST_DTYPE)
+    matrix[codes[:, None], codes[None, :]] = costs
+    return matrix
+
+
+def from_cost_map(cost_map):
+    """
+    Converts a cost map (dictionary of dictionaries) to a cost matrix.
+
+    Args:
+        cost_map (dict): Cost map as returned by `utility_functions.load_cost_map`.
+
+    Returns:
+        np.ndarray: Cost matrix (NUM_CODES x NUM_CODES, float32, NaN for missing pairs).
+    """
+    matrix = np.full((NUM_CODES, NUM_CODES), np.nan, dtype=COST_DTYPE)
+    for symbol, inner_map in cost_map.items():
+        row = symbol_codes([symbol])[0]
+        matrix[row, symbol_codes(inner_map.keys())] = list(inner_map.values())
+    return matrix
+
+
+def to_cost_map(matrix, symbols):
+    """
+    Converts a cost matrix to a cost map (dictionary of dictionaries), as saved by
+    `utility_functions.save_cost_map` for the C++ programs.
+
+    Args:
+        matrix (np.ndarray): Cost matrix.
+        symbols (iterable): Symbols of the cost map, in the order in which they are written
+                            (e.g. the characters of the dictionary).
+
+    Returns:
+        dict: Cost map with the pairs of the given symbols that are not missing.
+    """
+    symbols = list(dict.fromkeys(symbols))
+    codes = symbol_codes(symbols)
+    cost_map = {}
+    for symbol, row in zip(symbols, matrix[codes][:, codes].tolist()):
+        cost_map[symbol] = {
+            other: cost for other, cost in zip(symbols, row) if not math.isnan(cost)
+        }
+    return cost_map
+
+
+def save_cost_matrix(matrix, filename):
+    """
+    Saves a cost matrix to a binary file.
+
+    Args:
+        matrix (np.ndarray): Cost matrix.
+        filename (str): The name of the file where the cost matrix will be saved.
+
+    Returns:
+        None
+    """
+    rows, columns = matrix.shape
+    with open(filename, "wb") as file:
+        file.write(HEADER.pack(MAGIC, VERSION, rows, columns))
+        file.write(np.ascontiguousarray(matrix, dtype=COST_DTYPE).tobytes())
+
+
+def load_cost_matrix(filename):
+    """
+    Loads a cost matrix from a binary file, mapping it into memory (read-only).
+
+    Args:
+        filename (str): The name of the file from which to load the cost matrix.
+
+    Returns:
+        np.memmap: Cost matrix.
+
+    Raises:
+        ValueError: If the file is not a cost matrix of a supported version.
+    """
+    with open(filename, "rb") as file:
+        header = file.read(HEADER.size)
+    if len(header) != HEADER.size:
+        raise ValueError(f"'{filename}' is not a cost matrix file.")
+    magic, version, rows, columns = HEADER.unpack(header)
+    if magic != MAGIC:
+        raise ValueError(f"'{filename}' is not a cost matrix file.")
+    if version != VERSION:
+        raise ValueError(f"Unsupported cost matrix version {version} in '{filename}'.")
+    return np.memmap(
+        filename,
+        dtype=COST_DTYPE,
+        mode="r",
+        offset=HEADER.size,
+        shape=(rows, columns),
+    )
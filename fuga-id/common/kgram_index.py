@@ -0,0 +1,255 @@
+"""
+BSD 2-Clause License
+
+Copyright (c) 2024, Hilda Romero-Velo
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+
+* Redistributions of source code must retain the above copyright notice, this
+  list of conditions and the following disclaimer.
+
+* Redistributions in binary form must reproduce the above copyright notice, this
+  list of conditions and the following disclaimer in the documentation
+  and/or other materials provided with the distribution.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+
+"""
+Inverted index of the k-grams (substrings of k symbols) of the melodic lines, used to select
+the candidate lines of the approximate alignment before aligning them.
+
+The index is built from the melodic lines with one byte per symbol (see `corpus_index`).
+Every k-gram is packed in an integer (its k bytes, first symbol in the highest byte) and has
+a posting list with the lines where it occurs, each line once:
+
+    offset 0    magic (4 bytes, "FKGX")
+    offset 4    format version (uint32)
+    offset 8    k (uint32)
+    offset 12   reserved (uint32)
+    offset 16   number of lines (uint64)
+    offset 24   number of k-grams (uint64)
+    offset 32   number of postings (uint64)
+    offset 40   k-grams, sorted (uint64, number of k-grams)
+                posting offsets (uint64, number of k-grams + 1)
+                postings: line indexes (uint32, number of postings)
+
+The hits of a line are the query positions whose k-gram occurs in the line. Candidates are
+selected in two ways:
+    - `top_candidates`: the lines with the most hits (a heuristic; lines without hits are
+      never candidates).
+    - `lossless_candidates`: by the q-gram lemma, a fragment of a line within e edits
+      (substitutions, insertions or deletions) of a query of m symbols shares at least
+      m - k + 1 - k * e of its k-grams, so the lines with fewer hits cannot contain it. The
+      candidates keep every line with an occurrence of the query within the error budget.
+"""
+
+import mmap
+import struct
+
+import numpy as np
+
+MAGIC = b"FKGX"
+VERSION = 1
+HEADER = struct.Struct("<4sIIIQQQ")
+DEFAULT_K = 3
+MAX_K = 4  # k-grams and line indexes are packed together in 64 bits when building
+
+
+def kgram_keys(symbols, k):
+    """
+    Packs every k-gram of a sequence in an integer.
+
+    Args:
+        symbols (np.ndarray): Sequence with one byte per symbol (uint8).
+        k (int): Length of the k-grams.
+
+    Returns:
+        np.ndarray: Key (uint64) of the k-gram starting at every position where one fits.
+    """
+    num_kgrams = len(symbols) - k + 1
+    keys = np.zeros(max(num_kgrams, 0), dtype=np.uint64)
+    for position in range(k):
+        keys <<= np.uint64(8)
+        keys |= symbols[position : position + num_kgrams]
+    return keys
+
+
+def build_kgram_index(lines, k=DEFAULT_K):
+    """
+    Builds the k-gram index of the melodic lines.
+
+    Args:
+        lines (list): Melodic lines with one byte per symbol (bytes).
+        k (int): Length of the k-grams.
+
+    Returns:
+        dict: Index with the length of the k-grams ("k"), the number of lines
+              ("num_lines"), the sorted k-grams ("keys"), the posting offsets ("offsets")
+              and the postings ("postings").
+
+    Raises:
+        ValueError: If k is not between 1 and MAX_K.
+    """
+    if not 1 <= k <= MAX_K:
+        raise ValueError(f"k must be between 1 and {MAX_K}.")
+    lengths = np.array([len(line) for line in lines], dtype=np.int64)
+    symbols = np.frombuffer(b"".join(lines), dtype=np.uint8)
+    line_ends = np.cumsum(lengths)
+
+    # k-grams of the concatenated lines, without those spanning two lines
+    keys = kgram_keys(symbols, k)
+    line_of = np.repeat(np.arange(len(lines), dtype=np.uint64), lengths)[: len(keys)]
+    valid = np.arange(len(keys)) + k <= line_ends[line_of.astype(np.int64)]
+    pairs = np.unique((keys[valid] << np.uint64(32)) | line_of[valid])
+
+    unique_keys, starts = np.unique(pairs >> np.uint64(32), return_index=True)
+    offsets = np.append(starts, len(pairs)).astype(np.uint64)
+    return {
+        "k": k,
+        "num_lines": len(lines),
+        "keys": unique_keys,
+        "offsets": offsets,
+        "postings": (pairs & np.uint64(0xFFFFFFFF)).astype(np.uint32),
+    }
+
+
+def write_kgram_index(filename, index):
+    """
+    Writes a k-gram index.
+
+    Args:
+        filename (str): Path of the index file.
+        index (dict): Index built with `build_kgram_index`.
+
+    Returns:
+        None
+    """
+    with open(filename, "wb") as file:
+        file.write(
+            HEADER.pack(
+                MAGIC,
+                VERSION,
+                index["k"],
+                0,
+                index["num_lines"],
+                len(index["keys"]),
+                len(index["postings"]),
+            )
+        )
+        file.write(index["keys"].astype("<u8").tobytes())
+        file.write(index["offsets"].astype("<u8").tobytes())
+        file.write(index["postings"].astype("<u4").tobytes())
+
+
+def open_kgram_index(filename):
+    """
+    Opens a k-gram index, mapping it into memory (read-only).
+
+    Args:
+        filename (str): Path of the index file.
+
+    Returns:
+        dict: Index (see `build_kgram_index`), with NumPy views of the mapping.
+
+    Raises:
+        ValueError: If the file is not a k-gram index of a supported version.
+    """
+    with open(filename, "rb") as file:
+        if len(file.read(HEADER.size)) != HEADER.size:
+            raise ValueError(f"'{filename}' is not a k-gram index file.")
+        data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    magic, version, k, _, num_lines, num_kgrams, num_postings = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError(f"'{filename}' is not a k-gram index file.")
+    if version != VERSION:
+        raise ValueError(f"Unsupported k-gram index version {version} in '{filename}'.")
+
+    position = HEADER.size
+    keys = np.frombuffer(data, "<u8", num_kgrams, position)
+    position += keys.nbytes
+    offsets = np.frombuffer(data, "<u8", num_kgrams + 1, position)
+    position += offsets.nbytes
+    postings = np.frombuffer(data, "<u4", num_postings, position)
+    return {
+        "k": k,
+        "num_lines": num_lines,
+        "keys": keys,
+        "offsets": offsets,
+        "postings": postings,
+    }
+
+
+def count_hits(index, query):
+    """
+    Counts the hits of every melodic line: the query positions whose k-gram occurs in it.
+
+    Args:
+        index (dict): k-gram index.
+        query (bytes): Query with one byte per symbol.
+
+    Returns:
+        np.ndarray: Hits of every line.
+    """
+    keys, offsets, postings = index["keys"], index["offsets"], index["postings"]
+    query_keys = kgram_keys(np.frombuffer(query, dtype=np.uint8), index["k"])
+    if not len(keys) or not len(query_keys):
+        return np.zeros(index["num_lines"], dtype=np.int64)
+    slots = np.minimum(np.searchsorted(keys, query_keys), len(keys) - 1)
+    slots = slots[keys[slots] == query_keys]
+
+    # Postings of every query position found, concatenated
+    starts = offsets[slots].astype(np.int64)
+    lengths = offsets[slots + 1].astype(np.int64) - starts
+    shifts = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+    lines = postings[shifts + np.arange(lengths.sum())]
+    return np.bincount(lines, minlength=index["num_lines"])
+
+
+def top_candidates(index, query, num_candidates):
+    """
+    Selects the melodic lines with the most hits (see `count_hits`). Lines without hits are
+    not selected, and ties are resolved in favour of earlier lines.
+
+    Args:
+        index (dict): k-gram index.
+        query (bytes): Query with one byte per symbol.
+        num_candidates (int): Maximum number of lines selected.
+
+    Returns:
+        np.ndarray: Indexes of the selected lines, in increasing order.
+    """
+    hits = count_hits(index, query)
+    order = np.argsort(-hits, kind="stable")[:num_candidates]
+    return np.sort(order[hits[order] > 0])
+
+
+def lossless_candidates(index, query, max_errors):
+    """
+    Selects the melodic lines that may contain a fragment within max_errors edits of the
+    query, by the q-gram lemma (see the module description).
+
+    Args:
+        index (dict): k-gram index.
+        query (bytes): Query with one byte per symbol.
+        max_errors (int): Error budget (edits).
+
+    Returns:
+        np.ndarray: Indexes of the selected lines, in increasing order, or None if the
+                    query is too short for the error budget and no line can be discarded.
+    """
+    threshold = len(query) - index["k"] + 1 - index["k"] * max_errors
+    if threshold <= 0:
+        return None
+    return np.flatnonzero(count_hits(index, query) >= threshold)
@@ -0,0 +1,216 @@
+"""
+BSD 2-Clause License
+
+Copyright (c) 2024, Hilda Romero-Velo
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+
+* Redistributions of source code must retain the above copyright notice, this
+  list of conditions and the following disclaimer.
+
+* Redistributions in binary form must reproduce the above copyright notice, this
+  list of conditions and the following disclaimer in the documentation
+  and/or other materials provided with the distribution.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+
+"""
+Index of the upper bounds of the approximate alignment score of every melodic line, used to
+visit the lines in decreasing bound order and stop the Top 5 search early (see
+`approximate_alignment()` in `approximate_alignment.cpp`).
+
+The line symbols are taken as the `approximate_alignment` program aligns them (the UTF-8
+bytes of the feature texts). Identical melodic lines are collapsed into unique lines (see
+`corpus_index.deduplicate`), each aligned once by the program, with the fan-out list of the
+melodic lines that share it. The index stores the length and the symbol histogram of every
+unique line. The histograms are sparse: the symbols of every unique line are listed once,
+in increasing order, with their counts:
+
+    offset 0    magic (4 bytes, "FLBX")
+    offset 4    format version (uint32, 2)
+    offset 8    number of melodic lines (uint64)
+    offset 16   number of unique lines (uint64)
+    offset 24   number of histogram entries (uint64)
+    offset 32   histogram entry offsets (uint64, number of unique lines + 1)
+                fan-out offsets (uint64, number of unique lines + 1)
+                unique line lengths (uint32, number of unique lines)
+                fan-out lists: melodic line indexes, increasing within each unique line
+                (uint32, number of melodic lines)
+                counts (uint32, number of histogram entries)
+                symbols (uint8, number of histogram entries)
+
+A fitting alignment scores at most one pair per text and query position, and gaps only
+lower the score, so with the non-negative part of the scores of every pair, the score of a
+line against a query of m symbols is bounded by (see `upper_bounds`):
+    - min(line length, m) times the best score (length bound).
+    - The number of equal symbols the line and the query can pair, min(line count, query
+      count) of every symbol, times the score of a match of that symbol, plus min(line
+      length, m) times the best score of two different symbols (histogram overlap bound).
+"""
+
+import mmap
+import struct
+
+import numpy as np
+
+import corpus_index
+
+MAGIC = b"FLBX"
+VERSION = 2
+HEADER = struct.Struct("<4sIQQQ")
+NUM_CODES = 256  # One histogram slot per byte value
+
+
+def build_line_bounds(lines):
+    """
+    Builds the bound index of the melodic lines.
+
+    Args:
+        lines (list): Melodic lines as aligned (bytes).
+
+    Returns:
+        dict: Index with the number of melodic lines ("num_lines"), the fan-out offsets
+              ("fanout_offsets") and lists ("fanout") of the unique lines, their lengths
+              ("lengths") and the histogram entry offsets ("offsets"), symbols ("symbols")
+              and counts ("counts").
+    """
+    unique_lines, line_entries = corpus_index.deduplicate(lines)
+    fanout_offsets, fanout = corpus_index.build_fanout(line_entries, len(unique_lines))
+    lengths = np.array([len(line) for line in unique_lines], dtype=np.int64)
+    symbols = np.frombuffer(b"".join(unique_lines), dtype=np.uint8)
+    line_of = np.repeat(np.arange(len(unique_lines), dtype=np.int64), lengths)
+
+    # Histograms of every line at once: (line, symbol) keys, sorted, with their counts
+    keys, counts = np.unique(line_of * NUM_CODES + symbols, return_counts=True)
+    entries = np.bincount(keys // NUM_CODES, minlength=len(unique_lines))
+    return {
+        "num_lines": len(lines),
+        "fanout_offsets": fanout_offsets,
+        "fanout": fanout.astype(np.uint32),
+        "lengths": lengths.astype(np.uint32),
+        "offsets": np.append(0, np.cumsum(entries)).astype(np.uint64),
+        "symbols": (keys % NUM_CODES).astype(np.uint8),
+        "counts": counts.astype(np.uint32),
+    }
+
+
+def write_line_bounds(filename, bounds):
+    """
+    Writes a bound index.
+
+    Args:
+        filename (str): Path of the index file.
+        bounds (dict): Index built with `build_line_bounds`.
+
+    Returns:
+        None
+    """
+    with open(filename, "wb") as file:
+        file.write(
+            HEADER.pack(
+                MAGIC,
+                VERSION,
+                bounds["num_lines"],
+                len(bounds["lengths"]),
+                len(bounds["symbols"]),
+            )
+        )
+        file.write(bounds["offsets"].astype("<u8").tobytes())
+        file.write(bounds["fanout_offsets"].astype("<u8").tobytes())
+        file.write(bounds["lengths"].astype("<u4").tobytes())
+        file.write(bounds["fanout"].astype("<u4").tobytes())
+        file.write(bounds["counts"].astype("<u4").tobytes())
+        file.write(bounds["symbols"].astype(np.uint8).tobytes())
+
+
+def open_line_bounds(filename):
+    """
+    Opens a bound index, mapping it into memory (read-only).
+
+    Args:
+        filename (str): Path of the index file.
+
+    Returns:
+        dict: Index (see `build_line_bounds`), with NumPy views of the mapping.
+
+    Raises:
+        ValueError: If the file is not a bound index of a supported version.
+    """
+    with open(filename, "rb") as file:
+        if len(file.read(HEADER.size)) != HEADER.size:
+            raise ValueError(f"'{filename}' is not a line bound index file.")
+        data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    magic, version, num_lines, num_unique, num_entries = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError(f"'{filename}' is not a line bound index file.")
+    if version != VERSION:
+        raise ValueError(
+            f"Unsupported line bound index version {version} in '{filename}'."
+        )
+
+    position = HEADER.size
+    offsets = np.frombuffer(data, "<u8", num_unique + 1, position)
+    position += offsets.nbytes
+    fanout_offsets = np.frombuffer(data, "<u8", num_unique + 1, position)
+    position += fanout_offsets.nbytes
+    lengths = np.frombuffer(data, "<u4", num_unique, position)
+    position += lengths.nbytes
+    fanout = np.frombuffer(data, "<u4", num_lines, position)
+    position += fanout.nbytes
+    counts = np.frombuffer(data, "<u4", num_entries, position)
+    position += counts.nbytes
+    symbols = np.frombuffer(data, np.uint8, num_entries, position)
+    return {
+        "num_lines": num_lines,
+        "fanout_offsets": fanout_offsets,
+        "fanout": fanout,
+        "lengths": lengths,
+        "offsets": offsets,
+        "symbols": symbols,
+        "counts": counts,
+    }
+
+
+def upper_bounds(bounds, query, score_matrix):
+    """
+    Computes the upper bound of the alignment score of every unique line against a query
+    (see the module description), as the `approximate_alignment` program does.
+
+    Args:
+        bounds (dict): Bound index.
+        query (bytes): Query as aligned.
+        score_matrix (np.ndarray): Scores (text symbol, query symbol) of the alignment
+                                   (NUM_CODES x NUM_CODES, integers).
+
+    Returns:
+        np.ndarray: Upper bound (int64) of the score of every unique line.
+    """
+    positive = np.maximum(score_matrix.astype(np.int64), 0)
+    match_scores = positive.diagonal()
+    mismatch_score = np.where(np.eye(NUM_CODES, dtype=bool), 0, positive).max()
+
+    query_counts = np.bincount(
+        np.frombuffer(query, dtype=np.uint8), minlength=NUM_CODES
+    )
+    symbols = bounds["symbols"]
+    pairs = np.minimum(bounds["counts"], query_counts[symbols]) * match_scores[symbols]
+    entries = np.diff(bounds["offsets"].astype(np.int64))
+    line_of = np.repeat(np.arange(len(entries)), entries)
+    overlap = np.bincount(line_of, weights=pairs, minlength=len(entries))
+
+    aligned = np.minimum(bounds["lengths"].astype(np.int64), len(query))
+    return np.minimum(
+        overlap.astype(np.int64) + aligned * mismatch_score, aligned * positive.max()
+    )
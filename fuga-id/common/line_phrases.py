@@ -0,0 +1,193 @@
+"""
+BSD 2-Clause License
+
+Copyright (c) 2024, Hilda Romero-Velo
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+
+* Redistributions of source code must retain the above copyright notice, this
+  list of conditions and the following disclaimer.
+
+* Redistributions in binary form must reproduce the above copyright notice, this
+  list of conditions and the following disclaimer in the documentation
+  and/or other materials provided with the distribution.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+
+"""
+Index of the repeated phrases of every melodic line, used by the `approximate_alignment`
+program to copy the dynamic programming columns of a repeat instead of computing them again
+(see `align_line()` in `approximate_alignment.cpp`).
+
+Folk tunes repeat whole phrases (AABB forms, refrains), so a melodic line often contains
+exact copies of its own earlier symbols. Every unique line (see `corpus_index.deduplicate`)
+is factorized with LZ77: from left to right, each phrase is either a literal symbol or a copy
+of at least MIN_PHRASE_LENGTH symbols found earlier in the same line (its source, which may
+overlap the phrase). Only the copies are stored, in increasing order of their start, with
+the line symbols taken as the `approximate_alignment` program aligns them (the UTF-8 bytes
+of the feature texts):
+
+    offset 0    magic (4 bytes, "FLPX")
+    offset 4    format version (uint32, 1)
+    offset 8    number of unique lines (uint64)
+    offset 16   number of copies (uint64)
+    offset 24   copy offsets of every unique line (uint64, number of unique lines + 1)
+                copy starts (uint32, number of copies)
+                copy sources (uint32, number of copies)
+                copy lengths (uint32, number of copies)
+"""
+
+import mmap
+import struct
+from collections import defaultdict
+
+import numpy as np
+
+import corpus_index
+
+MAGIC = b"FLPX"
+VERSION = 1
+HEADER = struct.Struct("<4sIQQ")
+MIN_PHRASE_LENGTH = 4  # Shorter repeats are kept as literals
+MAX_SOURCES = 32  # Most recent earlier positions tried as the source of a copy
+
+
+def factorize(line, min_length=MIN_PHRASE_LENGTH):
+    """
+    Factorizes a melodic line with LZ77, taking at every position the longest copy among the
+    MAX_SOURCES most recent earlier positions that start with the same min_length symbols.
+
+    Args:
+        line (bytes): Melodic line as aligned.
+        min_length (int): Minimum length of a copy.
+
+    Returns:
+        list: Copies as (start, source, length) tuples, in increasing order of start.
+    """
+    copies = []
+    sources = defaultdict(list)  # Earlier positions of every min_length-gram
+    indexed = 0  # Positions whose min_length-gram has been recorded
+    position = 0
+    while position < len(line):
+        for start in range(indexed, min(position, len(line) - min_length + 1)):
+            sources[line[start : start + min_length]].append(start)
+        indexed = max(indexed, position)
+
+        best_source, best_length = 0, 0
+        key = line[position : position + min_length]
+        for source in reversed(sources.get(key, [])[-MAX_SOURCES:]):
+            length = min_length
+            while (
+                position + length < len(line)
+                and line[source + length] == line[position + length]
+            ):
+                length += 1
+            if length > best_length:
+                best_source, best_length = source, length
+
+        if best_length:
+            copies.append((position, best_source, best_length))
+            position += best_length
+        else:
+            position += 1
+    return copies
+
+
+def build_line_phrases(lines):
+    """
+    Builds the phrase index of the melodic lines.
+
+    Args:
+        lines (list): Melodic lines as aligned (bytes).
+
+    Returns:
+        dict: Index with the copy offsets of every unique line ("offsets") and the start
+              ("starts"), source ("sources") and length ("lengths") of every copy.
+    """
+    unique_lines, _ = corpus_index.deduplicate(lines)
+    copies = [factorize(line) for line in unique_lines]
+    fields = np.array(
+        [copy for line_copies in copies for copy in line_copies], dtype=np.uint32
+    ).reshape(-1, 3)
+    return {
+        "offsets": np.append(0, np.cumsum([len(c) for c in copies])).astype(np.uint64),
+        "starts": fields[:, 0].copy(),
+        "sources": fields[:, 1].copy(),
+        "lengths": fields[:, 2].copy(),
+    }
+
+
+def write_line_phrases(filename, phrases):
+    """
+    Writes a phrase index.
+
+    Args:
+        filename (str): Path of the index file.
+        phrases (dict): Index built with `build_line_phrases`.
+
+    Returns:
+        None
+    """
+    with open(filename, "wb") as file:
+        file.write(
+            HEADER.pack(
+                MAGIC, VERSION, len(phrases["offsets"]) - 1, len(phrases["starts"])
+            )
+        )
+        file.write(phrases["offsets"].astype("<u8").tobytes())
+        file.write(phrases["starts"].astype("<u4").tobytes())
+        file.write(phrases["sources"].astype("<u4").tobytes())
+        file.write(phrases["lengths"].astype("<u4").tobytes())
+
+
+def open_line_phrases(filename):
+    """
+    Opens a phrase index, mapping it into memory (read-only).
+
+    Args:
+        filename (str): Path of the index file.
+
+    Returns:
+        dict: Index (see `build_line_phrases`), with NumPy views of the mapping.
+
+    Raises:
+        ValueError: If the file is not a phrase index of a supported version.
+    """
+    with open(filename, "rb") as file:
+        if len(file.read(HEADER.size)) != HEADER.size:
+            raise ValueError(f"'{filename}' is not a line phrase index file.")
+        data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    magic, version, num_unique, num_copies = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError(f"'{filename}' is not a line phrase index file.")
+    if version != VERSION:
+        raise ValueError(
+            f"Unsupported line phrase index version {version} in '{filename}'."
+        )
+
+    position = HEADER.size
+    offsets = np.frombuffer(data, "<u8", num_unique + 1, position)
+    position += offsets.nbytes
+    starts = np.frombuffer(data, "<u4", num_copies, position)
+    position += starts.nbytes
+    sources = np.frombuffer(data, "<u4", num_copies, position)
+    position += sources.nbytes
+    lengths = np.frombuffer(data, "<u4", num_copies, position)
+    return {
+        "offsets": offsets,
+        "starts": starts,
+        "sources": sources,
+        "lengths": lengths,
+    }
@@ -0,0 +1,474 @@
+"""
+BSD 2-Clause License
+
+Copyright (c) 2024, Hilda Romero-Velo
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+
+* Redistributions of source code must retain the above copyright notice, this
+  list of conditions and the following disclaimer.
+
+* Redistributions in binary form must reproduce the above copyright notice, this
+  list of conditions and the following disclaimer in the documentation
+  and/or other materials provided with the distribution.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+
+"""
+Lightweight Standard MIDI File reader and writer working on NumPy arrays.
+
+`read_midi` parses a MIDI file into a structured array with one row per note (NOTE_DTYPE) and
+the tempo map of the file, without creating one object per event as `mido` and `pretty_midi`
+do. Notes are paired and grouped into instruments exactly as `pretty_midi` does (notes are
+grouped by program, channel and track, in the order in which `pretty_midi` creates its
+instruments, and keep the order of `Instrument.notes`), and note times come from the same
+tick to time map, so features computed on the array match those computed with `pretty_midi`.
+
+The parsed file is returned as a dictionary:
+    - "notes": structured array of notes (NOTE_DTYPE), grouped by instrument.
+    - "resolution": ticks per beat.
+    - "tempo_map": structured array of tempo changes (TEMPO_DTYPE) as used by `pretty_midi`
+      (set_tempo events of the first track).
+    - "tick_to_time": time in seconds of every tick of the file.
+    - "tempo_events": structured array (TEMPO_EVENT_DTYPE) with every set_tempo event of the
+      file, in track order.
+    - "end_tick": absolute tick of the last event of the file.
+
+With `with_events=True` the dictionary also holds every event of the file, for tools that
+rewrite files event by event (e.g. fragment extraction):
+    - "events": structured array of events (EVENT_DTYPE), in track order.
+    - "event_messages": bytes of every event (status byte included), aligned with "events".
+    - "track_count": number of tracks of the file.
+
+`write_tracks` writes lists of (delta, message) events to a type 1 MIDI file.
+"""
+
+import numpy as np
+
+NOTE_DTYPE = np.dtype(
+    [
+        ("onset", np.float64),  # Seconds
+        ("offset", np.float64),  # Seconds
+        ("onset_tick", np.int64),
+        ("offset_tick", np.int64),
+        ("pitch", np.uint8),
+        ("velocity", np.uint8),
+        ("track", np.int16),
+        ("channel", np.uint8),
+        ("program", np.uint8),
+        ("instrument", np.int16),  # Index of the (program, channel, track) group
+    ]
+)
+TEMPO_DTYPE = np.dtype([("tick", np.int64), ("tick_scale", np.float64)])
+TEMPO_EVENT_DTYPE = np.dtype(
+    [("track", np.int16), ("tick", np.int64), ("tempo", np.int64)]
+)
+EVENT_DTYPE = np.dtype(
+    [
+        ("track", np.int16),
+        ("tick", np.int64),
+        ("delta", np.int64),
+        ("kind", np.uint8),  # EVENT_* constant
+        ("pitch", np.uint8),  # Note events only
+    ]
+)
+
+# Event kinds
+EVENT_OTHER = 0
+EVENT_NOTE_ON = 1  # Note-on with velocity > 0
+EVENT_NOTE_OFF = 2  # Note-off or note-on with velocity 0
+EVENT_KEPT_META = 3  # Set tempo or time signature
+EVENT_END_OF_TRACK = 4
+
+DEFAULT_TEMPO = 500000  # Microseconds per beat (120 BPM)
+DRUM_CHANNEL = 9
+META_SET_TEMPO = 0x51
+META_TIME_SIGNATURE = 0x58
+META_END_OF_TRACK = 0x2F
+KEPT_META_TYPES = (META_SET_TEMPO, META_TIME_SIGNATURE)
+
+# Number of data bytes of channel messages (by status high nibble) and system messages
+CHANNEL_MESSAGE_LENGTHS = {
+    0x80: 2,
+    0x90: 2,
+    0xA0: 2,
+    0xB0: 2,
+    0xC0: 1,
+    0xD0: 1,
+    0xE0: 2,
+}
+SYSTEM_MESSAGE_LENGTHS = {0xF1: 1, 0xF2: 2, 0xF3: 1}
+
+
+def read_variable_length(data, pos):
+    """
+    Reads a variable-length quantity.
+
+    Args:
+        data (bytes): MIDI data.
+        pos (int): Position of the first byte of the quantity.
+
+    Returns:
+        tuple: (value, position of the next byte)
+    """
+    value = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value = (value << 7) | (byte & 0x7F)
+        if byte < 0x80:
+            return value, pos
+
+
+def encode_variable_length(value):
+    """
+    Encodes a variable-length quantity.
+
+    Args:
+        value (int): Non-negative integer.
+
+    Returns:
+        bytes: Encoded quantity.
+    """
+    encoded = [value & 0x7F]
+    value >>= 7
+    while value:
+        encoded.append((value & 0x7F) | 0x80)
+        value >>= 7
+    return bytes(reversed(encoded))
+
+
+def split_chunks(data):
+    """
+    Splits MIDI data into its header and track chunks.
+
+    Args:
+        data (bytes): Content of the MIDI file.
+
+    Returns:
+        tuple: (format, division, list of track chunk contents)
+    """
+    if data[:4] != b"MThd":
+        raise ValueError("Not a Standard MIDI File.")
+    header_length = int.from_bytes(data[4:8], "big")
+    midi_format = int.from_bytes(data[8:10], "big")
+    division = int.from_bytes(data[12:14], "big")
+    if division & 0x8000:
+        raise ValueError("SMPTE time division is not supported.")
+
+    tracks = []
+    pos = 8 + header_length
+    while pos + 8 <= len(data):
+        chunk_type = data[pos : pos + 4]
+        length = int.from_bytes(data[pos + 4 : pos + 8], "big")
+        if chunk_type == b"MTrk":
+            tracks.append(data[pos + 8 : pos + 8 + length])
+        pos += 8 + length
+    return midi_format, division, tracks
+
+
+def parse_track(data, track_index, notes, instruments, tempo_events, events=None):
+    """
+    Parses the events of a track, pairing note-on and note-off events as `pretty_midi` does.
+
+    Args:
+        data (bytes): Content of the track chunk.
+        track_index (int): Index of the track in the file.
+        notes (list): Closed notes (onset tick, offset tick, pitch, velocity, track, channel,
+                      program, instrument), appended in place.
+        instruments (dict): (program, channel, track) to instrument index, updated in place.
+        tempo_events (list): (track, tick, tempo) of the set_tempo events, appended in place.
+        events (list): If given, (track, tick, delta, kind, pitch, message) of every event,
+                       appended in place.
+
+    Returns:
+        int: Absolute tick of the last event of the track.
+    """
+    pos = 0
+    tick = 0
+    last_status = None
+    programs = [0] * 16
+    open_notes = {}  # (channel, pitch) -> [(onset tick, velocity)]
+    end = len(data)
+    while pos < end:
+        delta, pos = read_variable_length(data, pos)
+        tick += delta
+        status = data[pos]
+        if status < 0x80:
+            if last_status is None:
+                raise ValueError("Running status without a previous status byte.")
+            status = last_status
+        else:
+            pos += 1
+            if status != 0xFF:
+                last_status = status  # Meta events do not set running status
+
+        message_start = pos
+        kind = EVENT_OTHER
+        if status == 0xFF:
+            meta_type = data[pos]
+            length, pos = read_variable_length(data, pos + 1)
+            if meta_type == META_SET_TEMPO:
+                tempo_events.append(
+                    (track_index, tick, int.from_bytes(data[pos : pos + 3], "big"))
+                )
+            if meta_type in KEPT_META_TYPES:
+                kind = EVENT_KEPT_META
+            elif meta_type == META_END_OF_TRACK:
+                kind = EVENT_END_OF_TRACK
+            pos += length
+        elif status in (0xF0, 0xF7):
+            length, pos = read_variable_length(data, pos)
+            pos += length
+        elif status >= 0xF0:
+            pos += SYSTEM_MESSAGE_LENGTHS.get(status, 0)
+        else:
+            message_type = status & 0xF0
+            channel = status & 0x0F
+            if message_type == 0xC0:
+                programs[channel] = data[pos]
+            elif message_type == 0x90 and data[pos + 1] > 0:
+                kind = EVENT_NOTE_ON
+                open_notes.setdefault((channel, data[pos]), []).append(
+                    (tick, data[pos + 1])
+                )
+            elif message_type == 0x80 or message_type == 0x90:
+                kind = EVENT_NOTE_OFF
+                key = (channel, data[pos])
+                if key in open_notes:
+                    # A note-off closes every note opened on a previous tick; notes opened
+                    # on this same tick remain open
+                    to_close = [note for note in open_notes[key] if note[0] != tick]
+                    to_keep = [note for note in open_notes[key] if note[0] == tick]
+                    for onset_tick, velocity in to_close:
+                        group = (programs[channel], channel, track_index)
+                        instrument = instruments.setdefault(group, len(instruments))
+                        notes.append(
+                            (
+                                onset_tick,
+                                tick,
+                                data[pos],
+                                velocity,
+                                track_index,
+                                channel,
+                                programs[channel],
+                                instrument,
+                            )
+                        )
+                    if to_close and to_keep:
+                        open_notes[key] = to_keep
+                    else:
+                        del open_notes[key]
+            pos += CHANNEL_MESSAGE_LENGTHS[message_type]
+
+        if events is not None:
+            pitch = (
+                data[message_start] if kind in (EVENT_NOTE_ON, EVENT_NOTE_OFF) else 0
+            )
+            events.append(
+                (
+                    track_index,
+                    tick,
+                    delta,
+                    kind,
+                    pitch,
+                    bytes([status]) + data[message_start:pos],
+                )
+            )
+        if kind == EVENT_END_OF_TRACK:
+            break
+    return tick
+
+
+def build_tempo_map(tempo_events, resolution):
+    """
+    Builds the tempo map from the set_tempo events of the first track, as `pretty_midi` does.
+
+    Args:
+        tempo_events (list): (track, tick, tempo) of the set_tempo events.
+        resolution (int): Ticks per beat.
+
+    Returns:
+        numpy.ndarray: Tempo changes (TEMPO_DTYPE), starting at tick 0.
+    """
+    tick_scales = [(0, 60.0 / (120.0 * resolution))]
+    for track, tick, tempo in tempo_events:
+        if track != 0:
+            continue
+        tick_scale = 60.0 / ((6e7 / tempo) * resolution)
+        if tick == 0:
+            tick_scales = [(0, tick_scale)]
+        elif tick_scale != tick_scales[-1][1]:
+            tick_scales.append((tick, tick_scale))
+    return np.array(tick_scales, dtype=TEMPO_DTYPE)
+
+
+def build_tick_to_time(tempo_map, max_tick):
+    """
+    Computes the time in seconds of every tick, as `pretty_midi` does.
+
+    Args:
+        tempo_map (numpy.ndarray): Tempo changes (TEMPO_DTYPE).
+        max_tick (int): Last tick to compute the time for.
+
+    Returns:
+        numpy.ndarray: Time of every tick from 0 to max_tick (or to the last tempo change).
+    """
+    max_tick = max(max_tick, int(tempo_map["tick"].max()))
+    tick_to_time = np.zeros(max_tick + 1)
+    last_end_time = 0
+    for (start_tick, tick_scale), (end_tick, _) in zip(tempo_map[:-1], tempo_map[1:]):
+        ticks = np.arange(end_tick - start_tick + 1)
+        tick_to_time[start_tick : end_tick + 1] = last_end_time + tick_scale * ticks
+        last_end_time = tick_to_time[end_tick]
+    start_tick, tick_scale = tempo_map[-1]
+    ticks = np.arange(max_tick + 1 - start_tick)
+    tick_to_time[start_tick:] = last_end_time + tick_scale * ticks
+    return tick_to_time
+
+
+def read_midi(midi_path, with_events=False):
+    """
+    Reads a MIDI file into NumPy arrays.
+
+    Args:
+        midi_path (str): Path to the MIDI file.
+        with_events (bool): Whether to also return every event of the file.
+
+    Returns:
+        dict: Parsed file (see module docstring).
+    """
+    with open(midi_path, "rb") as file:
+        _, resolution, tracks = split_chunks(file.read())
+
+    notes, instruments, tempo_events = [], {}, []
+    events = [] if with_events else None
+    end_tick = 0
+    for track_index, track in enumerate(tracks):
+        end_tick = max(
+            end_tick,
+            parse_track(track, track_index, notes, instruments, tempo_events, events),
+        )
+
+    tempo_map = build_tempo_map(tempo_events, resolution)
+    tick_to_time = build_tick_to_time(tempo_map, end_tick + 1)
+
+    note_array = np.zeros(len(notes), dtype=NOTE_DTYPE)
+    if notes:
+        columns = list(zip(*notes))
+        for name, values in zip(
+            (
+                "onset_tick",
+                "offset_tick",
+                "pitch",
+                "velocity",
+                "track",
+                "channel",
+                "program",
+                "instrument",
+            ),
+            columns,
+        ):
+            note_array[name] = values
+        note_array["onset"] = tick_to_time[note_array["onset_tick"]]
+        note_array["offset"] = tick_to_time[note_array["offset_tick"]]
+        note_array = note_array[np.argsort(note_array["instrument"], kind="stable")]
+
+    midi_data = {
+        "notes": note_array,
+        "resolution": resolution,
+        "tempo_map": tempo_map,
+        "tick_to_time": tick_to_time,
+        "tempo_events": np.array(tempo_events, dtype=TEMPO_EVENT_DTYPE),
+        "end_tick": end_tick,
+    }
+    if with_events:
+        midi_data["events"] = np.array(
+            [event[:5] for event in events], dtype=EVENT_DTYPE
+        )
+        midi_data["event_messages"] = [event[5] for event in events]
+        midi_data["track_count"] = len(tracks)
+    return midi_data
+
+
+def initial_tempo(midi_data):
+    """
+    Returns the first tempo of a MIDI file.
+
+    Args:
+        midi_data (dict): Parsed MIDI file (see `read_midi`).
+
+    Returns:
+        int: Tempo of the first set_tempo event of the file in microseconds per beat, or the
+             MIDI default tempo if there is none.
+    """
+    if len(midi_data["tempo_events"]):
+        return int(midi_data["tempo_events"]["tempo"][0])
+    return DEFAULT_TEMPO
+
+
+def split_instruments(notes, include_drums=True):
+    """
+    Splits notes into instruments.
+
+    Args:
+        notes (numpy.ndarray): Notes (NOTE_DTYPE) grouped by instrument.
+        include_drums (bool): Whether to include the instruments of the drum channel.
+
+    Returns:
+        list: One note array per instrument, in instrument order.
+    """
+    if not len(notes):
+        return []
+    boundaries = np.flatnonzero(np.diff(notes["instrument"])) + 1
+    return [
+        group
+        for group in np.split(notes, boundaries)
+        if include_drums or group["channel"][0] != DRUM_CHANNEL
+    ]
+
+
+def write_tracks(midi_path, tracks, resolution):
+    """
+    Writes events to a type 1 MIDI file. As `mido` does when saving, end of track events are
+    removed (their delta time is added to the next event) and one is written at the end of
+    every track.
+
+    Args:
+        midi_path (str): Path to the MIDI file to write.
+        tracks (list): One list of (delta, message) events per track, where message holds the
+                       bytes of the event with its status byte.
+        resolution (int): Ticks per beat.
+    """
+    chunks = [
+        b"MThd"
+        + (6).to_bytes(4, "big")
+        + (1).to_bytes(2, "big")
+        + len(tracks).to_bytes(2, "big")
+        + resolution.to_bytes(2, "big")
+    ]
+    for events in tracks:
+        content = bytearray()
+        pending_delta = 0
+        for delta, message in events:
+            if message[:2] == bytes([0xFF, META_END_OF_TRACK]):
+                pending_delta += delta
+                continue
+            content += encode_variable_length(pending_delta + delta) + message
+            pending_delta = 0
+        content += encode_variable_length(pending_delta) + b"\xff\x2f\x00"
+        chunks.append(b"MTrk" + len(content).to_bytes(4, "big") + bytes(content))
+    with open(midi_path, "wb") as file:
+        file.write(b"".join(chunks))
@@ -0,0 +1,225 @@
+"""
+BSD 2-Clause License
+
+Copyright (c) 2024, Hilda Romero-Velo
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+
+* Redistributions of source code must retain the above copyright notice, this
+  list of conditions and the following disclaimer.
+
+* Redistributions in binary form must reproduce the above copyright notice, this
+  list of conditions and the following disclaimer in the documentation
+  and/or other materials provided with the distribution.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+
+"""
+Table-driven codec between feature values and their single-character notation.
+
+Feature values are semicolon-separated tokens (e.g. "2;-1;r3;" or "1/2;2;"), and the
+alignment dictionaries (`approx_dictionary` and `blast_dictionary`) map each token to a
+single character in the Latin-1 range, so every token is encoded as one byte. The codec
+builds, once per dictionary, a token-to-byte table for encoding and a byte-to-token table
+for decoding, and translates whole sequences (or whole corpora) per call:
+
+    encode(data, dictionary)            "2;-1;3;" -> b"..."      (one byte per known token)
+    encode_many(sequences, dictionary)  list of sequences -> list of bytes
+    encode_values(values, dictionary)   [2, -1, 3] -> b"..."
+    decode(symbols, dictionary)         b"..." -> "2;-1;3;"
+    decode_many(symbols_list, dictionary)
+
+Silence marks ("r") are removed from tokens and unknown tokens are skipped, as done by
+`to_single_notation`. Encoded sequences are `bytes`; `to_text` returns the equivalent string
+(one character per byte) used in the index text files, the FASTA files and the database, and
+`to_bytes` converts it back.
+"""
+
+SEPARATOR = ";"
+SILENCE_MARK = "r"
+
+_tables = {}  # id(dictionary) -> (dictionary, encoding table, decoding table)
+
+
+def build_tables(dictionary):
+    """
+    Builds the encoding and decoding tables of a dictionary.
+
+    Args:
+        dictionary (dict): Mapping of feature values (str) to single characters.
+
+    Returns:
+        tuple: (encoding table: token -> byte value, decoding table: list of 256 tokens
+               followed by the separator, None for unused bytes)
+
+    Raises:
+        ValueError: If a character of the dictionary does not fit in a single byte.
+    """
+    encoding = {}
+    decoding = [None] * 256
+    for token, character in dictionary.items():
+        code = ord(character)
+        if len(character) != 1 or code > 0xFF:
+            raise ValueError(f"Character {character!r} does not fit in a single byte.")
+        encoding[token] = code
+        decoding[code] = token + SEPARATOR
+    return encoding, decoding
+
+
+def get_tables(dictionary):
+    """
+    Returns the encoding and decoding tables of a dictionary, building them only once.
+
+    Args:
+        dictionary (dict): Mapping of feature values (str) to single characters.
+
+    Returns:
+        tuple: (encoding table, decoding table), see `build_tables`.
+    """
+    cached = _tables.get(id(dictionary))
+    if cached is None or cached[0] is not dictionary:
+        cached = (dictionary, *build_tables(dictionary))
+        _tables[id(dictionary)] = cached
+    return cached[1], cached[2]
+
+
+def encode_tokens(tokens, encoding):
+    """
+    Encodes a sequence of tokens with an encoding table, skipping unknown tokens.
+
+    Args:
+        tokens (iterable): Feature values (str), without silence marks.
+        encoding (dict): Token to byte value table.
+
+    Returns:
+        bytes: One byte per known token.
+    """
+    return bytes([code for code in map(encoding.get, tokens) if code is not None])
+
+
+def encode(data, dictionary):
+    """
+    Encodes semicolon-separated feature values into single-byte notation.
+
+    Args:
+        data (str): Semicolon-separated feature values (the last element after the final
+                    separator is ignored).
+        dictionary (dict): Mapping of feature values to single characters.
+
+    Returns:
+        bytes: Encoded sequence.
+    """
+    encoding, _ = get_tables(dictionary)
+    tokens = data.replace(SILENCE_MARK, "").split(SEPARATOR)
+    tokens.pop()  # Remove the last (empty) element
+    return encode_tokens(tokens, encoding)
+
+
+def encode_many(sequences, dictionary):
+    """
+    Encodes many sequences of semicolon-separated feature values with the same dictionary.
+
+    Args:
+        sequences (iterable): Semicolon-separated feature values (str) of each sequence.
+        dictionary (dict): Mapping of feature values to single characters.
+
+    Returns:
+        list: Encoded sequences (bytes), in the same order.
+    """
+    encoding, _ = get_tables(dictionary)
+    encoded = []
+    for data in sequences:
+        tokens = data.replace(SILENCE_MARK, "").split(SEPARATOR)
+        tokens.pop()
+        encoded.append(encode_tokens(tokens, encoding))
+    return encoded
+
+
+def encode_values(values, dictionary):
+    """
+    Encodes a list of feature values into single-byte notation.
+
+    Args:
+        values (iterable): Feature values (int, str or any value whose string is a token).
+        dictionary (dict): Mapping of feature values to single characters.
+
+    Returns:
+        bytes: Encoded sequence.
+    """
+    encoding, _ = get_tables(dictionary)
+    return encode_tokens(map(str, values), encoding)
+
+
+def decode(symbols, dictionary):
+    """
+    Decodes a single-byte notation sequence back to semicolon-separated feature values.
+
+    Args:
+        symbols (bytes or str): Encoded sequence (a str is taken as one character per byte).
+        dictionary (dict): Mapping of feature values to single characters.
+
+    Returns:
+        str: Semicolon-separated feature values, ending with a separator.
+
+    Raises:
+        KeyError: If a symbol is not part of the dictionary.
+    """
+    _, decoding = get_tables(dictionary)
+    if isinstance(symbols, str):
+        symbols = symbols.encode("latin-1")
+    tokens = [decoding[code] for code in symbols]
+    if None in tokens:
+        raise KeyError(f"Symbol not found in the dictionary: {symbols!r}")
+    return "".join(tokens)
+
+
+def decode_many(symbols_list, dictionary):
+    """
+    Decodes many single-byte notation sequences with the same dictionary.
+
+    Args:
+        symbols_list (iterable): Encoded sequences (bytes or str).
+        dictionary (dict): Mapping of feature values to single characters.
+
+    Returns:
+        list: Semicolon-separated feature values of each sequence.
+    """
+    return [decode(symbols, dictionary) for symbols in symbols_list]
+
+
+def to_text(symbols):
+    """
+    Converts an encoded sequence to a string with one character per byte.
+
+    Args:
+        symbols (bytes): Encoded sequence.
+
+    Returns:
+        str: Sequence in single-character notation.
+    """
+    return symbols.decode("latin-1")
+
+
+def to_bytes(text):
+    """
+    Converts a string in single-character notation back to its encoded sequence.
+
+    Args:
+        text (str): Sequence in single-character notation.
+
+    Returns:
+        bytes: Encoded sequence (one byte per character).
+    """
+    return text.encode("latin-1")
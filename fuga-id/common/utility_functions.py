@@ -32,6 +32,8 @@ OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
 import struct
 
+import notation_codec
+
 
 def extract_feature(filepath, ignore_value=None):
     """
@@ -50,16 +52,16 @@ def extract_feature(filepath, ignore_value=None):
     Notes:
         Lines that cannot be converted to integers are skipped.
     """
-    feature = ""
+    values = []
     with open(filepath, "r", encoding="utf8") as f:
         for line in f:
             try:
                 step = int(line.strip().replace("+", ""))
                 if step != ignore_value:
-                    feature += f"{step};"
+                    values.append(f"{step};")
             except ValueError:
                 continue
-    return feature
+    return "".join(values)
 
 
 def to_single_notation(data, dictionary):
@@ -71,19 +73,13 @@ def to_single_notation(data, dictionary):
         dictionary (dict): Mapping of feature values to single-character representations.
 
     Returns:
-        str: Translated feature values as a single string.
+        str: Translated feature values as a single string (unmapped values are skipped).
+
+    Notes:
+        The translation is done by `notation_codec`, which works on bytes; see
+        `notation_codec.encode` to get the encoded sequence without converting it to str.
     """
-    values = data.split(";")
-    values.pop()  # Remove the last empty element
-    result = ""
-    for v in values:
-        try:
-            result += dictionary[
-                v.replace("r", "")
-            ]  # Use dictionary to get single character
-        except KeyError:
-            result += ""  # Skip unmaped values
-    return result
+    return notation_codec.to_text(notation_codec.encode(data, dictionary))
 
 
 def save_cost_map(cost_map, filename):
@@ -87,6 +87,9 @@ CREATE TABLE Query (
     start_timestamp INTEGER NOT NULL, -- Start time of the query in the recording in milliseconds
     end_timestamp INTEGER NOT NULL,   -- End time of the query in the recording in milliseconds
     recording_id VARCHAR(255) NOT NULL, -- Foreign key referencing Recording
+    trimmed_duration_ms INTEGER, -- Duration after trimming leading/trailing silence (0 if the query had no musical content)
+    wall_time_ms INTEGER, -- Wall time of the feature extraction and searches of the query in milliseconds
+    search_mode VARCHAR(15), -- Whether the searches ran 'sequential' or 'concurrent'
     
     -- Ensures uniqueness based on (recording_id, start_timestamp, end_timestamp)
     CONSTRAINT unique_query_time UNIQUE (recording_id, start_timestamp, end_timestamp), 
@@ -0,0 +1,199 @@
+"""
+BSD 2-Clause License
+
+Copyright (c) 2024, Hilda Romero-Velo
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+
+* Redistributions of source code must retain the above copyright notice, this
+  list of conditions and the following disclaimer.
+
+* Redistributions in binary form must reproduce the above copyright notice, this
+  list of conditions and the following disclaimer in the documentation
+  and/or other materials provided with the distribution.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+
+"""
+Script: benchmark_alignment_kernels.py
+Purpose:
+    Compares the kernels of the in-process approximate alignment (`fitting_alignment.py`)
+    by query length: the per-line 'batch' kernel, the query 'profile' kernel, the prefix
+    'trie' kernel, and the kernel selected automatically from the sequence lengths. Checks
+    that all give the same results.
+
+Usage:
+    python3 benchmark_alignment_kernels.py [-n <queries>] [-f <feature> ...] [-s <seed>]
+
+Queries are fragments of melodic lines of the corpus with some symbols replaced, grouped in
+the query length buckets of `database/report_queries.py` (metrics by query sequence length). Lengths
+are drawn uniformly within each bucket; the open buckets use 5-9 and 51-200 symbols. The
+approximate alignment indexes must be built in scores/indexes.
+
+Reported metrics (per feature and bucket):
+    - Mean query length and latency per query of each kernel.
+    - Kernel selected automatically for most queries, and its speedup over the 'batch' kernel.
+    - Queries whose results differ between kernels.
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from collections import Counter
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(script_dir, "../../src"))
+import fitting_alignment
+
+# Query length buckets of `database/report_queries.py`, with the lengths drawn for each one
+BUCKETS = [
+    ("<10", 5, 9),
+    ("10-15", 10, 15),
+    ("15-20", 16, 20),
+    ("20-25", 21, 25),
+    ("25-30", 26, 30),
+    ("30-35", 31, 35),
+    ("35-40", 36, 40),
+    ("40-45", 41, 45),
+    ("45-50", 46, 50),
+    (">50", 51, 200),
+]
+MUTATION_RATE = 0.2  # Fraction of the query symbols replaced
+
+
+def make_query(corpus, length, rng):
+    """
+    Builds a query from a fragment of a melodic line of the corpus, replacing some of its
+    symbols with other symbols of the corpus.
+
+    Args:
+        corpus (dict): Corpus loaded with `fitting_alignment.load_corpus`.
+        length (int): Number of symbols of the query.
+        rng (random.Random): Random generator.
+
+    Returns:
+        str: Query in single-character notation.
+    """
+    candidates = [line for line in corpus["lines"] if len(line) >= length]
+    line = rng.choice(candidates or corpus["lines"])
+    start = rng.randint(0, max(len(line) - length, 0))
+    symbols = list(line[start : start + length])
+    alphabet = sorted(set(b"".join(corpus["lines"][:1000])))
+    for position in range(len(symbols)):
+        if rng.random() < MUTATION_RATE:
+            symbols[position] = rng.choice(alphabet)
+    return bytes(symbols).decode("latin-1")
+
+
+def time_alignment(query, corpus, kernel):
+    """
+    Aligns a query with a kernel.
+
+    Args:
+        query (str): Query in single-character notation.
+        corpus (dict): Corpus loaded with `fitting_alignment.load_corpus`.
+        kernel (str): Kernel name, or None to select it automatically.
+
+    Returns:
+        tuple: (results, latency in milliseconds)
+    """
+    start = time.perf_counter()
+    results = fitting_alignment.align(query, corpus, kernel=kernel)
+    return results, (time.perf_counter() - start) * 1000
+
+
+def benchmark_bucket(corpus, low, high, num_queries, rng):
+    """
+    Benchmarks the kernels on the queries of a length bucket.
+
+    Args:
+        corpus (dict): Corpus loaded with `fitting_alignment.load_corpus`.
+        low (int): Minimum query length.
+        high (int): Maximum query length.
+        num_queries (int): Number of queries.
+        rng (random.Random): Random generator.
+
+    Returns:
+        dict: Metrics of the bucket.
+    """
+    metrics = {
+        "length": 0,
+        "batch_ms": 0.0,
+        "profile_ms": 0.0,
+        "trie_ms": 0.0,
+        "auto_ms": 0.0,
+        "selected": Counter(),
+        "differing": 0,
+    }
+    for _ in range(num_queries):
+        query = make_query(corpus, rng.randint(low, high), rng)
+        metrics["length"] += len(query)
+        results = {}
+        for kernel in fitting_alignment.KERNELS + [None]:
+            results[kernel], latency_ms = time_alignment(query, corpus, kernel)
+            metrics[f"{kernel or 'auto'}_ms"] += latency_ms
+        metrics["selected"][fitting_alignment.select_kernel(len(query), corpus)] += 1
+        if any(result != results[None] for result in results.values()):
+            metrics["differing"] += 1
+    return metrics
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Compare the approximate alignment kernels by query length."
+    )
+    parser.add_argument(
+        "-n",
+        "--num_queries",
+        type=int,
+        default=10,
+        help="Queries per length bucket (default: %(default)s).",
+    )
+    parser.add_argument(
+        "-f",
+        "--features",
+        nargs="+",
+        choices=list(fitting_alignment.FEATURE_FILES),
+        default=list(fitting_alignment.FEATURE_FILES),
+        help="Features to benchmark (default: all).",
+    )
+    parser.add_argument(
+        "-s", "--seed", type=int, default=0, help="Random seed (default: %(default)s)."
+    )
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    for feature in args.features:
+        corpus = fitting_alignment.load_corpus(feature)
+        print(
+            f"\n{feature}: {len(corpus['lines'])} lines, {corpus['num_symbols']} symbols, "
+            f"longest {corpus['max_length']}"
+        )
+        print(
+            f"{'Bucket':<7} {'Length':>7} {'Batch':>9} {'Profile':>9} {'Trie':>9} "
+            f"{'Auto':>9} {'Selected':>9} {'Speedup':>8} {'Differ':>7}"
+        )
+        for label, low, high in BUCKETS:
+            m = benchmark_bucket(corpus, low, high, args.num_queries, rng)
+            n = max(args.num_queries, 1)
+            print(
+                f"{label:<7} {m['length'] / n:>7.1f} {m['batch_ms'] / n:>7.1f}ms "
+                f"{m['profile_ms'] / n:>7.1f}ms {m['trie_ms'] / n:>7.1f}ms "
+                f"{m['auto_ms'] / n:>7.1f}ms "
+                f"{m['selected'].most_common(1)[0][0]:>9} "
+                f"{m['batch_ms'] / max(m['auto_ms'], 1e-9):>7.1f}x {m['differing']:>7}"
+            )
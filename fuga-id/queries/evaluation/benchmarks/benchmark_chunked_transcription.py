@@ -0,0 +1,144 @@
+"""
+BSD 2-Clause License
+
+Copyright (c) 2024, Hilda Romero-Velo
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+
+* Redistributions of source code must retain the above copyright notice, this
+  list of conditions and the following disclaimer.
+
+* Redistributions in binary form must reproduce the above copyright notice, this
+  list of conditions and the following disclaimer in the documentation
+  and/or other materials provided with the distribution.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+
+"""
+Script: benchmark_chunked_transcription.py
+Purpose:
+    Measures how chunk-parallel transcription of long recordings scales with the number of
+    processes, and checks that the transcription is identical for every process count.
+
+Usage:
+    python3 benchmark_chunked_transcription.py [-a <audio_dir>] [-n <num_recordings>]
+                                               [-j 1 2 4 8] [-b tf|onnx|tflite]
+
+By default the longest recordings of `queries/data/folkoteca_audios` are transcribed. For
+each process count, the script prints the total wall time, the speedup over one process
+and whether the note events match those obtained with one process.
+"""
+
+import argparse
+import os
+import sys
+import time
+import wave
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(script_dir, "../../src"))
+import chunked_transcription
+import transcribe_audio
+
+DEFAULT_AUDIO_DIR = os.path.join(script_dir, "../../data/folkoteca_audios")
+DEFAULT_NUM_RECORDINGS = 5
+
+
+def get_longest_recordings(audio_dir, num_recordings):
+    """
+    Returns the longest WAV recordings of a folder.
+
+    Args:
+        audio_dir (str): Folder with WAV files.
+        num_recordings (int): Number of recordings to return.
+
+    Returns:
+        list: Paths of the longest recordings, longest first.
+    """
+    durations = []
+    for filename in os.listdir(audio_dir):
+        if filename.lower().endswith(".wav"):
+            path = os.path.join(audio_dir, filename)
+            with wave.open(path, "rb") as wav_file:
+                durations.append(
+                    (wav_file.getnframes() / wav_file.getframerate(), path)
+                )
+    return [path for _, path in sorted(durations, reverse=True)[:num_recordings]]
+
+
+def benchmark(recordings, jobs_list, backend):
+    """
+    Transcribes the recordings with every process count and prints the scaling results.
+
+    Args:
+        recordings (list): Paths of the recordings to transcribe.
+        jobs_list (list): Process counts to compare (the first one is the baseline).
+        backend (str): Model runtime ('tf', 'onnx' or 'tflite').
+    """
+    baseline_notes = None
+    baseline_time = None
+    print(f"{'Jobs':>5} {'Wall time (s)':>14} {'Speedup':>8} {'Identical':>10}")
+    for jobs in jobs_list:
+        start = time.perf_counter()
+        notes = [
+            chunked_transcription.transcribe_long(path, jobs, backend)
+            for path in recordings
+        ]
+        elapsed = time.perf_counter() - start
+        if baseline_notes is None:
+            baseline_notes, baseline_time = notes, elapsed
+        identical = notes == baseline_notes
+        print(
+            f"{jobs:>5} {elapsed:>14.2f} {baseline_time / elapsed:>8.2f} {str(identical):>10}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmark chunk-parallel transcription of long recordings."
+    )
+    parser.add_argument(
+        "-a", "--audio_dir", default=DEFAULT_AUDIO_DIR, help="Folder with WAV files."
+    )
+    parser.add_argument(
+        "-n",
+        "--num_recordings",
+        type=int,
+        default=DEFAULT_NUM_RECORDINGS,
+        help="Number of (longest) recordings to transcribe.",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        nargs="+",
+        default=[1, 2, 4, 8],
+        help="Process counts to compare (the first one is the baseline).",
+    )
+    parser.add_argument(
+        "-b",
+        "--backend",
+        choices=transcribe_audio.MODEL_BACKENDS,
+        default=transcribe_audio.DEFAULT_BACKEND,
+        help="Model runtime used by basic-pitch (default: %(default)s).",
+    )
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.audio_dir):
+        print(f"Error: The directory '{args.audio_dir}' does not exist.")
+        sys.exit(1)
+    recordings = get_longest_recordings(args.audio_dir, args.num_recordings)
+    print(f"Transcribing {len(recordings)} recordings with backend {args.backend}.")
+    benchmark(recordings, args.jobs, args.backend)
@@ -0,0 +1,236 @@
+"""
+BSD 2-Clause License
+
+Copyright (c) 2024, Hilda Romero-Velo
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+
+* Redistributions of source code must retain the above copyright notice, this
+  list of conditions and the following disclaimer.
+
+* Redistributions in binary form must reproduce the above copyright notice, this
+  list of conditions and the following disclaimer in the documentation
+  and/or other materials provided with the distribution.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+
+"""
+Script: benchmark_corpus_index.py
+Purpose:
+    Compares the cold-start load time of the approximate alignment corpus from the feature
+    text files (`<feature>_text.txt` and `melodic_line_ids.txt`) and from the binary corpus
+    index (`corpus_index.py`), and checks that both give the same melodic lines and
+    identifiers.
+
+Usage:
+    python3 benchmark_corpus_index.py [-i <indexes_dir>] [-r <runs>] [-f <feature> ...]
+                                      [--drop_caches]
+
+Every load runs in a new Python process, so nothing is cached by the interpreter; the time
+to start the process and import the modules is not counted. With --drop_caches the page
+cache is dropped before every load (requires root), otherwise the files are read from the
+page cache. If an index has no corpus index (built before it existed), one is written from
+the text files to a temporary directory.
+
+Reported metrics (per feature, median of the runs):
+    - Text: lines and identifiers read and decoded from the text files.
+    - Index: lines and identifiers read from the corpus index.
+    - Open: corpus index mapped into memory, without reading the lines (zero-copy).
+    - Whether the lines and identifiers of both are the same.
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(script_dir, "../../../common"))
+sys.path.append(os.path.join(script_dir, "../../src"))
+import corpus_index
+import fitting_alignment
+
+METHODS = ["text", "index", "open"]
+
+
+def load_text(text_path, ids_path):
+    """
+    Loads the melodic lines and identifiers from the text files, as `load_corpus` does.
+
+    Returns:
+        tuple: (lines with one byte per symbol, identifiers)
+    """
+    lines = [
+        fitting_alignment.encode_sequence(line)
+        for line in fitting_alignment.load_lines(text_path)
+    ]
+    ids = [line.decode("utf-8") for line in fitting_alignment.load_lines(ids_path)]
+    return lines, ids
+
+
+def load_index(index_path):
+    """
+    Loads the melodic lines and identifiers from the corpus index.
+
+    Returns:
+        tuple: (lines with one byte per symbol, identifiers)
+    """
+    index = corpus_index.open_corpus_index(index_path)
+    return corpus_index.get_lines(index), corpus_index.get_ids(index)
+
+
+def measure(method, text_path, ids_path, index_path):
+    """
+    Loads the corpus with a method and returns the time it took.
+
+    Returns:
+        float: Load time in milliseconds.
+    """
+    start = time.perf_counter()
+    if method == "text":
+        load_text(text_path, ids_path)
+    elif method == "index":
+        load_index(index_path)
+    else:
+        corpus_index.open_corpus_index(index_path)
+    return (time.perf_counter() - start) * 1000
+
+
+def drop_caches():
+    """
+    Drops the page cache, so the next load reads the files from disk.
+
+    Returns:
+        bool: True if the page cache was dropped.
+    """
+    try:
+        os.sync()
+        with open("/proc/sys/vm/drop_caches", "w") as file:
+            file.write("3\n")
+        return True
+    except OSError:
+        return False
+
+
+def cold_start(method, paths, runs, drop):
+    """
+    Measures the load time of a method in new processes.
+
+    Args:
+        method (str): Load method.
+        paths (tuple): Paths to the text, identifiers and corpus index files.
+        runs (int): Number of processes.
+        drop (bool): Whether to drop the page cache before every load.
+
+    Returns:
+        float: Median load time in milliseconds.
+    """
+    times = []
+    for _ in range(runs):
+        if drop and not drop_caches():
+            print("Warning: the page cache could not be dropped (root is required).")
+            drop = False
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--measure", method, *paths],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+        times.append(float(output))
+    return statistics.median(times)
+
+
+def benchmark_feature(feature, indexes_dir, tmp_dir, runs, drop):
+    """
+    Benchmarks the load methods on a feature.
+
+    Returns:
+        dict: Median load time of each method and whether both files match.
+    """
+    files = fitting_alignment.FEATURE_FILES[feature]
+    text_path = os.path.join(indexes_dir, files["text"])
+    ids_path = os.path.join(indexes_dir, fitting_alignment.IDS_FILE)
+    index_path = os.path.join(indexes_dir, files["corpus_index"])
+    if not os.path.isfile(index_path):
+        index_path = os.path.join(tmp_dir, files["corpus_index"])
+        corpus_index.write_corpus_index(index_path, *load_text(text_path, ids_path))
+
+    metrics = {
+        method: cold_start(method, (text_path, ids_path, index_path), runs, drop)
+        for method in METHODS
+    }
+    metrics["same"] = load_text(text_path, ids_path) == load_index(index_path)
+    metrics["text_mb"] = (
+        os.path.getsize(text_path) + os.path.getsize(ids_path)
+    ) / 2**20
+    metrics["index_mb"] = os.path.getsize(index_path) / 2**20
+    return metrics
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Compare the cold-start load time of the text files and the corpus index."
+    )
+    parser.add_argument(
+        "-i",
+        "--indexes_dir",
+        default=fitting_alignment.INDEXES_DIR,
+        help="Directory with the approximate alignment index files.",
+    )
+    parser.add_argument(
+        "-r",
+        "--runs",
+        type=int,
+        default=5,
+        help="Loads per method and feature (default: %(default)s).",
+    )
+    parser.add_argument(
+        "-f",
+        "--features",
+        nargs="+",
+        choices=list(fitting_alignment.FEATURE_FILES),
+        default=list(fitting_alignment.FEATURE_FILES),
+        help="Features to benchmark (default: all).",
+    )
+    parser.add_argument(
+        "--drop_caches",
+        action="store_true",
+        help="Drop the page cache before every load (requires root).",
+    )
+    parser.add_argument("--measure", choices=METHODS, help=argparse.SUPPRESS)
+    parser.add_argument("paths", nargs="*", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:  # Single load, run in a new process by `cold_start`
+        print(measure(args.measure, *args.paths))
+        sys.exit(0)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        print(
+            f"{'Feature':<10} {'Text MB':>8} {'Index MB':>9} {'Text':>9} {'Index':>9} "
+            f"{'Open':>9} {'Speedup':>8} {'Same':>5}"
+        )
+        for feature in args.features:
+            m = benchmark_feature(
+                feature, args.indexes_dir, tmp_dir, args.runs, args.drop_caches
+            )
+            print(
+                f"{feature:<10} {m['text_mb']:>8.2f} {m['index_mb']:>9.2f} "
+                f"{m['text']:>7.1f}ms {m['index']:>7.1f}ms {m['open']:>7.2f}ms "
+                f"{m['text'] / max(m['index'], 1e-9):>7.1f}x {str(m['same']):>5}"
+            )
@@ -0,0 +1,276 @@
+"""
+BSD 2-Clause License
+
+Copyright (c) 2024, Hilda Romero-Velo
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+
+* Redistributions of source code must retain the above copyright notice, this
+  list of conditions and the following disclaimer.
+
+* Redistributions in binary form must reproduce the above copyright notice, this
+  list of conditions and the following disclaimer in the documentation
+  and/or other materials provided with the distribution.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+
+"""
+Script: benchmark_fitting_alignment.py
+Purpose:
+    Compares the query latency of the in-process approximate alignment (`fitting_alignment.py`)
+    with the `approximate_alignment` program, and checks that both return the same results.
+
+Usage:
+    python3 benchmark_fitting_alignment.py [-d <data_dir>] [-n <files>] [-l <query_length>]
+                                           [-f <feature> ...]
+
+The features of every query file (queries/data/folkoteca_piano_recordings by default) are
+extracted once to a JSON file, keeping the first symbols of each notation (as many as in a
+query fragment), and the file is passed to the program so that its time is spent in the
+search: process spawn, corpus and cost map load and alignment. The in-process engine loads
+the corpus once and only aligns per query. The program must be built in queries/bin and the
+approximate alignment indexes in scores/indexes.
+
+The program runs the alignment 10 times to average its timing, so the latency of a single
+search is estimated by subtracting the extra runs from its wall time.
+
+The results are compared with the engine in C++-compatible mode (UTF-8 bytes, see
+`fitting_alignment.py`). The number of queries whose results change in the default mode
+(one symbol per character) is also reported.
+
+Reported metrics (per feature):
+    - Mean latency per query of the program (wall time, estimated single-run latency and
+      the alignment time it reports).
+    - Corpus load time and mean latency per query of the in-process engine, and speedup.
+    - Queries with the same results as the program, and with different results in the
+      default mode.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(script_dir, "../../src"))
+import fitting_alignment
+import query_features
+
+DEFAULT_DATA_DIR = os.path.join(script_dir, "../../data/folkoteca_piano_recordings")
+APPROXIMATE_ALIGNMENT = os.path.join(script_dir, "../../bin/approximate_alignment")
+FEATURE_FLAGS = {"chromatic": "-c", "diatonic": "-d", "rhythm": "-r"}
+PROGRAM_ALIGNMENT_RUNS = 10  # Runs averaged by `measure_time_and_cpu`
+
+
+def run_program(feature, json_path, workspace):
+    """
+    Runs the approximate alignment program on a query features file.
+
+    Args:
+        feature (str): Feature name.
+        json_path (str): Path to the query features JSON file.
+        workspace (str): Workspace of the query.
+
+    Returns:
+        tuple: (results read from its JSON file, or None, wall time in milliseconds)
+    """
+    results_path = os.path.join(workspace, "score_and_timing_results.json")
+    if os.path.exists(results_path):
+        os.remove(results_path)
+    start = time.perf_counter()
+    subprocess.run(
+        [APPROXIMATE_ALIGNMENT, FEATURE_FLAGS[feature], json_path, workspace],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    wall_ms = (time.perf_counter() - start) * 1000
+    if not os.path.exists(results_path):
+        return None, wall_ms
+    try:
+        with open(results_path, "r") as file:
+            return json.load(file), wall_ms
+    except ValueError:
+        return None, wall_ms  # Queries with symbols that are not escaped in its JSON
+
+
+def same_alignment(a, b):
+    """
+    Checks whether two alignment results are the same.
+
+    Args:
+        a (dict): "alignment" field of a result.
+        b (dict): "alignment" field of another result.
+
+    Returns:
+        bool: True if they retrieve the same lines with the same scores and positions.
+    """
+    fields = ["score_origin_pos", "query_origin_pos", "score_end_pos", "query_end_pos"]
+    return (
+        a["score_ids"] == b["score_ids"]
+        and [float(s) for s in a["scores"]] == [float(s) for s in b["scores"]]
+        and all([int(p) for p in a[f]] == [int(p) for p in b[f]] for f in fields)
+    )
+
+
+def truncate_notations(features, query_length):
+    """
+    Keeps the first symbols of every notation of a query, as in a query fragment.
+
+    Args:
+        features (dict): Query features (see `query_features.extract_query_features`).
+        query_length (int): Number of symbols kept (0 keeps the whole notations).
+
+    Returns:
+        dict: The query features.
+    """
+    if query_length:
+        for notations in features["notations"].values():
+            for feature, notation in notations.items():
+                notations[feature] = notation[:query_length]
+    return features
+
+
+def benchmark_feature(feature, json_paths, workspace):
+    """
+    Benchmarks the program and the in-process engine on the queries of a feature.
+
+    Args:
+        feature (str): Feature name.
+        json_paths (list): Paths to the query features JSON files.
+        workspace (str): Workspace for the program.
+
+    Returns:
+        dict: Metrics of the feature.
+    """
+    start = time.perf_counter()
+    corpus = fitting_alignment.load_corpus(feature)
+    load_ms = (time.perf_counter() - start) * 1000
+    compatible_corpus = fitting_alignment.load_corpus(feature, cpp_compatible=True)
+
+    metrics = {
+        "queries": 0,
+        "program_ms": 0.0,
+        "program_single_run_ms": 0.0,
+        "program_alignment_ms": 0.0,
+        "engine_ms": 0.0,
+        "engine_load_ms": load_ms,
+        "matching": 0,
+        "diverging": 0,
+    }
+    for json_path in json_paths:
+        query = query_features.load_notation(json_path, feature, "approximate")
+        program_results, wall_ms = run_program(feature, json_path, workspace)
+        if program_results is None:
+            print(f"  {os.path.basename(json_path)} [{feature}]: no program results")
+            continue
+
+        start = time.perf_counter()
+        results = fitting_alignment.align(query, corpus)
+        engine_ms = (time.perf_counter() - start) * 1000
+        compatible_results = fitting_alignment.align(query, compatible_corpus)
+
+        metrics["queries"] += 1
+        metrics["program_ms"] += wall_ms
+        alignment_ms = program_results["timing"]["alignment"]["clock_time_ms"]
+        metrics["program_alignment_ms"] += alignment_ms
+        metrics["program_single_run_ms"] += (
+            wall_ms - (PROGRAM_ALIGNMENT_RUNS - 1) * alignment_ms
+        )
+        metrics["engine_ms"] += engine_ms
+        if same_alignment(
+            compatible_results["alignment"], program_results["alignment"]
+        ):
+            metrics["matching"] += 1
+        else:
+            print(f"  {os.path.basename(json_path)} [{feature}]: results differ")
+        if not same_alignment(results["alignment"], compatible_results["alignment"]):
+            metrics["diverging"] += 1
+    return metrics
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Compare the in-process approximate alignment with the C++ program."
+    )
+    parser.add_argument(
+        "-d", "--data_dir", default=DEFAULT_DATA_DIR, help="Folder with query files."
+    )
+    parser.add_argument(
+        "-n",
+        "--num_files",
+        type=int,
+        default=20,
+        help="Number of query files (default: %(default)s).",
+    )
+    parser.add_argument(
+        "-l",
+        "--query_length",
+        type=int,
+        default=40,
+        help="Symbols kept from each query notation, 0 for all (default: %(default)s).",
+    )
+    parser.add_argument(
+        "-f",
+        "--features",
+        nargs="+",
+        choices=list(FEATURE_FLAGS),
+        default=list(FEATURE_FLAGS),
+        help="Features to benchmark (default: all).",
+    )
+    args = parser.parse_args()
+
+    if not os.path.isfile(APPROXIMATE_ALIGNMENT):
+        print(f"Error: The program '{APPROXIMATE_ALIGNMENT}' was not found.")
+        sys.exit(1)
+    files = sorted(
+        os.path.join(root, f)
+        for root, _, names in os.walk(args.data_dir)
+        for f in names
+        if f.lower().endswith((".wav", ".mid"))
+    )[: args.num_files]
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        json_paths = []
+        for file_path in files:
+            json_path = os.path.join(
+                tmp_dir, os.path.splitext(os.path.basename(file_path))[0] + ".json"
+            )
+            features = query_features.extract_query_features(file_path)
+            query_features.save_query_features(
+                truncate_notations(features, args.query_length), json_path
+            )
+            json_paths.append(json_path)
+
+        workspace = os.path.join(tmp_dir, "workspace")
+        os.makedirs(workspace)
+        print(
+            f"{'Feature':<10} {'Queries':>7} {'Program':>10} {'1 run':>10} "
+            f"{'Align':>9} {'Load':>9} {'Engine':>9} {'Speedup':>8} {'Same':>5} "
+            f"{'Diverge':>8}"
+        )
+        for feature in args.features:
+            m = benchmark_feature(feature, json_paths, workspace)
+            n = max(m["queries"], 1)
+            print(
+                f"{feature:<10} {m['queries']:>7} {m['program_ms'] / n:>8.1f}ms "
+                f"{m['program_single_run_ms'] / n:>8.1f}ms "
+                f"{m['program_alignment_ms'] / n:>7.1f}ms {m['engine_load_ms']:>7.1f}ms "
+                f"{m['engine_ms'] / n:>7.1f}ms "
+                f"{m['program_single_run_ms'] / max(m['engine_ms'], 1e-9):>7.1f}x "
+                f"{m['matching']:>5} {m['diverging']:>8}"
+            )
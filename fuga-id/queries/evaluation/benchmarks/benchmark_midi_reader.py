@@ -0,0 +1,386 @@
+"""
+BSD 2-Clause License
+
+Copyright (c) 2024, Hilda Romero-Velo
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+
+* Redistributions of source code must retain the above copyright notice, this
+  list of conditions and the following disclaimer.
+
+* Redistributions in binary form must reproduce the above copyright notice, this
+  list of conditions and the following disclaimer in the documentation
+  and/or other materials provided with the distribution.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+
+"""
+Script: benchmark_midi_reader.py
+Purpose:
+    Compares the NumPy MIDI reader (`common/midi_reader.py`) with the `pretty_midi` and `mido`
+    paths it replaces on a folder of MIDI files, and checks that it reads the same notes as
+    `pretty_midi` and the same durations as the previous `mido` duration lookup. Also checks
+    that MIDI fragments extracted on the reader (`queries/utils/extract_audio_fragment.py`)
+    hold the same notes as those of the previous `mido` fragment extraction.
+
+Usage:
+    python3 benchmark_midi_reader.py [-m <midi_dir>] [-r <repetitions>] [-n <fragments>]
+
+Reported metrics:
+    - Import time of each library (best of several fresh interpreters).
+    - Parse time per file of each library (best of several repetitions).
+    - Number of files whose notes or duration differ from the reference.
+    - Number of random fragments whose notes differ from the reference, and extraction time
+      per fragment of both implementations.
+"""
+
+import argparse
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+import mido
+import pretty_midi
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+common_dir = os.path.join(script_dir, "../../../common")
+sys.path.append(common_dir)
+sys.path.append(os.path.join(script_dir, "../../utils"))
+import midi_reader
+from extract_audio_fragment import extract_midi_fragment
+
+DEFAULT_MIDI_DIR = os.path.join(script_dir, "../../data/folkoteca_piano_recordings")
+IMPORT_STATEMENTS = {
+    "pretty_midi": "import pretty_midi",
+    "mido": "import mido",
+    "midi_reader": f"import sys; sys.path.append({common_dir!r}); import midi_reader",
+}
+
+
+def reference_duration(file_path):
+    """
+    Previous `mido` implementation of the MIDI duration lookup.
+
+    Args:
+        file_path (str): Path to the MIDI file.
+
+    Returns:
+        int: Duration in milliseconds.
+    """
+    midi_file = mido.MidiFile(file_path)
+    total_ticks = max(sum(msg.time for msg in track) for track in midi_file.tracks)
+    tempo = 500000
+    for track in midi_file.tracks:
+        for msg in track:
+            if msg.type == "set_tempo":
+                tempo = msg.tempo
+                break
+    return int((total_ticks * tempo / midi_file.ticks_per_beat) / 1000)
+
+
+def reader_duration(file_path):
+    """
+    Duration lookup on the NumPy MIDI reader (as in `generate_queries_from_recording.py`).
+
+    Args:
+        file_path (str): Path to the MIDI file.
+
+    Returns:
+        int: Duration in milliseconds.
+    """
+    midi_data = midi_reader.read_midi(file_path)
+    microseconds_per_tick = (
+        midi_reader.initial_tempo(midi_data) / midi_data["resolution"]
+    )
+    return int((midi_data["end_tick"] * microseconds_per_tick) / 1000)
+
+
+def reference_fragment(input_midi, start_time, end_time, output_file):
+    """
+    Previous `mido` implementation of the MIDI fragment extraction.
+
+    Args:
+        input_midi (str): Path to the original MIDI file.
+        start_time (int): Start time of the fragment in milliseconds.
+        end_time (int): End time of the fragment in milliseconds.
+        output_file (str): Path to save the extracted fragment.
+    """
+    midi_file = mido.MidiFile(input_midi)
+    output_midi = mido.MidiFile()
+    output_midi.ticks_per_beat = midi_file.ticks_per_beat
+
+    tempo = 500000
+    for track in midi_file.tracks:
+        for msg in track:
+            if msg.type == "set_tempo":
+                tempo = msg.tempo
+                break
+    ticks_per_ms = (midi_file.ticks_per_beat * 1000) / tempo
+    start_ticks = int(start_time * ticks_per_ms)
+    end_ticks = int(end_time * ticks_per_ms)
+
+    output_midi.tracks.append(mido.MidiTrack())
+    for msg in midi_file.tracks[0]:
+        if msg.type in ["set_tempo", "time_signature"]:
+            output_midi.tracks[0].append(msg.copy())
+
+    for track in midi_file.tracks:
+        output_track = mido.MidiTrack()
+        output_midi.tracks.append(output_track)
+        current_ticks = 0
+        notes_on = {}
+        for msg in track:
+            current_ticks += msg.time
+            if start_ticks <= current_ticks <= end_ticks:
+                if msg.type == "note_on" and msg.velocity > 0:
+                    notes_on[msg.note] = msg
+                    new_msg = msg.copy()
+                    new_msg.time = 0 if len(output_track) == 0 else msg.time
+                    output_track.append(new_msg)
+                elif msg.type == "note_off" or (
+                    msg.type == "note_on" and msg.velocity == 0
+                ):
+                    if msg.note in notes_on:
+                        output_track.append(msg.copy())
+                        del notes_on[msg.note]
+                else:
+                    output_track.append(msg.copy())
+        for note in notes_on:
+            output_track.append(mido.Message("note_off", note=note, velocity=0, time=0))
+
+    output_midi.save(output_file)
+
+
+def import_time(statement, repetitions):
+    """
+    Measures the import time of a library in fresh interpreters.
+
+    Args:
+        statement (str): Import statement.
+        repetitions (int): Number of interpreters.
+
+    Returns:
+        float: Best import time in seconds.
+    """
+    code = (
+        "import time; start = time.perf_counter(); "
+        f"{statement}; print(time.perf_counter() - start)"
+    )
+    return min(
+        float(subprocess.check_output([sys.executable, "-c", code], text=True))
+        for _ in range(repetitions)
+    )
+
+
+def parse_time(parse, midi_paths, repetitions):
+    """
+    Measures the parse time per file of a library.
+
+    Args:
+        parse (callable): Function parsing a MIDI file.
+        midi_paths (list): Paths to the MIDI files.
+        repetitions (int): Number of repetitions.
+
+    Returns:
+        float: Best mean parse time per file in seconds.
+    """
+    best = float("inf")
+    for _ in range(repetitions):
+        start = time.perf_counter()
+        for path in midi_paths:
+            parse(path)
+        best = min(best, (time.perf_counter() - start) / len(midi_paths))
+    return best
+
+
+def pretty_midi_notes(path):
+    """
+    Reads the notes of a MIDI file with `pretty_midi`.
+
+    Args:
+        path (str): Path to the MIDI file.
+
+    Returns:
+        list: (start, end, pitch, velocity) of the notes of every instrument.
+    """
+    return [
+        [(note.start, note.end, note.pitch, note.velocity) for note in instrument.notes]
+        for instrument in pretty_midi.PrettyMIDI(path).instruments
+    ]
+
+
+def same_notes(path):
+    """
+    Checks that the NumPy MIDI reader reads the same notes as `pretty_midi`.
+
+    Args:
+        path (str): Path to the MIDI file.
+
+    Returns:
+        bool: True if instruments and notes (times, pitch and velocity) are identical.
+    """
+    reference = pretty_midi_notes(path)
+    notes = midi_reader.read_midi(path)["notes"]
+    obtained = [
+        list(
+            zip(
+                group["onset"].tolist(),
+                group["offset"].tolist(),
+                group["pitch"].astype(int).tolist(),
+                group["velocity"].astype(int).tolist(),
+            )
+        )
+        for group in midi_reader.split_instruments(notes)
+    ]
+    return reference == obtained
+
+
+def random_fragments(midi_paths, count, seed=0):
+    """
+    Draws random fragments (3 to 15 seconds long) of the MIDI files.
+
+    Args:
+        midi_paths (list): Paths to the MIDI files.
+        count (int): Number of fragments.
+        seed (int): Seed of the random generator.
+
+    Returns:
+        list: (path, start time, end time) of the fragments, times in milliseconds.
+    """
+    generator = random.Random(seed)
+    durations = {path: reader_duration(path) for path in midi_paths}
+    fragments = []
+    for _ in range(count):
+        path = generator.choice(midi_paths)
+        start = generator.randrange(max(durations[path], 1))
+        fragments.append((path, start, start + generator.randrange(3000, 15000)))
+    return fragments
+
+
+def compare_fragments(fragments):
+    """
+    Extracts every fragment with both implementations and compares their notes.
+
+    Args:
+        fragments (list): (path, start time, end time) of the fragments.
+
+    Returns:
+        tuple: (fragments whose notes differ, mean reference extraction time in seconds,
+                mean reader extraction time in seconds)
+    """
+    mismatches = []
+    elapsed = {reference_fragment: 0.0, extract_midi_fragment: 0.0}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for path, start, end in fragments:
+            notes = []
+            for extract in elapsed:
+                output_file = os.path.join(tmp_dir, f"{extract.__name__}.mid")
+                started = time.perf_counter()
+                extract(path, start, end, output_file)
+                elapsed[extract] += time.perf_counter() - started
+                notes.append(pretty_midi_notes(output_file))
+            if notes[0] != notes[1]:
+                mismatches.append((path, start, end))
+    count = max(len(fragments), 1)
+    return (
+        mismatches,
+        elapsed[reference_fragment] / count,
+        elapsed[extract_midi_fragment] / count,
+    )
+
+
+def benchmark(midi_paths, repetitions, fragment_count):
+    """
+    Runs the comparison and prints the results.
+
+    Args:
+        midi_paths (list): Paths to the MIDI files.
+        repetitions (int): Number of repetitions of each measurement.
+        fragment_count (int): Number of random fragments to compare.
+
+    Returns:
+        bool: True if the reader matches the reference on every file and fragment.
+    """
+    note_mismatches = [path for path in midi_paths if not same_notes(path)]
+    duration_mismatches = [
+        path for path in midi_paths if reference_duration(path) != reader_duration(path)
+    ]
+
+    parsers = {
+        "pretty_midi": pretty_midi.PrettyMIDI,
+        "mido": mido.MidiFile,
+        "midi_reader": midi_reader.read_midi,
+    }
+    print(f"Files: {len(midi_paths)}\n")
+    print(f"{'Library':<12} {'Import (ms)':>12} {'Parse (ms/file)':>16}")
+    for name, parse in parsers.items():
+        imported = import_time(IMPORT_STATEMENTS[name], repetitions)
+        parsed = parse_time(parse, midi_paths, repetitions)
+        print(f"{name:<12} {imported * 1000:>12.1f} {parsed * 1000:>16.2f}")
+
+    print(f"\nFiles with different notes than pretty_midi: {len(note_mismatches)}")
+    print(f"Files with different duration than mido: {len(duration_mismatches)}")
+    for path in note_mismatches + duration_mismatches:
+        print(f"Mismatch: {os.path.basename(path)}")
+
+    fragment_mismatches, reference_time, reader_time = compare_fragments(
+        random_fragments(midi_paths, fragment_count)
+    )
+    print(
+        f"\nFragment extraction (ms/fragment): mido {reference_time * 1000:.2f}, "
+        f"midi_reader {reader_time * 1000:.2f}"
+    )
+    print(
+        f"Fragments with different notes than mido: {len(fragment_mismatches)}"
+        f" of {fragment_count}"
+    )
+    for path, start, end in fragment_mismatches:
+        print(f"Mismatch: {os.path.basename(path)} [{start}, {end}] ms")
+    return not note_mismatches and not duration_mismatches and not fragment_mismatches
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the NumPy MIDI reader.")
+    parser.add_argument(
+        "-m", "--midi_dir", default=DEFAULT_MIDI_DIR, help="Folder with MIDI files."
+    )
+    parser.add_argument(
+        "-r",
+        "--repetitions",
+        type=int,
+        default=5,
+        help="Repetitions of each measurement (default: %(default)s).",
+    )
+    parser.add_argument(
+        "-n",
+        "--fragments",
+        type=int,
+        default=150,
+        help="Random fragments to compare (default: %(default)s).",
+    )
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.midi_dir):
+        print(f"Error: The directory '{args.midi_dir}' does not exist.")
+        sys.exit(1)
+    midi_paths = sorted(
+        os.path.join(args.midi_dir, f)
+        for f in os.listdir(args.midi_dir)
+        if f.lower().endswith(".mid")
+    )
+    sys.exit(0 if benchmark(midi_paths, args.repetitions, args.fragments) else 1)
@@ -0,0 +1,224 @@
+"""
+BSD 2-Clause License
+
+Copyright (c) 2024, Hilda Romero-Velo
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+
+* Redistributions of source code must retain the above copyright notice, this
+  list of conditions and the following disclaimer.
+
+* Redistributions in binary form must reproduce the above copyright notice, this
+  list of conditions and the following disclaimer in the documentation
+  and/or other materials provided with the distribution.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+
+"""
+Script: benchmark_monophonic_transcription.py
+Purpose:
+    Compares the monophonic YIN transcription backend with basic-pitch on the recordings of
+    a folder, broken down by instrument (taken from the `Recording.instrument` column of the
+    database).
+
+Usage:
+    python3 benchmark_monophonic_transcription.py -db <path_to_database> [-a <audio_dir>]
+                                                  [-b tf|onnx|tflite] [-o <output_csv>]
+
+Reported metrics (per instrument):
+    - Latency of basic-pitch (model already loaded) and of the YIN backend, in seconds per
+      second of audio, and the resulting speedup. The basic-pitch cold start (import and
+      model loading), paid by every CLI call, is reported separately.
+    - Note-level precision, recall and F1 of the YIN transcription against basic-pitch
+      (same pitch and onsets at most 50 ms apart).
+
+Output:
+    - A summary table printed to stdout.
+    - A CSV file with the per-file results (default: results/monophonic_transcription.csv).
+"""
+
+import argparse
+import csv
+import os
+import sqlite3
+import sys
+import time
+from collections import defaultdict
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(script_dir, "../../src"))
+import audio_decoding
+import monophonic_transcription
+import transcribe_audio
+import transcription_worker
+from benchmark_transcription_backends import note_agreement
+
+DEFAULT_AUDIO_DIR = os.path.join(script_dir, "../../data/folkoteca_audios")
+DEFAULT_OUTPUT = os.path.join(script_dir, "results/monophonic_transcription.csv")
+
+
+def get_instruments(db_path):
+    """
+    Retrieves the instrument of every recording from the database.
+
+    Args:
+        db_path (str): Path to the SQLite database.
+
+    Returns:
+        dict: Instrument by recording ID.
+    """
+    try:
+        conn = sqlite3.connect(db_path)
+        cursor = conn.cursor()
+        cursor.execute("SELECT recording_id, instrument FROM Recording")
+        return dict(cursor.fetchall())
+    except sqlite3.Error as e:
+        print(f"Database error: {e}")
+        return {}
+    finally:
+        conn.close()
+
+
+def benchmark(audio_files, instruments, backend, output_csv):
+    """
+    Transcribes every file with basic-pitch and with the YIN backend, prints the results per
+    instrument and saves the per-file results to CSV.
+
+    Args:
+        audio_files (list): Paths of the WAV files to transcribe.
+        instruments (dict): Instrument by recording ID.
+        backend (str): basic-pitch model runtime ('tf', 'onnx' or 'tflite').
+        output_csv (str): Path of the CSV file with the per-file results.
+    """
+    start = time.perf_counter()
+    from basic_pitch.inference import predict
+
+    model = transcription_worker.load_model(backend)
+    cold_start = time.perf_counter() - start
+
+    rows = []
+    for audio_path in audio_files:
+        recording_id = os.path.splitext(os.path.basename(audio_path))[0]
+        signal, sample_rate = audio_decoding.load_wav(audio_path)
+        duration = len(signal) / sample_rate
+
+        start = time.perf_counter()
+        _, _, note_events = predict(
+            audio_path, model, **transcribe_audio.TRANSCRIPTION_SETTINGS
+        )
+        basic_pitch_time = time.perf_counter() - start
+        reference = [[float(n[0]), float(n[1]), int(n[2])] for n in note_events]
+
+        start = time.perf_counter()
+        signal, sample_rate = audio_decoding.load_wav(audio_path)
+        notes = monophonic_transcription.transcribe_signal(signal, sample_rate)
+        yin_time = time.perf_counter() - start
+        estimated = [[onset, offset, pitch] for onset, offset, pitch, _ in notes]
+
+        precision, recall, f1 = note_agreement(reference, estimated)
+        rows.append(
+            [
+                recording_id,
+                instruments.get(recording_id, "Unknown"),
+                duration,
+                basic_pitch_time,
+                yin_time,
+                len(reference),
+                len(estimated),
+                precision,
+                recall,
+                f1,
+            ]
+        )
+
+    os.makedirs(os.path.dirname(os.path.abspath(output_csv)), exist_ok=True)
+    with open(output_csv, "w", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(
+            [
+                "recording_id",
+                "instrument",
+                "duration_s",
+                "basic_pitch_s",
+                "yin_s",
+                "basic_pitch_notes",
+                "yin_notes",
+                "precision",
+                "recall",
+                "f1",
+            ]
+        )
+        writer.writerows(rows)
+
+    by_instrument = defaultdict(list)
+    for row in rows:
+        by_instrument[row[1]].append(row)
+    by_instrument["All"] = rows
+
+    print(f"basic-pitch ({backend}) cold start: {cold_start:.2f} s\n")
+    print(
+        f"{'Instrument':<12} {'Files':>5} {'BP s/s':>8} {'YIN s/s':>8} {'Speedup':>8} "
+        f"{'Precision':>9} {'Recall':>7} {'F1':>6}"
+    )
+    for instrument, group in sorted(by_instrument.items(), key=lambda x: x[0] == "All"):
+        audio = sum(r[2] for r in group)
+        basic_pitch_total = sum(r[3] for r in group)
+        yin_total = sum(r[4] for r in group)
+        precision, recall, f1 = (
+            sum(r[idx] for r in group) / len(group) for idx in (7, 8, 9)
+        )
+        print(
+            f"{instrument:<12} {len(group):>5} {basic_pitch_total / audio:>8.4f} "
+            f"{yin_total / audio:>8.4f} {basic_pitch_total / yin_total:>8.1f} "
+            f"{precision:>9.3f} {recall:>7.3f} {f1:>6.3f}"
+        )
+    print(f"\nPer-file results saved to {output_csv}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Compare the YIN transcription backend with basic-pitch per instrument."
+    )
+    parser.add_argument(
+        "-db", "--db_path", required=True, help="Path to the SQLite database."
+    )
+    parser.add_argument(
+        "-a", "--audio_dir", default=DEFAULT_AUDIO_DIR, help="Folder with WAV files."
+    )
+    parser.add_argument(
+        "-b",
+        "--backend",
+        choices=transcribe_audio.MODEL_BACKENDS,
+        default="tf",
+        help="basic-pitch model runtime used as reference (default: %(default)s).",
+    )
+    parser.add_argument(
+        "-o", "--output", default=DEFAULT_OUTPUT, help="Output CSV file."
+    )
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.audio_dir):
+        print(f"Error: The directory '{args.audio_dir}' does not exist.")
+        sys.exit(1)
+    if not os.path.isfile(args.db_path):
+        print(f"Error: The database path '{args.db_path}' does not exist.")
+        sys.exit(1)
+
+    audio_files = sorted(
+        os.path.join(args.audio_dir, f)
+        for f in os.listdir(args.audio_dir)
+        if f.lower().endswith(".wav")
+    )
+    benchmark(audio_files, get_instruments(args.db_path), args.backend, args.output)
@@ -0,0 +1,179 @@
+"""
+BSD 2-Clause License
+
+Copyright (c) 2024, Hilda Romero-Velo
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+
+* Redistributions of source code must retain the above copyright notice, this
+  list of conditions and the following disclaimer.
+
+* Redistributions in binary form must reproduce the above copyright notice, this
+  list of conditions and the following disclaimer in the documentation
+  and/or other materials provided with the distribution.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+
+"""
+Script: benchmark_rhythm_quantization.py
+Purpose:
+    Compares the vectorized rhythm ratio quantization (`query_features.rhythm_ratios`) with
+    the previous per-note implementation (`PrettyMIDI.time_to_tick` per note and
+    `min(RATIOS_NUMS, ...)` with Fraction arithmetic per pair of notes) on a folder of MIDI
+    files, checking that both produce identical ratios.
+
+Usage:
+    python3 benchmark_rhythm_quantization.py [-m <midi_dir>] [-r <repetitions>]
+
+Reported metrics:
+    - Number of files and ratios, and whether all the outputs are identical.
+    - Quantization time of both implementations (MIDI files already parsed) and speedup.
+    - End-to-end time of `rhythm_ratios_batch` (parsing included).
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import pretty_midi
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(script_dir, "../../src"))
+sys.path.append(os.path.join(script_dir, "../../utils"))
+sys.path.append(os.path.join(script_dir, "../../../common"))
+import midi_reader
+import query_features
+from constants import RATIOS_NUMS
+
+DEFAULT_MIDI_DIR = os.path.join(script_dir, "../../data/folkoteca_piano_recordings")
+
+
+def reference_rhythm_ratios(midi_data):
+    """
+    Previous per-note implementation of the rhythm ratio computation.
+
+    Args:
+        midi_data (pretty_midi.PrettyMIDI): Parsed MIDI file.
+
+    Returns:
+        list: Closest predefined ratios (str).
+    """
+    ratios = []
+    for instrument in midi_data.instruments:
+        num_notes = len(instrument.notes)
+        if num_notes < 2:
+            continue
+        tick_durations = [
+            midi_data.time_to_tick(note.get_duration()) for note in instrument.notes
+        ]
+        for i in range(num_notes - 1):
+            if tick_durations[i] == 0:
+                continue
+            ratio = tick_durations[i + 1] / tick_durations[i]
+            closest_ratio = min(RATIOS_NUMS, key=lambda x: abs(x - ratio))
+            ratios.append(str(closest_ratio))
+    return ratios
+
+
+def time_implementation(function, midi_files, repetitions):
+    """
+    Measures the best time of an implementation over all the parsed MIDI files.
+
+    Args:
+        function (callable): Rhythm ratio implementation.
+        midi_files (list): MIDI files parsed as expected by the implementation.
+        repetitions (int): Number of repetitions.
+
+    Returns:
+        tuple: (best time in seconds, outputs of the last repetition)
+    """
+    best = float("inf")
+    for _ in range(repetitions):
+        start = time.perf_counter()
+        outputs = [function(midi_data) for midi_data in midi_files]
+        best = min(best, time.perf_counter() - start)
+    return best, outputs
+
+
+def benchmark(midi_paths, repetitions):
+    """
+    Runs both implementations on the MIDI files and prints the results.
+
+    Args:
+        midi_paths (list): Paths to the MIDI files.
+        repetitions (int): Number of repetitions of each measurement.
+
+    Returns:
+        bool: True if both implementations produce identical ratios for every file.
+    """
+    reference_time, reference = time_implementation(
+        reference_rhythm_ratios,
+        [pretty_midi.PrettyMIDI(path) for path in midi_paths],
+        repetitions,
+    )
+    vectorized_time, vectorized = time_implementation(
+        query_features.rhythm_ratios,
+        [midi_reader.read_midi(path) for path in midi_paths],
+        repetitions,
+    )
+
+    mismatches = [
+        os.path.basename(path)
+        for path, expected, obtained in zip(midi_paths, reference, vectorized)
+        if expected != obtained
+    ]
+    for name in mismatches:
+        print(f"Mismatch: {name}")
+
+    start = time.perf_counter()
+    query_features.rhythm_ratios_batch(midi_paths)
+    batch_time = time.perf_counter() - start
+
+    print(f"Files: {len(midi_paths)}")
+    print(f"Ratios: {sum(len(ratios) for ratios in reference)}")
+    print(f"Identical outputs: {'yes' if not mismatches else 'no'}")
+    print(f"Per-note implementation: {reference_time * 1000:.1f} ms")
+    print(f"Vectorized implementation: {vectorized_time * 1000:.1f} ms")
+    print(f"Speedup: {reference_time / vectorized_time:.1f}x")
+    print(f"Batch API (parsing included): {batch_time * 1000:.1f} ms")
+    return not mismatches
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmark the vectorized rhythm ratio quantization."
+    )
+    parser.add_argument(
+        "-m", "--midi_dir", default=DEFAULT_MIDI_DIR, help="Folder with MIDI files."
+    )
+    parser.add_argument(
+        "-r",
+        "--repetitions",
+        type=int,
+        default=5,
+        help="Repetitions of each measurement (default: %(default)s).",
+    )
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.midi_dir):
+        print(f"Error: The directory '{args.midi_dir}' does not exist.")
+        sys.exit(1)
+    midi_paths = sorted(
+        os.path.join(args.midi_dir, f)
+        for f in os.listdir(args.midi_dir)
+        if f.lower().endswith(".mid")
+    )
+    sys.exit(0 if benchmark(midi_paths, args.repetitions) else 1)
@@ -0,0 +1,319 @@
+"""
+BSD 2-Clause License
+
+Copyright (c) 2024, Hilda Romero-Velo
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+
+* Redistributions of source code must retain the above copyright notice, this
+  list of conditions and the following disclaimer.
+
+* Redistributions in binary form must reproduce the above copyright notice, this
+  list of conditions and the following disclaimer in the documentation
+  and/or other materials provided with the distribution.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+
+"""
+Script: benchmark_transcription_backends.py
+Purpose:
+    Compares the basic-pitch model runtimes available to transcribe WAV queries ('tf', 'onnx'
+    and 'tflite') on a folder of recordings. Each backend runs in a fresh Python process, so
+    that its import and model loading cost and its memory usage are measured in isolation.
+
+Usage:
+    python3 benchmark_transcription_backends.py [-a <audio_dir>] [-b tf onnx tflite]
+                                                [-r tf] [-n <max_files>] [-o <output_csv>]
+
+Reported metrics (per backend):
+    - Cold start: time to import basic-pitch and load the model (seconds).
+    - Latency: transcription time per second of audio (seconds).
+    - Peak RSS: maximum resident set size of the process (MB).
+    - Agreement: note-level precision, recall and F1 against the reference backend. Two notes
+      match if they have the same pitch and their onsets differ by at most 50 ms.
+
+Output:
+    - A summary table printed to stdout.
+    - A CSV file with the per-file results (default: results/transcription_backends.csv).
+"""
+
+import argparse
+import csv
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import wave
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(script_dir, "../../src"))
+
+DEFAULT_AUDIO_DIR = os.path.join(script_dir, "../../data/folkoteca_audios")
+DEFAULT_OUTPUT = os.path.join(script_dir, "results/transcription_backends.csv")
+ONSET_TOLERANCE = 0.05  # Onset tolerance in seconds for two notes to match
+
+
+def get_audio_duration(audio_path):
+    """
+    Returns the duration of a WAV file in seconds.
+
+    Args:
+        audio_path (str): Path to the WAV file.
+
+    Returns:
+        float: Duration in seconds.
+    """
+    with wave.open(audio_path, "rb") as wav_file:
+        return wav_file.getnframes() / wav_file.getframerate()
+
+
+def run_backend(backend, audio_files, output_path):
+    """
+    Transcribes every audio file with the given backend and saves the measurements as JSON.
+    Meant to be run in a dedicated process (see `--worker`).
+
+    Args:
+        backend (str): Model runtime ('tf', 'onnx' or 'tflite').
+        audio_files (list): Paths of the WAV files to transcribe.
+        output_path (str): Path of the JSON file where the measurements are saved.
+    """
+    start = time.perf_counter()
+    from basic_pitch.inference import predict
+    import transcription_worker
+    from transcribe_audio import TRANSCRIPTION_SETTINGS
+
+    model = transcription_worker.load_model(backend)
+    cold_start = time.perf_counter() - start
+
+    files = []
+    for audio_path in audio_files:
+        start = time.perf_counter()
+        _, _, note_events = predict(audio_path, model, **TRANSCRIPTION_SETTINGS)
+        elapsed = time.perf_counter() - start
+        files.append(
+            {
+                "file": os.path.basename(audio_path),
+                "duration_s": get_audio_duration(audio_path),
+                "transcription_s": elapsed,
+                "notes": [
+                    [float(note[0]), float(note[1]), int(note[2])]
+                    for note in note_events
+                ],
+            }
+        )
+
+    peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    with open(output_path, "w") as file:
+        json.dump(
+            {"cold_start_s": cold_start, "peak_rss_mb": peak_rss_mb, "files": files},
+            file,
+        )
+
+
+def measure_backend(backend, audio_files):
+    """
+    Runs a backend in a fresh Python process and returns its measurements.
+
+    Args:
+        backend (str): Model runtime ('tf', 'onnx' or 'tflite').
+        audio_files (list): Paths of the WAV files to transcribe.
+
+    Returns:
+        dict: Measurements of the backend, or None if it failed.
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        output_path = os.path.join(tmp_dir, f"{backend}.json")
+        command = [sys.executable, os.path.abspath(__file__), "--worker", backend]
+        command += ["--output_json", output_path] + audio_files
+        result = subprocess.run(command)
+        if result.returncode != 0 or not os.path.exists(output_path):
+            print(f"Backend {backend} failed, skipping it.", file=sys.stderr)
+            return None
+        with open(output_path) as file:
+            return json.load(file)
+
+
+def note_agreement(reference_notes, estimated_notes, tolerance=ONSET_TOLERANCE):
+    """
+    Computes the note-level agreement between two transcriptions. Notes are matched greedily
+    in onset order; each reference note can be matched at most once.
+
+    Args:
+        reference_notes (list): Reference notes as [onset, offset, pitch].
+        estimated_notes (list): Estimated notes as [onset, offset, pitch].
+        tolerance (float): Maximum onset difference in seconds.
+
+    Returns:
+        tuple: (precision, recall, f1)
+    """
+    if not reference_notes and not estimated_notes:
+        return 1.0, 1.0, 1.0
+    unmatched = sorted(reference_notes)
+    matches = 0
+    for onset, _, pitch in sorted(estimated_notes):
+        for idx, (ref_onset, _, ref_pitch) in enumerate(unmatched):
+            if ref_onset > onset + tolerance:
+                break
+            if ref_pitch == pitch and abs(ref_onset - onset) <= tolerance:
+                matches += 1
+                del unmatched[idx]
+                break
+    precision = matches / len(estimated_notes) if estimated_notes else 0.0
+    recall = matches / len(reference_notes) if reference_notes else 0.0
+    f1 = (
+        2 * precision * recall / (precision + recall) if precision + recall > 0 else 0.0
+    )
+    return precision, recall, f1
+
+
+def benchmark(audio_files, backends, reference, output_csv):
+    """
+    Benchmarks the backends, prints a summary and saves the per-file results to CSV.
+
+    Args:
+        audio_files (list): Paths of the WAV files to transcribe.
+        backends (list): Backends to compare.
+        reference (str): Backend used as reference for the note agreement.
+        output_csv (str): Path of the CSV file with the per-file results.
+    """
+    measurements = {}
+    for backend in backends:
+        print(f"Benchmarking backend {backend} on {len(audio_files)} files...")
+        result = measure_backend(backend, audio_files)
+        if result is not None:
+            measurements[backend] = result
+
+    reference_files = None
+    if reference in measurements:
+        reference_files = {
+            f["file"]: f["notes"] for f in measurements[reference]["files"]
+        }
+
+    rows = []
+    summary = []
+    for backend, result in measurements.items():
+        total_audio = sum(f["duration_s"] for f in result["files"])
+        total_time = sum(f["transcription_s"] for f in result["files"])
+        f1_values = []
+        for f in result["files"]:
+            precision = recall = f1 = None
+            if reference_files is not None:
+                precision, recall, f1 = note_agreement(
+                    reference_files[f["file"]], f["notes"]
+                )
+                f1_values.append(f1)
+            rows.append(
+                [
+                    backend,
+                    f["file"],
+                    f["duration_s"],
+                    f["transcription_s"],
+                    len(f["notes"]),
+                    precision,
+                    recall,
+                    f1,
+                ]
+            )
+        summary.append(
+            (
+                backend,
+                result["cold_start_s"],
+                total_time / total_audio if total_audio > 0 else 0.0,
+                result["peak_rss_mb"],
+                sum(f1_values) / len(f1_values) if f1_values else None,
+            )
+        )
+
+    os.makedirs(os.path.dirname(os.path.abspath(output_csv)), exist_ok=True)
+    with open(output_csv, "w", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(
+            [
+                "backend",
+                "file",
+                "duration_s",
+                "transcription_s",
+                "notes",
+                f"precision_vs_{reference}",
+                f"recall_vs_{reference}",
+                f"f1_vs_{reference}",
+            ]
+        )
+        writer.writerows(rows)
+
+    print(
+        f"\n{'Backend':<8} {'Cold start (s)':>15} {'s / s audio':>12} "
+        f"{'Peak RSS (MB)':>14} {'F1 vs ' + reference:>10}"
+    )
+    for backend, cold_start, latency, peak_rss, f1 in summary:
+        f1_str = f"{f1:.3f}" if f1 is not None else "-"
+        print(
+            f"{backend:<8} {cold_start:>15.2f} {latency:>12.3f} {peak_rss:>14.1f} {f1_str:>10}"
+        )
+    print(f"\nPer-file results saved to {output_csv}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmark the basic-pitch runtime backends used to transcribe queries."
+    )
+    parser.add_argument(
+        "-a", "--audio_dir", default=DEFAULT_AUDIO_DIR, help="Folder with WAV files."
+    )
+    parser.add_argument(
+        "-b",
+        "--backends",
+        nargs="+",
+        choices=["tf", "onnx", "tflite"],
+        default=["tf", "onnx", "tflite"],
+        help="Backends to compare.",
+    )
+    parser.add_argument(
+        "-r",
+        "--reference",
+        choices=["tf", "onnx", "tflite"],
+        default="tf",
+        help="Reference backend for note agreement.",
+    )
+    parser.add_argument(
+        "-n", "--max_files", type=int, help="Maximum number of files to transcribe."
+    )
+    parser.add_argument(
+        "-o", "--output", default=DEFAULT_OUTPUT, help="Output CSV file."
+    )
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    parser.add_argument("--output_json", help=argparse.SUPPRESS)
+    parser.add_argument("files", nargs="*", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_backend(args.worker, args.files, args.output_json)
+        sys.exit(0)
+
+    if not os.path.isdir(args.audio_dir):
+        print(f"Error: The directory '{args.audio_dir}' does not exist.")
+        sys.exit(1)
+    audio_files = sorted(
+        os.path.join(args.audio_dir, f)
+        for f in os.listdir(args.audio_dir)
+        if f.lower().endswith(".wav")
+    )
+    if args.max_files:
+        audio_files = audio_files[: args.max_files]
+    backends = list(dict.fromkeys([args.reference] + args.backends))
+    benchmark(audio_files, backends, args.reference, args.output)
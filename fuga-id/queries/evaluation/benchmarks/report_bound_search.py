@@ -0,0 +1,187 @@
+"""
+BSD 2-Clause License
+
+Copyright (c) 2024, Hilda Romero-Velo
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+
+* Redistributions of source code must retain the above copyright notice, this
+  list of conditions and the following disclaimer.
+
+* Redistributions in binary form must reproduce the above copyright notice, this
+  list of conditions and the following disclaimer in the documentation
+  and/or other materials provided with the distribution.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+
+"""
+Script: report_bound_search.py
+Purpose:
+    Reports how many melodic lines the bound-ordered search of the `approximate_alignment`
+    program skips, by query length, and checks that it returns the same Top 5 as aligning
+    every line.
+
+Usage:
+    python3 report_bound_search.py [-n <queries>] [-f <feature> ...] [-s <seed>]
+
+Queries are built as in `benchmark_alignment_kernels.py` (fragments of melodic lines with
+some symbols replaced), in the query length buckets of `database/report_queries.py`. The
+search of `approximate_alignment()` (see `approximate_alignment.cpp`) is replayed on the
+exact scores of every unique line, computed in-process with the alignment of the program
+(`fitting_alignment.py` in C++-compatible mode): unique lines, each standing for all its
+identical lines, are visited in descending order of their upper bound (see `line_bounds.py`)
+until no remaining line can enter the Top 5. The
+approximate alignment indexes, with the line bound indexes, must be built in scores/indexes.
+
+The program reports the lines it skips for every query in the "search" section of its JSON
+results.
+
+Reported metrics (per feature and bucket):
+    - Mean, minimum and maximum fraction of unique lines skipped per query, and mean
+      fraction of dynamic programming cells (line symbols) skipped.
+    - Lines whose score exceeds their bound (must be 0).
+    - Queries whose Top 5 differs from aligning every line (must be 0).
+"""
+
+import argparse
+import os
+import random
+import sys
+
+import numpy as np
+
+from benchmark_alignment_kernels import BUCKETS, make_query
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(script_dir, "../../../common"))
+sys.path.append(os.path.join(script_dir, "../../src"))
+import fitting_alignment
+import line_bounds
+
+
+def bounded_search(best_scores, bounds, bounds_index, top_n=fitting_alignment.TOP_N):
+    """
+    Replays the bound-ordered search of the program on the exact scores of the unique lines.
+
+    Args:
+        best_scores (np.ndarray): Best score of every unique melodic line.
+        bounds (np.ndarray): Upper bound of the score of every unique melodic line.
+        bounds_index (dict): Bound index with the fan-out lists of the unique lines.
+        top_n (int): Number of melodic lines returned.
+
+    Returns:
+        tuple: (indexes of the Top N lines, best first; boolean mask of the unique lines
+               aligned)
+    """
+    fanout_offsets = bounds_index["fanout_offsets"]
+    aligned = np.zeros(len(bounds), dtype=bool)
+    top = []  # (score, line index) of the Top N lines, best first
+    for unique_line in np.argsort(-bounds, kind="stable"):
+        bound = bounds[unique_line]
+        if bound <= 0 or (len(top) == top_n and bound < top[-1][0]):
+            break
+        aligned[unique_line] = True
+        if best_scores[unique_line] > 0:
+            members = bounds_index["fanout"][
+                fanout_offsets[unique_line] : fanout_offsets[unique_line + 1]
+            ]
+            top += [(best_scores[unique_line], int(line)) for line in members]
+            top = sorted(top, reverse=True)[:top_n]
+    return np.array([line for _, line in top], dtype=np.int64), aligned
+
+
+def report_bucket(corpus, cpp_corpus, bounds_index, low, high, num_queries, rng):
+    """
+    Replays the bound-ordered search on the queries of a length bucket. Skipped lines and
+    cells are counted over the unique melodic lines, which are the ones aligned.
+
+    Returns:
+        dict: Metrics of the bucket.
+    """
+    lengths = bounds_index["lengths"].astype(np.int64)
+    metrics = {"skipped": [], "cells": [], "violations": 0, "different": 0}
+    for _ in range(num_queries):
+        query = fitting_alignment.encode_sequence(
+            make_query(corpus, rng.randint(low, high), rng), cpp_compatible=True
+        )
+        profile = cpp_corpus["score_matrix"][:, np.frombuffer(query, dtype=np.uint8)]
+        best_scores = fitting_alignment.corpus_scores(cpp_corpus, profile, "profile")[0]
+        bounds = line_bounds.upper_bounds(
+            bounds_index, query, cpp_corpus["score_matrix"]
+        )
+        top, aligned = bounded_search(best_scores, bounds, bounds_index)
+
+        metrics["skipped"].append(1 - aligned.mean())
+        metrics["cells"].append(1 - lengths[aligned].sum() / max(lengths.sum(), 1))
+        metrics["violations"] += int((best_scores > bounds).sum())
+        metrics["different"] += not np.array_equal(
+            top, fitting_alignment.select_top(best_scores[cpp_corpus["entries"]])
+        )
+    return metrics
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Report the lines skipped by the bound-ordered approximate search."
+    )
+    parser.add_argument(
+        "-n",
+        "--num_queries",
+        type=int,
+        default=10,
+        help="Queries per length bucket (default: %(default)s).",
+    )
+    parser.add_argument(
+        "-f",
+        "--features",
+        nargs="+",
+        choices=list(fitting_alignment.FEATURE_FILES),
+        default=list(fitting_alignment.FEATURE_FILES),
+        help="Features to report (default: all).",
+    )
+    parser.add_argument(
+        "-s", "--seed", type=int, default=0, help="Random seed (default: %(default)s)."
+    )
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    for feature in args.features:
+        corpus = fitting_alignment.load_corpus(feature)
+        cpp_corpus = fitting_alignment.load_corpus(feature, cpp_compatible=True)
+        bounds_index = line_bounds.open_line_bounds(
+            os.path.join(
+                fitting_alignment.INDEXES_DIR,
+                fitting_alignment.FEATURE_FILES[feature]["line_bounds"],
+            )
+        )
+        print(
+            f"\n{feature}: {len(corpus['lines'])} lines, "
+            f"{len(bounds_index['lengths'])} unique"
+        )
+        print(
+            f"{'Bucket':<7} {'Skipped':>8} {'Min':>7} {'Max':>7} {'Cells':>7} "
+            f"{'Violations':>10} {'Different':>9}"
+        )
+        for label, low, high in BUCKETS:
+            m = report_bucket(
+                corpus, cpp_corpus, bounds_index, low, high, args.num_queries, rng
+            )
+            print(
+                f"{label:<7} {100 * np.mean(m['skipped']):>7.1f}% "
+                f"{100 * np.min(m['skipped']):>6.1f}% "
+                f"{100 * np.max(m['skipped']):>6.1f}% "
+                f"{100 * np.mean(m['cells']):>6.1f}% "
+                f"{m['violations']:>10} {m['different']:>9}"
+            )
@@ -0,0 +1,157 @@
+"""
+BSD 2-Clause License
+
+Copyright (c) 2024, Hilda Romero-Velo
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+
+* Redistributions of source code must retain the above copyright notice, this
+  list of conditions and the following disclaimer.
+
+* Redistributions in binary form must reproduce the above copyright notice, this
+  list of conditions and the following disclaimer in the documentation
+  and/or other materials provided with the distribution.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+
+"""
+Script: report_deduplication.py
+Purpose:
+    Reports how many melodic lines are identical to another line in the approximate
+    alignment indexes, and the speedup of aligning every distinct line once
+    (`fitting_alignment.py`) over aligning every melodic line, by query length. Checks that
+    both give the same results.
+
+Usage:
+    python3 report_deduplication.py [-n <queries>] [-f <feature> ...] [-s <seed>]
+
+Queries are built as in `benchmark_alignment_kernels.py` (fragments of melodic lines with
+some symbols replaced), in the query length buckets of `database/report_queries.py`. The
+corpus without deduplication gives every melodic line its own entry, as the corpus indexes
+did before storing every distinct line once. The approximate alignment indexes must be built
+in scores/indexes.
+
+Reported metrics (per feature):
+    - Melodic lines, distinct lines and deduplication ratio (melodic lines per distinct
+      line), and the same for the symbols aligned by the dynamic programming.
+    - Mean latency per query with and without deduplication and speedup, per bucket.
+    - Queries whose results differ (must be 0).
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+from benchmark_alignment_kernels import BUCKETS, make_query
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(script_dir, "../../src"))
+import fitting_alignment
+
+
+def without_deduplication(corpus):
+    """
+    Builds the same corpus with one entry per melodic line, so identical lines are aligned
+    once each.
+
+    Args:
+        corpus (dict): Corpus loaded with `fitting_alignment.load_corpus`.
+
+    Returns:
+        dict: Corpus without deduplication.
+    """
+    lines = corpus["lines"]
+    return fitting_alignment.build_corpus(
+        corpus["ids"],
+        lines,
+        corpus["score_matrix"],
+        corpus["cpp_compatible"],
+        corpus["batch_size"],
+        corpus["kgram_index"],
+        (lines, np.arange(len(lines), dtype=np.int64)),
+    )
+
+
+def time_alignment(query, corpus):
+    """
+    Aligns a query with the kernel selected automatically.
+
+    Returns:
+        tuple: (results, latency in milliseconds)
+    """
+    start = time.perf_counter()
+    results = fitting_alignment.align(query, corpus)
+    return results, (time.perf_counter() - start) * 1000
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Report the identical melodic lines and the deduplication speedup."
+    )
+    parser.add_argument(
+        "-n",
+        "--num_queries",
+        type=int,
+        default=10,
+        help="Queries per length bucket (default: %(default)s).",
+    )
+    parser.add_argument(
+        "-f",
+        "--features",
+        nargs="+",
+        choices=list(fitting_alignment.FEATURE_FILES),
+        default=list(fitting_alignment.FEATURE_FILES),
+        help="Features to report (default: all).",
+    )
+    parser.add_argument(
+        "-s", "--seed", type=int, default=0, help="Random seed (default: %(default)s)."
+    )
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    for feature in args.features:
+        corpus = fitting_alignment.load_corpus(feature)
+        full_corpus = without_deduplication(corpus)
+        num_lines = len(corpus["lines"])
+        num_unique = len(corpus["unique_lines"])
+        print(
+            f"\n{feature}: {num_lines} lines, {num_unique} distinct "
+            f"({num_lines / max(num_unique, 1):.2f}x), "
+            f"{full_corpus['num_symbols']} symbols, {corpus['num_symbols']} distinct "
+            f"({full_corpus['num_symbols'] / max(corpus['num_symbols'], 1):.2f}x)"
+        )
+        print(
+            f"{'Bucket':<7} {'All lines':>10} {'Distinct':>10} {'Speedup':>8} "
+            f"{'Differ':>7}"
+        )
+        for label, low, high in BUCKETS:
+            full_ms = unique_ms = 0.0
+            differing = 0
+            for _ in range(args.num_queries):
+                query = make_query(corpus, rng.randint(low, high), rng)
+                full_results, latency_ms = time_alignment(query, full_corpus)
+                full_ms += latency_ms
+                results, latency_ms = time_alignment(query, corpus)
+                unique_ms += latency_ms
+                differing += results != full_results
+            n = max(args.num_queries, 1)
+            print(
+                f"{label:<7} {full_ms / n:>8.1f}ms {unique_ms / n:>8.1f}ms "
+                f"{full_ms / max(unique_ms, 1e-9):>7.1f}x {differing:>7}"
+            )
@@ -0,0 +1,204 @@
+"""
+BSD 2-Clause License
+
+Copyright (c) 2024, Hilda Romero-Velo
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+
+* Redistributions of source code must retain the above copyright notice, this
+  list of conditions and the following disclaimer.
+
+* Redistributions in binary form must reproduce the above copyright notice, this
+  list of conditions and the following disclaimer in the documentation
+  and/or other materials provided with the distribution.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+
+"""
+Script: report_kgram_prefilter.py
+Purpose:
+    Reports the recall and the speedup of the k-gram prefilter of the in-process approximate
+    alignment (`fitting_alignment.py`, `kgram_index.py`) against the exhaustive search, by
+    query length.
+
+Usage:
+    python3 report_kgram_prefilter.py [-n <queries>] [-f <feature> ...] [-c <candidates>]
+                                      [-e <max_errors>] [-k <k>] [-s <seed>]
+
+Queries are built as in `benchmark_alignment_kernels.py` (fragments of melodic lines with
+some symbols replaced), in the query length buckets of `database/report_queries.py`. Every
+query is aligned against every line (exhaustive), against the lines sharing the most k-grams
+with it (Top N candidates) and against the lines that may contain it within the error
+budget (lossless mode, q-gram lemma). The approximate alignment indexes must be built in
+scores/indexes; the k-gram index is built in memory if it is missing or has another k.
+
+Reported metrics (per feature and bucket):
+    - Mean latency per query of the exhaustive search.
+    - Top N and lossless modes: Recall@5 (fraction of the exhaustive Top 5 lines also
+      returned), mean fraction of lines aligned, and speedup over the exhaustive search.
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+from benchmark_alignment_kernels import BUCKETS, make_query
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(script_dir, "../../../common"))
+sys.path.append(os.path.join(script_dir, "../../src"))
+import fitting_alignment
+import kgram_index
+
+
+def timed_alignment(query, corpus, **prefilter):
+    """
+    Aligns a query and measures the latency.
+
+    Returns:
+        tuple: (identifiers of the Top 5 lines, latency in milliseconds)
+    """
+    start = time.perf_counter()
+    results = fitting_alignment.align(query, corpus, **prefilter)
+    return results["alignment"]["score_ids"], (time.perf_counter() - start) * 1000
+
+
+def recall(retrieved, reference):
+    """
+    Computes the fraction of the reference lines that were retrieved.
+
+    Returns:
+        float: Recall (1 if there are no reference lines).
+    """
+    if not reference:
+        return 1.0
+    return len(set(retrieved) & set(reference)) / len(reference)
+
+
+def aligned_fraction(query, corpus, **prefilter):
+    """
+    Computes the fraction of the lines of the corpus aligned with a prefilter.
+
+    Returns:
+        float: Fraction of lines aligned.
+    """
+    candidates = fitting_alignment.select_candidates(
+        fitting_alignment.encode_sequence(query), corpus, **prefilter
+    )
+    if candidates is None:
+        return 1.0
+    return len(candidates) / len(corpus["lines"])
+
+
+def report_bucket(corpus, low, high, args, rng):
+    """
+    Compares the prefilter modes with the exhaustive search on the queries of a bucket.
+
+    Returns:
+        dict: Metrics of the bucket.
+    """
+    modes = {
+        "top": {"num_candidates": args.candidates},
+        "lossless": {"max_errors": args.max_errors},
+    }
+    metrics = {"exhaustive_ms": 0.0}
+    for mode in modes:
+        metrics.update(
+            {f"{mode}_ms": 0.0, f"{mode}_recall": 0.0, f"{mode}_aligned": 0.0}
+        )
+    for _ in range(args.num_queries):
+        query = make_query(corpus, rng.randint(low, high), rng)
+        reference, exhaustive_ms = timed_alignment(query, corpus)
+        metrics["exhaustive_ms"] += exhaustive_ms
+        for mode, prefilter in modes.items():
+            retrieved, latency_ms = timed_alignment(query, corpus, **prefilter)
+            metrics[f"{mode}_ms"] += latency_ms
+            metrics[f"{mode}_recall"] += recall(retrieved, reference)
+            metrics[f"{mode}_aligned"] += aligned_fraction(query, corpus, **prefilter)
+    return metrics
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Report the recall and speedup of the k-gram prefilter."
+    )
+    parser.add_argument(
+        "-n",
+        "--num_queries",
+        type=int,
+        default=10,
+        help="Queries per length bucket (default: %(default)s).",
+    )
+    parser.add_argument(
+        "-f",
+        "--features",
+        nargs="+",
+        choices=list(fitting_alignment.FEATURE_FILES),
+        default=list(fitting_alignment.FEATURE_FILES),
+        help="Features to report (default: all).",
+    )
+    parser.add_argument(
+        "-c",
+        "--candidates",
+        type=int,
+        default=fitting_alignment.NUM_CANDIDATES,
+        help="Candidate lines in Top N mode (default: %(default)s).",
+    )
+    parser.add_argument(
+        "-e",
+        "--max_errors",
+        type=int,
+        default=2,
+        help="Error budget of the lossless mode (default: %(default)s).",
+    )
+    parser.add_argument(
+        "-k",
+        type=int,
+        default=kgram_index.DEFAULT_K,
+        help="Length of the k-grams (default: %(default)s).",
+    )
+    parser.add_argument(
+        "-s", "--seed", type=int, default=0, help="Random seed (default: %(default)s)."
+    )
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    for feature in args.features:
+        corpus = fitting_alignment.load_corpus(feature)
+        if corpus["kgram_index"] is None or corpus["kgram_index"]["k"] != args.k:
+            corpus["kgram_index"] = kgram_index.build_kgram_index(
+                corpus["lines"], args.k
+            )
+        print(
+            f"\n{feature}: {len(corpus['lines'])} lines, k = {args.k}, "
+            f"Top {args.candidates} candidates, lossless within {args.max_errors} edits"
+        )
+        print(
+            f"{'Bucket':<7} {'Exhaust':>9} {'Top R@5':>8} {'Aligned':>8} {'Speedup':>8} "
+            f"{'LL R@5':>8} {'Aligned':>8} {'Speedup':>8}"
+        )
+        for label, low, high in BUCKETS:
+            m = report_bucket(corpus, low, high, args, rng)
+            n = max(args.num_queries, 1)
+            columns = [f"{label:<7} {m['exhaustive_ms'] / n:>7.1f}ms"]
+            for mode in ["top", "lossless"]:
+                columns.append(
+                    f"{m[f'{mode}_recall'] / n:>8.3f} "
+                    f"{100 * m[f'{mode}_aligned'] / n:>7.1f}% "
+                    f"{m['exhaustive_ms'] / max(m[f'{mode}_ms'], 1e-9):>7.1f}x"
+                )
+            print(" ".join(columns))
@@ -0,0 +1,250 @@
+"""
+BSD 2-Clause License
+
+Copyright (c) 2024, Hilda Romero-Velo
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+
+* Redistributions of source code must retain the above copyright notice, this
+  list of conditions and the following disclaimer.
+
+* Redistributions in binary form must reproduce the above copyright notice, this
+  list of conditions and the following disclaimer in the documentation
+  and/or other materials provided with the distribution.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+
+"""
+Script: report_line_phrases.py
+Purpose:
+    Reports, by musical form, how much the repeated phrases of the melodic lines compress
+    them (see `line_phrases.py`) and how many dynamic programming columns the
+    `approximate_alignment` program copies from those repeats instead of computing them,
+    with the resulting speedup, by query length.
+
+Usage:
+    python3 report_line_phrases.py [-n <queries>] [-f <feature> ...] [-s <seed>]
+
+Queries are built as in `benchmark_alignment_kernels.py` (fragments of melodic lines with
+some symbols replaced), in the query length buckets of `database/report_queries.py`. The
+columns of every distinct line are computed in-process with the scores of the program
+(`fitting_alignment.py` in C++-compatible mode), and `align_line()` (see
+`approximate_alignment.cpp`) is replayed on them: inside every copy of the phrase index, the
+columns are copied from the first one equal to the column at the same offset of the source.
+Every distinct line is counted, as when no line is skipped by its bound. The speedup is the
+ratio of columns to columns computed, since a copied column costs a comparison at most. The
+musical form of a line is the second field of its identifier, as in
+`compute_approx_alignment_files.py`. The approximate alignment indexes, with the line phrase
+indexes, must be built in scores/indexes.
+
+The program reports the columns it computes and copies for every query in the "search"
+section of its JSON results.
+
+Reported metrics (per feature):
+    - Per form: distinct lines, symbols, LZ77 phrases (literals and copies), compression
+      ratio (symbols per phrase), fraction of symbols inside copies, and fraction of columns
+      copied and speedup over all the queries.
+    - Per bucket: fraction of columns copied and speedup over all the forms.
+"""
+
+import argparse
+import os
+import random
+import sys
+from collections import defaultdict
+
+import numpy as np
+
+from benchmark_alignment_kernels import BUCKETS, make_query
+from report_prefix_trie import musical_form
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(script_dir, "../../../common"))
+sys.path.append(os.path.join(script_dir, "../../src"))
+import fitting_alignment
+import line_phrases
+
+BATCH_SIZE = 32  # Lines whose columns are kept at once
+
+
+def score_columns(batch, profile, gap_penalty=fitting_alignment.GAP_PENALTY):
+    """
+    Computes every score column of the fitting alignment of the query against a batch of
+    melodic lines, as `fitting_alignment.score_batch` does.
+
+    Args:
+        batch (dict): Batch of melodic lines (see `fitting_alignment.build_batches`).
+        profile (np.ndarray): Query profile (see `fitting_alignment.align_batch`).
+        gap_penalty (int): Gap penalty.
+
+    Returns:
+        np.ndarray: Columns (text positions + 1, lines, query positions + 1).
+    """
+    codes = batch["codes"]
+    query_length = profile.shape[1]
+    gap_offsets = np.arange(1, query_length + 1) * gap_penalty
+
+    columns = np.zeros((codes.shape[0] + 1, codes.shape[1], query_length + 1), np.int32)
+    columns[0, :, 1:] = gap_offsets
+    for i in range(1, codes.shape[0] + 1):
+        scores, new_scores = columns[i - 1], columns[i]
+        diagonal = scores[:, :-1] + profile[codes[i - 1]]
+        np.maximum(diagonal, scores[:, 1:] + gap_penalty, out=new_scores[:, 1:])
+        new_scores[:, 1:] -= gap_offsets
+        np.maximum.accumulate(new_scores[:, 1:], axis=1, out=new_scores[:, 1:])
+        np.maximum(new_scores[:, 1:], 0, out=new_scores[:, 1:])
+        new_scores[:, 1:] += gap_offsets
+    return columns
+
+
+def copied_columns(columns, copies):
+    """
+    Counts the columns of a line that `align_line()` copies: every copy is copied from its
+    first column equal to the column at the same offset of its source.
+
+    Args:
+        columns (np.ndarray): Columns of the line (text positions + 1, query positions + 1).
+        copies (list): Copies of the line as (start, source, length) tuples.
+
+    Returns:
+        int: Number of columns copied.
+    """
+    copied = 0
+    for start, source, length in copies:
+        same = (
+            columns[start : start + length] == columns[source : source + length]
+        ).all(axis=1)
+        if same.any():
+            copied += length - int(same.argmax())
+    return copied
+
+
+def report_query(corpus, line_copies, query):
+    """
+    Replays the copies of the columns of every distinct line for a query.
+
+    Args:
+        corpus (dict): C++-compatible corpus (see `fitting_alignment.load_corpus`).
+        line_copies (list): Copies of every distinct line as (start, source, length) tuples.
+        query (bytes): C++-compatible encoded query.
+
+    Returns:
+        np.ndarray: Columns copied per distinct line.
+    """
+    profile = corpus["score_matrix"][:, np.frombuffer(query, dtype=np.uint8)]
+    copied = np.zeros(len(corpus["unique_lines"]), dtype=np.int64)
+    with_copies = [line for line, copies in enumerate(line_copies) if copies]
+    for start in range(0, len(with_copies), BATCH_SIZE):
+        lines = with_copies[start : start + BATCH_SIZE]
+        batch = fitting_alignment.build_batches(
+            [corpus["unique_lines"][line] for line in lines], BATCH_SIZE
+        )[0]
+        columns = score_columns(batch, profile)
+        for column, index in enumerate(batch["indexes"]):
+            line = lines[index]
+            copied[line] = copied_columns(columns[:, column], line_copies[line])
+    return copied
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Report the compression and the columns copied by the line phrases."
+    )
+    parser.add_argument(
+        "-n",
+        "--num_queries",
+        type=int,
+        default=10,
+        help="Queries per length bucket (default: %(default)s).",
+    )
+    parser.add_argument(
+        "-f",
+        "--features",
+        nargs="+",
+        choices=list(fitting_alignment.FEATURE_FILES),
+        default=list(fitting_alignment.FEATURE_FILES),
+        help="Features to report (default: all).",
+    )
+    parser.add_argument(
+        "-s", "--seed", type=int, default=0, help="Random seed (default: %(default)s)."
+    )
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    for feature in args.features:
+        corpus = fitting_alignment.load_corpus(feature)
+        cpp_corpus = fitting_alignment.load_corpus(feature, cpp_compatible=True)
+        phrases = line_phrases.open_line_phrases(
+            os.path.join(
+                fitting_alignment.INDEXES_DIR,
+                fitting_alignment.FEATURE_FILES[feature]["line_phrases"],
+            )
+        )
+        offsets = phrases["offsets"].astype(np.int64)
+        fields = np.stack([phrases["starts"], phrases["sources"], phrases["lengths"]])
+        line_copies = [
+            [tuple(copy) for copy in fields[:, offsets[line] : offsets[line + 1]].T]
+            for line in range(len(offsets) - 1)
+        ]
+        lengths = np.array([len(line) for line in cpp_corpus["unique_lines"]])
+
+        # Form of every distinct line: the form of its first melodic line
+        first_lines = np.full(len(lengths), len(corpus["ids"]))
+        np.minimum.at(first_lines, cpp_corpus["entries"], np.arange(len(corpus["ids"])))
+        forms = defaultdict(list)
+        for line, first_line in enumerate(first_lines):
+            forms[musical_form(corpus["ids"][first_line])].append(line)
+
+        copied_by_bucket = {}
+        for label, low, high in BUCKETS:
+            copied_by_bucket[label] = np.zeros(len(lengths), dtype=np.int64)
+            for _ in range(args.num_queries):
+                query = fitting_alignment.encode_sequence(
+                    make_query(corpus, rng.randint(low, high), rng), cpp_compatible=True
+                )
+                copied_by_bucket[label] += report_query(cpp_corpus, line_copies, query)
+        copied = sum(copied_by_bucket.values())
+        num_queries = max(args.num_queries, 1) * len(BUCKETS)
+
+        print(f"\n{feature}: {len(corpus['lines'])} lines, {len(lengths)} distinct")
+        print(
+            f"{'Form':<20} {'Lines':>6} {'Symbols':>9} {'Phrases':>8} {'Ratio':>6} "
+            f"{'In copies':>9} {'Copied':>7} {'Speedup':>8}"
+        )
+        for form in sorted(forms):
+            lines = forms[form]
+            symbols = int(lengths[lines].sum())
+            in_copies = sum(copy[2] for line in lines for copy in line_copies[line])
+            num_phrases = (
+                symbols - in_copies + sum(len(line_copies[line]) for line in lines)
+            )
+            columns = symbols * num_queries
+            form_copied = int(copied[lines].sum())
+            print(
+                f"{form:<20} {len(lines):>6} {symbols:>9} {num_phrases:>8} "
+                f"{symbols / max(num_phrases, 1):>6.2f} "
+                f"{100 * in_copies / max(symbols, 1):>8.1f}% "
+                f"{100 * form_copied / max(columns, 1):>6.1f}% "
+                f"{columns / max(columns - form_copied, 1):>7.2f}x"
+            )
+
+        print(f"\n{'Bucket':<7} {'Copied':>7} {'Speedup':>8}")
+        for label, _, _ in BUCKETS:
+            columns = int(lengths.sum()) * max(args.num_queries, 1)
+            bucket_copied = int(copied_by_bucket[label].sum())
+            print(
+                f"{label:<7} {100 * bucket_copied / max(columns, 1):>6.1f}% "
+                f"{columns / max(columns - bucket_copied, 1):>7.2f}x"
+            )
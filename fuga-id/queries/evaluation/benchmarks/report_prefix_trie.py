@@ -0,0 +1,186 @@
+"""
+BSD 2-Clause License
+
+Copyright (c) 2024, Hilda Romero-Velo
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+
+* Redistributions of source code must retain the above copyright notice, this
+  list of conditions and the following disclaimer.
+
+* Redistributions in binary form must reproduce the above copyright notice, this
+  list of conditions and the following disclaimer in the documentation
+  and/or other materials provided with the distribution.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+
+"""
+Script: report_prefix_trie.py
+Purpose:
+    Reports the dynamic programming cells that the prefix 'trie' kernel of the in-process
+    approximate alignment (`fitting_alignment.py`) saves by computing the columns of the
+    prefixes shared by several melodic lines once, in total and by musical form, and checks
+    that it returns the same results as the 'batch' kernel by query length.
+
+Usage:
+    python3 report_prefix_trie.py [-n <queries>] [-f <feature> ...] [-s <seed>]
+
+Every kernel computes a column of query length cells per text position it aligns: one per
+symbol of every distinct line for the 'batch' and 'profile' kernels (without padding) and
+one per trie node for the 'trie' kernel, so the fraction of cells saved does not depend on
+the query. The musical form of a melodic line is the second field of its identifier, as in
+`compute_approx_alignment_files.py`; the cells of a form are those of the trie of its lines
+alone. Queries are built as in `benchmark_alignment_kernels.py`. The approximate alignment
+indexes must be built in scores/indexes.
+
+Reported metrics (per feature):
+    - Symbols of all the melodic lines and of the distinct lines, trie nodes, and cells saved
+      by the trie over the distinct lines and over all the lines, in total and by form.
+    - Mean latency per query of the 'batch' and 'trie' kernels per bucket, and queries whose
+      results differ (must be 0).
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from collections import defaultdict
+
+from benchmark_alignment_kernels import BUCKETS, make_query
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(script_dir, "../../src"))
+import fitting_alignment
+
+
+def musical_form(line_id):
+    """
+    Returns the musical form of a melodic line from its identifier.
+
+    Args:
+        line_id (str): Identifier of the melodic line.
+
+    Returns:
+        str: Musical form, or the identifier if it has no form field.
+    """
+    fields = line_id.split("_")
+    return fields[1] if len(fields) > 1 else line_id
+
+
+def trie_cells(lines):
+    """
+    Counts the symbols of some melodic lines, of their distinct lines and the nodes of the
+    trie of the distinct lines.
+
+    Args:
+        lines (list): Encoded melodic lines (bytes).
+
+    Returns:
+        tuple: (symbols, distinct symbols, trie nodes)
+    """
+    unique_lines = list(dict.fromkeys(lines))
+    trie = fitting_alignment.build_trie(unique_lines)
+    return (
+        sum(len(line) for line in lines),
+        sum(len(line) for line in unique_lines),
+        trie["num_nodes"],
+    )
+
+
+def print_cells(label, symbols, unique_symbols, nodes):
+    """
+    Prints a row of the cells table.
+    """
+    print(
+        f"{label:<20} {symbols:>10} {unique_symbols:>10} {nodes:>10} "
+        f"{100 * (1 - nodes / max(unique_symbols, 1)):>8.1f}% "
+        f"{100 * (1 - nodes / max(symbols, 1)):>8.1f}%"
+    )
+
+
+def time_alignment(query, corpus, kernel):
+    """
+    Aligns a query with a kernel.
+
+    Returns:
+        tuple: (results, latency in milliseconds)
+    """
+    start = time.perf_counter()
+    results = fitting_alignment.align(query, corpus, kernel=kernel)
+    return results, (time.perf_counter() - start) * 1000
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Report the alignment cells saved by the prefix trie kernel."
+    )
+    parser.add_argument(
+        "-n",
+        "--num_queries",
+        type=int,
+        default=10,
+        help="Queries per length bucket (default: %(default)s).",
+    )
+    parser.add_argument(
+        "-f",
+        "--features",
+        nargs="+",
+        choices=list(fitting_alignment.FEATURE_FILES),
+        default=list(fitting_alignment.FEATURE_FILES),
+        help="Features to report (default: all).",
+    )
+    parser.add_argument(
+        "-s", "--seed", type=int, default=0, help="Random seed (default: %(default)s)."
+    )
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    for feature in args.features:
+        corpus = fitting_alignment.load_corpus(feature)
+        forms = defaultdict(list)
+        for line_id, line in zip(corpus["ids"], corpus["lines"]):
+            forms[musical_form(line_id)].append(line)
+
+        print(f"\n{feature}: {len(corpus['lines'])} lines")
+        print(
+            f"{'Form':<20} {'Symbols':>10} {'Distinct':>10} {'Nodes':>10} "
+            f"{'Saved':>9} {'vs all':>9}"
+        )
+        for form in sorted(forms):
+            print_cells(form, *trie_cells(forms[form]))
+        print_cells(
+            "Total",
+            sum(len(line) for line in corpus["lines"]),
+            corpus["num_symbols"],
+            fitting_alignment.get_trie(corpus)["num_nodes"],
+        )
+
+        print(f"\n{'Bucket':<7} {'Batch':>9} {'Trie':>9} {'Speedup':>8} {'Differ':>7}")
+        for label, low, high in BUCKETS:
+            batch_ms = trie_ms = 0.0
+            differing = 0
+            for _ in range(args.num_queries):
+                query = make_query(corpus, rng.randint(low, high), rng)
+                batch_results, latency_ms = time_alignment(query, corpus, "batch")
+                batch_ms += latency_ms
+                results, latency_ms = time_alignment(query, corpus, "trie")
+                trie_ms += latency_ms
+                differing += results != batch_results
+            n = max(args.num_queries, 1)
+            print(
+                f"{label:<7} {batch_ms / n:>7.1f}ms {trie_ms / n:>7.1f}ms "
+                f"{batch_ms / max(trie_ms, 1e-9):>7.1f}x {differing:>7}"
+            )
@@ -0,0 +1,201 @@
+"""
+BSD 2-Clause License
+
+Copyright (c) 2024, Hilda Romero-Velo
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+
+* Redistributions of source code must retain the above copyright notice, this
+  list of conditions and the following disclaimer.
+
+* Redistributions in binary form must reproduce the above copyright notice, this
+  list of conditions and the following disclaimer in the documentation
+  and/or other materials provided with the distribution.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+
+"""
+Script: report_quantized_parity.py
+Purpose:
+    Reports the ranking parity of the quantized (int16) mode of the in-process approximate
+    alignment (`fitting_alignment.py`) with its int32 scores, and the latency of both.
+
+Usage:
+    python3 report_quantized_parity.py [-d <data_dir>] [-n <files>] [-l <query_length>]
+                                       [-f <feature> ...]
+
+The features of every query file (WAV or MIDI) under the data folder (queries/data by
+default, the whole evaluation query set) are extracted once, and each approximate notation
+is aligned with both corpora. The approximate alignment indexes must be built in
+scores/indexes.
+
+Reported metrics (per feature):
+    - Queries, and queries aligned with int32 scores in quantized mode to avoid overflow.
+    - Queries with the same Top 5 (identifiers, scores and positions), with the same Top 5
+      lines in any order, and with the same best line.
+    - Mean latency per query of both modes, and speedup of the quantized mode.
+The mismatching queries are listed, and the exit status is 1 if any Top 5 differs.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(script_dir, "../../src"))
+import fitting_alignment
+import query_features
+
+DEFAULT_DATA_DIR = os.path.join(script_dir, "../../data")
+
+
+def timed_alignment(query, corpus):
+    """
+    Aligns a query and measures the latency.
+
+    Returns:
+        tuple: ("alignment" field of the results, latency in milliseconds)
+    """
+    start = time.perf_counter()
+    results = fitting_alignment.align(query, corpus)
+    return results["alignment"], (time.perf_counter() - start) * 1000
+
+
+def overflows_int16(query, corpus):
+    """
+    Checks whether a query is aligned with int32 scores in quantized mode.
+
+    Returns:
+        bool: True if its dynamic programming could overflow int16.
+    """
+    symbols = np.frombuffer(fitting_alignment.encode_sequence(query), dtype=np.uint8)
+    if not len(symbols):
+        return False
+    return not fitting_alignment.fits_int16(corpus["score_matrix"][:, symbols])
+
+
+def report_feature(feature, queries):
+    """
+    Compares both modes on the queries of a feature.
+
+    Args:
+        feature (str): Feature name.
+        queries (dict): Query notation of the feature by query file name.
+
+    Returns:
+        dict: Metrics of the feature.
+    """
+    corpus = fitting_alignment.load_corpus(feature)
+    quantized_corpus = fitting_alignment.load_corpus(feature, quantized=True)
+    metrics = {
+        "queries": 0,
+        "int32_fallbacks": 0,
+        "same_top": 0,
+        "same_lines": 0,
+        "same_best": 0,
+        "int32_ms": 0.0,
+        "int16_ms": 0.0,
+    }
+    for name, query in queries.items():
+        reference, int32_ms = timed_alignment(query, corpus)
+        quantized, int16_ms = timed_alignment(query, quantized_corpus)
+        metrics["queries"] += 1
+        metrics["int32_fallbacks"] += overflows_int16(query, quantized_corpus)
+        metrics["int32_ms"] += int32_ms
+        metrics["int16_ms"] += int16_ms
+        metrics["same_top"] += quantized == reference
+        metrics["same_lines"] += set(quantized["score_ids"]) == set(
+            reference["score_ids"]
+        )
+        metrics["same_best"] += quantized["score_ids"][:1] == reference["score_ids"][:1]
+        if quantized != reference:
+            print(f"  {name} [{feature}]: Top 5 differs")
+    return metrics
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Report the ranking parity of the quantized alignment scores."
+    )
+    parser.add_argument(
+        "-d", "--data_dir", default=DEFAULT_DATA_DIR, help="Folder with query files."
+    )
+    parser.add_argument(
+        "-n",
+        "--num_files",
+        type=int,
+        default=0,
+        help="Number of query files, 0 for all (default: %(default)s).",
+    )
+    parser.add_argument(
+        "-l",
+        "--query_length",
+        type=int,
+        default=0,
+        help="Symbols kept from each query notation, 0 for all (default: %(default)s).",
+    )
+    parser.add_argument(
+        "-f",
+        "--features",
+        nargs="+",
+        choices=list(fitting_alignment.FEATURE_FILES),
+        default=list(fitting_alignment.FEATURE_FILES),
+        help="Features to report (default: all).",
+    )
+    args = parser.parse_args()
+
+    files = sorted(
+        os.path.join(root, f)
+        for root, _, names in os.walk(args.data_dir)
+        for f in names
+        if f.lower().endswith((".wav", ".mid"))
+    )
+    if args.num_files:
+        files = files[: args.num_files]
+
+    notations = {}
+    for file_path in files:
+        try:
+            features = query_features.extract_query_features(file_path)
+        except Exception as e:
+            print(f"  {os.path.basename(file_path)}: features not extracted ({e})")
+            continue
+        notations[os.path.relpath(file_path, args.data_dir)] = features["notations"][
+            "approximate"
+        ]
+
+    print(
+        f"{'Feature':<10} {'Queries':>7} {'int32':>6} {'Top 5':>6} {'Lines':>6} "
+        f"{'Best':>6} {'int32 ms':>9} {'int16 ms':>9} {'Speedup':>8}"
+    )
+    all_same = True
+    for feature in args.features:
+        queries = {
+            name: notation[feature][: args.query_length or None]
+            for name, notation in notations.items()
+        }
+        m = report_feature(feature, queries)
+        n = max(m["queries"], 1)
+        print(
+            f"{feature:<10} {m['queries']:>7} {m['int32_fallbacks']:>6} "
+            f"{m['same_top']:>6} {m['same_lines']:>6} {m['same_best']:>6} "
+            f"{m['int32_ms'] / n:>7.1f}ms {m['int16_ms'] / n:>7.1f}ms "
+            f"{m['int32_ms'] / max(m['int16_ms'], 1e-9):>7.2f}x"
+        )
+        all_same = all_same and m["same_top"] == m["queries"]
+    sys.exit(0 if all_same else 1)
@@ -0,0 +1,275 @@
+"""
+BSD 2-Clause License
+
+Copyright (c) 2024, Hilda Romero-Velo
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+
+* Redistributions of source code must retain the above copyright notice, this
+  list of conditions and the following disclaimer.
+
+* Redistributions in binary form must reproduce the above copyright notice, this
+  list of conditions and the following disclaimer in the documentation
+  and/or other materials provided with the distribution.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+
+"""
+Script: report_transcribe_once_divergence.py
+Purpose:
+    Quantifies how far the query features obtained in transcribe-once mode (slicing the notes
+    of a single transcription of the full recording) diverge from those obtained by
+    transcribing each fragment on its own, as done by default by
+    `generate_queries_from_recording.py`.
+
+Usage:
+    python3 report_transcribe_once_divergence.py [-a <audio_dir>] [-n <num_recordings>]
+                                                 [-b <backend>] [--seed <seed>] [-o <csv>]
+
+For every recording, random fragments are generated as in the evaluation, and both MIDI
+versions of each fragment go through `extract_query_feature.sh`. For each feature
+(chromatic, diatonic, rhythm) the report gives the share of fragments with identical
+features and the mean normalized edit distance between both feature sequences (0 means
+identical, 1 means completely different).
+
+Output:
+    - A summary table printed to stdout.
+    - A CSV file with the per-fragment results (default: results/transcribe_once_divergence.csv).
+"""
+
+import argparse
+import csv
+import os
+import random
+import subprocess
+import sys
+import tempfile
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(script_dir, ".."))
+sys.path.append(os.path.join(script_dir, "../../src"))
+import audio_decoding
+import audio_preconditioning
+import recording_transcription
+import transcribe_audio
+from generate_queries_from_recording import generate_adaptive_fragments
+
+DEFAULT_AUDIO_DIR = os.path.join(script_dir, "../../data/folkoteca_audios")
+DEFAULT_OUTPUT = os.path.join(script_dir, "results/transcribe_once_divergence.csv")
+EXTRACT_QUERY_FEATURE = os.path.join(script_dir, "../../src/extract_query_feature.sh")
+TMP_DIR = os.path.join(script_dir, "../../tmp")
+FEATURES = {"chromatic": "-c", "diatonic": "-d", "rhythm": "-r"}
+
+
+def edit_distance(a, b):
+    """
+    Computes the Levenshtein distance between two sequences.
+
+    Args:
+        a (str): First sequence.
+        b (str): Second sequence.
+
+    Returns:
+        int: Minimum number of insertions, deletions and substitutions.
+    """
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, start=1):
+        current = [i]
+        for j, char_b in enumerate(b, start=1):
+            current.append(
+                min(
+                    previous[j] + 1,
+                    current[j - 1] + 1,
+                    previous[j - 1] + (char_a != char_b),
+                )
+            )
+        previous = current
+    return previous[-1]
+
+
+def extract_feature(midi_path, feature):
+    """
+    Extracts a query feature from a MIDI file with the query feature extraction script.
+
+    Args:
+        midi_path (str): Path to the MIDI file.
+        feature (str): Feature name ('chromatic', 'diatonic' or 'rhythm').
+
+    Returns:
+        str: Feature in single-character notation (empty if it could not be extracted).
+    """
+    subprocess.run(
+        [
+            "bash",
+            EXTRACT_QUERY_FEATURE,
+            FEATURES[feature],
+            midi_path,
+            "-m",
+            "approximate",
+        ],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    feature_file = os.path.join(TMP_DIR, f"{feature}_sf_query.txt")
+    if not os.path.exists(feature_file):
+        return ""
+    with open(feature_file, "r", encoding="utf8") as file:
+        value = file.read().strip()
+    os.remove(feature_file)
+    return value
+
+
+def transcribe_fragment(signal, sample_rate, start_ms, end_ms, tmp_dir, backend):
+    """
+    Transcribes a fragment on its own, as done in the default evaluation mode.
+
+    Args:
+        signal (numpy.ndarray): Signal of the full recording.
+        sample_rate (int): Sample rate of the recording.
+        start_ms (int): Start time of the fragment in milliseconds.
+        end_ms (int): End time of the fragment in milliseconds.
+        tmp_dir (str): Directory for the intermediate files.
+        backend (str): Transcription backend.
+
+    Returns:
+        str: Path to the fragment MIDI file, or None if the fragment has no musical content.
+    """
+    fragment_path = os.path.join(tmp_dir, f"fragment_{start_ms}_{end_ms}.wav")
+    fragment = signal[start_ms * sample_rate // 1000 : end_ms * sample_rate // 1000]
+    audio_decoding.save_wav(fragment_path, fragment, sample_rate)
+    if not audio_preconditioning.precondition(fragment_path, fragment_path):
+        return None
+    midi_path = os.path.join(tmp_dir, f"fragment_{start_ms}_{end_ms}.mid")
+    transcribe_audio.transcribe(fragment_path, midi_path, backend=backend)
+    return midi_path
+
+
+def report(audio_files, backend, seed, output_csv):
+    """
+    Compares both evaluation modes on random fragments of the recordings and prints the
+    divergence of each feature.
+
+    Args:
+        audio_files (list): Paths of the WAV recordings.
+        backend (str): Transcription backend.
+        seed (int): Seed of the random fragment generation.
+        output_csv (str): Path of the CSV file with the per-fragment results.
+    """
+    random.seed(seed)
+    rows = []
+    for audio_path in audio_files:
+        recording_id = os.path.splitext(os.path.basename(audio_path))[0]
+        print(f"Processing {recording_id}...")
+        signal, sample_rate = audio_decoding.load_wav(audio_path)
+        notes = recording_transcription.transcribe_recording(audio_path, backend)
+        fragments = generate_adaptive_fragments(len(signal) * 1000 // sample_rate)
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            for start_ms, end_ms in fragments:
+                fragment_midi = transcribe_fragment(
+                    signal, sample_rate, start_ms, end_ms, tmp_dir, backend
+                )
+                if fragment_midi is None:
+                    continue
+                sliced_midi = os.path.join(tmp_dir, f"sliced_{start_ms}_{end_ms}.mid")
+                recording_transcription.write_fragment(
+                    notes, start_ms, end_ms, sliced_midi
+                )
+                for feature in FEATURES:
+                    per_fragment = extract_feature(fragment_midi, feature)
+                    sliced = extract_feature(sliced_midi, feature)
+                    longest = max(len(per_fragment), len(sliced))
+                    distance = (
+                        edit_distance(per_fragment, sliced) / longest
+                        if longest
+                        else 0.0
+                    )
+                    rows.append(
+                        [
+                            recording_id,
+                            start_ms,
+                            end_ms,
+                            feature,
+                            len(per_fragment),
+                            len(sliced),
+                            per_fragment == sliced,
+                            distance,
+                        ]
+                    )
+
+    os.makedirs(os.path.dirname(os.path.abspath(output_csv)), exist_ok=True)
+    with open(output_csv, "w", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(
+            [
+                "recording_id",
+                "start_ms",
+                "end_ms",
+                "feature",
+                "per_fragment_length",
+                "sliced_length",
+                "identical",
+                "normalized_edit_distance",
+            ]
+        )
+        writer.writerows(rows)
+
+    print(f"\n{'Feature':<10} {'Fragments':>9} {'Identical':>10} {'Mean distance':>14}")
+    for feature in FEATURES:
+        group = [row for row in rows if row[3] == feature]
+        if not group:
+            continue
+        identical = sum(row[6] for row in group) / len(group)
+        distance = sum(row[7] for row in group) / len(group)
+        print(f"{feature:<10} {len(group):>9} {identical:>10.1%} {distance:>14.3f}")
+    print(f"\nPer-fragment results saved to {output_csv}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Report the feature divergence of the transcribe-once evaluation mode."
+    )
+    parser.add_argument(
+        "-a", "--audio_dir", default=DEFAULT_AUDIO_DIR, help="Folder with WAV files."
+    )
+    parser.add_argument(
+        "-n", "--num_recordings", type=int, help="Maximum number of recordings."
+    )
+    parser.add_argument(
+        "-b",
+        "--backend",
+        choices=transcribe_audio.TRANSCRIPTION_BACKENDS,
+        default=transcribe_audio.DEFAULT_BACKEND,
+        help="Transcription backend (default: %(default)s).",
+    )
+    parser.add_argument(
+        "--seed", type=int, default=0, help="Seed of the random fragments."
+    )
+    parser.add_argument(
+        "-o", "--output", default=DEFAULT_OUTPUT, help="Output CSV file."
+    )
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.audio_dir):
+        print(f"Error: The directory '{args.audio_dir}' does not exist.")
+        sys.exit(1)
+    audio_files = sorted(
+        os.path.join(args.audio_dir, f)
+        for f in os.listdir(args.audio_dir)
+        if f.lower().endswith(".wav")
+    )
+    if args.num_recordings:
+        audio_files = audio_files[: args.num_recordings]
+    report(audio_files, args.backend, args.seed, args.output)
@@ -0,0 +1,286 @@
+"""
+BSD 2-Clause License
+
+Copyright (c) 2024, Hilda Romero-Velo
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+
+* Redistributions of source code must retain the above copyright notice, this
+  list of conditions and the following disclaimer.
+
+* Redistributions in binary form must reproduce the above copyright notice, this
+  list of conditions and the following disclaimer in the documentation
+  and/or other materials provided with the distribution.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+
+"""
+Script: stress_concurrent_queries.py
+Purpose:
+    Checks that concurrent queries do not interfere with each other. Every query runs in its
+    own workspace (as `launch_query.py` does), so running many of them at the same time must
+    give the same features and search results as running them one after another.
+
+Usage:
+    python3 stress_concurrent_queries.py [-d <data_dir>] [-n <files>] [-j <concurrency>]
+                                         [-r <rounds>] [-b <backend>] [--binaries]
+
+The feature extraction script is run for every query file, feature and method, first
+sequentially (the reference) and then concurrently in several shuffled rounds. With
+--binaries, the search programs in queries/bin are run instead, which also checks the result
+files written to the workspaces (the score indexes must have been built).
+
+Output:
+    - Every query whose concurrent output differs from its reference.
+    - A summary with the number of runs, failures and elapsed times. The exit status is 1 if
+      any run does not match its reference.
+"""
+
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(script_dir, "../../src"))
+import transcribe_audio
+
+DEFAULT_DATA_DIR = os.path.join(script_dir, "../../data")
+EXTRACT_QUERY_FEATURE = os.path.join(script_dir, "../../src/extract_query_feature.sh")
+BIN_DIR = os.path.join(script_dir, "../../bin")
+FEATURES = {"chromatic": "-c", "diatonic": "-d", "rhythm": "-r"}
+METHODS = {"approximate": "approximate_alignment", "blast": "blast_alignment"}
+
+
+def run_extraction(file_path, feature, method, backend, workspace):
+    """
+    Extracts a query feature into a workspace with the feature extraction script.
+
+    Args:
+        file_path (str): Path to the WAV or MIDI file.
+        feature (str): Feature name.
+        method (str): Alignment method.
+        backend (str): Transcription backend for WAV files.
+        workspace (str): Workspace of the query.
+
+    Returns:
+        str: Feature in single-character notation (None if it could not be extracted).
+    """
+    tmp_dir = os.path.join(workspace, "tmp")
+    command = [
+        "bash",
+        EXTRACT_QUERY_FEATURE,
+        FEATURES[feature],
+        file_path,
+        "-m",
+        method,
+        "-b",
+        backend,
+        "-w",
+        tmp_dir,
+    ]
+    subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    extension = "txt" if method == "approximate" else "fasta"
+    feature_file = os.path.join(tmp_dir, f"{feature}_sf_query.{extension}")
+    if not os.path.exists(feature_file):
+        return None
+    with open(feature_file, "r", encoding="utf8") as file:
+        return file.read()
+
+
+def run_search(file_path, feature, method, backend, workspace):
+    """
+    Runs a search program with a workspace and reads its results, without the timing.
+
+    Args:
+        file_path (str): Path to the WAV or MIDI file.
+        feature (str): Feature name.
+        method (str): Alignment method.
+        backend (str): Transcription backend for WAV files.
+        workspace (str): Workspace of the query.
+
+    Returns:
+        str: Query and alignment results as JSON (None if the search produced no results).
+    """
+    command = [
+        os.path.join(BIN_DIR, METHODS[method]),
+        FEATURES[feature],
+        file_path,
+        workspace,
+    ]
+    env = dict(os.environ, FUGA_ID_TRANSCRIPTION_BACKEND=backend)
+    subprocess.run(
+        command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, env=env
+    )
+    json_path = os.path.join(workspace, "score_and_timing_results.json")
+    if not os.path.exists(json_path):
+        return None
+    with open(json_path, "r") as file:
+        data = json.load(file)
+    return json.dumps(
+        {"query": data["query"], "alignment": data["alignment"]}, sort_keys=True
+    )
+
+
+def run_query(job, backend, binaries):
+    """
+    Runs a query in a fresh workspace.
+
+    Args:
+        job (tuple): (file path, feature, method) of the query.
+        backend (str): Transcription backend for WAV files.
+        binaries (bool): Whether to run the search programs instead of the extraction.
+
+    Returns:
+        str: Output of the query.
+    """
+    runner = run_search if binaries else run_extraction
+    with tempfile.TemporaryDirectory(prefix="fuga_id_stress_") as workspace:
+        return runner(*job, backend, workspace)
+
+
+def run_all(jobs, backend, binaries, concurrency):
+    """
+    Runs every query with the given number of concurrent workers.
+
+    Args:
+        jobs (list): Queries as (file path, feature, method) tuples.
+        backend (str): Transcription backend for WAV files.
+        binaries (bool): Whether to run the search programs instead of the extraction.
+        concurrency (int): Number of queries running at the same time.
+
+    Returns:
+        tuple: (outputs in the order of the jobs, elapsed seconds)
+    """
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        outputs = list(
+            executor.map(lambda job: run_query(job, backend, binaries), jobs)
+        )
+    return outputs, time.perf_counter() - start
+
+
+def stress(files, backend, binaries, concurrency, rounds):
+    """
+    Compares the output of concurrent queries with their sequential reference.
+
+    Args:
+        files (list): Paths of the query files.
+        backend (str): Transcription backend for WAV files.
+        binaries (bool): Whether to run the search programs instead of the extraction.
+        concurrency (int): Number of queries running at the same time.
+        rounds (int): Number of concurrent rounds.
+
+    Returns:
+        bool: True if every concurrent run matches its reference.
+    """
+    jobs = [
+        (file_path, feature, method)
+        for file_path in files
+        for feature in FEATURES
+        for method in METHODS
+    ]
+    reference, sequential_time = run_all(jobs, backend, binaries, 1)
+    reference = dict(zip(jobs, reference))
+    print(f"Sequential reference: {len(jobs)} queries in {sequential_time:.2f} s")
+
+    failures = 0
+    for round_number in range(1, rounds + 1):
+        shuffled = random.sample(jobs, len(jobs))
+        outputs, elapsed = run_all(shuffled, backend, binaries, concurrency)
+        round_failures = 0
+        for (file_path, feature, method), output in zip(shuffled, outputs):
+            if output != reference[(file_path, feature, method)]:
+                round_failures += 1
+                print(
+                    f"  {os.path.basename(file_path)} [{feature}, {method}]: "
+                    "output differs from the sequential run"
+                )
+        failures += round_failures
+        print(
+            f"Round {round_number}: {len(jobs)} queries with {concurrency} workers in "
+            f"{elapsed:.2f} s, {round_failures} mismatches"
+        )
+
+    print(f"\nRuns: {len(jobs) * rounds}, mismatches: {failures}")
+    return failures == 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Run queries concurrently and check that they do not interfere."
+    )
+    parser.add_argument(
+        "-d", "--data_dir", default=DEFAULT_DATA_DIR, help="Folder with query files."
+    )
+    parser.add_argument(
+        "-n",
+        "--num_files",
+        type=int,
+        default=8,
+        help="Number of query files used (default: %(default)s).",
+    )
+    parser.add_argument(
+        "-j",
+        "--concurrency",
+        type=int,
+        default=os.cpu_count(),
+        help="Number of queries running at the same time (default: number of CPUs).",
+    )
+    parser.add_argument(
+        "-r",
+        "--rounds",
+        type=int,
+        default=3,
+        help="Number of concurrent rounds (default: %(default)s).",
+    )
+    parser.add_argument(
+        "-b",
+        "--backend",
+        choices=transcribe_audio.TRANSCRIPTION_BACKENDS,
+        default=transcribe_audio.DEFAULT_BACKEND,
+        help="Transcription backend for WAV files (default: %(default)s).",
+    )
+    parser.add_argument(
+        "--binaries",
+        action="store_true",
+        help="Run the search programs in queries/bin instead of the feature extraction.",
+    )
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.data_dir):
+        print(f"Error: The directory '{args.data_dir}' does not exist.")
+        sys.exit(1)
+    if args.binaries and not all(
+        os.path.isfile(os.path.join(BIN_DIR, program)) for program in METHODS.values()
+    ):
+        print(f"Error: The search programs were not found in '{BIN_DIR}'.")
+        sys.exit(1)
+    files = sorted(
+        os.path.join(root, f)
+        for root, _, names in os.walk(args.data_dir)
+        for f in names
+        if f.lower().endswith((".wav", ".mid"))
+    )[: args.num_files]
+    sys.exit(
+        0
+        if stress(files, args.backend, args.binaries, args.concurrency, args.rounds)
+        else 1
+    )
@@ -0,0 +1,233 @@
+"""
+BSD 2-Clause License
+
+Copyright (c) 2024, Hilda Romero-Velo
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+
+* Redistributions of source code must retain the above copyright notice, this
+  list of conditions and the following disclaimer.
+
+* Redistributions in binary form must reproduce the above copyright notice, this
+  list of conditions and the following disclaimer in the documentation
+  and/or other materials provided with the distribution.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+
+"""
+Script: verify_cost_matrix_parity.py
+Purpose:
+    Checks that the dense cost matrices (`cost_matrix.py`) are equivalent to the cost maps
+    (dictionaries of dictionaries) built and saved by the alignment index setup before them,
+    and compares the time to build and load both.
+
+Usage:
+    python3 verify_cost_matrix_parity.py [-i <indexes_dir>]
+
+For every feature dictionary, with the local (match 1, mismatch -|a-b|) and global (match 0,
+mismatch |a-b|) costs:
+    - The cost matrix built from the dictionary has the same cost for every pair as the cost
+      map built with the previous per-pair loop, and no cost for the other pairs.
+    - The cost map written from the matrix for the C++ programs is byte-identical to the one
+      written before.
+    - The matrix read back with a memory map is identical to the matrix saved.
+If the alignment indexes exist (scores/indexes by default), every cost matrix file is also
+checked against the cost map file next to it, and the approximate alignment scores of
+`fitting_alignment.py` are checked to be the same from both files.
+
+Output:
+    - Build and load times of the cost maps and the cost matrices.
+    - The mismatching checks. The exit status is 1 if any check fails.
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from fractions import Fraction
+
+import numpy as np
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+common_dir = os.path.join(script_dir, "../../../common")
+sys.path.append(common_dir)
+sys.path.append(os.path.join(common_dir, "dicts"))
+sys.path.append(os.path.join(script_dir, "../../src"))
+import approx_dictionary
+import cost_matrix
+import fitting_alignment
+from utility_functions import load_cost_map, save_cost_map
+
+DEFAULT_INDEXES_DIR = os.path.join(script_dir, "../../../scores/indexes")
+DICTIONARIES = {
+    "chromatic": approx_dictionary.CHROMATIC_DIC,
+    "diatonic": approx_dictionary.DIATONIC_DIC,
+    "rhythm": approx_dictionary.RHYTHM_DIC,
+}
+COSTS = {"local": (1.0, -1.0), "global": (0.0, 1.0)}  # (match value, mismatch sign)
+
+
+def reference_cost_map(dic, match_value, mismatch_sign):
+    """
+    Builds a cost map as the alignment index setup did before the cost matrices, parsing
+    the dictionary keys for every pair.
+
+    Args:
+        dic (dict): A dictionary where the keys are numeric values and the values are characters.
+        match_value (float): Cost of a match.
+        mismatch_sign (float): Sign of the cost of a mismatch.
+
+    Returns:
+        dict: A dictionary of dictionaries representing the alignment cost matrix.
+    """
+    cost_map = {}
+    keys = list(dic.keys())
+    values = list(dic.values())
+    for i in range(len(values)):
+        cost_map[values[i]] = {}
+        for j in range(len(values)):
+            if i == j:
+                cost_map[values[i]][values[j]] = match_value
+            else:
+                val_i = float(Fraction(keys[i]))
+                val_j = float(Fraction(keys[j]))
+                cost_map[values[i]][values[j]] = mismatch_sign * abs(val_i - val_j)
+    return cost_map
+
+
+def timed(function, *args):
+    """
+    Calls a function and measures its time.
+
+    Returns:
+        tuple: (result, time in milliseconds)
+    """
+    start = time.perf_counter()
+    result = function(*args)
+    return result, (time.perf_counter() - start) * 1000
+
+
+def verify_dictionary(name, dic, match_value, mismatch_sign, tmp_dir):
+    """
+    Checks the cost matrix of a dictionary against its reference cost map.
+
+    Args:
+        name (str): Name of the checked costs.
+        dic (dict): Feature dictionary.
+        match_value (float): Cost of a match.
+        mismatch_sign (float): Sign of the cost of a mismatch.
+        tmp_dir (str): Directory for the saved files.
+
+    Returns:
+        bool: True if every check passes.
+    """
+    cost_map, map_build_ms = timed(reference_cost_map, dic, match_value, mismatch_sign)
+    matrix, matrix_build_ms = timed(
+        cost_matrix.build_cost_matrix, dic, match_value, mismatch_sign
+    )
+    cost_map_file = os.path.join(tmp_dir, f"{name}_cost_map.bin")
+    matrix_cost_map_file = os.path.join(tmp_dir, f"{name}_matrix_cost_map.bin")
+    cost_matrix_file = os.path.join(tmp_dir, f"{name}_cost_matrix.bin")
+    save_cost_map(cost_map, cost_map_file)
+    save_cost_map(cost_matrix.to_cost_map(matrix, dic.values()), matrix_cost_map_file)
+    cost_matrix.save_cost_matrix(matrix, cost_matrix_file)
+    _, map_load_ms = timed(load_cost_map, cost_map_file)
+    loaded, matrix_load_ms = timed(cost_matrix.load_cost_matrix, cost_matrix_file)
+
+    failures = []
+    if not np.array_equal(cost_matrix.from_cost_map(cost_map), matrix, equal_nan=True):
+        failures.append("costs differ from the cost map")
+    with open(cost_map_file, "rb") as a, open(matrix_cost_map_file, "rb") as b:
+        if a.read() != b.read():
+            failures.append("cost map file differs")
+    if not np.array_equal(loaded, matrix, equal_nan=True):
+        failures.append("loaded matrix differs")
+
+    print(
+        f"{name:<18} {len(dic):>7} {map_build_ms:>8.1f}ms {matrix_build_ms:>8.1f}ms "
+        f"{map_load_ms:>8.1f}ms {matrix_load_ms:>8.2f}ms  {'; '.join(failures) or 'OK'}"
+    )
+    return not failures
+
+
+def verify_indexes(indexes_dir):
+    """
+    Checks the cost matrix files of the alignment indexes against their cost map files.
+
+    Args:
+        indexes_dir (str): Directory with the alignment indexes.
+
+    Returns:
+        bool: True if every check passes.
+    """
+    passed = True
+    for index in ["approximate_alignment", "global_alignment"]:
+        index_dir = os.path.join(indexes_dir, index)
+        if not os.path.isdir(index_dir):
+            continue
+        for filename in sorted(os.listdir(index_dir)):
+            if not filename.endswith("_cost_map.bin"):
+                continue
+            matrix_path = os.path.join(
+                index_dir, filename.replace("_cost_map.bin", "_cost_matrix.bin")
+            )
+            if not os.path.isfile(matrix_path):
+                print(f"{index}/{filename}: no cost matrix (see convert_cost_maps.py)")
+                passed = False
+                continue
+            cost_map = load_cost_map(os.path.join(index_dir, filename))
+            matrix = cost_matrix.load_cost_matrix(matrix_path)
+            same = np.array_equal(
+                cost_matrix.from_cost_map(cost_map), matrix, equal_nan=True
+            )
+            if index == "approximate_alignment":
+                same = same and np.array_equal(
+                    fitting_alignment.build_score_matrix(cost_map),
+                    fitting_alignment.score_matrix_from_costs(matrix),
+                )
+            print(f"{index}/{filename}: {'OK' if same else 'differs'}")
+            passed = passed and same
+    return passed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Check that the cost matrices are equivalent to the cost maps."
+    )
+    parser.add_argument(
+        "-i",
+        "--indexes_dir",
+        default=DEFAULT_INDEXES_DIR,
+        help="Directory with the alignment indexes (default: scores/indexes).",
+    )
+    args = parser.parse_args()
+
+    passed = True
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        print(
+            f"{'Costs':<18} {'Symbols':>7} {'Map build':>10} {'Mat build':>10} "
+            f"{'Map load':>10} {'Mat load':>10}  Result"
+        )
+        for feature, dic in DICTIONARIES.items():
+            for costs, (match_value, mismatch_sign) in COSTS.items():
+                passed = (
+                    verify_dictionary(
+                        f"{costs}_{feature}", dic, match_value, mismatch_sign, tmp_dir
+                    )
+                    and passed
+                )
+    passed = verify_indexes(args.indexes_dir) and passed
+    sys.exit(0 if passed else 1)
@@ -0,0 +1,196 @@
+"""
+BSD 2-Clause License
+
+Copyright (c) 2024, Hilda Romero-Velo
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+
+* Redistributions of source code must retain the above copyright notice, this
+  list of conditions and the following disclaimer.
+
+* Redistributions in binary form must reproduce the above copyright notice, this
+  list of conditions and the following disclaimer in the documentation
+  and/or other materials provided with the distribution.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+
+"""
+Script: verify_midi_intervals_parity.py
+Purpose:
+    Checks that the chromatic and diatonic query features computed directly from the MIDI
+    note pitches (`extract_query_feature.sh --from_midi`, see `midi_intervals.py`) match
+    those computed with the Humdrum toolchain (default in `extract_query_feature.sh`).
+
+Usage:
+    python3 verify_midi_intervals_parity.py [-d <data_dir>] [-b <backend>] [-m <method>]
+
+Every WAV and MIDI file found under the data folder (queries/data by default) goes through
+both chains; WAV files are transcribed once (transcriptions are cached) and the same MIDI
+transcription is used by both. Humdrum tools (mid2hum, humsed, mint, semits, xdelta) must
+be installed.
+
+Output:
+    - The mismatching files with the position of the first differing symbol.
+    - A summary with the number of matching files per feature. The exit status is 1 if any
+      file does not match.
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(script_dir, "../../src"))
+import transcribe_audio
+
+DEFAULT_DATA_DIR = os.path.join(script_dir, "../../data")
+EXTRACT_QUERY_FEATURE = os.path.join(script_dir, "../../src/extract_query_feature.sh")
+TMP_DIR = os.path.join(script_dir, "../../tmp")
+FEATURES = {"chromatic": "-c", "diatonic": "-d"}
+
+
+def extract_feature(file_path, feature, method, backend, from_midi):
+    """
+    Extracts a query feature with the query feature extraction script.
+
+    Args:
+        file_path (str): Path to the WAV or MIDI file.
+        feature (str): Feature name ('chromatic' or 'diatonic').
+        method (str): Alignment method ('approximate' or 'blast').
+        backend (str): Transcription backend for WAV files.
+        from_midi (bool): Whether to compute the intervals directly from MIDI.
+
+    Returns:
+        str: Feature in single-character notation (None if the extraction failed or
+             produced an empty feature).
+    """
+    extension = "txt" if method == "approximate" else "fasta"
+    feature_file = os.path.join(TMP_DIR, f"{feature}_sf_query.{extension}")
+    if os.path.exists(feature_file):
+        os.remove(feature_file)  # Output of a previous extraction
+    command = [
+        "bash",
+        EXTRACT_QUERY_FEATURE,
+        FEATURES[feature],
+        file_path,
+        "-m",
+        method,
+        "-b",
+        backend,
+    ]
+    if from_midi:
+        command.append("--from_midi")
+    result = subprocess.run(
+        command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    if result.returncode != 0 or not os.path.exists(feature_file):
+        return None
+    with open(feature_file, "r", encoding="utf8") as file:
+        value = file.read()
+    os.remove(feature_file)
+    return value if value.strip() else None
+
+
+def first_difference(a, b):
+    """
+    Returns the position of the first differing symbol between two strings.
+
+    Args:
+        a (str): First string.
+        b (str): Second string.
+
+    Returns:
+        int: Index of the first difference (length of the shortest string if one is a
+             prefix of the other).
+    """
+    for i, (char_a, char_b) in enumerate(zip(a, b)):
+        if char_a != char_b:
+            return i
+    return min(len(a), len(b))
+
+
+def verify(files, method, backend):
+    """
+    Compares both feature extraction chains on every file and prints the mismatches.
+
+    Args:
+        files (list): Paths of the WAV and MIDI files.
+        method (str): Alignment method.
+        backend (str): Transcription backend for WAV files.
+
+    Returns:
+        bool: True if every file produces the same features with both chains.
+    """
+    matches = {feature: 0 for feature in FEATURES}
+    for file_path in files:
+        name = os.path.basename(file_path)
+        for feature in FEATURES:
+            from_midi = extract_feature(file_path, feature, method, backend, True)
+            humdrum = extract_feature(file_path, feature, method, backend, False)
+            if from_midi is None:
+                print(f"{name} [{feature}]: MIDI chain produced no output.")
+            if humdrum is None:
+                print(f"{name} [{feature}]: Humdrum chain produced no output.")
+            if from_midi is None or humdrum is None:
+                continue
+            if from_midi != humdrum:
+                position = first_difference(from_midi, humdrum)
+                print(
+                    f"{name} [{feature}]: mismatch at symbol {position} "
+                    f"(midi: {len(from_midi)} symbols, humdrum: {len(humdrum)} symbols)"
+                )
+            else:
+                matches[feature] += 1
+
+    print(f"\n{'Feature':<10} {'Files':>6} {'Matching':>9}")
+    for feature, matching in matches.items():
+        print(f"{feature:<10} {len(files):>6} {matching:>9}")
+    return all(matching == len(files) for matching in matches.values())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Check the MIDI interval extraction against the Humdrum toolchain."
+    )
+    parser.add_argument(
+        "-d", "--data_dir", default=DEFAULT_DATA_DIR, help="Folder with query files."
+    )
+    parser.add_argument(
+        "-b",
+        "--backend",
+        choices=transcribe_audio.TRANSCRIPTION_BACKENDS,
+        default=transcribe_audio.DEFAULT_BACKEND,
+        help="Transcription backend for WAV files (default: %(default)s).",
+    )
+    parser.add_argument(
+        "-m",
+        "--method",
+        choices=["approximate", "blast"],
+        default="approximate",
+        help="Alignment method (default: %(default)s).",
+    )
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.data_dir):
+        print(f"Error: The directory '{args.data_dir}' does not exist.")
+        sys.exit(1)
+    files = sorted(
+        os.path.join(root, f)
+        for root, _, names in os.walk(args.data_dir)
+        for f in names
+        if f.lower().endswith((".wav", ".mid"))
+    )
+    sys.exit(0 if verify(files, args.method, args.backend) else 1)
@@ -38,14 +38,24 @@ This script processes all files in a specified directory, checking if they are W
 For each valid WAV file, it runs the "generate_queries_from_recording.py" command using the 
 file as input. If a file is not a WAV file, it logs the error to an "error_log.txt" file. 
 Additionally, the script verifies that the provided database to store the results of executing
-the command exists.
+the command exists. A persistent transcription worker is started before processing the files and
+stopped afterwards, so the basic-pitch model is loaded once for the whole folder instead of once
+per query fragment. The fragments of each recording are sent to the worker as a single batch
+request, so inference runs on shared model batches (see `batch_transcription.py`).
+Several recordings can be processed concurrently with --jobs: every query runs in its own
+workspace (see `launch_query.py`), so concurrent queries do not share temporary or result files.
 
 Usage:
-    python3 evaluate_audio_folder.py <directory_path> -db <database_path>
+    python3 evaluate_audio_folder.py <directory_path> -db <database_path> [--no_worker]
+                                     [--transcribe_once] [-j <jobs>]
 
 Parameters:
     <directory_path>: The path to the directory containing the WAV files to be processed.
     -db, --db_path: The path to the SQLite database required for "generate_queries_from_recording.py".
+    --no_worker: Do not start the transcription worker (each query runs the basic-pitch CLI).
+    --transcribe_once: Transcribe each WAV recording once and slice its fragments from the
+                       recording notes (passed to "generate_queries_from_recording.py").
+    -j, --jobs: Number of recordings processed concurrently (default: 1).
 
 Dependencies:
     - Python 3.x
@@ -61,6 +71,14 @@ import argparse
 import os
 import sys
 import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "../src"))
+import transcription_worker
+
+WORKER_STARTUP_TIMEOUT = 300  # Maximum time in seconds to wait for the model to load
 
 
 def log_error(message):
@@ -90,7 +108,94 @@ def print_progress(processed, total):
     )
 
 
-def process_files(directory_path, database_path):
+def start_transcription_worker():
+    """
+    Starts the transcription worker in the background and waits until it is ready.
+
+    Returns:
+        subprocess.Popen: The worker process, or None if the worker could not be started
+                          (queries then fall back to the basic-pitch CLI).
+    """
+    if transcription_worker.is_running():
+        return None  # Reuse a worker started outside of this script
+    transcription_worker.generate_auth_key()  # Inherited by the worker and the queries
+    worker_script = os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), "../src/transcription_worker.py"
+    )
+    worker = subprocess.Popen(
+        ["python3", worker_script, "start"], stdout=subprocess.DEVNULL
+    )
+    deadline = time.time() + WORKER_STARTUP_TIMEOUT
+    while time.time() < deadline:
+        if worker.poll() is not None:
+            log_error(
+                "Transcription worker exited during startup; using basic-pitch CLI."
+            )
+            return None
+        if transcription_worker.is_running():
+            return worker
+        time.sleep(0.5)
+    log_error("Transcription worker did not start in time; using basic-pitch CLI.")
+    worker.terminate()
+    return None
+
+
+def stop_transcription_worker(worker):
+    """
+    Stops a transcription worker started by this script.
+
+    Parameters:
+        worker (subprocess.Popen): The worker process.
+    """
+    if worker is None:
+        return
+    transcription_worker.stop()
+    try:
+        worker.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        worker.kill()
+
+
+def process_file(file_path, database_path, transcribe_once=False):
+    """
+    Executes the "generate_queries_from_recording.py" command for a file, logging invalid
+    files and failures.
+
+    Parameters:
+        file_path (str): The path to the file to process.
+        database_path (str): The path to the database.
+        transcribe_once (bool): Whether to slice the fragments from a single transcription
+                                of the recording.
+    """
+    filename = os.path.basename(file_path)
+
+    # Skip if not a file
+    if not os.path.isfile(file_path):
+        return
+
+    # Check if the file is a WAV or MIDI file
+    if file_path.lower().endswith(".wav") or file_path.lower().endswith(".mid"):
+        # Construct the command to run
+        command = [
+            "python3",
+            os.path.join(
+                os.path.dirname(__file__), "generate_queries_from_recording.py"
+            ),
+            file_path,
+            "-db",
+            database_path,
+        ]
+        if transcribe_once:
+            command.append("--transcribe_once")
+        try:
+            subprocess.run(command, check=True)
+        except subprocess.CalledProcessError as e:
+            log_error(f"Failed to process '{filename}': {e}")
+    else:
+        log_error(f"Invalid file (not WAV): {filename}")
+
+
+def process_files(directory_path, database_path, transcribe_once=False, jobs=1):
     """
     Processes files in the given directory and executes the "generate_queries_from_recording.py"
     command for each one. Displays the progress as percentage.
@@ -98,42 +203,27 @@ def process_files(directory_path, database_path):
     Parameters:
         directory_path (str): The path to the directory containing files to process.
         database_path (str): The path to the database.
+        transcribe_once (bool): Whether to slice the fragments from a single transcription
+                                of each recording.
+        jobs (int): Number of files processed concurrently.
     """
     files = os.listdir(directory_path)
     total_files = len(files)
     processed_files = 0
+    progress_lock = threading.Lock()
 
-    print_progress(processed_files, total_files)
-    for filename in files:
-        file_path = os.path.join(directory_path, filename)
-
-        # Skip if not a file
-        if not os.path.isfile(file_path):
+    def process_and_report(filename):
+        nonlocal processed_files
+        process_file(
+            os.path.join(directory_path, filename), database_path, transcribe_once
+        )
+        with progress_lock:
             processed_files += 1
             print_progress(processed_files, total_files)
-            continue
-
-        # Check if the file is a WAV or MIDI file
-        if file_path.lower().endswith(".wav") or file_path.lower().endswith(".mid"):
-            # Construct the command to run
-            command = [
-                "python3",
-                os.path.join(
-                    os.path.dirname(__file__), "generate_queries_from_recording.py"
-                ),
-                file_path,
-                "-db",
-                database_path,
-            ]
-            try:
-                subprocess.run(command, check=True)
-            except subprocess.CalledProcessError as e:
-                log_error(f"Failed to process '{filename}': {e}")
-        else:
-            log_error(f"Invalid file (not WAV): {filename}")
-
-        processed_files += 1
-        print_progress(processed_files, total_files)
+
+    print_progress(processed_files, total_files)
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as executor:
+        list(executor.map(process_and_report, files))
 
     print(f"Finished processing {processed_files}/{total_files} files.")
 
@@ -141,7 +231,7 @@ def process_files(directory_path, database_path):
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(
         description="Process WAV or MIDI files in a directory and launch 'generate_queries_from_recording.py' command.",
-        usage="python3 evaluate_audio_folder.py <directory_path> -db <database_path>",
+        usage="python3 evaluate_audio_folder.py <directory_path> -db <database_path> [--no_worker] [--transcribe_once] [-j <jobs>]",
     )
     parser.add_argument(
         "directory_path",
@@ -150,6 +240,23 @@ if __name__ == "__main__":
     parser.add_argument(
         "-db", "--db_path", required=True, help="Path to the SQLite database."
     )
+    parser.add_argument(
+        "--no_worker",
+        action="store_true",
+        help="Do not start the persistent transcription worker.",
+    )
+    parser.add_argument(
+        "--transcribe_once",
+        action="store_true",
+        help="Transcribe each recording once and slice its fragments from it.",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=1,
+        help="Number of recordings processed concurrently (default: %(default)s).",
+    )
     args = parser.parse_args()
 
     # Parse arguments
@@ -167,5 +274,9 @@ if __name__ == "__main__":
         )
         sys.exit(1)
 
-    # Process files in the directory
-    process_files(directory_path, database_path)
+    # Process files in the directory, sharing a single transcription worker
+    worker = None if args.no_worker else start_transcription_worker()
+    try:
+        process_files(directory_path, database_path, args.transcribe_once, args.jobs)
+    finally:
+        stop_transcription_worker(worker)
@@ -36,23 +36,38 @@ Purpose: Extract random fragments from a recording, save them in the database,
          launch queries for each fragment, and clean up temporary files.
 
 Usage:
-    python3 generate_queries_from_recording.py <recording> -db <path_to_database>
+    python3 generate_queries_from_recording.py <recording> -db <path_to_database> [--transcribe_once]
 
 Steps:
 1. Verifies if the recording exists in the "Recording" table of "folkoteca.db".
 2. Extracts 4 random fragments of random durations (3-20 seconds).
 3. Saves fragment metadata in the "Query" table, using milliseconds for timestamps.
-4. Launches `launch_query.py` for each fragment using its query ID.
-5. Deletes temporary fragment files.
+   WAV fragments are pre-conditioned (mono downmix at the model sample rate and silence
+   trimming); their trimmed duration is stored, and fragments without musical content are
+   not searched.
+4. For WAV recordings, transcribes all the fragments at once with shared model batches and
+   stores them in the transcription cache (see `batch_transcription.py`).
+5. Launches `launch_query.py` for each fragment using its query ID.
+6. Deletes temporary fragment files.
+
+With `--transcribe_once`, a WAV recording is transcribed a single time and each fragment is
+obtained by slicing the recording note events between its timestamps (see
+`recording_transcription.py`). Fragments are then written and searched as MIDI files, so
+steps 3-4 use the sliced notes instead of the audio (the stored trimmed duration is the
+time spanned by the fragment notes).
 
 Required Arguments:
     <recording>: Path to the audio file for the recording.
     -db, --db_path: Path to the SQLite database.
 
+Optional Arguments:
+    --transcribe_once: Transcribe the full recording once and slice the fragments from it.
+
 Dependencies:
     - SQLite3 for database access.
     - The `extract_audio_fragment.py` script must be available.
     - The `launch_query.py` script must be available.
+    - The `batch_transcription.py` module (queries/src) for WAV recordings.
 """
 
 import argparse
@@ -61,9 +76,18 @@ from pydub import AudioSegment
 import random
 import sqlite3
 import subprocess
-import mido
 import sys
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "../src"))
+sys.path.append(
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "../../common")
+)
+import audio_preconditioning
+import batch_transcription
+import midi_reader
+import recording_transcription
+from launch_query import DB_TIMEOUT, store_trimmed_duration
+
 MIN_FRAGMENT_DURATION = 3000  # Minimum fragment duration in milliseconds
 MAX_FRAGMENT_DURATION = 20000  # Maximum fragment duration in milliseconds
 DEFAULT_NUM_FRAGMENTS = 4  # Default number of fragments to generate
@@ -86,23 +110,12 @@ def get_file_duration(file_path):
         audio = AudioSegment.from_file(file_path)
         return len(audio)
     elif extension == ".mid":
-        midi_file = mido.MidiFile(file_path)
-        # Calculate total time in ticks
-        total_ticks = 0
-        for track in midi_file.tracks:
-            track_ticks = 0
-            for msg in track:
-                track_ticks += msg.time
-            total_ticks = max(total_ticks, track_ticks)
-        # Convert ticks to milliseconds using tempo
-        tempo = 500000  # Default tempo (microseconds per beat)
-        for track in midi_file.tracks:
-            for msg in track:
-                if msg.type == "set_tempo":
-                    tempo = msg.tempo
-                    break
-        microseconds_per_tick = tempo / midi_file.ticks_per_beat
-        return int((total_ticks * microseconds_per_tick) / 1000)
+        midi_data = midi_reader.read_midi(file_path)
+        # Convert the tick of the last event to milliseconds using tempo
+        microseconds_per_tick = (
+            midi_reader.initial_tempo(midi_data) / midi_data["resolution"]
+        )
+        return int((midi_data["end_tick"] * microseconds_per_tick) / 1000)
     else:
         raise ValueError(f"Unsupported file format: {extension}")
 
@@ -117,7 +130,7 @@ def check_recording_in_db(recording_id, db_path="folkoteca.db"):
         bool: True if the recording exists, False otherwise.
     """
     try:
-        conn = sqlite3.connect(db_path)
+        conn = sqlite3.connect(db_path, timeout=DB_TIMEOUT)
         cursor = conn.cursor()
         cursor.execute(
             "SELECT recording_id FROM Recording WHERE recording_id = ?", (recording_id,)
@@ -143,7 +156,7 @@ def fragment_exists(recording_id, start_ms, end_ms, db_path="folkoteca.db"):
         bool: True if the fragment exists, False otherwise.
     """
     try:
-        conn = sqlite3.connect(db_path)
+        conn = sqlite3.connect(db_path, timeout=DB_TIMEOUT)
         cursor = conn.cursor()
         cursor.execute(
             """
@@ -216,7 +229,7 @@ def store_query_in_db(recording_id, start_ms, end_ms, db_path="folkoteca.db"):
         int: The query ID of the inserted record.
     """
     try:
-        conn = sqlite3.connect(db_path)
+        conn = sqlite3.connect(db_path, timeout=DB_TIMEOUT)
         cursor = conn.cursor()
         cursor.execute(
             """
@@ -235,15 +248,15 @@ def store_query_in_db(recording_id, start_ms, end_ms, db_path="folkoteca.db"):
         conn.close()
 
 
-def process_fragment(recording, start_ms, end_ms, query_id, db_path):
+def extract_fragment(recording, start_ms, end_ms):
     """
-    Processes a fragment: extracts it, launches the query, and deletes the temporary file.
+    Extracts a fragment of the recording into the audio fragments directory.
     Args:
         recording (str): Path to the original recording.
         start_ms (int): Start time of the fragment in milliseconds.
         end_ms (int): End time of the fragment in milliseconds.
-        query_id (int): Query ID.
-        db_path(str): Path to the SQLite database
+    Returns:
+        str: Path to the extracted fragment.
     """
     os.makedirs(audio_fragments_dir, exist_ok=True)
     recording_base_name = os.path.basename(recording)
@@ -257,7 +270,6 @@ def process_fragment(recording, start_ms, end_ms, query_id, db_path):
     extract_audio_fragment_script = os.path.join(
         script_dir, "../utils/extract_audio_fragment.py"
     )
-    launch_command_script = os.path.join(script_dir, "launch_query.py")
 
     # Extract fragment
     extract_command = [
@@ -272,6 +284,69 @@ def process_fragment(recording, start_ms, end_ms, query_id, db_path):
         audio_fragments_dir,
     ]
     subprocess.run(extract_command, check=True)
+    return fragment_path
+
+
+def prepare_fragment(recording, start_ms, end_ms, recording_notes=None):
+    """
+    Prepares the file of a fragment to be searched: either extracts and pre-conditions it
+    from the recording, or writes the recording notes between its timestamps as MIDI.
+    Args:
+        recording (str): Path to the original recording.
+        start_ms (int): Start time of the fragment in milliseconds.
+        end_ms (int): End time of the fragment in milliseconds.
+        recording_notes (list): Note events of the full recording, or None to extract the
+                                fragment from the recording.
+    Returns:
+        tuple: (fragment path, trimmed duration in milliseconds or None for MIDI recordings)
+    """
+    if recording_notes is not None:
+        recording_file_name = os.path.splitext(os.path.basename(recording))[0]
+        os.makedirs(audio_fragments_dir, exist_ok=True)
+        fragment_path = os.path.join(
+            audio_fragments_dir, f"{recording_file_name}_{start_ms}_{end_ms}.mid"
+        )
+        fragment_notes = recording_transcription.write_fragment(
+            recording_notes, start_ms, end_ms, fragment_path
+        )
+        return fragment_path, recording_transcription.notes_span_ms(fragment_notes)
+
+    fragment_path = extract_fragment(recording, start_ms, end_ms)
+    if not fragment_path.lower().endswith(".wav"):
+        return fragment_path, None
+    return fragment_path, audio_preconditioning.precondition(
+        fragment_path, fragment_path
+    )
+
+
+def transcribe_fragments(fragment_paths):
+    """
+    Transcribes WAV fragments with shared model batches and stores them in the transcription
+    cache. Failures are reported but not raised: each query then transcribes its fragment
+    on its own.
+    Args:
+        fragment_paths (list): Paths to the extracted fragments.
+    """
+    wav_fragments = [f for f in fragment_paths if f.lower().endswith(".wav")]
+    if not wav_fragments:
+        return
+    try:
+        batch_transcription.warm_cache(wav_fragments)
+    except Exception as e:
+        print(
+            f"Warning: Batch transcription failed, fragments will be transcribed one by one: {e}"
+        )
+
+
+def process_fragment(fragment_path, query_id, db_path):
+    """
+    Processes a fragment: launches the query and deletes the temporary file.
+    Args:
+        fragment_path (str): Path to the extracted fragment.
+        query_id (int): Query ID.
+        db_path(str): Path to the SQLite database
+    """
+    launch_command_script = os.path.join(script_dir, "launch_query.py")
 
     # Launch query
     launch_command = [
@@ -298,6 +373,11 @@ if __name__ == "__main__":
     parser.add_argument(
         "-db", "--db_path", required=True, help="Path to the SQLite database."
     )
+    parser.add_argument(
+        "--transcribe_once",
+        action="store_true",
+        help="Transcribe the full recording once and slice the fragments from it.",
+    )
     args = parser.parse_args()
 
     if not os.path.isfile(args.recording):
@@ -322,7 +402,15 @@ if __name__ == "__main__":
         # Generate adaptive fragments
         fragments = generate_adaptive_fragments(duration_ms)
 
-        # Process each fragment
+        # Transcribe the full recording once if requested (WAV recordings only)
+        recording_notes = None
+        if args.transcribe_once and args.recording.lower().endswith(".wav"):
+            recording_notes = recording_transcription.transcribe_recording(
+                args.recording
+            )
+
+        # Store and extract each fragment
+        pending_fragments = []
         for start_ms, end_ms in fragments:
             if fragment_exists(recording_id, start_ms, end_ms, args.db_path):
                 print(
@@ -336,11 +424,31 @@ if __name__ == "__main__":
                     f"Error: Failed to store {recording_id} fragment {start_ms}-{end_ms} in the database."
                 )
                 continue
-            process_fragment(args.recording, start_ms, end_ms, query_id, args.db_path)
-
-        # Clean up: remove the audio_fragments_dir if empty
-        if not os.listdir(audio_fragments_dir):
-            os.rmdir(audio_fragments_dir)
+            fragment_path, trimmed_duration_ms = prepare_fragment(
+                args.recording, start_ms, end_ms, recording_notes
+            )
+            if trimmed_duration_ms is not None:
+                store_trimmed_duration(query_id, trimmed_duration_ms, args.db_path)
+                if not trimmed_duration_ms:
+                    print(
+                        f"{recording_id} fragment {start_ms}-{end_ms} has no musical content. Skipping..."
+                    )
+                    os.remove(fragment_path)
+                    continue
+            pending_fragments.append((fragment_path, query_id))
+
+        # Transcribe all the fragments at once, then launch each query
+        transcribe_fragments([fragment_path for fragment_path, _ in pending_fragments])
+        for fragment_path, query_id in pending_fragments:
+            process_fragment(fragment_path, query_id, args.db_path)
+
+        # Clean up: remove the audio_fragments_dir if empty (and not in use by another
+        # recording processed concurrently)
+        try:
+            if not os.listdir(audio_fragments_dir):
+                os.rmdir(audio_fragments_dir)
+        except OSError:
+            pass
 
     except Exception as e:
         print(f"Error during processing: {e}")
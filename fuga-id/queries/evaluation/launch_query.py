@@ -37,7 +37,8 @@ Purpose:
     and stores the results along with retrieved scores in a database.
 
 Usage:
-    python3 launch_query.py <audio> -qid <query_id> -db <path_to_database>
+    python3 launch_query.py <audio> -qid <query_id> -db <path_to_database> [-tb tf|onnx|tflite|yin]
+                            [-j <max_concurrent_searches>]
 
 Features:
 1. Supports Two Search Types:
@@ -52,6 +53,20 @@ Features:
 3. Validation:
     - Ensures that the `query_id` exists in the database before execution.
     - Validates that all `melodic_line_id` values from the JSON files exist in the `Score` table.
+    - Pre-conditions WAV queries (mono downmix at the model sample rate and silence trimming,
+      see `audio_preconditioning.py`), stores the trimmed duration in the `Query` table and
+      skips the searches of queries without musical content.
+    - Extracts every query feature once (see `query_features.py`) and passes the resulting
+      JSON file to all the searches. The time of this shared extraction is added to the
+      feature extraction time of every search, so timings remain comparable with searches
+      that extract their own features.
+    - Runs the searches once the shared features are extracted, storing the results of each
+      search as soon as it completes. They run sequentially by default; with
+      --max_concurrent_searches above 1 they run concurrently (asyncio subprocesses, bounded
+      by it). Concurrent searches compete for the CPU, so their per-search timings
+      (alignment and feature extraction times) are not comparable with sequential ones.
+    - Reports the wall time of the query (feature extraction and searches) and stores it in
+      the `Query` table together with the mode ('sequential' or 'concurrent').
 
 4. Database Storage:
     - Saves the averaged timing results in `BLAST_Search` or `Approximate_Alignment_Search` tables.
@@ -59,22 +74,58 @@ Features:
       `Approximate_Alignment_Search_Melodic_Line` tables.
 
 5. File Management:
-    - Automatically deletes the JSON result file after processing it.
+    - Runs every query in its own workspace, a temporary directory (in memory, under
+      /dev/shm, when available) holding the extracted features and the result files of its
+      searches, so several queries can run concurrently. Every search writes to its own
+      subdirectory of the query workspace. The workspace is deleted at the end.
+      Its parent directory can be set with the FUGA_ID_WORKSPACE_ROOT environment variable.
 
 Required Arguments:
     <audio>: Path to the audio file for the query.
     -qid, --query_id: The Query ID associated with the search operation.
     -db, --db_path: Path to the SQLite database.
+
+Optional Arguments:
+    -tb, --transcription_backend: basic-pitch model runtime used to transcribe WAV queries
+                                  ('tf', 'onnx' or 'tflite'), or 'yin' to use the monophonic
+                                  pitch tracker instead. It is passed to the feature
+                                  extraction through the FUGA_ID_TRANSCRIPTION_BACKEND
+                                  environment variable.
+    -j, --max_concurrent_searches: Maximum number of searches running at the same time
+                                   (default: 1, sequential). Values above 1 reduce the wall
+                                   time of the query, but the per-search timings stored in
+                                   the database are inflated by CPU contention and are not
+                                   comparable with sequential runs.
+    --from_midi: Compute the chromatic and diatonic intervals directly from the MIDI note
+                 pitches (see `midi_intervals.py`) instead of with the Humdrum toolchain.
+                 It is passed to the feature extraction of every search through the
+                 FUGA_ID_INTERVALS_FROM_MIDI environment variable.
 """
 
 import argparse
+import asyncio
 import datetime
 import json
 import os
+import resource
 import shutil
 import sqlite3
 import subprocess
 import sys
+import tempfile
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "../src"))
+import audio_preconditioning
+import query_features
+import transcribe_audio
+
+DB_TIMEOUT = 60  # Seconds to wait for the database while concurrent queries write to it
+SHARED_MEMORY_DIR = "/dev/shm"
+FAILED_JSON_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)),
+    "../data/results/failed_json_melodic_lines",
+)
 
 
 def validate_query_id(query_id, db_path):
@@ -89,7 +140,7 @@ def validate_query_id(query_id, db_path):
         bool: True if the query_id exists, False otherwise.
     """
     try:
-        conn = sqlite3.connect(db_path)
+        conn = sqlite3.connect(db_path, timeout=DB_TIMEOUT)
         cursor = conn.cursor()
         cursor.execute("SELECT query_id FROM Query WHERE query_id = ?", (query_id,))
         return cursor.fetchone() is not None
@@ -112,7 +163,7 @@ def validate_melodic_line_id(melodic_line_id, db_path):
         bool: True if the melodic_line_id exists, False otherwise.
     """
     try:
-        conn = sqlite3.connect(db_path)
+        conn = sqlite3.connect(db_path, timeout=DB_TIMEOUT)
         cursor = conn.cursor()
         cursor.execute(
             "SELECT melodic_line_id FROM Melodic_Line WHERE melodic_line_id = ?",
@@ -126,6 +177,122 @@ def validate_melodic_line_id(melodic_line_id, db_path):
         conn.close()
 
 
+def store_trimmed_duration(query_id, trimmed_duration_ms, db_path):
+    """
+    Stores the duration of a query after trimming its silence in the Query table, adding the
+    column to databases created before it existed.
+
+    Args:
+        query_id (int): The query ID.
+        trimmed_duration_ms (int): Trimmed duration in milliseconds (0 if the query was empty).
+        db_path (str): Path to the SQLite database.
+    """
+    try:
+        conn = sqlite3.connect(db_path, timeout=DB_TIMEOUT)
+        cursor = conn.cursor()
+        cursor.execute("PRAGMA table_info(Query)")
+        if "trimmed_duration_ms" not in [row[1] for row in cursor.fetchall()]:
+            cursor.execute("ALTER TABLE Query ADD COLUMN trimmed_duration_ms INTEGER")
+        cursor.execute(
+            "UPDATE Query SET trimmed_duration_ms = ? WHERE query_id = ?",
+            (trimmed_duration_ms, query_id),
+        )
+        conn.commit()
+    except sqlite3.Error as e:
+        print(f"Database error: {e}")
+    finally:
+        conn.close()
+
+
+def get_workspace_root():
+    """
+    Returns the directory where the query workspaces are created: the directory set in the
+    FUGA_ID_WORKSPACE_ROOT environment variable or, if it is not set, the shared memory
+    filesystem when it is writable.
+
+    Returns:
+        str: The workspace root, or None to use the default temporary directory.
+    """
+    workspace_root = os.environ.get("FUGA_ID_WORKSPACE_ROOT")
+    if workspace_root:
+        os.makedirs(workspace_root, exist_ok=True)
+        return workspace_root
+    if os.path.isdir(SHARED_MEMORY_DIR) and os.access(SHARED_MEMORY_DIR, os.W_OK):
+        return SHARED_MEMORY_DIR
+    return None
+
+
+def store_wall_time(query_id, wall_time_ms, search_mode, db_path):
+    """
+    Stores the wall time of a query and the mode its searches ran in in the Query table,
+    adding the columns to databases created before they existed.
+
+    Args:
+        query_id (int): The query ID.
+        wall_time_ms (int): Wall time of the feature extraction and searches in milliseconds.
+        search_mode (str): 'sequential' or 'concurrent'.
+        db_path (str): Path to the SQLite database.
+    """
+    try:
+        conn = sqlite3.connect(db_path, timeout=DB_TIMEOUT)
+        cursor = conn.cursor()
+        cursor.execute("PRAGMA table_info(Query)")
+        columns = [row[1] for row in cursor.fetchall()]
+        if "wall_time_ms" not in columns:
+            cursor.execute("ALTER TABLE Query ADD COLUMN wall_time_ms INTEGER")
+        if "search_mode" not in columns:
+            cursor.execute("ALTER TABLE Query ADD COLUMN search_mode TEXT")
+        cursor.execute(
+            "UPDATE Query SET wall_time_ms = ?, search_mode = ? WHERE query_id = ?",
+            (wall_time_ms, search_mode, query_id),
+        )
+        conn.commit()
+    except sqlite3.Error as e:
+        print(f"Database error: {e}")
+    finally:
+        conn.close()
+
+
+def extract_shared_features(query_audio, json_path, backend, from_midi=False):
+    """
+    Extracts every feature of the query once and saves them to a JSON file, measuring the
+    time spent.
+
+    Args:
+        query_audio (str): Path to the WAV or MIDI query.
+        json_path (str): Path to the JSON file to write.
+        backend (str): Transcription backend for WAV queries.
+        from_midi (bool): Compute the intervals directly from MIDI instead of with Humdrum.
+
+    Returns:
+        dict: Feature extraction timing (user, system and clock time in milliseconds),
+              including child processes.
+    """
+    usage_before = [
+        resource.getrusage(who)
+        for who in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN)
+    ]
+    start = time.perf_counter()
+    features = query_features.extract_query_features(query_audio, backend, from_midi)
+    query_features.save_query_features(features, json_path)
+    clock_ms = (time.perf_counter() - start) * 1000
+    usage_after = [
+        resource.getrusage(who)
+        for who in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN)
+    ]
+    return {
+        "fe_user_ms": sum(
+            (after.ru_utime - before.ru_utime) * 1000
+            for before, after in zip(usage_before, usage_after)
+        ),
+        "fe_system_ms": sum(
+            (after.ru_stime - before.ru_stime) * 1000
+            for before, after in zip(usage_before, usage_after)
+        ),
+        "fe_clock_ms": int(round(clock_ms)),
+    }
+
+
 def extract_timing_data(data):
     """
     Extract timing information from JSON data.
@@ -183,12 +350,11 @@ def extract_alignment_results(data, db_path, json_file):
 
 def handle_invalid_melodic_line(melodic_line_id, json_file):
     """Handle invalid melodic line ID by copying JSON and raising error."""
-    failed_json_dir = os.path.join(
-        os.path.dirname(json_file), "failed_json_melodic_lines"
-    )
-    os.makedirs(failed_json_dir, exist_ok=True)
+    os.makedirs(FAILED_JSON_DIR, exist_ok=True)
     timestamp = datetime.datetime.now().strftime("%Y%m%d%H%M%S%f")
-    failed_json_path = os.path.join(failed_json_dir, f"failed_{timestamp}.json")
+    failed_json_path = os.path.join(
+        FAILED_JSON_DIR, f"failed_{timestamp}_{os.getpid()}.json"
+    )
     shutil.copy(json_file, failed_json_path)
     raise ValueError(
         "Invalid melodic_line_id {} in JSON results.".format(melodic_line_id)
@@ -238,7 +404,7 @@ def store_results(
         db_path (str): Path to database
     """
     try:
-        conn = sqlite3.connect(db_path)
+        conn = sqlite3.connect(db_path, timeout=DB_TIMEOUT)
         cursor = conn.cursor()
 
         # Insert search record
@@ -302,6 +468,104 @@ def store_results(
         conn.close()
 
 
+def process_search_results(
+    query_id, algorithm, search_type, json_path, shared_times, db_path
+):
+    """
+    Processes the JSON results of a search and stores them in the database.
+
+    Args:
+        query_id (int): Query ID
+        algorithm (str): Algorithm type ('BLAST' or 'Approximate_Alignment')
+        search_type (str): Type of search ('chromatic', 'diatonic', 'rhythmic')
+        json_path (str): Path to the JSON results of the search.
+        shared_times (dict): Timing of the shared feature extraction, added to the search's.
+        db_path (str): Path to database
+    """
+    times, query_sequence, processed_scores = process_json_results(json_path, db_path)
+    for key, value in shared_times.items():
+        if key in times:
+            times[key] += value
+
+    # Skip storing results if query_sequence is empty
+    if not query_sequence:
+        print(f"Skipping {algorithm} {search_type} due to empty query sequence.")
+        return
+
+    store_results(
+        query_id,
+        algorithm,
+        search_type,
+        query_sequence,
+        times,
+        processed_scores,
+        db_path,
+    )
+
+
+async def run_search(command, semaphore):
+    """
+    Runs a search command once a slot of the semaphore is free.
+
+    Args:
+        command (list): The search command and its arguments.
+        semaphore (asyncio.Semaphore): Bounds the number of searches running at once.
+
+    Raises:
+        subprocess.CalledProcessError: If the search exits with a non-zero status.
+    """
+    async with semaphore:
+        process = await asyncio.create_subprocess_exec(*command)
+        returncode = await process.wait()
+    if returncode != 0:
+        raise subprocess.CalledProcessError(returncode, command)
+
+
+async def run_searches(
+    commands, query_input, workspace, query_id, shared_times, db_path, max_concurrent
+):
+    """
+    Runs the searches of a query with bounded concurrency, storing the results of each
+    search as soon as it completes. Every search uses its own subdirectory of the query
+    workspace.
+
+    Args:
+        commands (list): (command, algorithm, search type) of every search.
+        query_input (str): Query audio or JSON file with its shared features.
+        workspace (str): Workspace of the query.
+        query_id (int): Query ID.
+        shared_times (dict): Timing of the shared feature extraction.
+        db_path (str): Path to the SQLite database.
+        max_concurrent (int): Maximum number of searches running at the same time.
+
+    Raises:
+        subprocess.CalledProcessError: If any search fails (once all of them have finished).
+    """
+    semaphore = asyncio.Semaphore(max_concurrent)
+
+    async def run_and_store(command_str, algorithm, search_type):
+        search_workspace = os.path.join(workspace, f"{algorithm}_{search_type}")
+        os.makedirs(search_workspace, exist_ok=True)
+        await run_search(
+            command_str.split() + [query_input, search_workspace], semaphore
+        )
+        process_search_results(
+            query_id,
+            algorithm,
+            search_type,
+            os.path.join(search_workspace, "score_and_timing_results.json"),
+            shared_times,
+            db_path,
+        )
+
+    results = await asyncio.gather(
+        *(run_and_store(*command) for command in commands), return_exceptions=True
+    )
+    for result in results:
+        if isinstance(result, Exception):
+            raise result
+
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(
         description="Launch query and store results in database."
@@ -311,8 +575,34 @@ if __name__ == "__main__":
     parser.add_argument(
         "-db", "--db_path", required=True, help="Path to the SQLite database."
     )
+    parser.add_argument(
+        "-tb",
+        "--transcription_backend",
+        choices=["tf", "onnx", "tflite", "yin"],
+        help="Backend used to transcribe WAV queries ('yin' for monophonic queries).",
+    )
+    parser.add_argument(
+        "-j",
+        "--max_concurrent_searches",
+        type=int,
+        default=1,
+        help="Maximum number of searches running at the same time (default: %(default)s, "
+        "sequential; per-search timings of concurrent searches are not comparable).",
+    )
+    parser.add_argument(
+        "--from_midi",
+        action="store_true",
+        help="Compute the intervals directly from MIDI instead of with Humdrum.",
+    )
     args = parser.parse_args()
 
+    # Propagate the transcription backend and the interval source to the feature extraction
+    # of every search
+    if args.transcription_backend:
+        os.environ["FUGA_ID_TRANSCRIPTION_BACKEND"] = args.transcription_backend
+    if args.from_midi:
+        os.environ["FUGA_ID_INTERVALS_FROM_MIDI"] = "1"
+
     # Validate inputs
     if not os.path.isfile(args.audio):
         print(f"Error: File {args.audio} does not exist.")
@@ -323,9 +613,6 @@ if __name__ == "__main__":
 
     # Define paths from script directory
     script_dir = os.path.dirname(os.path.abspath(__file__))
-    results_dir = os.path.join(script_dir, "../data/results")
-    os.makedirs(results_dir, exist_ok=True)
-    json_path = os.path.join(results_dir, "score_and_timing_results.json")
     approximate_alignment_executable = os.path.join(
         script_dir, "../bin/approximate_alignment"
     )
@@ -345,36 +632,65 @@ if __name__ == "__main__":
         (blast_executable + " -r", "BLAST", "rhythmic"),
     ]
 
-    # Process commands
-    for command_str, algorithm, search_type in commands:
-        command = command_str.split() + [args.audio]
-        subprocess.run(command, check=True)
+    # Create the query workspace, where the searches write their temporary and result files
+    tmp_dir = tempfile.TemporaryDirectory(
+        prefix="fuga_id_query_", dir=get_workspace_root()
+    )
 
-        times, query_sequence, processed_scores = process_json_results(
-            json_path, args.db_path
+    # Pre-condition WAV queries and skip those without musical content
+    query_audio = args.audio
+    if args.audio.lower().endswith(".wav"):
+        query_audio = os.path.join(tmp_dir.name, os.path.basename(args.audio))
+        trimmed_duration_ms = audio_preconditioning.precondition(
+            args.audio, query_audio
         )
-
-        # Skip storing results if query_sequence is empty
-        if not query_sequence:
-            print(f"Skipping {algorithm} {search_type} due to empty query sequence.")
-            continue
-
-        store_results(
-            args.query_id,
-            algorithm,
-            search_type,
-            query_sequence,
-            times,
-            processed_scores,
-            args.db_path,
+        store_trimmed_duration(args.query_id, trimmed_duration_ms, args.db_path)
+        if not trimmed_duration_ms:
+            print(
+                f"Skipping query {args.query_id}: no musical content in {args.audio}."
+            )
+            commands = []
+
+    # Extract the features once for all the searches. If it fails, every search extracts
+    # its own features from the query audio.
+    start = time.perf_counter()
+    query_input = query_audio
+    shared_times = {"fe_user_ms": 0, "fe_system_ms": 0, "fe_clock_ms": 0}
+    if commands:
+        features_path = os.path.join(
+            tmp_dir.name, os.path.splitext(os.path.basename(args.audio))[0] + ".json"
+        )
+        try:
+            shared_times = extract_shared_features(
+                query_audio,
+                features_path,
+                args.transcription_backend or transcribe_audio.DEFAULT_BACKEND,
+                args.from_midi,
+            )
+            query_input = features_path
+        except Exception as e:
+            print(f"Shared feature extraction failed ({e}); extracting per search.")
+
+    # Run the searches, storing the results of each one as soon as it completes
+    if commands:
+        max_concurrent = max(1, min(args.max_concurrent_searches, len(commands)))
+        search_mode = "sequential" if max_concurrent == 1 else "concurrent"
+        asyncio.run(
+            run_searches(
+                commands,
+                query_input,
+                tmp_dir.name,
+                args.query_id,
+                shared_times,
+                args.db_path,
+                max_concurrent,
+            )
+        )
+        wall_time_ms = int(round((time.perf_counter() - start) * 1000))
+        store_wall_time(args.query_id, wall_time_ms, search_mode, args.db_path)
+        print(
+            f"Query {args.query_id}: {len(commands)} searches in {wall_time_ms} ms "
+            f"({search_mode}, up to {max_concurrent} at a time)."
         )
 
-        if os.path.exists(json_path):
-            os.remove(json_path)
-
-    # Remove results directory and its contents if it does not contain other directories
-    if not any(
-        os.path.isdir(os.path.join(results_dir, entry))
-        for entry in os.listdir(results_dir)
-    ):
-        shutil.rmtree(results_dir)
+    tmp_dir.cleanup()
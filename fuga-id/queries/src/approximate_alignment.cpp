@@ -46,23 +46,28 @@ OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
  *       ../shared/alignment_utils.cpp ../shared/cli_utils.cpp ../shared/data_structures.cpp
  *       ../shared/file_operations.cpp ../shared/json_operations.cpp ../shared/system_utils.cpp`
  *   - Run the executable with the following arguments:
- *     `./approximate_alignment [-c|-d|-r] query_file`
+ *     `./approximate_alignment [-c|-d|-r] query_file [workspace]`
  *
  * Command-line arguments:
  *   - `-c`, `-d`, `-r`: Specify the search type (chromatic, diatonic, or rhythm).
  *   - `query_file`: Path to the query file (WAV for chromatic/diatonic, MIDI for rhythm).
+ *   - `workspace` [optional]: Private directory for the temporary files and results of the query.
  *
  * Key functionalities:
  *   1. Command-line argument validation.
  *   2. Feature extraction from the query using external scripts.
- *   3. Dynamic programming-based approximate alignment.
- *   4. Alignment scoring and result storage in JSON format.
+ *   3. Dynamic programming-based approximate alignment, aligning identical melodic lines once,
+ *      visiting them in descending order of their score upper bound and stopping once no
+ *      remaining line can enter the Top 5, and copying the columns of repeated phrases.
+ *   4. Alignment scoring and result storage in JSON format, with the number of lines skipped.
  *
  * Dependencies:
  *   - A Linux environment supporting `/proc/self/exe` for executable path retrieval.
  *   - Bash shell for executing external scripts.
  *   - Python for running scoring scripts.
  *   - The cost map file for the search type (-c, -d, -r).
+ *   - The line bound index for the search type [optional] (without it, every line is aligned).
+ *   - The line phrase index for the search type [optional] (without it, every column is computed).
  *   - Included scripts for feature extraction and scoring.
  *   - Included alignment_utils.hpp, cli_utils.hpp, data_structures.hpp, file_operations.hpp,
  *     json_operations.hpp, and system_utils.hpp for shared functions.
@@ -81,6 +86,7 @@ OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
 #include <algorithm>
 #include <iostream>
+#include <limits>
 #include <vector>
 #include <sys/stat.h>
 #include "shared/alignment_utils.hpp"
@@ -143,29 +149,42 @@ int get_gap_penalty(const string &search_feature)
     }
 }
 
+// Structure representing an alignment result together with the index of its melodic line
+struct RankedAlignment
+{
+    AlignmentResult result; // Alignment result
+    size_t line_index;      // Index of the melodic line in the corpus
+    bool exact_origin;      // Whether the origin of the result is known (see `align_line`)
+};
+
 /**
  * @brief Updates the top alignments vector with a new alignment result.
  *
  * This function inserts a new alignment result into the top alignments vector while maintaining
  * the descending order of alignment scores. If the vector exceeds the maximum size of 5, the
- * lowest score is removed.
+ * lowest score is removed. Ties are resolved in favour of later melodic lines, which gives the
+ * Top 5 of visiting the lines in corpus order whatever the order they are visited in.
  *
  * @param top_alignments Reference to the vector of top alignment results.
- * @param result The new alignment result to be inserted.
+ * @param ranked The new alignment result to be inserted, with its melodic line index.
  */
-void update_top_alignments(vector<AlignmentResult> &top_alignments, const AlignmentResult &result)
+void update_top_alignments(vector<RankedAlignment> &top_alignments, const RankedAlignment &ranked)
 {
-    // Find insertion point maintaining descending score order
-    auto it = lower_bound(top_alignments.begin(), top_alignments.end(), result,
-                          [](const AlignmentResult &a, const AlignmentResult &b)
+    // Find insertion point maintaining descending score order (and descending line index)
+    auto it = lower_bound(top_alignments.begin(), top_alignments.end(), ranked,
+                          [](const RankedAlignment &a, const RankedAlignment &b)
                           {
-                              return a.alignment_score > b.alignment_score;
+                              if (a.result.alignment_score != b.result.alignment_score)
+                              {
+                                  return a.result.alignment_score > b.result.alignment_score;
+                              }
+                              return a.line_index > b.line_index;
                           });
 
     // Insert if we have space or if better than lowest score
     if (top_alignments.size() < 5 || it != top_alignments.end())
     {
-        top_alignments.insert(it, result);
+        top_alignments.insert(it, ranked);
         if (top_alignments.size() > 5)
         {
             top_alignments.pop_back();
@@ -174,108 +193,461 @@ void update_top_alignments(vector<AlignmentResult> &top_alignments, const Alignm
 }
 
 /**
- * @brief Computes the approximate alignment score between a given text and a query string.
+ * @brief Checks that a bound index describes the melodic lines loaded.
  *
- * This function calculates the alignment score between a reference text and a query string
- * using dynamic programming. The algorithm uses a scoring scheme based on matching and mismatching
- * characters to determine the best alignment position. The function returns the Top 5 best aligned
- * musical sheets.
+ * Every melodic line must belong to the fan-out list of exactly one unique line with its
+ * length, so an index built for another version of the corpus is not used.
+ *
+ * @param bounds Bound index of the melodic lines.
+ * @param scores Vector of feature values for each score
+ *
+ * @return bool `true` if the index can be used for the melodic lines.
+ */
+bool check_line_bounds(const LineBounds &bounds, const vector<string> &scores)
+{
+    if (bounds.fanout.size() != scores.size() || bounds.fanout_offsets.size() != bounds.lengths.size() + 1 ||
+        bounds.offsets.size() != bounds.lengths.size() + 1 || bounds.fanout_offsets.back() != scores.size())
+    {
+        return false;
+    }
+    vector<bool> seen(scores.size(), false);
+    for (size_t unique_line = 0; unique_line < bounds.lengths.size(); ++unique_line)
+    {
+        for (uint64_t member = bounds.fanout_offsets[unique_line]; member < bounds.fanout_offsets[unique_line + 1]; ++member)
+        {
+            uint32_t line = bounds.fanout[member];
+            if (line >= scores.size() || seen[line] || scores[line].length() != bounds.lengths[unique_line])
+            {
+                return false;
+            }
+            seen[line] = true;
+        }
+    }
+    return true;
+}
+
+/**
+ * @brief Builds a bound index without bounds, where every melodic line is its own unique line.
  *
+ * @param num_lines Number of melodic lines.
+ *
+ * @return LineBounds Index with the fan-out of every melodic line and no lengths or histograms.
+ */
+LineBounds unbounded_line_bounds(size_t num_lines)
+{
+    LineBounds bounds;
+    for (size_t line = 0; line <= num_lines; ++line)
+    {
+        bounds.fanout_offsets.push_back(line);
+    }
+    for (size_t line = 0; line < num_lines; ++line)
+    {
+        bounds.fanout.push_back(line);
+    }
+    return bounds;
+}
+
+/**
+ * @brief Checks that a phrase index describes the unique melodic lines of a bound index.
+ *
+ * Every copy must repeat, within its line, the symbols of an earlier position, and the copies
+ * of a line must not overlap, so an index built for another version of the corpus is not used.
+ *
+ * @param phrases Phrase index of the unique melodic lines.
+ * @param bounds Bound index of the melodic lines, checked with `check_line_bounds`.
  * @param scores Vector of feature values for each score
+ *
+ * @return bool `true` if the index can be used for the unique melodic lines.
+ */
+bool check_line_phrases(const LinePhrases &phrases, const LineBounds &bounds, const vector<string> &scores)
+{
+    size_t num_copies = phrases.starts.size();
+    if (phrases.offsets.size() != bounds.fanout_offsets.size() || phrases.offsets.back() != num_copies ||
+        phrases.sources.size() != num_copies || phrases.lengths.size() != num_copies)
+    {
+        return false;
+    }
+    for (size_t unique_line = 0; unique_line + 1 < phrases.offsets.size(); ++unique_line)
+    {
+        const string &text = scores[bounds.fanout[bounds.fanout_offsets[unique_line]]];
+        size_t line_end = 0; // End of the previous copy
+        for (uint64_t copy = phrases.offsets[unique_line]; copy < phrases.offsets[unique_line + 1]; ++copy)
+        {
+            size_t start = phrases.starts[copy], source = phrases.sources[copy], length = phrases.lengths[copy];
+            if (start < line_end || source >= start || start + length > text.length() ||
+                text.compare(start, length, text, source, length) != 0)
+            {
+                return false;
+            }
+            line_end = start + length;
+        }
+    }
+    return true;
+}
+
+/**
+ * @brief Builds a phrase index without copies for a number of unique melodic lines.
+ *
+ * @param num_unique Number of unique melodic lines.
+ *
+ * @return LinePhrases Index where no line repeats its symbols.
+ */
+LinePhrases empty_line_phrases(size_t num_unique)
+{
+    LinePhrases phrases;
+    phrases.offsets.assign(num_unique + 1, 0);
+    return phrases;
+}
+
+/**
+ * @brief Computes the upper bound of the alignment score of every unique melodic line.
+ *
+ * A fitting alignment scores at most one pair per text and query position, and gaps only
+ * lower the score. Taking the non-negative part of the score of every pair, the score of a
+ * line is bounded by the minimum of:
+ *   - min(line length, query length) times the best score of a pair.
+ *   - The matches the line and the query can pair for every symbol (the minimum of both
+ *     counts) times the score of that match, plus min(line length, query length) times the
+ *     best score of two different symbols (0 with the cost maps of the setup).
+ * Lengths and symbol histograms come from the bound index built at setup time. Without them
+ * (see `unbounded_line_bounds`), every bound is the maximum value, so no line is skipped.
+ *
+ * @param bounds Bound index of the melodic lines.
  * @param query The query sequence to search for
  * @param cost_map Map containing match scores and mismatch penalties for character pairs
- * @param score_ids Vector of musical sheet IDs
  * @param gap_penalty Gap penalty value for the alignment computation
  *
- * @return vector<AlignmentResult> Vector of the top 5 alignment results with the highest scores.
+ * @return vector<long> Upper bound of the score of every unique melodic line.
  */
-vector<AlignmentResult> approximate_alignment(
-    const vector<string> &scores,
+vector<long> compute_upper_bounds(
+    const LineBounds &bounds,
     const string &query,
     const unordered_map<char, unordered_map<char, float>> &cost_map,
-    const vector<string> &score_ids,
     const int gap_penalty)
 {
-    vector<AlignmentResult> top_alignments;
-    size_t query_length = query.length();
-    vector<Cell> column(query_length + 1);
+    size_t num_unique = bounds.fanout_offsets.size() - 1;
+    if (bounds.lengths.size() != num_unique)
+    {
+        return vector<long>(num_unique, numeric_limits<long>::max());
+    }
 
-    for (size_t score_index = 0; score_index < scores.size(); ++score_index)
+    // Best scores of a match of every symbol and of two different symbols, truncated as in the
+    // alignment (pairs missing from the cost map score the gap penalty)
+    long missing_score = max(gap_penalty, 0);
+    vector<long> match_scores(256, missing_score);
+    long mismatch_score = missing_score;
+    for (const auto &[text_char, inner_map] : cost_map)
     {
-        const string &score_text = scores[score_index];
-        const string &current_score_id = score_ids[score_index];
-        size_t score_length = score_text.length();
+        for (const auto &[query_char, value] : inner_map)
+        {
+            long score = max(static_cast<int>(value), 0);
+            if (text_char == query_char)
+            {
+                match_scores[static_cast<unsigned char>(text_char)] = score;
+            }
+            else
+            {
+                mismatch_score = max(mismatch_score, score);
+            }
+        }
+    }
+    long best_score = max(mismatch_score, *max_element(match_scores.begin(), match_scores.end()));
 
-        float current_max_score = 0;
-        pair<size_t, size_t> current_max_position = {0, 0};
-        pair<size_t, size_t> current_max_origin = {0, 0};
+    vector<long> query_counts(256, 0);
+    for (char query_char : query)
+    {
+        ++query_counts[static_cast<unsigned char>(query_char)];
+    }
 
-        // Initialize column of the dynamic programming matrix
-        column[0] = {0, 0, 0};
-        for (size_t j = 1; j <= query_length; ++j)
+    vector<long> upper_bounds(num_unique);
+    for (size_t unique_line = 0; unique_line < num_unique; ++unique_line)
+    {
+        long overlap = 0;
+        for (uint64_t entry = bounds.offsets[unique_line]; entry < bounds.offsets[unique_line + 1]; ++entry)
         {
-            column[j] = {-static_cast<float>(j), 0, j - 1};
+            uint8_t symbol = bounds.symbols[entry];
+            overlap += min(static_cast<long>(bounds.counts[entry]), query_counts[symbol]) * match_scores[symbol];
         }
+        long pairs = min(static_cast<long>(bounds.lengths[unique_line]), static_cast<long>(query.length()));
+        upper_bounds[unique_line] = min(overlap + pairs * mismatch_score, pairs * best_score);
+    }
+    return upper_bounds;
+}
 
-        // Compute the distance matrix using dynamic programming
-        for (size_t i = 1; i <= score_length; ++i)
-        {
-            Cell prev_diagonal = column[0];
-            column[0].score = 0;
-            column[0].text_origin_pos = i - 1;
+/**
+ * @brief Computes the fitting alignment of the query against a melodic line.
+ *
+ * Every column of the dynamic programming matrix only depends on the column before it and on
+ * the text symbol. Inside a copy of earlier symbols of the line (see `LinePhrases`), once the
+ * column equals the column at the same offset of the source, the remaining columns of the
+ * copy equal those of the source too, so their scores are taken from `history` instead of
+ * being computed. Their cells cannot improve the best cell, which has already seen the same
+ * scores earlier in the line, so the best score and its end position are the same as
+ * computing every column. The origins of the cells reached through copied columns are not
+ * kept: if the best cell comes after the first copied column, `exact_origin` is cleared and
+ * the line must be aligned again without copies to know its origin.
+ *
+ * @param score_text Feature values of the melodic line
+ * @param query The query sequence to search for
+ * @param cost_map Map containing match scores and mismatch penalties for character pairs
+ * @param gap_penalty Gap penalty value for the alignment computation
+ * @param phrases Phrase index of the unique melodic lines
+ * @param first_copy First copy of the line in the phrase index
+ * @param last_copy End of the copies of the line in the phrase index (equal to `first_copy`
+ *                  to compute every column)
+ * @param column Column of the dynamic programming matrix (query length + 1 cells)
+ * @param history Buffer for the scores of the columns computed, kept if the line has copies
+ * @param row_of Buffer for the position in `history` of the column of every text position
+ * @param exact_origin Reference set to whether the origin of the result is known
+ * @param search_stats Reference to the counts of columns computed and copied
+ *
+ * @return AlignmentResult Best score of the line with its origin and end positions, without
+ *         melodic line ID.
+ */
+AlignmentResult align_line(
+    const string &score_text,
+    const string &query,
+    const unordered_map<char, unordered_map<char, float>> &cost_map,
+    const int gap_penalty,
+    const LinePhrases &phrases,
+    uint64_t first_copy,
+    uint64_t last_copy,
+    vector<Cell> &column,
+    vector<float> &history,
+    vector<size_t> &row_of,
+    bool &exact_origin,
+    SearchStats &search_stats)
+{
+    size_t query_length = query.length();
+    size_t score_length = score_text.length();
+    bool keep_history = first_copy < last_copy;
+    size_t first_copied_row = score_length + 1; // First text position whose column was copied (1-based)
 
-            for (size_t j = 1; j <= query_length; ++j)
-            {
-                Cell temp = column[j];
-                int align_score = get_alignment_score(score_text[i - 1], query[j - 1], cost_map, gap_penalty);
+    float current_max_score = 0;
+    pair<size_t, size_t> current_max_position = {0, 0};
+    pair<size_t, size_t> current_max_origin = {0, 0};
 
-                int diagonal_score = prev_diagonal.score + align_score;
-                int insertion_score = column[j - 1].score + gap_penalty;
-                int deletion_score = column[j].score + gap_penalty;
+    // Initialize column of the dynamic programming matrix
+    column[0] = {0, 0, 0};
+    for (size_t j = 1; j <= query_length; ++j)
+    {
+        column[j] = {-static_cast<float>(j), 0, j - 1};
+    }
 
-                if (diagonal_score >= insertion_score && diagonal_score >= deletion_score)
-                {
-                    column[j].score = diagonal_score;
-                    column[j].text_origin_pos = prev_diagonal.text_origin_pos;
-                    column[j].query_origin_pos = prev_diagonal.query_origin_pos;
-                }
-                else if (insertion_score >= diagonal_score && insertion_score >= deletion_score)
+    if (keep_history)
+    {
+        history.clear();
+        row_of.assign(score_length + 1, 0);
+        for (size_t j = 0; j <= query_length; ++j)
+        {
+            history.push_back(column[j].score);
+        }
+    }
+
+    // Compute the distance matrix using dynamic programming
+    uint64_t copy = first_copy;
+    for (size_t i = 1; i <= score_length; ++i)
+    {
+        // Inside a copy, take the remaining columns from the source once they match
+        while (copy < last_copy && i - 1 >= phrases.starts[copy] + phrases.lengths[copy])
+        {
+            ++copy;
+        }
+        if (copy < last_copy && i - 1 >= phrases.starts[copy])
+        {
+            size_t copy_start = phrases.starts[copy], copy_end = copy_start + phrases.lengths[copy];
+            const float *source_column = &history[row_of[phrases.sources[copy] + i - 1 - copy_start] *
+                                                  (query_length + 1)];
+            bool same_column = true;
+            for (size_t j = 0; same_column && j <= query_length; ++j)
+            {
+                same_column = column[j].score == source_column[j];
+            }
+            if (same_column)
+            {
+                first_copied_row = min(first_copied_row, i);
+                search_stats.copied_rows += copy_end + 1 - i;
+                for (; i <= copy_end; ++i)
                 {
-                    column[j].score = insertion_score;
-                    column[j].text_origin_pos = column[j - 1].text_origin_pos;
-                    column[j].query_origin_pos = column[j - 1].query_origin_pos;
+                    row_of[i] = row_of[phrases.sources[copy] + i - copy_start];
                 }
-                else
+                i = copy_end;
+                const float *last_column = &history[row_of[copy_end] * (query_length + 1)];
+                for (size_t j = 0; j <= query_length; ++j)
                 {
-                    column[j].score = deletion_score;
-                    column[j].text_origin_pos = column[j].text_origin_pos;
-                    column[j].query_origin_pos = column[j].query_origin_pos;
+                    column[j].score = last_column[j];
                 }
+                continue;
+            }
+        }
+        ++search_stats.aligned_rows;
 
-                prev_diagonal = temp;
+        Cell prev_diagonal = column[0];
+        column[0].score = 0;
+        column[0].text_origin_pos = i - 1;
 
-                if (column[j].score > current_max_score)
-                {
-                    current_max_score = column[j].score;
-                    current_max_position = {i - 1, j - 1};
-                    current_max_origin = {column[j].text_origin_pos, column[j].query_origin_pos};
-                }
+        for (size_t j = 1; j <= query_length; ++j)
+        {
+            Cell temp = column[j];
+            int align_score = get_alignment_score(score_text[i - 1], query[j - 1], cost_map, gap_penalty);
+
+            int diagonal_score = prev_diagonal.score + align_score;
+            int insertion_score = column[j - 1].score + gap_penalty;
+            int deletion_score = column[j].score + gap_penalty;
+
+            if (diagonal_score >= insertion_score && diagonal_score >= deletion_score)
+            {
+                column[j].score = diagonal_score;
+                column[j].text_origin_pos = prev_diagonal.text_origin_pos;
+                column[j].query_origin_pos = prev_diagonal.query_origin_pos;
+            }
+            else if (insertion_score >= diagonal_score && insertion_score >= deletion_score)
+            {
+                column[j].score = insertion_score;
+                column[j].text_origin_pos = column[j - 1].text_origin_pos;
+                column[j].query_origin_pos = column[j - 1].query_origin_pos;
+            }
+            else
+            {
+                column[j].score = deletion_score;
+                column[j].text_origin_pos = column[j].text_origin_pos;
+                column[j].query_origin_pos = column[j].query_origin_pos;
+            }
+
+            prev_diagonal = temp;
+
+            if (column[j].score > current_max_score)
+            {
+                current_max_score = column[j].score;
+                current_max_position = {i - 1, j - 1};
+                current_max_origin = {column[j].text_origin_pos, column[j].query_origin_pos};
             }
         }
 
-        // Add last score's alignment if good enough
-        if (current_max_score > 0)
+        if (keep_history)
         {
-            AlignmentResult result{
-                current_max_score,
-                current_max_origin,
-                current_max_position,
-                current_score_id};
-            update_top_alignments(top_alignments, result);
+            row_of[i] = history.size() / (query_length + 1);
+            for (size_t j = 0; j <= query_length; ++j)
+            {
+                history.push_back(column[j].score);
+            }
         }
     }
 
-    return top_alignments;
+    exact_origin = current_max_position.first + 1 < first_copied_row;
+    return AlignmentResult{current_max_score, current_max_origin, current_max_position, ""};
+}
+
+/**
+ * @brief Computes the approximate alignment score between a given text and a query string.
+ *
+ * This function calculates the alignment score between a reference text and a query string
+ * using dynamic programming. The algorithm uses a scoring scheme based on matching and mismatching
+ * characters to determine the best alignment position. The function returns the Top 5 best aligned
+ * musical sheets.
+ *
+ * Identical melodic lines are aligned once: every unique line of the bound index is aligned
+ * and its result is given to all the melodic lines of its fan-out list. The unique lines are
+ * visited in descending order of the upper bound of their score (see `compute_upper_bounds`),
+ * and the search stops as soon as the bound of the next line falls below the fifth best
+ * score found, since no remaining line can then enter the Top 5. Lines whose bound is not
+ * positive are never aligned either, as only positive scores are kept. Inside the repeats of
+ * a line, columns are copied instead of computed when possible (see `align_line`), and the
+ * lines of the Top 5 whose origin is then unknown are aligned again. The results are the
+ * same as aligning every melodic line.
+ *
+ * @param scores Vector of feature values for each score
+ * @param query The query sequence to search for
+ * @param cost_map Map containing match scores and mismatch penalties for character pairs
+ * @param score_ids Vector of musical sheet IDs
+ * @param gap_penalty Gap penalty value for the alignment computation
+ * @param bounds Bound index of the melodic lines, checked with `check_line_bounds` (see
+ *               `unbounded_line_bounds` to align every line)
+ * @param phrases Phrase index of the unique melodic lines, checked with `check_line_phrases`
+ *                (see `empty_line_phrases` to compute every column)
+ * @param search_stats Reference to the counts of melodic lines aligned and skipped
+ *
+ * @return vector<AlignmentResult> Vector of the top 5 alignment results with the highest scores.
+ */
+vector<AlignmentResult> approximate_alignment(
+    const vector<string> &scores,
+    const string &query,
+    const unordered_map<char, unordered_map<char, float>> &cost_map,
+    const vector<string> &score_ids,
+    const int gap_penalty,
+    const LineBounds &bounds,
+    const LinePhrases &phrases,
+    SearchStats &search_stats)
+{
+    vector<RankedAlignment> top_alignments;
+    vector<Cell> column(query.length() + 1);
+    vector<float> history;
+    vector<size_t> row_of;
+
+    // Visit the unique melodic lines in descending bound order
+    vector<long> upper_bounds = compute_upper_bounds(bounds, query, cost_map, gap_penalty);
+    vector<size_t> line_order(upper_bounds.size());
+    for (size_t unique_line = 0; unique_line < upper_bounds.size(); ++unique_line)
+    {
+        line_order[unique_line] = unique_line;
+    }
+    stable_sort(line_order.begin(), line_order.end(),
+                [&upper_bounds](size_t a, size_t b)
+                {
+                    return upper_bounds[a] > upper_bounds[b];
+                });
+
+    search_stats = SearchStats();
+    search_stats.total_lines = scores.size();
+    search_stats.unique_lines = upper_bounds.size();
+    for (size_t unique_line : line_order)
+    {
+        // Stop once no remaining line can score above 0 or enter the Top 5
+        long upper_bound = upper_bounds[unique_line];
+        if (upper_bound <= 0 ||
+            (top_alignments.size() == 5 && upper_bound < top_alignments.back().result.alignment_score))
+        {
+            break;
+        }
+        ++search_stats.aligned_lines;
+
+        // Align the first melodic line of the fan-out list, identical to the others
+        bool exact_origin;
+        AlignmentResult result = align_line(
+            scores[bounds.fanout[bounds.fanout_offsets[unique_line]]], query, cost_map, gap_penalty,
+            phrases, phrases.offsets[unique_line], phrases.offsets[unique_line + 1], column, history, row_of,
+            exact_origin, search_stats);
+
+        // Add last score's alignment to every melodic line of the fan-out list if good enough
+        for (uint64_t member = bounds.fanout_offsets[unique_line];
+             result.alignment_score > 0 && member < bounds.fanout_offsets[unique_line + 1]; ++member)
+        {
+            size_t score_index = bounds.fanout[member];
+            result.retrieved_score_id = score_ids[score_index];
+            update_top_alignments(top_alignments, {result, score_index, exact_origin});
+        }
+    }
+    search_stats.skipped_lines = search_stats.unique_lines - search_stats.aligned_lines;
+
+    // Align again without copies the lines whose origin went through copied columns
+    for (RankedAlignment &ranked : top_alignments)
+    {
+        if (!ranked.exact_origin)
+        {
+            SearchStats realign_stats;
+            AlignmentResult exact_result = align_line(
+                scores[ranked.line_index], query, cost_map, gap_penalty, phrases, 0, 0, column, history, row_of,
+                ranked.exact_origin, realign_stats);
+            ranked.result.origin_position = exact_result.origin_position;
+        }
+    }
+
+    vector<AlignmentResult> results;
+    for (const RankedAlignment &ranked : top_alignments)
+    {
+        results.push_back(ranked.result);
+    }
+    return results;
 }
 
 /**
@@ -300,45 +672,31 @@ vector<AlignmentResult> approximate_alignment(
  */
 int main(int argc, char **argv)
 {
-    string search_feature, query_file, query;
-    if (!validate_args(argc, argv, search_feature, query_file, "approximate"))
+    string search_feature, query_file, workspace, query;
+    if (!validate_args(argc, argv, search_feature, query_file, workspace, "approximate"))
     {
         return 1;
     }
 
     string base_dir = get_executable_directory();
+    // Temporary files and results go to the query workspace when one is given, so that several
+    // queries can run concurrently without sharing the default directories.
+    string tmp_dir = workspace.empty() ? base_dir + "/../tmp" : workspace + "/tmp";
+    string results_dir = workspace.empty() ? base_dir + "/../data/results" : workspace;
     string query_sf_file;
-    string text = load_file(get_search_files(base_dir, search_feature, query_sf_file, "approximate"));
+    string text = load_file(get_search_files(base_dir, tmp_dir, search_feature, query_sf_file, "approximate"));
     string ids = load_file(base_dir + "/../../scores/indexes/approximate_alignment/melodic_line_ids.txt");
 
     // Split text and ids into vectors
-    vector<string> scores;
-    vector<string> score_ids;
-    size_t pos = 0;
-    string token;
-    while ((pos = text.find('\n')) != string::npos)
-    {
-        token = text.substr(0, pos);
-        scores.push_back(token);
-        text.erase(0, pos + 1);
-    }
-    scores.push_back(text); // Add the last score
-
-    pos = 0;
-    while ((pos = ids.find('\n')) != string::npos)
-    {
-        token = ids.substr(0, pos);
-        score_ids.push_back(token);
-        ids.erase(0, pos + 1);
-    }
-    score_ids.push_back(ids); // Add the last id
+    vector<string> scores = split_lines(text);
+    vector<string> score_ids = split_lines(ids);
 
     // Define the shell commands for extracting query features and cleaning temporary files.
     string extract_query_features = base_dir + "/../src/extract_query_feature.sh";
     string clean_tmp = base_dir + "/../utils/clean_tmp.sh";
     string features_command = "bash " + extract_query_features + " " + search_feature + " " +
-                              query_file + " -m approximate";
-    string clean_command = "bash " + clean_tmp;
+                              query_file + " -m approximate -w " + tmp_dir;
+    string clean_command = "bash " + clean_tmp + " " + tmp_dir;
 
     // Measure the time taken to extract features from the query.
     double extract_feature_user_time, extract_feature_system_time;
@@ -358,20 +716,40 @@ int main(int argc, char **argv)
     unordered_map<char, unordered_map<char, float>> cost_map = load_cost_map(cost_map_file);
     int gap_penalty = get_gap_penalty(search_feature);
 
+    // Unique melodic lines and their upper bounds, to align identical lines once and stop the
+    // search early (every line is aligned without a valid index)
+    LineBounds bounds;
+    if (!load_line_bounds(get_line_bounds_file(base_dir, search_feature), bounds) ||
+        !check_line_bounds(bounds, scores))
+    {
+        bounds = unbounded_line_bounds(scores.size());
+    }
+
+    // Repeated phrases of the unique melodic lines, to copy their columns (every column is
+    // computed without a valid index)
+    LinePhrases phrases;
+    if (!load_line_phrases(get_line_phrases_file(base_dir, search_feature), phrases) ||
+        !check_line_phrases(phrases, bounds, scores))
+    {
+        phrases = empty_line_phrases(bounds.fanout_offsets.size() - 1);
+    }
+
     // Measure the time taken for approximate alignment between the query and text.
     double align_user_time, align_system_time;
     long align_clock_time;
     vector<AlignmentResult> top_alignments;
+    SearchStats search_stats;
     measure_time_and_cpu([&]()
-                         { top_alignments = approximate_alignment(scores, query, cost_map, score_ids, gap_penalty); },
+                         { top_alignments = approximate_alignment(scores, query, cost_map, score_ids, gap_penalty,
+                                                                  bounds, phrases, search_stats); },
                          true, align_user_time, align_system_time, align_clock_time, false);
 
     // Save the timing results and retrieved score into a JSON file.
-    string results_dir = base_dir + "/../data/results";
     mkdir(results_dir.c_str(), 0755);
     save_result_and_timing_to_json(
         top_alignments, query, extract_feature_user_time, extract_feature_system_time, extract_feature_clock_time,
-        align_user_time, align_system_time, align_clock_time, results_dir + "/score_and_timing_results.json");
+        align_user_time, align_system_time, align_clock_time, results_dir + "/score_and_timing_results.json",
+        &search_stats);
 
     // Clean up temporary files.
     system(clean_command.c_str());
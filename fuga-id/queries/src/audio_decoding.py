@@ -0,0 +1,137 @@
+"""
+BSD 2-Clause License
+
+Copyright (c) 2024, Hilda Romero-Velo
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+
+* Redistributions of source code must retain the above copyright notice, this
+  list of conditions and the following disclaimer.
+
+* Redistributions in binary form must reproduce the above copyright notice, this
+  list of conditions and the following disclaimer in the documentation
+  and/or other materials provided with the distribution.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+
+"""
+This module decodes PCM WAV files into NumPy arrays using only the standard library `wave`
+module, so that lightweight analyses (e.g. the monophonic transcription backend) do not
+need to import an audio framework. It also resamples signals and writes them back as
+16-bit PCM WAV files.
+"""
+
+import math
+import wave
+
+import numpy as np
+
+
+def load_wav(audio_path):
+    """
+    Decodes a PCM WAV file into a mono float signal in the range [-1, 1].
+
+    Args:
+        audio_path (str): Path to the WAV file.
+
+    Returns:
+        tuple: (signal as numpy.ndarray of float32, sample rate)
+
+    Raises:
+        ValueError: If the sample width is not supported.
+    """
+    with wave.open(audio_path, "rb") as wav_file:
+        n_channels = wav_file.getnchannels()
+        sample_width = wav_file.getsampwidth()
+        sample_rate = wav_file.getframerate()
+        frames = wav_file.readframes(wav_file.getnframes())
+
+    if sample_width == 1:
+        signal = (np.frombuffer(frames, dtype=np.uint8).astype(np.float32) - 128) / 128
+    elif sample_width == 2:
+        signal = np.frombuffer(frames, dtype="<i2").astype(np.float32) / 32768
+    elif sample_width == 3:
+        raw = np.frombuffer(frames, dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+        values = raw[:, 0] | (raw[:, 1] << 8) | (raw[:, 2] << 16)
+        values = np.where(values >= 1 << 23, values - (1 << 24), values)
+        signal = values.astype(np.float32) / (1 << 23)
+    elif sample_width == 4:
+        signal = np.frombuffer(frames, dtype="<i4").astype(np.float32) / (1 << 31)
+    else:
+        raise ValueError(f"Unsupported WAV sample width: {sample_width} bytes.")
+
+    if n_channels > 1:
+        signal = signal.reshape(-1, n_channels).mean(axis=1)
+    return signal, sample_rate
+
+
+def downsample(signal, sample_rate, max_sample_rate):
+    """
+    Reduces the sample rate of a signal by an integer factor, averaging consecutive samples
+    as a simple low-pass filter, so that it does not exceed a maximum sample rate.
+
+    Args:
+        signal (numpy.ndarray): Mono signal.
+        sample_rate (int): Sample rate of the signal.
+        max_sample_rate (int): Maximum sample rate of the result.
+
+    Returns:
+        tuple: (downsampled signal, new sample rate)
+    """
+    factor = int(np.ceil(sample_rate / max_sample_rate))
+    if factor <= 1:
+        return signal, sample_rate
+    n_samples = len(signal) // factor * factor
+    return signal[:n_samples].reshape(-1, factor).mean(axis=1), sample_rate / factor
+
+
+def resample(signal, sample_rate, target_sample_rate):
+    """
+    Resamples a signal with a polyphase anti-aliasing filter.
+
+    Args:
+        signal (numpy.ndarray): Mono signal.
+        sample_rate (int): Sample rate of the signal.
+        target_sample_rate (int): Sample rate of the result.
+
+    Returns:
+        numpy.ndarray: Resampled signal (float32).
+    """
+    if sample_rate == target_sample_rate:
+        return signal.astype(np.float32)
+    from scipy.signal import resample_poly
+
+    divisor = math.gcd(int(sample_rate), int(target_sample_rate))
+    resampled = resample_poly(
+        signal, int(target_sample_rate) // divisor, int(sample_rate) // divisor
+    )
+    return resampled.astype(np.float32)
+
+
+def save_wav(audio_path, signal, sample_rate):
+    """
+    Writes a mono signal in the range [-1, 1] as a 16-bit PCM WAV file.
+
+    Args:
+        audio_path (str): Path of the WAV file.
+        signal (numpy.ndarray): Mono signal.
+        sample_rate (int): Sample rate of the signal.
+    """
+    samples = np.round(np.clip(signal, -1, 32767 / 32768) * 32768).astype("<i2")
+    with wave.open(audio_path, "wb") as wav_file:
+        wav_file.setnchannels(1)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(int(sample_rate))
+        wav_file.writeframes(samples.tobytes())
@@ -0,0 +1,148 @@
+"""
+BSD 2-Clause License
+
+Copyright (c) 2024, Hilda Romero-Velo
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+
+* Redistributions of source code must retain the above copyright notice, this
+  list of conditions and the following disclaimer.
+
+* Redistributions in binary form must reproduce the above copyright notice, this
+  list of conditions and the following disclaimer in the documentation
+  and/or other materials provided with the distribution.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+
+"""
+This module implements the pre-conditioning stage applied to WAV queries before they are
+transcribed and searched:
+
+    1. The audio is decoded once and downmixed to mono at the transcription model sample
+       rate (22050 Hz, as used by basic-pitch).
+    2. Leading and trailing silence is trimmed with an energy-based activity detector: a
+       frame is active if its RMS level is above an absolute floor and not too far below
+       the loudest frame of the query. A short margin is kept around the active region.
+    3. Queries without enough active audio are rejected, so that no transcription or
+       search is run for them.
+
+Trimming works on a fixed frame grid, so pre-conditioning an already pre-conditioned file
+gives the same result.
+
+Example usage:
+    python3 audio_preconditioning.py path/to/query.wav -o path/to/preconditioned.wav
+"""
+
+import argparse
+import json
+import os
+import sys
+
+import numpy as np
+
+import audio_decoding
+
+MODEL_SAMPLE_RATE = 22050  # Sample rate of the transcription model (Hz)
+FRAME_LENGTH = 1024  # Activity detection frame length (samples)
+ABSOLUTE_FLOOR_DB = -50.0  # Frames below this level (dBFS) are silent
+RELATIVE_FLOOR_DB = -35.0  # Frames this far below the loudest frame are silent
+MARGIN_FRAMES = 4  # Frames kept before and after the active region (~190 ms)
+MIN_ACTIVE_MS = 250  # Queries with less active audio are rejected
+
+
+def detect_activity(signal):
+    """
+    Finds the active (non-silent) frames of a signal.
+
+    Args:
+        signal (numpy.ndarray): Mono signal at the model sample rate.
+
+    Returns:
+        numpy.ndarray: Boolean activity of each frame of FRAME_LENGTH samples.
+    """
+    n_frames = int(np.ceil(len(signal) / FRAME_LENGTH))
+    if n_frames == 0:
+        return np.zeros(0, dtype=bool)
+    padded = np.zeros(n_frames * FRAME_LENGTH, dtype=np.float64)
+    padded[: len(signal)] = signal
+    rms = np.sqrt(np.mean(padded.reshape(n_frames, FRAME_LENGTH) ** 2, axis=1))
+    rms_db = 20 * np.log10(np.maximum(rms, 1e-10))
+    return rms_db > max(ABSOLUTE_FLOOR_DB, rms_db.max() + RELATIVE_FLOOR_DB)
+
+
+def trim_silence(signal):
+    """
+    Trims the leading and trailing silence of a signal.
+
+    Args:
+        signal (numpy.ndarray): Mono signal at the model sample rate.
+
+    Returns:
+        numpy.ndarray: Trimmed signal, or None if it has no musical content.
+    """
+    active = detect_activity(signal)
+    active_ms = active.sum() * FRAME_LENGTH * 1000 / MODEL_SAMPLE_RATE
+    if active_ms < MIN_ACTIVE_MS:
+        return None
+    active_frames = np.flatnonzero(active)
+    first = max(0, active_frames[0] - MARGIN_FRAMES)
+    last = min(len(active), active_frames[-1] + 1 + MARGIN_FRAMES)
+    return signal[first * FRAME_LENGTH : last * FRAME_LENGTH]
+
+
+def precondition(audio_path, output_path):
+    """
+    Decodes a WAV query to mono at the model sample rate, trims its silence and writes the
+    result, unless the query has no musical content.
+
+    Args:
+        audio_path (str): Path to the WAV query.
+        output_path (str): Path of the pre-conditioned WAV file (may be the input path).
+
+    Returns:
+        int: Duration of the trimmed query in milliseconds, or 0 if the query was rejected
+             (in which case no file is written).
+    """
+    signal, sample_rate = audio_decoding.load_wav(audio_path)
+    signal = audio_decoding.resample(signal, sample_rate, MODEL_SAMPLE_RATE)
+    trimmed = trim_silence(signal)
+    if trimmed is None:
+        return 0
+    audio_decoding.save_wav(output_path, trimmed, MODEL_SAMPLE_RATE)
+    return int(round(len(trimmed) * 1000 / MODEL_SAMPLE_RATE))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Decode, downmix and trim the silence of a WAV query."
+    )
+    parser.add_argument("audio", help="Path to the WAV query.")
+    parser.add_argument(
+        "-o", "--output", required=True, help="Path of the pre-conditioned WAV file."
+    )
+    args = parser.parse_args()
+
+    if not os.path.isfile(args.audio):
+        print(f"Error: File {args.audio} does not exist.", file=sys.stderr)
+        sys.exit(1)
+    trimmed_duration_ms = precondition(args.audio, args.output)
+    print(
+        json.dumps(
+            {
+                "status": "ok" if trimmed_duration_ms else "empty",
+                "trimmed_duration_ms": trimmed_duration_ms,
+            }
+        )
+    )
@@ -0,0 +1,290 @@
+"""
+BSD 2-Clause License
+
+Copyright (c) 2024, Hilda Romero-Velo
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+
+* Redistributions of source code must retain the above copyright notice, this
+  list of conditions and the following disclaimer.
+
+* Redistributions in binary form must reproduce the above copyright notice, this
+  list of conditions and the following disclaimer in the documentation
+  and/or other materials provided with the distribution.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+
+"""
+This module implements batched basic-pitch transcription. Instead of running the model once
+per audio file with batches of a single window, the audio of many inputs (files or buffers)
+is split into the model windows, padded, and predicted in shared batches. The model output
+is then split back per input and turned into one list of note events for each of them.
+
+It is used to transcribe all the fragments extracted from a recording at once and store them
+in the transcription cache (see `warm_cache`), so that the per-query feature extraction only
+finds cache hits.
+
+Example usage:
+    python3 batch_transcription.py fragment_1.wav fragment_2.wav ... [-b onnx]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+
+import numpy as np
+
+import transcribe_audio
+import transcription_cache
+import transcription_worker
+
+DEFAULT_BATCH_SIZE = 32  # Model windows predicted per batch
+N_OVERLAPPING_FRAMES = 30  # Overlap between windows used by basic-pitch
+
+
+def load_audio(source):
+    """
+    Loads an audio input as a mono signal at the basic-pitch sample rate.
+
+    Args:
+        source (str or numpy.ndarray): Path to an audio file, or a mono signal already sampled
+                                       at the basic-pitch sample rate (22050 Hz).
+
+    Returns:
+        numpy.ndarray: Mono audio signal (float32).
+    """
+    if isinstance(source, np.ndarray):
+        return source.astype(np.float32)
+    import librosa
+    from basic_pitch.constants import AUDIO_SAMPLE_RATE
+
+    audio, _ = librosa.load(str(source), sr=AUDIO_SAMPLE_RATE, mono=True)
+    return audio
+
+
+def window_audio(audio):
+    """
+    Splits an audio signal into the overlapping, zero-padded windows expected by the model,
+    exactly as basic-pitch does for a single file.
+
+    Args:
+        audio (numpy.ndarray): Mono audio signal.
+
+    Returns:
+        list: Windows of shape (AUDIO_N_SAMPLES, 1).
+    """
+    from basic_pitch.constants import AUDIO_N_SAMPLES, FFT_HOP
+    from basic_pitch.inference import window_audio_file
+
+    overlap_len = N_OVERLAPPING_FRAMES * FFT_HOP
+    hop_size = AUDIO_N_SAMPLES - overlap_len
+    padded = np.concatenate([np.zeros(overlap_len // 2, dtype=np.float32), audio])
+    return [window for window, _ in window_audio_file(padded, hop_size)]
+
+
+def predict_windows(model, windows):
+    """
+    Runs the model on a batch of windows. Runtimes whose model has a fixed batch size of one
+    (e.g. some TFLite builds) are run window by window.
+
+    Args:
+        model (basic_pitch.inference.Model): Loaded model.
+        windows (numpy.ndarray): Batch of windows of shape (batch, AUDIO_N_SAMPLES, 1).
+
+    Returns:
+        dict: Model outputs ('note', 'onset', 'contour') with one row per window.
+    """
+    try:
+        return model.predict(windows)
+    except Exception:
+        if len(windows) == 1:
+            raise
+        outputs = [model.predict(windows[i : i + 1]) for i in range(len(windows))]
+        return {k: np.concatenate([o[k] for o in outputs]) for k in outputs[0]}
+
+
+def run_batched_inference(audios, model, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Computes the basic-pitch model output of several audio signals with shared batches.
+
+    Args:
+        audios (list): Mono audio signals.
+        model (basic_pitch.inference.Model): Loaded model.
+        batch_size (int): Number of windows predicted per batch.
+
+    Returns:
+        list: Unwrapped model output (dict) of each audio signal.
+    """
+    from basic_pitch.inference import unwrap_output
+
+    windows = []
+    counts = []
+    for audio in audios:
+        audio_windows = window_audio(audio)
+        windows.extend(audio_windows)
+        counts.append(len(audio_windows))
+
+    outputs = {"note": [], "onset": [], "contour": []}
+    for start in range(0, len(windows), batch_size):
+        batch = np.stack(windows[start : start + batch_size])
+        for k, v in predict_windows(model, batch).items():
+            outputs[k].append(v)
+    outputs = {k: np.concatenate(v) for k, v in outputs.items()}
+
+    results = []
+    offsets = np.concatenate([[0], np.cumsum(counts)])
+    for idx, audio in enumerate(audios):
+        window_slice = slice(offsets[idx], offsets[idx + 1])
+        results.append(
+            {
+                k: unwrap_output(v[window_slice], len(audio), N_OVERLAPPING_FRAMES)
+                for k, v in outputs.items()
+            }
+        )
+    return results
+
+
+def transcribe_batch(inputs, model, settings, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Transcribes several audio inputs with shared model batches.
+
+    Args:
+        inputs (list): Audio file paths or mono signals at 22050 Hz.
+        model (basic_pitch.inference.Model): Loaded model.
+        settings (dict): Transcription settings (see `transcribe_audio.py`).
+        batch_size (int): Number of windows predicted per batch.
+
+    Returns:
+        list: One (pretty_midi.PrettyMIDI, note events) tuple per input, in input order.
+    """
+    from basic_pitch import note_creation
+    from basic_pitch.constants import AUDIO_SAMPLE_RATE, FFT_HOP
+
+    audios = [load_audio(source) for source in inputs]
+    min_note_len = int(
+        np.round(settings["minimum_note_length"] / 1000 * (AUDIO_SAMPLE_RATE / FFT_HOP))
+    )
+    transcriptions = []
+    for model_output in run_batched_inference(audios, model, batch_size):
+        transcriptions.append(
+            note_creation.model_output_to_notes(
+                model_output,
+                onset_thresh=settings["onset_threshold"],
+                frame_thresh=settings["frame_threshold"],
+                min_note_len=min_note_len,
+            )
+        )
+    return transcriptions
+
+
+def transcribe_files(
+    audio_paths, midi_paths, model, settings, batch_size=DEFAULT_BATCH_SIZE
+):
+    """
+    Transcribes several audio files with shared model batches and writes one MIDI file each.
+
+    Args:
+        audio_paths (list): Paths of the WAV files to transcribe.
+        midi_paths (list): Paths of the resulting MIDI files.
+        model (basic_pitch.inference.Model): Loaded model.
+        settings (dict): Transcription settings.
+        batch_size (int): Number of windows predicted per batch.
+    """
+    transcriptions = transcribe_batch(audio_paths, model, settings, batch_size)
+    for (midi_data, _), midi_path in zip(transcriptions, midi_paths):
+        midi_data.write(midi_path)
+
+
+def warm_cache(
+    audio_paths,
+    backend=transcribe_audio.DEFAULT_BACKEND,
+    batch_size=DEFAULT_BATCH_SIZE,
+):
+    """
+    Transcribes the audio files that are not cached yet in shared batches and stores them in
+    the transcription cache. The transcription worker is used if it is running; otherwise the
+    model is loaded in this process.
+
+    Args:
+        audio_paths (list): Paths of the WAV files to transcribe.
+        backend (str): Model runtime ('tf', 'onnx' or 'tflite'), or 'yin'.
+        batch_size (int): Number of windows predicted per batch.
+
+    Returns:
+        int: Number of files transcribed (files already cached are skipped).
+    """
+    if backend not in transcribe_audio.MODEL_BACKENDS:
+        # Backends without a model (e.g. 'yin') are fast enough to run file by file
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            midi_path = os.path.join(tmp_dir, "transcription.mid")
+            return sum(
+                not transcribe_audio.transcribe(path, midi_path, backend=backend)
+                for path in audio_paths
+            )
+
+    settings = transcribe_audio.get_transcription_settings(backend)
+    cache_keys = {}
+    for audio_path in audio_paths:
+        cache_key = transcription_cache.compute_cache_key(audio_path, settings)
+        if not transcription_cache.contains(cache_key):
+            cache_keys[audio_path] = cache_key
+    if not cache_keys:
+        return 0
+
+    missing = list(cache_keys)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        midi_paths = [
+            os.path.join(tmp_dir, f"{idx}_basic_pitch.mid")
+            for idx in range(len(missing))
+        ]
+        if not transcription_worker.request_batch_transcription(
+            missing, midi_paths, settings, batch_size
+        ):
+            model = transcription_worker.load_model(backend)
+            transcribe_files(missing, midi_paths, model, settings, batch_size)
+        for audio_path, midi_path in zip(missing, midi_paths):
+            transcription_cache.store(cache_keys[audio_path], midi_path)
+    return len(missing)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Transcribe several WAV files in shared batches into the cache."
+    )
+    parser.add_argument(
+        "audio", nargs="+", help="Paths of the WAV files to transcribe."
+    )
+    parser.add_argument(
+        "-b",
+        "--backend",
+        choices=transcribe_audio.TRANSCRIPTION_BACKENDS,
+        default=transcribe_audio.DEFAULT_BACKEND,
+        help="Model runtime used by basic-pitch (default: %(default)s).",
+    )
+    parser.add_argument(
+        "--batch_size",
+        type=int,
+        default=DEFAULT_BATCH_SIZE,
+        help="Model windows predicted per batch (default: %(default)s).",
+    )
+    args = parser.parse_args()
+
+    for audio_path in args.audio:
+        if not os.path.isfile(audio_path):
+            print(f"Error: File {audio_path} does not exist.", file=sys.stderr)
+            sys.exit(1)
+    transcribed = warm_cache(args.audio, args.backend, args.batch_size)
+    print(f"Transcribed {transcribed} of {len(args.audio)} files.")
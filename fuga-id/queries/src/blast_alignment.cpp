@@ -42,11 +42,12 @@ OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
  * Usage:
  *   - Compile the program using a C++ compiler with the required libraries (e.g., g++).
  *   - Run the executable with the following arguments:
- *     `./blast_alignment [-c|-d|-r] query_file`
+ *     `./blast_alignment [-c|-d|-r] query_file [workspace]`
  *
  * Command-line arguments:
  *   - `-c`, `-d`, `-r`: Specify the search type (chromatic, diatonic, or rhythm).
  *   - `query_file`: Path to the query file (WAV for chromatic/diatonic, MIDI for rhythm).
+ *   - `workspace` [optional]: Private directory for the temporary files and results of the query.
  *
  * Functionality:
  *   1. Validates and parses command-line arguments.
@@ -165,11 +166,13 @@ vector<AlignmentResult> read_scores_from_file(const string &score_results_file)
  * for each of these operations. It also generates a JSON report with scores retrieved during
  * the alignment and with timing information.
  *
- * The program expects two command-line arguments:
+ * The program expects two command-line arguments and an optional third one:
  * 1. A search type flag (`-c`, `-d`, or `-r`) indicating the type of search to perform
  *    (chromatic, diatonic, or rhythm).
  * 2. The path to the query file, which can be either a WAV file (for chromatic and diatonic)
  *    or a MIDI file (for rhythm).
+ * 3. The query workspace, where the temporary files and results are written instead of the
+ *    shared 'tmp' and 'data/results' directories.
  *
  * The main steps in the program include:
  * - Validating and parsing the command-line arguments.
@@ -183,29 +186,33 @@ vector<AlignmentResult> read_scores_from_file(const string &score_results_file)
  * @param argc The number of command-line arguments passed to the program.
  * @param argv An array of command-line argument strings.
  *             argv[1] should specify the search type (`-c`, `-d`, or `-r`), and argv[2]
- *             should specify the query file.
+ *             should specify the query file; argv[3], if given, the query workspace.
  *
  * @return int 0 if the program executed successfully, non-zero if an error occurred.
  */
 int main(int argc, char **argv)
 {
-    string search_feature, query_file;
-    if (!validate_args(argc, argv, search_feature, query_file, "blast"))
+    string search_feature, query_file, workspace;
+    if (!validate_args(argc, argv, search_feature, query_file, workspace, "blast"))
     {
         return 1;
     }
 
     // Prepare the paths for query features and the appropriate database based on the search type
     string base_dir = get_executable_directory();
+    // Temporary files and results go to the query workspace when one is given, so that several
+    // queries can run concurrently without sharing the default directories.
+    string tmp_dir = workspace.empty() ? base_dir + "/../tmp" : workspace + "/tmp";
+    string results_dir = workspace.empty() ? base_dir + "/../data/results" : workspace;
     string query_sf_file;
-    string db = get_search_files(base_dir, search_feature, query_sf_file, "blast");
+    string db = get_search_files(base_dir, tmp_dir, search_feature, query_sf_file, "blast");
 
     // Define the shell commands for extracting query features and cleaning temporary files.
     string extract_query_features = base_dir + "/../src/extract_query_feature.sh";
     string clean_tmp = base_dir + "/../utils/clean_tmp.sh";
     string features_command = "bash " + extract_query_features + " " + search_feature + " " +
-                              query_file + " -m blast";
-    string clean_command = "bash " + clean_tmp;
+                              query_file + " -m blast -w " + tmp_dir;
+    string clean_command = "bash " + clean_tmp + " " + tmp_dir;
 
     // Measure the time taken to extract features from the query.
     double extract_feature_user_time, extract_feature_system_time;
@@ -239,7 +246,6 @@ int main(int argc, char **argv)
     }
 
     // Prepare BLAST command and results directory.
-    string results_dir = base_dir + "/../data/results";
     mkdir(results_dir.c_str(), 0755);
     string score_results_file = results_dir + "/score_results.txt";
 
@@ -282,4 +288,4 @@ int main(int argc, char **argv)
     // Clean up temporary files after the program finishes.
     system(clean_command.c_str());
     return EXIT_SUCCESS;
-}
\ No newline at end of file
+}
\ No newline at end of file
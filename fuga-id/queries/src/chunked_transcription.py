@@ -0,0 +1,277 @@
+"""
+BSD 2-Clause License
+
+Copyright (c) 2024, Hilda Romero-Velo
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+
+* Redistributions of source code must retain the above copyright notice, this
+  list of conditions and the following disclaimer.
+
+* Redistributions in binary form must reproduce the above copyright notice, this
+  list of conditions and the following disclaimer in the documentation
+  and/or other materials provided with the distribution.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+
+"""
+This module implements chunk-parallel transcription of long recordings. The recording is
+split into fixed, overlapping chunks that are transcribed independently across a process
+pool (each process loads the model once), and the note events of consecutive chunks are
+stitched together deterministically:
+
+    - Each overlap between two chunks is cut at its midpoint. A chunk owns the notes whose
+      onset falls before the cut, and the next chunk owns the notes starting after it.
+    - A note that is still sounding at the cut is continued by the note of the same pitch
+      that the next chunk finds sounding at the cut, so notes straddling chunk boundaries
+      are not split or duplicated.
+
+Chunk boundaries only depend on the recording length and the chunk settings, and chunk
+results are combined in chunk order, so the output is identical whatever the number of
+processes.
+
+Example usage:
+    python3 chunked_transcription.py path/to/recording.wav -o recording.mid -j 4
+"""
+
+import argparse
+import multiprocessing
+import os
+import sys
+
+import numpy as np
+
+import batch_transcription
+import transcribe_audio
+import transcription_worker
+
+DEFAULT_CHUNK_SECONDS = 30.0  # Length of each chunk
+DEFAULT_OVERLAP_SECONDS = 4.0  # Overlap between consecutive chunks
+ONSET_TOLERANCE = 0.05  # Onset tolerance in seconds when continuing notes across a cut
+MIDI_PROGRAM = 4  # Program used by basic-pitch for its MIDI output
+
+_model = None  # Model loaded once in each pool process
+
+
+def compute_chunks(n_samples, sample_rate, chunk_seconds, overlap_seconds):
+    """
+    Computes the sample ranges of the overlapping chunks of a recording.
+
+    Args:
+        n_samples (int): Length of the recording in samples.
+        sample_rate (int): Sample rate of the recording.
+        chunk_seconds (float): Length of each chunk in seconds.
+        overlap_seconds (float): Overlap between consecutive chunks in seconds.
+
+    Returns:
+        list of tuples: (start, end) sample of each chunk.
+    """
+    chunk_len = int(round(chunk_seconds * sample_rate))
+    hop = chunk_len - int(round(overlap_seconds * sample_rate))
+    if hop <= 0:
+        raise ValueError("The chunk overlap must be shorter than the chunk length.")
+    chunks = []
+    start = 0
+    while True:
+        end = min(start + chunk_len, n_samples)
+        chunks.append((start, end))
+        if end >= n_samples:
+            return chunks
+        start += hop
+
+
+def _init_pool(backend):
+    """Loads the model of the given backend in a pool process."""
+    global _model
+    _model = transcription_worker.load_model(backend)
+
+
+def _transcribe_chunk(args):
+    """
+    Transcribes a chunk with the model of the current process.
+
+    Args:
+        args (tuple): (audio chunk, transcription settings)
+
+    Returns:
+        list: Note events of the chunk as (start, end, pitch, amplitude), in seconds from the
+              chunk start.
+    """
+    audio, settings = args
+    [(_, note_events)] = batch_transcription.transcribe_batch([audio], _model, settings)
+    return [
+        (float(start), float(end), int(pitch), float(amplitude))
+        for start, end, pitch, amplitude, *_ in note_events
+    ]
+
+
+def stitch_chunks(chunk_notes, chunk_times):
+    """
+    Stitches the note events of overlapping chunks into a single list of note events.
+
+    Args:
+        chunk_notes (list): Note events (start, end, pitch, amplitude) of each chunk, relative
+                            to the chunk start.
+        chunk_times (list): (start, end) time of each chunk in seconds.
+
+    Returns:
+        list: Note events (start, end, pitch, amplitude) of the recording, sorted by onset
+              and pitch.
+    """
+    stitched = []
+    # Pitch -> index in stitched of the note sounding at the previous cut
+    open_notes = {}
+    for idx, (notes, (chunk_start, chunk_end)) in enumerate(
+        zip(chunk_notes, chunk_times)
+    ):
+        cut_before = (
+            (chunk_start + chunk_times[idx - 1][1]) / 2 if idx > 0 else float("-inf")
+        )
+        cut_after = (
+            (chunk_times[idx + 1][0] + chunk_end) / 2
+            if idx + 1 < len(chunk_times)
+            else float("inf")
+        )
+        next_open = {}
+        for start, end, pitch, amplitude in sorted(notes):
+            start += chunk_start
+            end += chunk_start
+            if start >= cut_after or end <= cut_before:
+                continue  # Owned by a neighbouring chunk
+            if start < cut_before or (
+                start <= cut_before + ONSET_TOLERANCE and pitch in open_notes
+            ):
+                # Continuation of a note that was sounding at the previous cut
+                if pitch not in open_notes:
+                    continue
+                note_idx = open_notes.pop(pitch)
+                s, e, p, a = stitched[note_idx]
+                stitched[note_idx] = (s, max(e, end), p, a)
+            else:
+                note_idx = len(stitched)
+                stitched.append((start, end, pitch, amplitude))
+            if end > cut_after:
+                next_open[pitch] = note_idx
+        open_notes = next_open
+    return sorted(stitched, key=lambda note: (note[0], note[2], note[1]))
+
+
+def notes_to_midi(note_events, midi_path):
+    """
+    Writes note events to a MIDI file with the same layout as the basic-pitch output.
+
+    Args:
+        note_events (list): Note events (start, end, pitch, amplitude) in seconds.
+        midi_path (str): Path of the resulting MIDI file.
+    """
+    import pretty_midi
+
+    midi_data = pretty_midi.PrettyMIDI(initial_tempo=120)
+    instrument = pretty_midi.Instrument(program=MIDI_PROGRAM)
+    for start, end, pitch, amplitude in note_events:
+        instrument.notes.append(
+            pretty_midi.Note(int(np.round(127 * amplitude)), pitch, start, end)
+        )
+    midi_data.instruments.append(instrument)
+    midi_data.write(midi_path)
+
+
+def transcribe_long(
+    audio_path,
+    jobs=1,
+    backend=transcribe_audio.DEFAULT_BACKEND,
+    chunk_seconds=DEFAULT_CHUNK_SECONDS,
+    overlap_seconds=DEFAULT_OVERLAP_SECONDS,
+):
+    """
+    Transcribes a long recording by chunks across a process pool.
+
+    Args:
+        audio_path (str): Path to the WAV file to transcribe.
+        jobs (int): Number of processes used to transcribe the chunks.
+        backend (str): Model runtime ('tf', 'onnx' or 'tflite').
+        chunk_seconds (float): Length of each chunk in seconds.
+        overlap_seconds (float): Overlap between consecutive chunks in seconds.
+
+    Returns:
+        list: Note events (start, end, pitch, amplitude) of the recording.
+    """
+    from basic_pitch.constants import AUDIO_SAMPLE_RATE
+
+    settings = transcribe_audio.get_transcription_settings(backend)
+    audio = batch_transcription.load_audio(audio_path)
+    chunks = compute_chunks(
+        len(audio), AUDIO_SAMPLE_RATE, chunk_seconds, overlap_seconds
+    )
+    tasks = [(audio[start:end], settings) for start, end in chunks]
+
+    jobs = max(1, min(jobs, len(chunks)))
+    if jobs == 1:
+        _init_pool(backend)
+        chunk_notes = [_transcribe_chunk(task) for task in tasks]
+    else:
+        context = multiprocessing.get_context("spawn")
+        with context.Pool(jobs, initializer=_init_pool, initargs=(backend,)) as pool:
+            chunk_notes = pool.map(_transcribe_chunk, tasks, chunksize=1)
+
+    chunk_times = [
+        (start / AUDIO_SAMPLE_RATE, end / AUDIO_SAMPLE_RATE) for start, end in chunks
+    ]
+    return stitch_chunks(chunk_notes, chunk_times)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Transcribe a long recording by overlapping chunks across processes."
+    )
+    parser.add_argument("audio", help="Path to the WAV file to transcribe.")
+    parser.add_argument(
+        "-o", "--output", required=True, help="Path of the resulting MIDI file."
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=os.cpu_count(),
+        help="Number of processes (default: number of CPUs).",
+    )
+    parser.add_argument(
+        "-b",
+        "--backend",
+        choices=transcribe_audio.MODEL_BACKENDS,
+        default=transcribe_audio.DEFAULT_BACKEND,
+        help="Model runtime used by basic-pitch (default: %(default)s).",
+    )
+    parser.add_argument(
+        "--chunk_seconds",
+        type=float,
+        default=DEFAULT_CHUNK_SECONDS,
+        help="Length of each chunk in seconds (default: %(default)s).",
+    )
+    parser.add_argument(
+        "--overlap_seconds",
+        type=float,
+        default=DEFAULT_OVERLAP_SECONDS,
+        help="Overlap between chunks in seconds (default: %(default)s).",
+    )
+    args = parser.parse_args()
+
+    if not os.path.isfile(args.audio):
+        print(f"Error: File {args.audio} does not exist.", file=sys.stderr)
+        sys.exit(1)
+    notes = transcribe_long(
+        args.audio, args.jobs, args.backend, args.chunk_seconds, args.overlap_seconds
+    )
+    notes_to_midi(notes, args.output)
@@ -33,21 +33,36 @@ OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 : '
 # Script to extract musical features from audio files (WAV or MIDI).
 # This script supports extracting chromatic, diatonic, and rhythm features.
+# The query can also be a JSON file with the features already extracted by
+# 'query_features.py', in which case the requested notation is read from it.
 # 
 # Usage:
 #   Run the script with one of the following feature flags:
-#     - -c <wav_or_midi_file_path>    Extracts chromatic feature from a WAV or MIDI file.
-#     - -d <wav_or_midi_file_path>    Extracts diatonic feature from a WAV or MIDI file.
-#     - -r <wav_or_midi_file_path>   Extracts rhythm feature from a WAV or MIDI file.
+#     - -c <wav_midi_or_json_file_path>    Extracts chromatic feature from a WAV, MIDI or JSON file.
+#     - -d <wav_midi_or_json_file_path>    Extracts diatonic feature from a WAV, MIDI or JSON file.
+#     - -r <wav_midi_or_json_file_path>    Extracts rhythm feature from a WAV, MIDI or JSON file.
 #   The script requires the additional argument:
 #     - -m <method>           Specifies the alignment method: 'approximate' or 'blast'.
+#   Optionally, for WAV files:
+#     - -b <backend>          basic-pitch model runtime: 'tf', 'onnx' or 'tflite', or 'yin' for
+#                             the monophonic pitch tracker. Defaults to
+#                             $FUGA_ID_TRANSCRIPTION_BACKEND, or 'tf' if it is not set.
+#   Optionally:
+#     - -w <directory>        Directory where the temporary files of the query are stored.
+#                             Concurrent queries must use different directories.
+#   Optionally, for chromatic and diatonic features:
+#     - --from_midi           Compute the intervals directly from the MIDI note pitches
+#                             ('midi_intervals.py') instead of with the Humdrum toolchain.
+#                             Experimental until 'verify_midi_intervals_parity.py' reports no
+#                             mismatches on queries/data. Also enabled by setting
+#                             $FUGA_ID_INTERVALS_FROM_MIDI.
 # 
 # Example usage:
 #   ./extract_query_feature.sh -c path/to/file.wav -m approximate
 #
 # Dependencies:
 #   The script assumes the availability of several utilities:
-#   - basic-pitch
+#   - basic-pitch (through 'transcribe_audio.py', which caches transcriptions)
 #   - mid2hum
 #   - humsed
 #   - mint (for diatonic analysis)
@@ -60,17 +75,21 @@ OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 #     - For the 'approximate' method: a TXT file (e.g., chromatic_sf_query.txt).
 #     - For the 'blast' method: a FASTA file (e.g., chromatic_sf_query.fasta).
 #
-# All generated files are stored in a 'tmp' directory at the script's root.
+# All generated files are stored in the directory given with -w or, by default, in a 'tmp'
+# directory at the script's root.
 
 #!/bin/bash
 
 # Usage message
-usage="Usage: $0 -c <file_path> | -d <file_path> | -r <file_path> [-m approximate | blast]\n\
+usage="Usage: $0 -c <file_path> | -d <file_path> | -r <file_path> [-m approximate | blast] [-b tf | onnx | tflite | yin] [-w <directory>] [--from_midi]\n\
     Extract features from audio files:\n\
-    -c <wav_or_midi_file_path>    Extract chromatic features from a WAV or MIDI file\n\
-    -d <wav_or_midi_file_path>    Extract diatonic features from a WAV or MIDI file\n\
-    -r <wav_or_midi_file_path>    Extract rhythm features from a WAV or MIDI file\n\
+    -c <wav_midi_or_json_file_path>    Extract chromatic features from a WAV, MIDI or JSON file\n\
+    -d <wav_midi_or_json_file_path>    Extract diatonic features from a WAV, MIDI or JSON file\n\
+    -r <wav_midi_or_json_file_path>    Extract rhythm features from a WAV, MIDI or JSON file\n\
     -m <method>       Specify alignment method: 'approximate' or 'blast' (required)\n\
+    -b <backend>      Specify transcription backend: 'tf', 'onnx', 'tflite' or 'yin' (optional)\n\
+    -w <directory>    Directory for the temporary files of the query (optional)\n\
+    --from_midi       Compute chromatic/diatonic intervals directly from MIDI (optional)\n\
     \nExample:\n\
   $0 -c path/to/file.wav -m approximate"
 
@@ -78,6 +97,12 @@ usage="Usage: $0 -c <file_path> | -d <file_path> | -r <file_path> [-m approximat
 feature=""
 input_file=""
 method=""
+backend="${FUGA_ID_TRANSCRIPTION_BACKEND:-tf}"
+from_midi=false
+if [ -n "$FUGA_ID_INTERVALS_FROM_MIDI" ]; then
+    from_midi=true
+fi
+temp_dir=""
 
 # Function to show usage and exit
 show_usage_and_exit() {
@@ -96,8 +121,8 @@ validate_file_exists() {
 # Function to validate file extension
 validate_file_extension() {
     local file_ext="$1"
-    if [ "$file_ext" != "wav" ] && [ "$file_ext" != "mid" ]; then
-        echo "Error: File '$input_file' must be a .wav or .mid file for $feature feature." >&2
+    if [ "$file_ext" != "wav" ] && [ "$file_ext" != "mid" ] && [ "$file_ext" != "json" ]; then
+        echo "Error: File '$input_file' must be a .wav, .mid or .json file for $feature feature." >&2
         exit 1
     fi
 }
@@ -123,6 +148,27 @@ while [[ $# -gt 0 ]]; do
             show_usage_and_exit
         fi
         ;;
+    -b | --transcription_backend)
+        if [[ "$2" == "tf" || "$2" == "onnx" || "$2" == "tflite" || "$2" == "yin" ]]; then
+            backend="$2"
+            shift
+        else
+            echo "Error: Invalid backend. Choose 'tf', 'onnx', 'tflite' or 'yin'." >&2
+            show_usage_and_exit
+        fi
+        ;;
+    -w | --workspace)
+        if [ -n "$2" ]; then
+            temp_dir="$2"
+            shift
+        else
+            echo "Error: Specify a directory after the workspace option." >&2
+            show_usage_and_exit
+        fi
+        ;;
+    --from_midi)
+        from_midi=true
+        ;;
     -h | --help)
         show_usage_and_exit
         ;;
@@ -164,7 +210,9 @@ filename=$(basename "$input_file" .${extension})
 
 # Define temporary directories and check existence
 script_dir=$(dirname "$(realpath "$0")")
-temp_dir="$script_dir/../tmp"
+if [ -z "$temp_dir" ]; then
+    temp_dir="$script_dir/../tmp"
+fi
 mkdir -p "$temp_dir"
 if [ ! -d "$temp_dir" ]; then
     echo "Error: Failed to create temporary directory."
@@ -176,13 +224,21 @@ mkdir -p $(realpath "$script_dir/../logs")
 logs_dir=$(realpath "$script_dir/../logs")
 error_log="$logs_dir/error_log.txt"
 
+# Function to transcribe the WAV query into MIDI. Transcriptions are cached by audio content
+# and settings (including the backend), so the same fragment is only transcribed once for all
+# features and methods.
+transcribe_wav() {
+    midi_file="$temp_dir/${filename}_basic_pitch.mid"
+    python3 "$script_dir/transcribe_audio.py" "$input_file" -o "$midi_file" -b "$backend" \
+        2>>"$error_log"
+}
+
 # Function to analyze rhythm
 process_rhythm() {
     local ext="$1"
 
     if [ "$ext" = "wav" ]; then
-        basic-pitch "$temp_dir/" "$input_file" >/dev/null 2>>"$error_log"
-        midi_file="$temp_dir/${filename}_basic_pitch.mid"
+        transcribe_wav
     else
         midi_file="$input_file"
     fi
@@ -197,17 +253,9 @@ process_rhythm() {
     fi
 }
 
-# Function to analyze chromatic or diatonic
-process_chromatic_diatonic() {
-    local ext="$1"
-
-    if [ "$ext" = "wav" ]; then
-        basic-pitch "$temp_dir/" "$input_file" >/dev/null 2>>"$error_log"
-        midi_file="$temp_dir/${filename}_basic_pitch.mid"
-    else
-        midi_file="$input_file"
-    fi
-
+# Function to compute the chromatic or diatonic analysis with the Humdrum toolchain. Sets
+# 'analysis_file' to the resulting analysis.
+analyze_with_humdrum() {
     # Convert MIDI to **kern format
     mid2hum "$midi_file" >"$temp_dir/query_kern.krn" 2>>"$error_log"
     validate_file_exists "$temp_dir/query_kern.krn"
@@ -219,37 +267,69 @@ process_chromatic_diatonic() {
 
     # Compute diatonic or chromatic analysis
     if [ "$feature" = "diatonic" ]; then
-        mint -d "$temp_dir/query_kern_cleaned.krn" >"$temp_dir/query_diatonic_analysis.txt"
-        validate_file_exists "$temp_dir/query_diatonic_analysis.txt"
-        if [ "$method" = "approximate" ]; then
-            python3 "$script_dir/feature_format_transformation.py" \
-                -d "$temp_dir/query_diatonic_analysis.txt" \
-                -m "$method" >"$temp_dir/diatonic_sf_query.txt"
-        else
-            echo ">${filename}" >"$temp_dir/diatonic_sf_query.fasta"
-            python3 "$script_dir/feature_format_transformation.py" \
-                -d "$temp_dir/query_diatonic_analysis.txt" \
-                -m "$method" >>"$temp_dir/diatonic_sf_query.fasta"
-        fi
+        analysis_file="$temp_dir/query_diatonic_analysis.txt"
+        mint -d "$temp_dir/query_kern_cleaned.krn" >"$analysis_file"
     else
         semits -x "$temp_dir/query_kern_cleaned.krn" >"$temp_dir/query_semits.sem"
         validate_file_exists "$temp_dir/query_semits.sem"
-        xdelta -s ^= "$temp_dir/query_semits.sem" >"$temp_dir/query_chromatic_analysis.txt"
-        validate_file_exists "$temp_dir/query_chromatic_analysis.txt"
-        if [ "$method" = "approximate" ]; then
-            python3 "$script_dir/feature_format_transformation.py" \
-                -c "$temp_dir/query_chromatic_analysis.txt" \
-                -m "$method" >"$temp_dir/chromatic_sf_query.txt"
-        else
-            echo ">${filename}" >"$temp_dir/chromatic_sf_query.fasta"
-            python3 "$script_dir/feature_format_transformation.py" \
-                -c "$temp_dir/query_chromatic_analysis.txt" \
-                -m "$method" >>"$temp_dir/chromatic_sf_query.fasta"
-        fi
+        analysis_file="$temp_dir/query_chromatic_analysis.txt"
+        xdelta -s ^= "$temp_dir/query_semits.sem" >"$analysis_file"
+    fi
+    validate_file_exists "$analysis_file"
+}
+
+# Function to analyze chromatic or diatonic. By default, the intervals are computed with the
+# Humdrum toolchain; they are computed directly from the MIDI note pitches with --from_midi.
+process_chromatic_diatonic() {
+    local ext="$1"
+    local feature_flag="-c"
+    local transformation_args
+
+    if [ "$ext" = "wav" ]; then
+        transcribe_wav
+    else
+        midi_file="$input_file"
+    fi
+
+    if [ "$feature" = "diatonic" ]; then
+        feature_flag="-d"
+    fi
+
+    if [ "$from_midi" = true ]; then
+        transformation_args=("$feature_flag" "$midi_file" --from_midi)
+    else
+        analyze_with_humdrum
+        transformation_args=("$feature_flag" "$analysis_file")
+    fi
+
+    if [ "$method" = "approximate" ]; then
+        python3 "$script_dir/feature_format_transformation.py" "${transformation_args[@]}" \
+            -m "$method" >"$temp_dir/${feature}_sf_query.txt"
+    else
+        echo ">${filename}" >"$temp_dir/${feature}_sf_query.fasta"
+        python3 "$script_dir/feature_format_transformation.py" "${transformation_args[@]}" \
+            -m "$method" >>"$temp_dir/${feature}_sf_query.fasta"
+    fi
+}
+
+# Function to read a feature already extracted by 'query_features.py' from a JSON file
+process_precomputed() {
+    if [ "$method" = "approximate" ]; then
+        python3 "$script_dir/query_features.py" "$input_file" -f "$feature" -m "$method" \
+            >"$temp_dir/${feature}_sf_query.txt" 2>>"$error_log"
+    else
+        echo ">${filename}" >"$temp_dir/${feature}_sf_query.fasta"
+        python3 "$script_dir/query_features.py" "$input_file" -f "$feature" -m "$method" \
+            >>"$temp_dir/${feature}_sf_query.fasta" 2>>"$error_log"
     fi
 }
 
 # Call the appropriate function based on the feature
+if [ "$extension" = "json" ]; then
+    process_precomputed
+    exit
+fi
+
 case "$feature" in
 chromatic | diatonic)
     process_chromatic_diatonic "$extension"
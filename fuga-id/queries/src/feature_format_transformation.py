@@ -36,18 +36,20 @@ rhythmic feature from MIDI files. The extracted data is converted into a single
 notation format and printed to the console. Users can specify which features to 
 compile using command-line arguments, and must specify an alignment method 
 (`approximate` or `blast`) for the conversion process. Note that chromatic and 
-diatonic **kern analyses are stored in TXT files.
+diatonic **kern analyses are stored in TXT files. With `--from_midi`, the chromatic and
+diatonic features are computed directly from the note pitches of a MIDI file instead
+(see `midi_intervals.py`), so no Humdrum analysis is needed.
 
 Example usage:
     python feature_format_transformation.py -c path/to/chromatic_kern_analysis_file.txt -m blast
     python feature_format_transformation.py -d path/to/diatonic_kern_analysis_file.txt -m blast
     python feature_format_transformation.py -r path/to/midi_file.mid -m approximate
+    python feature_format_transformation.py -c path/to/midi_file.mid --from_midi -m approximate
 """
 
 import os
 import sys
 import argparse
-import pretty_midi
 
 # Define directories to allow importing shared modules and dictionaries
 common_directory = os.path.abspath(
@@ -68,8 +70,10 @@ sys.path.append(utils_directory)
 # and notation conversion.
 import approx_dictionary
 import blast_dictionary
+import midi_reader
 from utility_functions import extract_feature, to_single_notation
-from constants import RATIOS_NUMS
+from midi_intervals import extract_chromatic_from_midi, extract_diatonic_from_midi
+from query_features import rhythm_ratios
 
 
 # Extract chromatic feature from the **kern analysis file, ignoring changes with a step value of 0
@@ -86,50 +90,30 @@ def extract_diatonic(filepath):
 
 # Extract rhythm feature from a MIDI file by computing duration ratios between consecutive notes
 def extract_rhythm(midifilepath):
-    data = pretty_midi.PrettyMIDI(midifilepath)
-    ratios = []
-
-    # Process each instrument track in the MIDI file
-    for instrument in data.instruments:
-        num_notes = len(instrument.notes)
-
-        # Skip tracks with fewer than 2 notes, as we cannot compute a ratio with just one note
-        if num_notes < 2:
-            continue
-
-        # Precompute tick durations of each note to avoid repeated time-to-tick conversions
-        tick_durations = [
-            data.time_to_tick(note.get_duration()) for note in instrument.notes
-        ]
-
-        # Calculate the duration ratio between consecutive notes
-        for i in range(num_notes - 1):
-            current_duration_ticks = tick_durations[i]
-            next_duration_ticks = tick_durations[i + 1]
-            if current_duration_ticks == 0:
-                continue  # Avoid division by zero
-
-            # Find closest predefined ratio to computed ratio
-            ratio = next_duration_ticks / current_duration_ticks
-            closest_ratio = min(RATIOS_NUMS, key=lambda x: abs(x - ratio))
-            ratios.append(str(closest_ratio))
+    ratios = rhythm_ratios(midi_reader.read_midi(midifilepath))
 
     # Return computed ratios as a string separated by ';', or an empty string if no ratios found
     return ";".join(ratios) + ";" if ratios else ""
 
 
-# Process chromatic feature from a **kern analysis file, convert values
-# to a single notation format, and print the result.
-def process_chromatic(filepath, dictionary):
-    chromatic_feature = extract_chromatic(filepath)
+# Process chromatic feature from a **kern analysis file (or from a MIDI file if from_midi),
+# convert values to a single notation format, and print the result.
+def process_chromatic(filepath, dictionary, from_midi=False):
+    if from_midi:
+        chromatic_feature = extract_chromatic_from_midi(filepath)
+    else:
+        chromatic_feature = extract_chromatic(filepath)
     chromatic_query = to_single_notation(chromatic_feature, dictionary.CHROMATIC_DIC)
     print(chromatic_query)
 
 
-# Process diatonic feature from a **kern analysis file, convert values
-# to a single notation format, and print the result.
-def process_diatonic(filepath, dictionary):
-    diatonic_feature = extract_diatonic(filepath)
+# Process diatonic feature from a **kern analysis file (or from a MIDI file if from_midi),
+# convert values to a single notation format, and print the result.
+def process_diatonic(filepath, dictionary, from_midi=False):
+    if from_midi:
+        diatonic_feature = extract_diatonic_from_midi(filepath)
+    else:
+        diatonic_feature = extract_diatonic(filepath)
     diatonic_query = to_single_notation(diatonic_feature, dictionary.DIATONIC_DIC)
     print(diatonic_query)
 
@@ -171,6 +155,13 @@ parser.add_argument(
     help="Convert query rhythm to single format. MIDI file needed.",
 )
 
+# Argument to compute the chromatic/diatonic features directly from a MIDI file
+parser.add_argument(
+    "--from_midi",
+    action="store_true",
+    help="Chromatic/diatonic paths are MIDI files. Intervals are computed from note pitches.",
+)
+
 # Argument to specify the alignment method (mandatory)
 parser.add_argument(
     "-m",
@@ -191,10 +182,10 @@ dictionary = approx_dictionary if args.method == "approximate" else blast_dictio
 
 # Process each feature if specified
 if args.chromatic:
-    process_chromatic(args.chromatic, dictionary)
+    process_chromatic(args.chromatic, dictionary, args.from_midi)
 
 if args.diatonic:
-    process_diatonic(args.diatonic, dictionary)
+    process_diatonic(args.diatonic, dictionary, args.from_midi)
 
 if args.rhythm:
     process_rhythm(args.rhythm, dictionary)
@@ -0,0 +1,997 @@
+"""
+BSD 2-Clause License
+
+Copyright (c) 2024, Hilda Romero-Velo
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+
+* Redistributions of source code must retain the above copyright notice, this
+  list of conditions and the following disclaimer.
+
+* Redistributions in binary form must reproduce the above copyright notice, this
+  list of conditions and the following disclaimer in the documentation
+  and/or other materials provided with the distribution.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+
+"""
+This module computes the approximate alignment of the query search in-process, with the same
+fitting alignment as `approximate_alignment()` in `approximate_alignment.cpp`: scores taken
+from the cost map (truncated to integers, with the gap penalty for missing pairs), gap
+penalty of -1, free start in the melodic line, the best cell of each line (score greater
+than 0) with its origin and end positions, and the Top 5 lines. Ties are resolved as in the
+C++ program, so the results are the same.
+
+The corpus (melodic lines, identifiers and cost matrix) is loaded once with `load_corpus` and
+reused by every query. The binary corpus index (see `corpus_index.py`) and the dense cost
+matrix (see `cost_matrix.py`) are memory-mapped, falling back to the text files and the cost
+map of the C++ program for indexes built before they existed. Identical melodic lines
+(doubled staves, repeated voices) are aligned once: the corpus index stores every distinct
+sequence once with the fan-out list of its melodic lines, and the score of each distinct
+sequence is expanded to all of them before selecting the Top 5. The distinct sequences
+are sorted by length and grouped in padded batches, and the dynamic programming advances
+one text position at a time for a whole batch of lines: every step updates a (lines x query
+positions) block with NumPy. The dependency along the query (insertions) is solved with a
+cumulative maximum, and the origin of the cells reached by insertions is propagated with a
+forward fill.
+
+Symbols: the feature texts are written in UTF-8, and the C++ program aligns their bytes and
+keys the cost map by the first byte of each symbol, so symbols outside ASCII (two bytes in
+UTF-8) are aligned as two symbols sharing the cost map row of the last symbol with the same
+first byte. This module aligns one symbol per character (the Latin-1 value of the notation,
+see `notation_codec`) by default, which gives the intended alignment. With
+`cpp_compatible=True` it aligns the UTF-8 bytes as the C++ program does and returns exactly
+the same results (positions are then byte offsets), which is how both are compared in
+`benchmark_fitting_alignment.py`.
+
+Quantized mode: the scores are small integers (costs are truncated as in the C++ program and
+the gap penalty is -1), so with `quantized=True` the score matrix and the dynamic programming
+scores are kept in int16 instead of int32, which halves the memory traffic of every step and
+fits twice as many lines per batch. Queries long enough to overflow int16 (see
+`fits_int16`) are aligned with int32 scores, so the results are always the same.
+
+Prefilter: with the k-gram index of the corpus (see `kgram_index.py`), only some lines are
+aligned: the lines sharing the most k-grams with the query (`num_candidates`), or, losslessly
+for an error budget, the lines that may contain the query within `max_errors` edits by the
+q-gram lemma (`max_errors`). Without either, every line is aligned.
+
+Prefix trie: melodic lines of the same tune family often share long prefixes, and the
+dynamic programming columns of a prefix do not depend on what follows it. The 'trie' kernel
+(`align_trie`) aligns the query against the prefix trie of the distinct lines (see
+`build_trie`), so the columns of every shared prefix are computed once, with the same
+results as the other kernels.
+
+Usage:
+    python3 fitting_alignment.py <query_json_file> -f <feature> [-i <indexes_dir>]
+                                 [-k batch|profile|trie] [--cpp_compatible] [--quantized]
+                                 [-c <num_candidates> | -e <max_errors>]
+"""
+
+import argparse
+import json
+import os
+import sys
+
+import numpy as np
+
+sys.path.append(
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "../../common")
+)
+import corpus_index
+import cost_matrix
+import kgram_index
+import utility_functions
+
+INDEXES_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)),
+    "../../scores/indexes/approximate_alignment",
+)
+FEATURE_FILES = {
+    "chromatic": {
+        "text": "chromatic_text.txt",
+        "cost_map": "chromatic_cost_map.bin",
+        "cost_matrix": "chromatic_cost_matrix.bin",
+        "corpus_index": "chromatic_corpus_index.bin",
+        "kgram_index": "chromatic_kgram_index.bin",
+        "line_bounds": "chromatic_line_bounds.bin",
+        "line_phrases": "chromatic_line_phrases.bin",
+    },
+    "diatonic": {
+        "text": "diatonic_text.txt",
+        "cost_map": "diatonic_cost_map.bin",
+        "cost_matrix": "diatonic_cost_matrix.bin",
+        "corpus_index": "diatonic_corpus_index.bin",
+        "kgram_index": "diatonic_kgram_index.bin",
+        "line_bounds": "diatonic_line_bounds.bin",
+        "line_phrases": "diatonic_line_phrases.bin",
+    },
+    "rhythm": {
+        "text": "rhythm_text.txt",
+        "cost_map": "rhythmic_cost_map.bin",
+        "cost_matrix": "rhythmic_cost_matrix.bin",
+        "corpus_index": "rhythm_corpus_index.bin",
+        "kgram_index": "rhythm_kgram_index.bin",
+        "line_bounds": "rhythm_line_bounds.bin",
+        "line_phrases": "rhythm_line_phrases.bin",
+    },
+}
+IDS_FILE = "melodic_line_ids.txt"
+GAP_PENALTY = -1  # Same gap penalty for every feature (see `get_gap_penalty`)
+TOP_N = 5
+BATCH_SIZE = 256  # Melodic lines aligned at once
+QUANTIZED_BATCH_SIZE = 512  # Melodic lines aligned at once with int16 scores
+NUM_CANDIDATES = 100  # Candidate lines aligned with the k-gram prefilter (see `align`)
+KERNELS = ["batch", "profile", "trie"]
+# Estimated cost (in microseconds) of a text position and of a cell with each kernel,
+# measured with NumPy on a single core (see `select_kernel`)
+KERNEL_COSTS = {
+    "batch": {"step": 41.0, "cell": 0.035},
+    "profile": {"step": 26.0, "cell": 0.012},
+}
+
+
+def load_lines(filename):
+    """
+    Loads a text file as a list of lines, as the C++ program does: trailing newlines are
+    removed and the content is split on newlines (an empty file gives one empty line).
+
+    Args:
+        filename (str): Path to the text file.
+
+    Returns:
+        list: Lines of the file as bytes.
+    """
+    with open(filename, "rb") as file:
+        return file.read().rstrip(b"\n").split(b"\n")
+
+
+def symbol_code(symbol, cpp_compatible=False):
+    """
+    Returns the byte value used for a symbol of the cost map.
+
+    Args:
+        symbol (str): Single-character symbol.
+        cpp_compatible (bool): Whether to use the first UTF-8 byte, as the C++ program does.
+
+    Returns:
+        int: Byte value of the symbol.
+    """
+    return symbol.encode("utf-8")[0] if cpp_compatible else ord(symbol)
+
+
+def build_score_matrix(cost_map, gap_penalty=GAP_PENALTY, cpp_compatible=False):
+    """
+    Builds the 256x256 matrix of alignment scores from a cost map, indexed by the byte values
+    of the text and query symbols. Scores are truncated to integers and missing pairs score
+    the gap penalty, as in `get_alignment_score`.
+
+    Args:
+        cost_map (dict): Cost map as returned by `utility_functions.load_cost_map`.
+        gap_penalty (int): Score of the pairs missing from the cost map.
+        cpp_compatible (bool): Whether to key the symbols by their first UTF-8 byte, so that
+                               symbols sharing it overwrite each other as in the C++ program.
+
+    Returns:
+        np.ndarray: Matrix of int32 scores (text symbol, query symbol).
+    """
+    matrix = np.full((256, 256), gap_penalty, dtype=np.int32)
+    for text_symbol, inner_map in cost_map.items():
+        row = np.full(256, gap_penalty, dtype=np.int32)
+        for query_symbol, value in inner_map.items():
+            row[symbol_code(query_symbol, cpp_compatible)] = int(value)
+        matrix[symbol_code(text_symbol, cpp_compatible)] = row
+    return matrix
+
+
+def score_matrix_from_costs(costs, gap_penalty=GAP_PENALTY):
+    """
+    Builds the matrix of alignment scores from a dense cost matrix (see `cost_matrix.py`),
+    with the same scores as `build_score_matrix` gives for the equivalent cost map.
+
+    Args:
+        costs (np.ndarray): Cost matrix (NaN for missing pairs).
+        gap_penalty (int): Score of the pairs missing from the cost matrix.
+
+    Returns:
+        np.ndarray: Matrix of int32 scores (text symbol, query symbol).
+    """
+    return np.trunc(np.nan_to_num(costs, nan=gap_penalty)).astype(np.int32)
+
+
+def encode_sequence(sequence, cpp_compatible=False):
+    """
+    Converts a sequence in single-character notation to the byte values aligned.
+
+    Args:
+        sequence (str or bytes): Sequence as text, or its UTF-8 bytes as read from a file.
+        cpp_compatible (bool): Whether to align the UTF-8 bytes as the C++ program does.
+
+    Returns:
+        bytes: Byte values of the sequence.
+    """
+    if isinstance(sequence, bytes):
+        sequence = sequence.decode("utf-8")
+    return sequence.encode("utf-8" if cpp_compatible else "latin-1")
+
+
+def build_batches(lines, batch_size=BATCH_SIZE):
+    """
+    Groups the melodic lines in batches of similar length. Each batch is stored transposed
+    and padded to its longest line, so a text position of all its lines is contiguous.
+
+    Args:
+        lines (list): Encoded melodic lines (bytes).
+        batch_size (int): Maximum number of lines per batch.
+
+    Returns:
+        list: Batches as dictionaries with the line indexes ("indexes"), their lengths
+              ("lengths") and the padded symbols ("codes", text positions x lines).
+    """
+    lengths = np.array([len(line) for line in lines], dtype=np.int64)
+    order = np.argsort(lengths, kind="stable")
+    order = order[lengths[order] > 0]  # Empty lines cannot be aligned
+
+    batches = []
+    for start in range(0, len(order), batch_size):
+        indexes = order[start : start + batch_size]
+        batch_lengths = lengths[indexes]
+        codes = np.zeros((batch_lengths.max(), len(indexes)), dtype=np.uint8)
+        for column, index in enumerate(indexes):
+            codes[: lengths[index], column] = np.frombuffer(lines[index], np.uint8)
+        batches.append({"indexes": indexes, "lengths": batch_lengths, "codes": codes})
+    return batches
+
+
+def build_trie(lines):
+    """
+    Builds the prefix trie of the melodic lines, level by level. The lines are sorted, so
+    the lines sharing a prefix are contiguous and a line starts a new node at a depth greater
+    than its common prefix with the previous line. Level d holds the nodes at depth d (the
+    distinct prefixes of d symbols), each with its parent in level d - 1 and its last symbol.
+
+    Args:
+        lines (list): Encoded melodic lines (bytes).
+
+    Returns:
+        dict: Trie with its levels ("levels", dictionaries with the parent of every node
+              ("parents"), its symbol ("codes"), and the lines ending at the level ("lines")
+              with their node ("ends")), the number of nodes ("num_nodes") and of lines
+              ("num_lines").
+    """
+    order = np.array(sorted(range(len(lines)), key=lines.__getitem__), dtype=np.int64)
+    sorted_lines = [lines[index] for index in order]
+    lengths = np.array([len(line) for line in sorted_lines], dtype=np.int64)
+    offsets = np.concatenate(([0], np.cumsum(lengths)))
+    symbols = np.frombuffer(b"".join(sorted_lines), dtype=np.uint8)
+
+    # Common prefix length of every line with the previous one
+    common = np.zeros(len(lines), dtype=np.int64)
+    for position in range(1, len(lines)):
+        size = min(lengths[position - 1], lengths[position])
+        previous = symbols[offsets[position - 1] : offsets[position - 1] + size]
+        current = symbols[offsets[position] : offsets[position] + size]
+        different = np.flatnonzero(previous != current)
+        common[position] = different[0] if len(different) else size
+
+    levels = []
+    alive = np.flatnonzero(lengths > 0)  # Lines reaching the current depth, in order
+    nodes = np.zeros(
+        len(alive), dtype=np.int64
+    )  # Node of each of them in the last level
+    for depth in range(1, int(lengths.max(initial=0)) + 1):
+        reaching = lengths[alive] >= depth
+        alive, parents = alive[reaching], nodes[reaching]
+        starts = common[alive] < depth
+        nodes = np.cumsum(starts) - 1
+        ending = lengths[alive] == depth
+        levels.append(
+            {
+                "parents": parents[starts],
+                "codes": symbols[offsets[alive[starts]] + depth - 1],
+                "ends": nodes[ending],
+                "lines": order[alive[ending]],
+            }
+        )
+    return {
+        "levels": levels,
+        "num_nodes": sum(len(level["codes"]) for level in levels),
+        "num_lines": len(lines),
+    }
+
+
+def load_corpus(
+    feature,
+    indexes_dir=INDEXES_DIR,
+    batch_size=None,
+    cpp_compatible=False,
+    quantized=False,
+):
+    """
+    Loads the corpus of a feature for the approximate alignment: melodic lines, their
+    identifiers and the score matrix, with the distinct lines already grouped in batches.
+    Lines, identifiers and the entry of every line come from the corpus index, or from the
+    text files if there is no corpus index (identical lines are then collapsed when loading).
+    The k-gram index is opened if the index has one. Scores come from the dense cost matrix,
+    or from the cost map if the index has no cost matrix or in C++-compatible mode (where
+    symbols are keyed as the C++ program reads the cost map).
+
+    Args:
+        feature (str): Feature name ('chromatic', 'diatonic' or 'rhythm').
+        indexes_dir (str): Directory with the approximate alignment index files.
+        batch_size (int): Maximum number of lines per batch (default: BATCH_SIZE, or
+                          QUANTIZED_BATCH_SIZE in quantized mode).
+        cpp_compatible (bool): Whether to align the UTF-8 bytes as the C++ program does.
+        quantized (bool): Whether to keep the scores in int16.
+
+    Returns:
+        dict: Corpus with the line identifiers ("ids"), the encoded lines ("lines"), the
+              distinct lines ("unique_lines") and the entry of every line ("entries"), the
+              total ("num_symbols") and maximum ("max_length") length of the distinct
+              lines, the batches of distinct lines ("batches", of up to "batch_size"
+              lines) with the text positions they span ("num_steps") and their padded
+              size ("num_padded_symbols"), the score matrix ("score_matrix", int16 in
+              quantized mode), the symbol semantics ("cpp_compatible"), the k-gram
+              index ("kgram_index", or None) and the prefix trie of the distinct lines
+              ("trie", built on first use by `get_trie`).
+
+    Raises:
+        ValueError: In quantized mode, if a score of the cost map does not fit in int16.
+    """
+    files = {
+        name: os.path.join(indexes_dir, filename)
+        for name, filename in FEATURE_FILES[feature].items()
+    }
+    if os.path.isfile(files["corpus_index"]):
+        index = corpus_index.open_corpus_index(files["corpus_index"])
+        unique_lines = corpus_index.get_unique_lines(index)
+        entries = index["entries"]
+        ids = corpus_index.get_ids(index)
+        if cpp_compatible:
+            unique_lines = [
+                line.decode("latin-1").encode("utf-8") for line in unique_lines
+            ]
+        lines = [unique_lines[entry] for entry in entries.tolist()]
+    else:
+        lines = [
+            encode_sequence(line, cpp_compatible) for line in load_lines(files["text"])
+        ]
+        ids = [
+            line.decode("utf-8")
+            for line in load_lines(os.path.join(indexes_dir, IDS_FILE))
+        ]
+        unique_lines, entries = corpus_index.deduplicate(lines)
+    if cpp_compatible or not os.path.isfile(files["cost_matrix"]):
+        cost_map = utility_functions.load_cost_map(files["cost_map"])
+        score_matrix = build_score_matrix(cost_map, GAP_PENALTY, cpp_compatible)
+    else:
+        costs = cost_matrix.load_cost_matrix(files["cost_matrix"])
+        score_matrix = score_matrix_from_costs(costs, GAP_PENALTY)
+    if quantized:
+        limits = np.iinfo(np.int16)
+        if score_matrix.min() < limits.min or score_matrix.max() > limits.max:
+            raise ValueError(f"The scores of '{feature}' do not fit in int16.")
+        score_matrix = score_matrix.astype(np.int16)
+    if batch_size is None:
+        batch_size = QUANTIZED_BATCH_SIZE if quantized else BATCH_SIZE
+    # The k-gram index has one byte per symbol, so it is not used in C++-compatible mode
+    kgrams = None
+    if not cpp_compatible and os.path.isfile(files["kgram_index"]):
+        kgrams = kgram_index.open_kgram_index(files["kgram_index"])
+    return build_corpus(
+        ids,
+        lines,
+        score_matrix,
+        cpp_compatible,
+        batch_size,
+        kgrams,
+        (unique_lines, entries),
+    )
+
+
+def build_corpus(
+    ids,
+    lines,
+    score_matrix,
+    cpp_compatible,
+    batch_size,
+    kgrams=None,
+    deduplicated=None,
+):
+    """
+    Groups the distinct melodic lines of a corpus in batches and gathers the corpus fields
+    (see `load_corpus`).
+
+    Args:
+        ids (list): Identifier of every melodic line.
+        lines (list): Encoded melodic lines (bytes).
+        score_matrix (np.ndarray): Matrix of scores.
+        cpp_compatible (bool): Whether the lines are the UTF-8 bytes of the features.
+        batch_size (int): Maximum number of lines per batch.
+        kgrams (dict): k-gram index of the lines (see `kgram_index.py`), or None.
+        deduplicated (tuple): Distinct lines and entry of every line (see
+                              `corpus_index.deduplicate`), or None to collapse them here.
+
+    Returns:
+        dict: Corpus.
+    """
+    unique_lines, entries = deduplicated or corpus_index.deduplicate(lines)
+    batches = build_batches(unique_lines, batch_size)
+    return {
+        "ids": ids,
+        "lines": lines,
+        "unique_lines": unique_lines,
+        "entries": entries,
+        "num_symbols": sum(len(line) for line in unique_lines),
+        "max_length": max((len(line) for line in unique_lines), default=0),
+        "batches": batches,
+        "batch_size": batch_size,
+        "num_steps": sum(batch["codes"].shape[0] for batch in batches),
+        "num_padded_symbols": sum(batch["codes"].size for batch in batches),
+        "score_matrix": score_matrix,
+        "cpp_compatible": cpp_compatible,
+        "kgram_index": kgrams,
+        "trie": None,
+    }
+
+
+def get_trie(corpus):
+    """
+    Returns the prefix trie of the distinct melodic lines of a corpus (see `build_trie`),
+    building it the first time it is needed.
+
+    Args:
+        corpus (dict): Corpus loaded with `load_corpus`.
+
+    Returns:
+        dict: Prefix trie of the distinct lines.
+    """
+    if corpus["trie"] is None:
+        corpus["trie"] = build_trie(corpus["unique_lines"])
+    return corpus["trie"]
+
+
+def select_candidates(query, corpus, num_candidates=None, max_errors=None):
+    """
+    Selects the melodic lines to align with the k-gram index of the corpus: the lines that
+    may contain the query within max_errors edits (lossless, see
+    `kgram_index.lossless_candidates`) or, if no error budget is given, the num_candidates
+    lines sharing the most k-grams with the query.
+
+    Args:
+        query (bytes): Encoded query.
+        corpus (dict): Corpus loaded with `load_corpus`.
+        num_candidates (int): Number of candidate lines, or None.
+        max_errors (int): Error budget, or None.
+
+    Returns:
+        np.ndarray: Indexes of the candidate lines, in increasing order, or None to align
+                    every line (no prefilter requested, no k-gram index, or a query too
+                    short to discard any line).
+    """
+    kgrams = corpus["kgram_index"]
+    if kgrams is None or len(query) < kgrams["k"]:
+        return None
+    if max_errors is not None:
+        return kgram_index.lossless_candidates(kgrams, query, max_errors)
+    if num_candidates is not None:
+        return kgram_index.top_candidates(kgrams, query, num_candidates)
+    return None
+
+
+def select_lines(corpus, indexes):
+    """
+    Returns the corpus restricted to some of its melodic lines, keeping their order and
+    the distinct lines they share.
+
+    Args:
+        corpus (dict): Corpus loaded with `load_corpus`.
+        indexes (np.ndarray): Indexes of the lines kept, in increasing order.
+
+    Returns:
+        dict: Corpus with the selected lines, without k-gram index.
+    """
+    kept_entries, entries = np.unique(corpus["entries"][indexes], return_inverse=True)
+    return build_corpus(
+        [corpus["ids"][index] for index in indexes],
+        [corpus["lines"][index] for index in indexes],
+        corpus["score_matrix"],
+        corpus["cpp_compatible"],
+        corpus["batch_size"],
+        deduplicated=(
+            [corpus["unique_lines"][entry] for entry in kept_entries],
+            entries.reshape(-1),
+        ),
+    )
+
+
+def align_batch(batch, profile, gap_penalty=GAP_PENALTY):
+    """
+    Computes the fitting alignment of the query against a batch of melodic lines.
+
+    The origin of every cell is kept as a single code, text origin * (query length + 1) +
+    query origin, so it is propagated with a single gather.
+
+    Args:
+        batch (dict): Batch of melodic lines (see `build_batches`).
+        profile (np.ndarray): Query profile: scores of every text symbol (256) against every
+                              query position (int32 or int16, the type of the scores).
+        gap_penalty (int): Gap penalty.
+
+    Returns:
+        tuple: Arrays with the best score of each line, the origin (text, query) and the end
+               (text, query) positions of its best cell.
+    """
+    codes, lengths = batch["codes"], batch["lengths"]
+    num_lines = codes.shape[1]
+    query_length = profile.shape[1]
+    stride = query_length + 1
+    positions = np.arange(1, stride)
+    # Cost of reaching position j by insertions only
+    gap_offsets = (positions * gap_penalty).astype(profile.dtype)
+    row_offsets = np.arange(num_lines)[:, None] * stride
+
+    # First column of the matrix: (score -j, text origin 0, query origin j - 1)
+    scores = np.zeros((num_lines, stride), dtype=profile.dtype)
+    scores[:, 1:] = gap_offsets
+    origins = np.zeros((num_lines, stride), dtype=np.int64)
+    origins[:, 1:] = positions - 1
+
+    best_scores = np.zeros(num_lines, dtype=np.int64)
+    best_cells = np.zeros(num_lines, dtype=np.int64)
+    best_origins = np.zeros(num_lines, dtype=np.int64)
+    new_scores = np.zeros((num_lines, stride), dtype=profile.dtype)
+    local_origins = np.empty((num_lines, stride), dtype=np.int64)
+    sources = np.zeros((num_lines, stride), dtype=np.int64)
+
+    for i in range(1, codes.shape[0] + 1):
+        diagonal = scores[:, :-1] + profile[codes[i - 1]]
+        deletion = scores[:, 1:] + gap_penalty
+
+        # Insertions: H[j] = max(diagonal[j], deletion[j], H[j - 1] + gap), with H[0] = 0
+        np.maximum(diagonal, deletion, out=new_scores[:, 1:])
+        new_scores[:, 1:] -= gap_offsets
+        np.maximum.accumulate(new_scores[:, 1:], axis=1, out=new_scores[:, 1:])
+        np.maximum(new_scores[:, 1:], 0, out=new_scores[:, 1:])
+        new_scores[:, 1:] += gap_offsets
+        insertion = new_scores[:, :-1] + gap_penalty
+
+        # Choice of the C++ program: diagonal, then insertion, then deletion
+        is_diagonal = (diagonal >= insertion) & (diagonal >= deletion)
+        is_insertion = (insertion >= deletion) & ~is_diagonal
+        local_origins[:, 0] = (i - 1) * stride
+        np.copyto(local_origins[:, 1:], origins[:, 1:])
+        np.copyto(local_origins[:, 1:], origins[:, :-1], where=is_diagonal)
+
+        # Cells reached by insertions take the origin of the nearest cell on their left that
+        # was not reached by an insertion
+        np.multiply(positions, ~is_insertion, out=sources[:, 1:])
+        np.maximum.accumulate(sources[:, 1:], axis=1, out=sources[:, 1:])
+        sources += row_offsets
+        origins = local_origins.take(sources)
+        sources -= row_offsets
+        scores, new_scores = new_scores, scores
+
+        # Best cell of each line (first one in row-major order), only within the line
+        row_best = scores[:, 1:].argmax(axis=1) + 1
+        row_scores = scores.take(row_offsets[:, 0] + row_best)
+        improved = (row_scores > best_scores) & (i <= lengths)
+        if improved.any():
+            best_scores[improved] = row_scores[improved]
+            best_cells[improved] = (i - 1) * stride + row_best[improved] - 1
+            best_origins[improved] = origins.take(
+                row_offsets[improved, 0] + row_best[improved]
+            )
+
+    return (
+        best_scores,
+        np.stack(np.divmod(best_origins, stride)),
+        np.stack(np.divmod(best_cells, stride)),
+    )
+
+
+def score_batch(batch, profile, gap_penalty=GAP_PENALTY):
+    """
+    Computes the best score of the fitting alignment of the query against a batch of melodic
+    lines, and the end position of its best cell, without tracking origins.
+
+    This is the query profile kernel, in the style of Farrar's striped method: every step
+    scores a text position against all query positions at once by indexing the query
+    profile, and only the score column is kept. The dependency along the query (insertions),
+    which the striped layout resolves with its lazy-F loop, is resolved exactly with a
+    cumulative maximum. Lines are processed in increasing length, so the lines already
+    finished are dropped from the block and long lines do not pay for padding.
+
+    Args:
+        batch (dict): Batch of melodic lines (see `build_batches`).
+        profile (np.ndarray): Query profile: scores of every text symbol (256) against every
+                              query position (int32 or int16, the type of the scores).
+        gap_penalty (int): Gap penalty.
+
+    Returns:
+        tuple: Arrays with the best score of each line and the end (text, query) position of
+               its best cell.
+    """
+    codes, lengths = batch["codes"], batch["lengths"]
+    num_lines = codes.shape[1]
+    query_length = profile.shape[1]
+    # Cost of reaching position j by insertions only
+    gap_offsets = (np.arange(1, query_length + 1) * gap_penalty).astype(profile.dtype)
+
+    scores = np.zeros((num_lines, query_length + 1), dtype=profile.dtype)
+    scores[:, 1:] = gap_offsets
+    new_scores = np.zeros_like(scores)
+    best_scores = np.zeros(num_lines, dtype=np.int64)
+    best_ends = np.zeros((2, num_lines), dtype=np.int64)
+
+    first = 0  # First line not finished yet (lines are sorted by length)
+    for i in range(1, codes.shape[0] + 1):
+        if lengths[first] < i:
+            finished = np.searchsorted(lengths, i) - first
+            first += finished
+            scores, new_scores = scores[finished:], new_scores[finished:]
+
+        diagonal = scores[:, :-1] + profile[codes[i - 1, first:]]
+        np.add(scores[:, 1:], gap_penalty, out=new_scores[:, 1:])
+        np.maximum(diagonal, new_scores[:, 1:], out=new_scores[:, 1:])
+        new_scores[:, 1:] -= gap_offsets
+        np.maximum.accumulate(new_scores[:, 1:], axis=1, out=new_scores[:, 1:])
+        np.maximum(new_scores[:, 1:], 0, out=new_scores[:, 1:])
+        new_scores[:, 1:] += gap_offsets
+        scores, new_scores = new_scores, scores
+
+        # Best cell of each line (first one in row-major order)
+        row_best = scores[:, 1:].argmax(axis=1)
+        row_scores = scores[np.arange(len(row_best)), row_best + 1]
+        improved = np.flatnonzero(row_scores > best_scores[first:])
+        if len(improved):
+            best_scores[first + improved] = row_scores[improved]
+            best_ends[0, first + improved] = i - 1
+            best_ends[1, first + improved] = row_best[improved]
+
+    return best_scores, best_ends
+
+
+def align_trie(trie, profile, gap_penalty=GAP_PENALTY):
+    """
+    Computes the fitting alignment of the query against the melodic lines of a prefix trie.
+
+    The column of the dynamic programming at text position i, and the best cell found up to
+    it, only depend on the first i symbols of the line, so they are computed once per trie
+    node and shared by all the lines with that prefix. The trie is walked level by level:
+    every step gathers the columns of the parents of the nodes of a level and advances them
+    by one text position at once, as `align_batch` does for a batch of lines, with the same
+    results.
+
+    Args:
+        trie (dict): Prefix trie of the melodic lines (see `build_trie`).
+        profile (np.ndarray): Query profile (see `align_batch`).
+        gap_penalty (int): Gap penalty.
+
+    Returns:
+        tuple: Arrays with the best score of each line, the origin (text, query) and the end
+               (text, query) positions of its best cell.
+    """
+    query_length = profile.shape[1]
+    stride = query_length + 1
+    positions = np.arange(1, stride)
+    gap_offsets = (positions * gap_penalty).astype(profile.dtype)
+
+    # Root of the trie: first column of the matrix, as in `align_batch`
+    scores = np.zeros((1, stride), dtype=profile.dtype)
+    scores[:, 1:] = gap_offsets
+    origins = np.zeros((1, stride), dtype=np.int64)
+    origins[:, 1:] = positions - 1
+    best_scores = np.zeros(1, dtype=np.int64)
+    best_cells = np.zeros(1, dtype=np.int64)
+    best_origins = np.zeros(1, dtype=np.int64)
+
+    line_scores = np.zeros(trie["num_lines"], dtype=np.int64)
+    line_cells = np.zeros(trie["num_lines"], dtype=np.int64)
+    line_origins = np.zeros(trie["num_lines"], dtype=np.int64)
+    for i, level in enumerate(trie["levels"], 1):
+        parents = level["parents"]
+        scores, origins = scores[parents], origins[parents]
+        best_scores = best_scores[parents]
+        best_cells, best_origins = best_cells[parents], best_origins[parents]
+        row_offsets = np.arange(len(parents))[:, None] * stride
+
+        diagonal = scores[:, :-1] + profile[level["codes"]]
+        deletion = scores[:, 1:] + gap_penalty
+        new_scores = np.zeros_like(scores)
+        np.maximum(diagonal, deletion, out=new_scores[:, 1:])
+        new_scores[:, 1:] -= gap_offsets
+        np.maximum.accumulate(new_scores[:, 1:], axis=1, out=new_scores[:, 1:])
+        np.maximum(new_scores[:, 1:], 0, out=new_scores[:, 1:])
+        new_scores[:, 1:] += gap_offsets
+        insertion = new_scores[:, :-1] + gap_penalty
+
+        is_diagonal = (diagonal >= insertion) & (diagonal >= deletion)
+        is_insertion = (insertion >= deletion) & ~is_diagonal
+        local_origins = origins.copy()
+        local_origins[:, 0] = (i - 1) * stride
+        np.copyto(local_origins[:, 1:], origins[:, :-1], where=is_diagonal)
+        sources = np.zeros((len(parents), stride), dtype=np.int64)
+        np.multiply(positions, ~is_insertion, out=sources[:, 1:])
+        np.maximum.accumulate(sources[:, 1:], axis=1, out=sources[:, 1:])
+        origins = local_origins.take(sources + row_offsets)
+        scores = new_scores
+
+        row_best = scores[:, 1:].argmax(axis=1) + 1
+        row_scores = scores.take(row_offsets[:, 0] + row_best)
+        improved = row_scores > best_scores
+        if improved.any():
+            best_scores[improved] = row_scores[improved]
+            best_cells[improved] = (i - 1) * stride + row_best[improved] - 1
+            best_origins[improved] = origins.take(
+                row_offsets[improved, 0] + row_best[improved]
+            )
+
+        # Lines ending at this level keep the best cell of their node
+        ends, lines = level["ends"], level["lines"]
+        line_scores[lines] = best_scores[ends]
+        line_cells[lines] = best_cells[ends]
+        line_origins[lines] = best_origins[ends]
+
+    return (
+        line_scores,
+        np.stack(np.divmod(line_origins, stride)),
+        np.stack(np.divmod(line_cells, stride)),
+    )
+
+
+def select_top(best_scores, top_n=TOP_N):
+    """
+    Selects the Top N melodic lines by score, as `update_top_alignments` does: higher scores
+    first and, on ties, later lines first. Only lines with a score greater than 0 count.
+
+    Args:
+        best_scores (np.ndarray): Best score of every melodic line of the corpus.
+        top_n (int): Number of melodic lines selected.
+
+    Returns:
+        np.ndarray: Indexes of the selected lines, best first.
+    """
+    indexes = np.flatnonzero(best_scores > 0)
+    order = np.lexsort((-indexes, -best_scores[indexes]))
+    return indexes[order[:top_n]]
+
+
+def corpus_scores(corpus, profile, kernel):
+    """
+    Runs a kernel on every batch of the corpus and gathers its results per distinct melodic
+    line (see `load_corpus`).
+
+    Args:
+        corpus (dict): Corpus loaded with `load_corpus`.
+        profile (np.ndarray): Query profile (see `align_batch`).
+        kernel (str): 'batch' (`align_batch`), 'profile' (`score_batch`, without origins) or
+                      'trie' (`align_trie`, over the prefix trie instead of the batches).
+
+    Returns:
+        tuple: Arrays with the best score, the origin (text, query; None with the 'profile'
+               kernel) and the end (text, query) position of every distinct line.
+    """
+    if kernel == "trie":
+        return align_trie(get_trie(corpus), profile)
+    num_lines = len(corpus["unique_lines"])
+    best_scores = np.zeros(num_lines, dtype=np.int64)
+    best_origins = np.zeros((2, num_lines), dtype=np.int64)
+    best_ends = np.zeros((2, num_lines), dtype=np.int64)
+    for batch in corpus["batches"]:
+        indexes = batch["indexes"]
+        if kernel == "batch":
+            scores, origins, ends = align_batch(batch, profile)
+            best_origins[:, indexes] = origins
+        else:
+            scores, ends = score_batch(batch, profile)
+        best_scores[indexes] = scores
+        best_ends[:, indexes] = ends
+    return best_scores, best_origins if kernel == "batch" else None, best_ends
+
+
+def select_kernel(query_length, corpus):
+    """
+    Selects the alignment kernel from the sequence lengths, estimating the cost of each one
+    with `KERNEL_COSTS`. Both kernels take a step per text position of every batch, but the
+    'batch' kernel computes the cells of the padding of its batches, while the 'profile'
+    kernel drops the lines already finished. The 'profile' kernel only keeps scores and
+    recomputes the origins of the Top N lines afterwards with `align_batch`, which takes as
+    many steps as the longest of those lines, so it pays off unless the query is short and
+    the corpus has few, long melodic lines. The 'trie' kernel is only used when requested.
+
+    Args:
+        query_length (int): Number of symbols of the query.
+        corpus (dict): Corpus loaded with `load_corpus`.
+
+    Returns:
+        str: 'batch' or 'profile'.
+    """
+    batch_cost = (
+        KERNEL_COSTS["batch"]["step"] * corpus["num_steps"]
+        + KERNEL_COSTS["batch"]["cell"] * query_length * corpus["num_padded_symbols"]
+    )
+    profile_cost = (
+        KERNEL_COSTS["profile"]["step"] * corpus["num_steps"]
+        + KERNEL_COSTS["profile"]["cell"] * query_length * corpus["num_symbols"]
+        + KERNEL_COSTS["batch"]["step"] * corpus["max_length"]
+    )
+    return "profile" if profile_cost <= batch_cost else "batch"
+
+
+def fits_int16(profile, gap_penalty=GAP_PENALTY):
+    """
+    Checks whether the dynamic programming of a query fits in int16 scores. Scores stay
+    between the query length times the gap penalty and the query length times the best
+    match, and intermediate values add at most a match, a mismatch and a query length of gap
+    penalties to them.
+
+    Args:
+        profile (np.ndarray): Query profile.
+        gap_penalty (int): Gap penalty.
+
+    Returns:
+        bool: True if no value can overflow int16.
+    """
+    query_length = profile.shape[1]
+    best = max(int(profile.max()), 0)
+    worst = max(-int(profile.min()), abs(gap_penalty))
+    bound = (query_length + 1) * (best + abs(gap_penalty)) + worst
+    return bound <= np.iinfo(np.int16).max
+
+
+def align(
+    query, corpus, top_n=TOP_N, kernel=None, num_candidates=None, max_errors=None
+):
+    """
+    Computes the approximate alignment of a query against the corpus and returns the Top N
+    melodic lines. Every distinct line is aligned once, and its results are shared by all
+    the melodic lines with the same sequence.
+
+    Args:
+        query (str): Query feature in single-character notation.
+        corpus (dict): Corpus loaded with `load_corpus`.
+        top_n (int): Number of melodic lines returned.
+        kernel (str): 'batch', 'profile' (see `select_kernel`) or 'trie' (see
+                      `align_trie`), or None to select between the first two from the
+                      sequence lengths. All give the same results.
+        num_candidates (int): Align only this number of lines, those sharing the most
+                              k-grams with the query (see `select_candidates`).
+        max_errors (int): Align only the lines that may contain the query within this number
+                          of edits (see `select_candidates`).
+
+    Notes:
+        With a quantized corpus, queries that could overflow int16 are aligned with int32
+        scores.
+
+    Returns:
+        dict: Results with the fields of the JSON written by the C++ program ("query" and
+              "alignment" with "score_ids", "scores", "score_origin_pos", "query_origin_pos",
+              "score_end_pos" and "query_end_pos"), as read by
+              `launch_query.extract_alignment_results`.
+    """
+    symbols = np.frombuffer(
+        encode_sequence(query, corpus["cpp_compatible"]), dtype=np.uint8
+    )
+    if len(symbols) and (num_candidates is not None or max_errors is not None):
+        candidates = select_candidates(
+            symbols.tobytes(), corpus, num_candidates, max_errors
+        )
+        if candidates is not None:
+            corpus = select_lines(corpus, candidates)
+    top = top_entries = np.zeros(0, dtype=np.int64)
+    if len(symbols) and corpus["lines"]:
+        profile = corpus["score_matrix"][:, symbols]
+        if profile.dtype == np.int16 and not fits_int16(profile):
+            profile = profile.astype(np.int32)
+        kernel = kernel or select_kernel(len(symbols), corpus)
+        best_scores, best_origins, best_ends = corpus_scores(corpus, profile, kernel)
+
+        # Expand the scores of the distinct lines to every melodic line
+        top = select_top(best_scores[corpus["entries"]], top_n)
+        top_entries = corpus["entries"][top]
+
+        # The 'profile' kernel does not keep origins: realign the Top N lines to get them
+        if kernel == "profile" and len(top):
+            realigned = np.unique(top_entries)
+            batch = build_batches(
+                [corpus["unique_lines"][entry] for entry in realigned], len(realigned)
+            )[0]
+            _, top_origins, _ = align_batch(batch, profile)
+            best_origins = np.zeros((2, len(best_scores)), dtype=np.int64)
+            best_origins[:, realigned[batch["indexes"]]] = top_origins
+
+    return {
+        "query": query,
+        "alignment": {
+            "score_ids": [corpus["ids"][index] for index in top],
+            "scores": [float(best_scores[entry]) for entry in top_entries],
+            "score_origin_pos": [int(best_origins[0, entry]) for entry in top_entries],
+            "query_origin_pos": [int(best_origins[1, entry]) for entry in top_entries],
+            "score_end_pos": [int(best_ends[0, entry]) for entry in top_entries],
+            "query_end_pos": [int(best_ends[1, entry]) for entry in top_entries],
+        },
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Compute the approximate alignment of a query in-process."
+    )
+    parser.add_argument(
+        "query", help="JSON file with the query features (see 'query_features.py')."
+    )
+    parser.add_argument(
+        "-f",
+        "--feature",
+        choices=list(FEATURE_FILES),
+        required=True,
+        help="Feature to align.",
+    )
+    parser.add_argument(
+        "-i",
+        "--indexes_dir",
+        default=INDEXES_DIR,
+        help="Directory with the approximate alignment index files.",
+    )
+    parser.add_argument(
+        "--cpp_compatible",
+        action="store_true",
+        help="Align the UTF-8 bytes of the features as the C++ program does.",
+    )
+    parser.add_argument(
+        "-k",
+        "--kernel",
+        choices=KERNELS,
+        help="Alignment kernel (default: selected from the sequence lengths).",
+    )
+    parser.add_argument(
+        "--quantized",
+        action="store_true",
+        help="Keep the alignment scores in int16.",
+    )
+    prefilter = parser.add_mutually_exclusive_group()
+    prefilter.add_argument(
+        "-c",
+        "--candidates",
+        type=int,
+        nargs="?",
+        const=NUM_CANDIDATES,
+        help="Align only the lines sharing the most k-grams with the query "
+        f"(default number of lines: {NUM_CANDIDATES}).",
+    )
+    prefilter.add_argument(
+        "-e",
+        "--max_errors",
+        type=int,
+        help="Align only the lines that may contain the query within this number of edits.",
+    )
+    args = parser.parse_args()
+
+    with open(args.query, "r", encoding="utf8") as file:
+        query = json.load(file)["notations"]["approximate"][args.feature]
+    corpus = load_corpus(
+        args.feature,
+        args.indexes_dir,
+        cpp_compatible=args.cpp_compatible,
+        quantized=args.quantized,
+    )
+    results = align(
+        query,
+        corpus,
+        kernel=args.kernel,
+        num_candidates=args.candidates,
+        max_errors=args.max_errors,
+    )
+    print(json.dumps(results, indent=2))
@@ -0,0 +1,160 @@
+"""
+BSD 2-Clause License
+
+Copyright (c) 2024, Hilda Romero-Velo
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+
+* Redistributions of source code must retain the above copyright notice, this
+  list of conditions and the following disclaimer.
+
+* Redistributions in binary form must reproduce the above copyright notice, this
+  list of conditions and the following disclaimer in the documentation
+  and/or other materials provided with the distribution.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+
+"""
+This module computes the chromatic and diatonic query features directly from the note
+pitches of a MIDI file, as an alternative to the Humdrum chain (mid2hum, humsed,
+mint/semits, xdelta) of the query path (`extract_query_feature.sh --from_midi`):
+
+    - Chromatic feature: semitone difference between consecutive notes, dropping zeros
+      (no change in pitch), as `semits -x` followed by `xdelta -s ^=`.
+    - Diatonic feature: signed diatonic interval number between consecutive notes (+2 for
+      an ascending second, -3 for a descending third...), dropping unisons, as `mint -d`.
+      Pitches are spelled with sharps only, as done by mid2hum, so that e.g. C to C# is a
+      unison and is dropped.
+
+Notes are taken track by track (instrument by instrument) in onset order, as done for the
+rhythm feature. Chords (several notes starting at the same time in a track) are dropped,
+since the Humdrum analyses do not produce a single interval for them.
+
+The features are returned in the same format as `extract_feature` (semicolon-separated
+integers), ready for `to_single_notation`.
+"""
+
+import os
+import sys
+
+import numpy as np
+
+sys.path.append(
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "../../common")
+)
+import midi_reader
+
+# Diatonic step (C=0 ... B=6) of each pitch class, spelling accidentals with sharps
+SHARP_SPELLING_STEPS = [0, 0, 1, 1, 2, 3, 3, 4, 4, 5, 5, 6]
+
+
+def extract_melodies(midi):
+    """
+    Extracts the sequence of note pitches of every track of a MIDI file, dropping chords.
+
+    Args:
+        midi (str or dict): Path to the MIDI file, or the file parsed by `midi_reader`.
+
+    Returns:
+        list: One list of MIDI pitches per track, in onset order.
+    """
+    data = midi if isinstance(midi, dict) else midi_reader.read_midi(midi)
+    melodies = []
+    for notes in midi_reader.split_instruments(data["notes"], include_drums=False):
+        notes = notes[np.argsort(notes["onset_tick"], kind="stable")]
+        onsets, counts = np.unique(notes["onset_tick"], return_counts=True)
+        single = np.isin(notes["onset_tick"], onsets[counts == 1])
+        melodies.append(notes["pitch"][single].astype(int).tolist())
+    return melodies
+
+
+def diatonic_number(pitch):
+    """
+    Returns the absolute diatonic position of a MIDI pitch spelled with sharps.
+
+    Args:
+        pitch (int): MIDI pitch.
+
+    Returns:
+        int: Diatonic position (7 steps per octave).
+    """
+    return (pitch // 12) * 7 + SHARP_SPELLING_STEPS[pitch % 12]
+
+
+def chromatic_intervals(melodies):
+    """
+    Computes the semitone differences between consecutive notes, dropping zeros.
+
+    Args:
+        melodies (list): One list of MIDI pitches per track (see `extract_melodies`).
+
+    Returns:
+        list: Semitone differences (int).
+    """
+    return [
+        current - previous
+        for melody in melodies
+        for previous, current in zip(melody, melody[1:])
+        if current != previous
+    ]
+
+
+def diatonic_intervals(melodies):
+    """
+    Computes the signed diatonic interval numbers between consecutive notes, dropping unisons.
+
+    Args:
+        melodies (list): One list of MIDI pitches per track (see `extract_melodies`).
+
+    Returns:
+        list: Diatonic interval numbers (int), e.g. 2 for an ascending second.
+    """
+    intervals = []
+    for melody in melodies:
+        for previous, current in zip(melody, melody[1:]):
+            steps = diatonic_number(current) - diatonic_number(previous)
+            if steps != 0:
+                intervals.append(steps + 1 if steps > 0 else steps - 1)
+    return intervals
+
+
+def extract_chromatic_from_midi(midi_path):
+    """
+    Computes the chromatic feature of a MIDI file.
+
+    Args:
+        midi_path (str): Path to the MIDI file.
+
+    Returns:
+        str: Semitone differences separated by semicolons, zeros excluded.
+    """
+    return "".join(
+        f"{step};" for step in chromatic_intervals(extract_melodies(midi_path))
+    )
+
+
+def extract_diatonic_from_midi(midi_path):
+    """
+    Computes the diatonic feature of a MIDI file.
+
+    Args:
+        midi_path (str): Path to the MIDI file.
+
+    Returns:
+        str: Signed diatonic interval numbers separated by semicolons, unisons excluded.
+    """
+    return "".join(
+        f"{step};" for step in diatonic_intervals(extract_melodies(midi_path))
+    )
@@ -0,0 +1,290 @@
+"""
+BSD 2-Clause License
+
+Copyright (c) 2024, Hilda Romero-Velo
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+
+* Redistributions of source code must retain the above copyright notice, this
+  list of conditions and the following disclaimer.
+
+* Redistributions in binary form must reproduce the above copyright notice, this
+  list of conditions and the following disclaimer in the documentation
+  and/or other materials provided with the distribution.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+
+"""
+This module implements a lightweight transcription backend for monophonic queries (gaita,
+flute, whistle, voice, violin, trumpet...). It replaces the polyphonic neural transcriber
+by a vectorized YIN fundamental frequency tracker followed by onset segmentation, written
+in NumPy:
+
+    1. The signal is split into overlapping frames, and the YIN cumulative mean normalized
+       difference of every frame is computed at once with FFT cross-correlations.
+    2. Each frame gets the first period below the YIN threshold (refined by parabolic
+       interpolation); frames without one, or too quiet, are unvoiced.
+    3. The f0 track is converted to MIDI pitches and median filtered to remove vibrato and
+       octave glitches.
+    4. Notes are runs of voiced frames with the same pitch, additionally split at energy
+       onsets so that repeated notes are kept apart. Notes shorter than the minimum note
+       length are discarded.
+
+Example usage:
+    python3 monophonic_transcription.py path/to/query.wav -o path/to/query.mid
+"""
+
+import argparse
+import os
+import sys
+
+import numpy as np
+
+import audio_decoding
+
+# Settings of the YIN tracker and of the note segmentation
+YIN_SETTINGS = {
+    "max_sample_rate": 22050,  # Signals are downsampled to at most this rate (Hz)
+    "frame_length": 1024,  # Analysis frame length (samples)
+    "hop_length": 256,  # Hop between frames (samples)
+    "fmin": 65.0,  # Lowest detectable f0 (Hz)
+    "fmax": 2100.0,  # Highest detectable f0 (Hz)
+    "threshold": 0.15,  # YIN absolute threshold
+    "silence_db": -40.0,  # Frames quieter than this (dB below the loudest frame) are unvoiced
+    "median_frames": 5,  # Length of the median filter applied to the pitch track
+    "onset_db": 6.0,  # Energy rise (dB over two frames) marking a new onset
+    "minimum_note_length": 127.70,  # Minimum note length (ms), as in basic-pitch
+}
+
+
+def frame_signal(signal, frame_length, hop_length):
+    """
+    Splits a signal into overlapping frames centered at multiples of the hop length, padding
+    both ends with zeros.
+
+    Args:
+        signal (numpy.ndarray): Mono signal.
+        frame_length (int): Frame length in samples.
+        hop_length (int): Hop between frames in samples.
+
+    Returns:
+        numpy.ndarray: Frames of shape (n_frames, frame_length).
+    """
+    n_frames = max(1, int(np.ceil(len(signal) / hop_length)))
+    padded = np.zeros((n_frames - 1) * hop_length + frame_length, dtype=np.float32)
+    offset = frame_length // 2
+    padded[offset : offset + len(signal)] = signal[: len(padded) - offset]
+    return np.lib.stride_tricks.sliding_window_view(padded, frame_length)[::hop_length]
+
+
+def cumulative_mean_normalized_difference(frames, tau_max):
+    """
+    Computes the YIN cumulative mean normalized difference function of every frame.
+
+    Args:
+        frames (numpy.ndarray): Frames of shape (n_frames, frame_length).
+        tau_max (int): Largest lag to evaluate.
+
+    Returns:
+        numpy.ndarray: Normalized difference of shape (n_frames, tau_max + 1).
+    """
+    frame_length = frames.shape[1]
+    window = frame_length - tau_max  # Integration window
+    n_fft = 1 << int(np.ceil(np.log2(frame_length + window)))
+
+    # Cross-correlation of the first window of each frame with the whole frame
+    head = np.fft.rfft(frames[:, :window], n_fft)
+    full = np.fft.rfft(frames, n_fft)
+    correlation = np.fft.irfft(np.conj(head) * full, n_fft)[:, : tau_max + 1]
+
+    # Energy of the window starting at each lag
+    squares = np.concatenate(
+        [np.zeros((len(frames), 1)), np.cumsum(frames.astype(np.float64) ** 2, axis=1)],
+        axis=1,
+    )
+    lags = np.arange(tau_max + 1)
+    energy = squares[:, lags + window] - squares[:, lags]
+
+    difference = np.maximum(energy[:, :1] + energy - 2 * correlation, 0)
+    cumulative = np.cumsum(difference[:, 1:], axis=1)
+    normalized = np.ones_like(difference)
+    normalized[:, 1:] = difference[:, 1:] * lags[1:] / np.maximum(cumulative, 1e-12)
+    return normalized
+
+
+def track_f0(signal, sample_rate, settings=YIN_SETTINGS):
+    """
+    Estimates the fundamental frequency of every frame with the YIN algorithm.
+
+    Args:
+        signal (numpy.ndarray): Mono signal.
+        sample_rate (float): Sample rate of the signal.
+        settings (dict): YIN settings.
+
+    Returns:
+        tuple: (f0 in Hz per frame, with 0 for unvoiced frames; RMS energy per frame in dB,
+                measured over two hops around the frame center)
+    """
+    frames = frame_signal(signal, settings["frame_length"], settings["hop_length"])
+    tau_min = max(2, int(np.floor(sample_rate / settings["fmax"])))
+    tau_max = min(
+        settings["frame_length"] // 2, int(np.ceil(sample_rate / settings["fmin"]))
+    )
+    normalized = cumulative_mean_normalized_difference(frames, tau_max)
+
+    # First lag below the threshold that is a local minimum of the difference function
+    candidates = normalized[:, tau_min:tau_max]
+    is_minimum = candidates <= normalized[:, tau_min + 1 : tau_max + 1]
+    below = (candidates < settings["threshold"]) & is_minimum
+    voiced = below.any(axis=1)
+    tau = np.argmax(below, axis=1) + tau_min
+
+    # Parabolic interpolation around the selected lag
+    rows = np.arange(len(frames))
+    left = normalized[rows, tau - 1]
+    center = normalized[rows, tau]
+    right = normalized[rows, tau + 1]
+    denominator = left - 2 * center + right
+    shift = np.where(
+        np.abs(denominator) > 1e-12, 0.5 * (left - right) / denominator, 0.0
+    )
+    refined_tau = tau + np.clip(shift, -1, 1)
+
+    center = settings["frame_length"] // 2
+    hop = settings["hop_length"]
+    around_center = frames[:, center - hop : center + hop].astype(np.float64)
+    rms = np.sqrt(np.mean(around_center**2, axis=1))
+    rms_db = 20 * np.log10(np.maximum(rms, 1e-10))
+    voiced &= rms_db > rms_db.max() + settings["silence_db"]
+    f0 = np.where(voiced, sample_rate / refined_tau, 0.0)
+    return f0, rms_db
+
+
+def median_filter(values, size):
+    """
+    Applies a centered median filter, repeating the edge values.
+
+    Args:
+        values (numpy.ndarray): 1D array.
+        size (int): Odd filter length.
+
+    Returns:
+        numpy.ndarray: Filtered array.
+    """
+    if size <= 1 or len(values) == 0:
+        return values
+    half = size // 2
+    padded = np.pad(values, half, mode="edge")
+    return np.median(np.lib.stride_tricks.sliding_window_view(padded, size), axis=1)
+
+
+def segment_notes(f0, rms_db, frame_rate, settings=YIN_SETTINGS):
+    """
+    Segments an f0 track into note events.
+
+    Args:
+        f0 (numpy.ndarray): f0 in Hz per frame (0 for unvoiced frames).
+        rms_db (numpy.ndarray): RMS energy per frame in dB.
+        frame_rate (float): Frames per second.
+        settings (dict): Segmentation settings.
+
+    Returns:
+        list: Note events (start, end, pitch, amplitude) in seconds.
+    """
+    voiced = f0 > 0
+    midi = np.zeros(len(f0))
+    midi[voiced] = 69 + 12 * np.log2(f0[voiced] / 440.0)
+    pitch = np.where(
+        voiced, np.round(median_filter(midi, settings["median_frames"])), 0
+    )
+    # Median filtering must not make unvoiced frames voiced (or vice versa)
+    pitch = np.where(voiced, pitch, 0).astype(int)
+
+    # Note boundaries: pitch or voicing changes, and energy onsets
+    rise = np.zeros(len(rms_db), dtype=bool)
+    rise[2:] = rms_db[2:] - rms_db[:-2] > settings["onset_db"]
+    onset = rise & ~np.concatenate([[False], rise[:-1]])  # First frame of each rise
+    boundary = np.ones(len(pitch), dtype=bool)
+    boundary[1:] = (pitch[1:] != pitch[:-1]) | onset[1:]
+    starts = np.flatnonzero(boundary)
+    ends = np.append(starts[1:], len(pitch))
+
+    min_frames = settings["minimum_note_length"] / 1000 * frame_rate
+    loudest = rms_db.max() if len(rms_db) else 0.0
+    notes = []
+    for start, end in zip(starts, ends):
+        if pitch[start] == 0 or end - start < min_frames:
+            continue
+        level = np.mean(rms_db[start:end]) - loudest  # dB below the loudest frame
+        amplitude = float(np.clip(1 + level / -settings["silence_db"], 0.05, 1.0))
+        notes.append(
+            (start / frame_rate, end / frame_rate, int(pitch[start]), amplitude)
+        )
+    return notes
+
+
+def transcribe_signal(signal, sample_rate, settings=YIN_SETTINGS):
+    """
+    Transcribes a monophonic signal into note events.
+
+    Args:
+        signal (numpy.ndarray): Mono signal.
+        sample_rate (int): Sample rate of the signal.
+        settings (dict): YIN and segmentation settings.
+
+    Returns:
+        list: Note events (start, end, pitch, amplitude) in seconds.
+    """
+    signal, sample_rate = audio_decoding.downsample(
+        signal, sample_rate, settings["max_sample_rate"]
+    )
+    f0, rms_db = track_f0(signal, sample_rate, settings)
+    return segment_notes(f0, rms_db, sample_rate / settings["hop_length"], settings)
+
+
+def transcribe_file(audio_path, midi_path, settings=YIN_SETTINGS):
+    """
+    Transcribes a monophonic WAV file into a MIDI file.
+
+    Args:
+        audio_path (str): Path to the WAV file to transcribe.
+        midi_path (str): Path where the resulting MIDI file is saved.
+        settings (dict): YIN and segmentation settings.
+
+    Returns:
+        list: Note events (start, end, pitch, amplitude) in seconds.
+    """
+    import chunked_transcription
+
+    signal, sample_rate = audio_decoding.load_wav(audio_path)
+    notes = transcribe_signal(signal, sample_rate, settings)
+    chunked_transcription.notes_to_midi(notes, midi_path)
+    return notes
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Transcribe a monophonic WAV file into MIDI with a YIN pitch tracker."
+    )
+    parser.add_argument("audio", help="Path to the WAV file to transcribe.")
+    parser.add_argument(
+        "-o", "--output", required=True, help="Path of the resulting MIDI file."
+    )
+    args = parser.parse_args()
+
+    if not os.path.isfile(args.audio):
+        print(f"Error: File {args.audio} does not exist.", file=sys.stderr)
+        sys.exit(1)
+    transcribe_file(args.audio, args.output)
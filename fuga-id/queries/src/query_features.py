@@ -0,0 +1,398 @@
+"""
+BSD 2-Clause License
+
+Copyright (c) 2024, Hilda Romero-Velo
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+
+* Redistributions of source code must retain the above copyright notice, this
+  list of conditions and the following disclaimer.
+
+* Redistributions in binary form must reproduce the above copyright notice, this
+  list of conditions and the following disclaimer in the documentation
+  and/or other materials provided with the distribution.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+
+"""
+This module extracts every query feature from a single parse of the query. The query MIDI
+(transcribed once if the query is a WAV file) is read once, and the chromatic, diatonic and
+rhythm features are computed from it and translated into the single-character notations of
+both alignment methods (`approx_dictionary` and `blast_dictionary`). The chromatic and
+diatonic intervals are computed with the Humdrum toolchain, as `extract_query_feature.sh`
+does, or directly from the MIDI note pitches with `from_midi` (see `midi_intervals.py`).
+
+The result is a dictionary that can be saved as JSON:
+
+    {
+        "query": "<query file name without extension>",
+        "raw": {"chromatic": [3, -2, ...], "diatonic": [3, -2, ...], "rhythm": ["1/2", ...]},
+        "notations": {
+            "approximate": {"chromatic": "...", "diatonic": "...", "rhythm": "..."},
+            "blast": {"chromatic": "...", "diatonic": "...", "rhythm": "..."}
+        }
+    }
+
+`extract_query_feature.sh` accepts such a JSON file as query, so the searches of a query can
+share a single feature extraction (see `launch_query.py`).
+
+Usage:
+    python3 query_features.py <wav_or_midi_file> [-b <backend>] [-o <json_file>]
+                              [--from_midi]
+    python3 query_features.py <json_file> -f <feature> -m <method>
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+import numpy as np
+
+sys.path.append(
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "../../common")
+)
+sys.path.append(
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "../../common/dicts")
+)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "../utils"))
+import approx_dictionary
+import blast_dictionary
+import transcribe_audio
+import midi_reader
+import notation_codec
+from constants import RATIOS_NUMS
+from utility_functions import extract_feature
+from midi_intervals import chromatic_intervals, diatonic_intervals, extract_melodies
+
+FEATURES = ["chromatic", "diatonic", "rhythm"]
+METHODS = {"approximate": approx_dictionary, "blast": blast_dictionary}
+FEATURE_DICTIONARIES = {
+    "chromatic": "CHROMATIC_DIC",
+    "diatonic": "DIATONIC_DIC",
+    "rhythm": "RHYTHM_DIC",
+}
+
+# Predefined rhythm ratios sorted by value, with their position in RATIOS_NUMS to break ties
+# between equidistant ratios as `min(RATIOS_NUMS, ...)` does (first one in RATIOS_NUMS wins)
+SORTED_RATIOS = sorted(RATIOS_NUMS)
+RATIO_VALUES = np.array([float(ratio) for ratio in SORTED_RATIOS])
+RATIO_ORDER = np.array([RATIOS_NUMS.index(ratio) for ratio in SORTED_RATIOS])
+RATIO_LABELS = [str(ratio) for ratio in SORTED_RATIOS]
+
+
+def durations_to_ticks(midi_data, durations):
+    """
+    Converts note durations to ticks at once, replicating `PrettyMIDI.time_to_tick` (each
+    duration is converted as if it were an absolute time, as done per note before).
+
+    Args:
+        midi_data (dict): MIDI file parsed by `midi_reader`.
+        durations (numpy.ndarray): Note durations in seconds.
+
+    Returns:
+        numpy.ndarray: Durations in ticks (int64).
+    """
+    tick_to_time = midi_data["tick_to_time"]
+    last_tick = len(tick_to_time) - 1
+
+    # Nearest tick, keeping the later one when both neighbours are equally close
+    ticks = np.searchsorted(tick_to_time, durations, side="left")
+    previous = np.abs(durations - tick_to_time[np.maximum(ticks - 1, 0)])
+    following = np.abs(durations - tick_to_time[np.minimum(ticks, last_tick)])
+    ticks = np.where((ticks > 0) & (previous < following), ticks - 1, ticks)
+
+    # Durations beyond the map are extrapolated with the final tempo
+    beyond = ticks > last_tick
+    if beyond.any():
+        final_tick_scale = midi_data["tempo_map"]["tick_scale"][-1]
+        ticks[beyond] = np.round(
+            last_tick + (durations[beyond] - tick_to_time[last_tick]) / final_tick_scale
+        )
+    return ticks.astype(np.int64)
+
+
+def quantize_ratios(ratios):
+    """
+    Rounds duration ratios to the closest predefined ratio.
+
+    Args:
+        ratios (numpy.ndarray): Duration ratios.
+
+    Returns:
+        numpy.ndarray: Indexes of the closest ratios in RATIO_LABELS.
+    """
+    upper = np.clip(np.searchsorted(RATIO_VALUES, ratios), 1, len(RATIO_VALUES) - 1)
+    lower = upper - 1
+    lower_distance = np.abs(RATIO_VALUES[lower] - ratios)
+    upper_distance = np.abs(RATIO_VALUES[upper] - ratios)
+    take_lower = (lower_distance < upper_distance) | (
+        (lower_distance == upper_distance) & (RATIO_ORDER[lower] < RATIO_ORDER[upper])
+    )
+    return np.where(take_lower, lower, upper)
+
+
+def rhythm_ratios(midi_data):
+    """
+    Computes the duration ratios between consecutive notes of every track, rounded to the
+    closest predefined ratio.
+
+    Args:
+        midi_data (dict): MIDI file parsed by `midi_reader`.
+
+    Returns:
+        list: Closest predefined ratios (str), e.g. "1/2".
+    """
+    ratios = []
+    for notes in midi_reader.split_instruments(midi_data["notes"]):
+        # Skip tracks with fewer than 2 notes, as we cannot compute a ratio with just one note
+        if len(notes) < 2:
+            continue
+
+        durations = notes["offset"] - notes["onset"]
+        ticks = durations_to_ticks(midi_data, durations)
+
+        # Ratio between consecutive notes, skipping notes of zero ticks (division by zero)
+        current, following = ticks[:-1], ticks[1:]
+        valid = current != 0
+        closest = quantize_ratios(following[valid] / current[valid])
+        ratios.extend(RATIO_LABELS[index] for index in closest)
+    return ratios
+
+
+def rhythm_ratios_batch(midi_paths):
+    """
+    Computes the rhythm ratios of many MIDI files.
+
+    Args:
+        midi_paths (list): Paths to the MIDI files.
+
+    Returns:
+        list: Rhythm ratios of each file (see `rhythm_ratios`), in the same order.
+    """
+    return [rhythm_ratios(midi_reader.read_midi(path)) for path in midi_paths]
+
+
+def humdrum_intervals(midi_path):
+    """
+    Computes the chromatic and diatonic intervals of a MIDI file with the Humdrum toolchain
+    (mid2hum, humsed, semits and xdelta, or mint), as `extract_query_feature.sh` does.
+
+    Args:
+        midi_path (str): Path to the MIDI file.
+
+    Returns:
+        tuple: Semitone differences (zeros excluded) and diatonic interval numbers (unisons
+               excluded), as lists of int.
+
+    Raises:
+        subprocess.CalledProcessError: If a Humdrum tool fails.
+        FileNotFoundError: If a Humdrum tool is not installed.
+    """
+
+    def run(command, output_path):
+        with open(output_path, "w", encoding="utf8") as output:
+            subprocess.run(
+                command, stdout=output, stderr=subprocess.DEVNULL, check=True
+            )
+
+    def read_analysis(analysis_path, ignore_value):
+        values = extract_feature(analysis_path, ignore_value=ignore_value)
+        return [int(step) for step in values.split(";")[:-1]]
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        kern = os.path.join(tmp_dir, "query_kern.krn")
+        kern_wor = os.path.join(tmp_dir, "query_kern_wor.krn")
+        kern_cleaned = os.path.join(tmp_dir, "query_kern_cleaned.krn")
+        semits = os.path.join(tmp_dir, "query_semits.sem")
+        chromatic = os.path.join(tmp_dir, "query_chromatic_analysis.txt")
+        diatonic = os.path.join(tmp_dir, "query_diatonic_analysis.txt")
+
+        run(["mid2hum", midi_path], kern)
+        run(["humsed", "/r/d", kern], kern_wor)
+        run(["humsed", "/-/d", kern_wor], kern_cleaned)
+        run(["semits", "-x", kern_cleaned], semits)
+        run(["xdelta", "-s", "^=", semits], chromatic)
+        run(["mint", "-d", kern_cleaned], diatonic)
+
+        return read_analysis(chromatic, 0), read_analysis(diatonic, 1)
+
+
+def compute_raw_features(midi_path, from_midi=False):
+    """
+    Computes the numeric values of every feature from a single parse of a MIDI file.
+
+    Args:
+        midi_path (str): Path to the MIDI file.
+        from_midi (bool): Compute the chromatic and diatonic intervals directly from the
+                          MIDI note pitches instead of with the Humdrum toolchain.
+
+    Returns:
+        dict: Feature name to list of values.
+    """
+    midi_data = midi_reader.read_midi(midi_path)
+    if from_midi:
+        melodies = extract_melodies(midi_data)
+        chromatic, diatonic = chromatic_intervals(melodies), diatonic_intervals(
+            melodies
+        )
+    else:
+        chromatic, diatonic = humdrum_intervals(midi_path)
+    return {
+        "chromatic": chromatic,
+        "diatonic": diatonic,
+        "rhythm": rhythm_ratios(midi_data),
+    }
+
+
+def to_notations(raw_features):
+    """
+    Translates the numeric feature values into the single-character notation of every
+    alignment method.
+
+    Args:
+        raw_features (dict): Feature name to list of values (see `compute_raw_features`).
+
+    Returns:
+        dict: Method name to a dictionary of feature name to notation.
+    """
+    notations = {}
+    for method, dictionary in METHODS.items():
+        notations[method] = {
+            feature: notation_codec.to_text(
+                notation_codec.encode_values(
+                    raw_features[feature],
+                    getattr(dictionary, FEATURE_DICTIONARIES[feature]),
+                )
+            )
+            for feature in FEATURES
+        }
+    return notations
+
+
+def extract_query_features(query_path, backend=None, from_midi=False):
+    """
+    Extracts every feature of a query, transcribing it first if it is a WAV file.
+
+    Args:
+        query_path (str): Path to the WAV or MIDI query.
+        backend (str): Transcription backend for WAV queries (default backend if None).
+        from_midi (bool): Compute the chromatic and diatonic intervals directly from the
+                          MIDI note pitches instead of with the Humdrum toolchain.
+
+    Returns:
+        dict: Query name, raw feature values and notations (see module docstring).
+    """
+    name, extension = os.path.splitext(os.path.basename(query_path))
+    if extension.lower() == ".wav":
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            midi_path = os.path.join(tmp_dir, f"{name}_basic_pitch.mid")
+            transcribe_audio.transcribe(
+                query_path,
+                midi_path,
+                backend=backend or transcribe_audio.DEFAULT_BACKEND,
+            )
+            raw_features = compute_raw_features(midi_path, from_midi)
+    else:
+        raw_features = compute_raw_features(query_path, from_midi)
+    return {
+        "query": name,
+        "raw": raw_features,
+        "notations": to_notations(raw_features),
+    }
+
+
+def save_query_features(features, json_path):
+    """
+    Saves the features of a query to a JSON file.
+
+    Args:
+        features (dict): Query features (see `extract_query_features`).
+        json_path (str): Path to the JSON file.
+    """
+    with open(json_path, "w", encoding="utf8") as file:
+        json.dump(features, file, ensure_ascii=False)
+
+
+def load_notation(json_path, feature, method):
+    """
+    Loads the notation of a feature for an alignment method from a query features JSON file.
+
+    Args:
+        json_path (str): Path to the JSON file.
+        feature (str): Feature name ('chromatic', 'diatonic' or 'rhythm').
+        method (str): Alignment method ('approximate' or 'blast').
+
+    Returns:
+        str: Feature in single-character notation.
+    """
+    with open(json_path, "r", encoding="utf8") as file:
+        return json.load(file)["notations"][method][feature]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Extract every query feature from a single parse of the query."
+    )
+    parser.add_argument(
+        "query", help="WAV or MIDI query, or a JSON file with its features."
+    )
+    parser.add_argument(
+        "-b",
+        "--backend",
+        choices=transcribe_audio.TRANSCRIPTION_BACKENDS,
+        default=transcribe_audio.DEFAULT_BACKEND,
+        help="Transcription backend for WAV queries (default: %(default)s).",
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        help="Save the features to this JSON file instead of printing.",
+    )
+    parser.add_argument(
+        "--from_midi",
+        action="store_true",
+        help="Compute the intervals directly from MIDI instead of with Humdrum.",
+    )
+    parser.add_argument(
+        "-f",
+        "--feature",
+        choices=FEATURES,
+        help="Print the notation of this feature from a JSON file (requires -m).",
+    )
+    parser.add_argument(
+        "-m",
+        "--method",
+        choices=list(METHODS),
+        help="Alignment method of the printed notation (requires -f).",
+    )
+    args = parser.parse_args()
+
+    if not os.path.isfile(args.query):
+        print(f"Error: File '{args.query}' does not exist.", file=sys.stderr)
+        sys.exit(1)
+
+    if args.query.lower().endswith(".json"):
+        if not (args.feature and args.method):
+            parser.error("JSON queries require -f and -m.")
+        print(load_notation(args.query, args.feature, args.method))
+    else:
+        features = extract_query_features(args.query, args.backend, args.from_midi)
+        if args.output:
+            save_query_features(features, args.output)
+        else:
+            print(json.dumps(features, ensure_ascii=False))
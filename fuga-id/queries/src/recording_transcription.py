@@ -0,0 +1,182 @@
+"""
+BSD 2-Clause License
+
+Copyright (c) 2024, Hilda Romero-Velo
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+
+* Redistributions of source code must retain the above copyright notice, this
+  list of conditions and the following disclaimer.
+
+* Redistributions in binary form must reproduce the above copyright notice, this
+  list of conditions and the following disclaimer in the documentation
+  and/or other materials provided with the distribution.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+
+"""
+This module implements the transcribe-once, slice-many evaluation mode. A full recording is
+transcribed a single time (by chunks in parallel, and cached like any other transcription),
+and the note events of each query fragment are obtained by slicing the recording note events
+between the fragment timestamps. Each fragment is then written as a MIDI file, so that the
+per-fragment transcription cost becomes a per-recording cost.
+
+A note belongs to a fragment if its onset lies inside the fragment; notes still sounding at
+the end of the fragment are cut at the fragment end.
+
+Example usage:
+    python3 recording_transcription.py path/to/recording.wav -s 1000 -e 9000 -o fragment.mid
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+
+import chunked_transcription
+import transcribe_audio
+
+sys.path.append(
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "../../common")
+)
+import midi_reader
+
+
+def read_notes(midi_path):
+    """
+    Reads the note events of a MIDI file.
+
+    Args:
+        midi_path (str): Path to the MIDI file.
+
+    Returns:
+        list: Note events (start, end, pitch, amplitude) in seconds, sorted by onset and pitch.
+    """
+    note_array = midi_reader.read_midi(midi_path)["notes"]
+    notes = list(
+        zip(
+            note_array["onset"].tolist(),
+            note_array["offset"].tolist(),
+            note_array["pitch"].astype(int).tolist(),
+            (note_array["velocity"] / 127).tolist(),
+        )
+    )
+    return sorted(notes, key=lambda note: (note[0], note[2], note[1]))
+
+
+def transcribe_recording(
+    recording_path, backend=transcribe_audio.DEFAULT_BACKEND, jobs=os.cpu_count()
+):
+    """
+    Transcribes a full recording once (reusing the cached transcription if there is one).
+
+    Args:
+        recording_path (str): Path to the WAV recording.
+        backend (str): Transcription backend ('tf', 'onnx', 'tflite' or 'yin').
+        jobs (int): Number of processes used to transcribe the recording by chunks.
+
+    Returns:
+        list: Note events (start, end, pitch, amplitude) of the recording in seconds.
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        midi_path = os.path.join(tmp_dir, "recording.mid")
+        transcribe_audio.transcribe(
+            recording_path, midi_path, backend=backend, chunked=True, jobs=jobs
+        )
+        return read_notes(midi_path)
+
+
+def slice_notes(notes, start_ms, end_ms):
+    """
+    Selects the note events of a fragment of the recording.
+
+    Args:
+        notes (list): Note events (start, end, pitch, amplitude) of the recording in seconds.
+        start_ms (int): Start time of the fragment in milliseconds.
+        end_ms (int): End time of the fragment in milliseconds.
+
+    Returns:
+        list: Note events of the fragment, relative to the fragment start.
+    """
+    start, end = start_ms / 1000, end_ms / 1000
+    return [
+        (note_start - start, min(note_end, end) - start, pitch, amplitude)
+        for note_start, note_end, pitch, amplitude in notes
+        if start <= note_start < end
+    ]
+
+
+def notes_span_ms(notes):
+    """
+    Returns the time spanned by a list of note events, from the first onset to the last
+    offset.
+
+    Args:
+        notes (list): Note events (start, end, pitch, amplitude) in seconds.
+
+    Returns:
+        int: Span in milliseconds (0 if there are no notes).
+    """
+    if not notes:
+        return 0
+    return int(round((max(n[1] for n in notes) - min(n[0] for n in notes)) * 1000))
+
+
+def write_fragment(notes, start_ms, end_ms, midi_path):
+    """
+    Writes the note events of a fragment of the recording as a MIDI file.
+
+    Args:
+        notes (list): Note events (start, end, pitch, amplitude) of the recording in seconds.
+        start_ms (int): Start time of the fragment in milliseconds.
+        end_ms (int): End time of the fragment in milliseconds.
+        midi_path (str): Path of the resulting MIDI file.
+
+    Returns:
+        list: Note events of the fragment, relative to the fragment start.
+    """
+    fragment_notes = slice_notes(notes, start_ms, end_ms)
+    chunked_transcription.notes_to_midi(fragment_notes, midi_path)
+    return fragment_notes
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Transcribe a recording once and write the MIDI of one of its fragments."
+    )
+    parser.add_argument("recording", help="Path to the WAV recording.")
+    parser.add_argument(
+        "-s", "--start", type=int, required=True, help="Start time in milliseconds."
+    )
+    parser.add_argument(
+        "-e", "--end", type=int, required=True, help="End time in milliseconds."
+    )
+    parser.add_argument(
+        "-o", "--output", required=True, help="Path of the fragment MIDI file."
+    )
+    parser.add_argument(
+        "-b",
+        "--backend",
+        choices=transcribe_audio.TRANSCRIPTION_BACKENDS,
+        default=transcribe_audio.DEFAULT_BACKEND,
+        help="Transcription backend (default: %(default)s).",
+    )
+    args = parser.parse_args()
+
+    if not os.path.isfile(args.recording):
+        print(f"Error: File {args.recording} does not exist.", file=sys.stderr)
+        sys.exit(1)
+    recording_notes = transcribe_recording(args.recording, args.backend)
+    write_fragment(recording_notes, args.start, args.end, args.output)
@@ -114,3 +114,155 @@ std::string get_cost_map_file(const std::string &base_dir, const std::string &se
         return base_dir + "/../../scores/indexes/approximate_alignment/rhythmic_cost_map.bin";
     }
 }
+
+/**
+ * @brief Loads the bound index of the melodic lines from a binary file.
+ *
+ * The index is written at setup time by `common/line_bounds.py`: a header (magic "FLBX",
+ * format version, number of melodic lines, of unique lines and of histogram entries)
+ * followed by the histogram entry offsets, the fan-out offsets, the unique line lengths, the
+ * fan-out lists, the entry counts and the entry symbols, in little-endian order.
+ *
+ * @param filename Path to the binary file containing the bound index.
+ * @param bounds Reference to the structure that will hold the index.
+ * @return bool `true` if the index was loaded, `false` if the file cannot be opened or is not
+ *         a bound index of a supported version.
+ */
+bool load_line_bounds(const std::string &filename, LineBounds &bounds)
+{
+    std::ifstream file(filename, std::ios::binary);
+    if (!file)
+    {
+        return false;
+    }
+
+    char magic[4];
+    uint32_t version;
+    uint64_t num_lines, num_unique, num_entries;
+    file.read(magic, sizeof(magic));
+    file.read(reinterpret_cast<char *>(&version), sizeof(version));
+    file.read(reinterpret_cast<char *>(&num_lines), sizeof(num_lines));
+    file.read(reinterpret_cast<char *>(&num_unique), sizeof(num_unique));
+    file.read(reinterpret_cast<char *>(&num_entries), sizeof(num_entries));
+    if (!file || std::string(magic, sizeof(magic)) != "FLBX" || version != 2)
+    {
+        std::cerr << "Ignoring invalid line bound index: " << filename << std::endl;
+        return false;
+    }
+
+    bounds.offsets.resize(num_unique + 1);
+    bounds.fanout_offsets.resize(num_unique + 1);
+    bounds.lengths.resize(num_unique);
+    bounds.fanout.resize(num_lines);
+    bounds.counts.resize(num_entries);
+    bounds.symbols.resize(num_entries);
+    file.read(reinterpret_cast<char *>(bounds.offsets.data()), bounds.offsets.size() * sizeof(uint64_t));
+    file.read(reinterpret_cast<char *>(bounds.fanout_offsets.data()), bounds.fanout_offsets.size() * sizeof(uint64_t));
+    file.read(reinterpret_cast<char *>(bounds.lengths.data()), bounds.lengths.size() * sizeof(uint32_t));
+    file.read(reinterpret_cast<char *>(bounds.fanout.data()), bounds.fanout.size() * sizeof(uint32_t));
+    file.read(reinterpret_cast<char *>(bounds.counts.data()), bounds.counts.size() * sizeof(uint32_t));
+    file.read(reinterpret_cast<char *>(bounds.symbols.data()), bounds.symbols.size());
+    if (!file)
+    {
+        std::cerr << "Ignoring truncated line bound index: " << filename << std::endl;
+        bounds = LineBounds();
+        return false;
+    }
+    return true;
+}
+
+/**
+ * @brief Retrieves the bound index file of the melodic lines based on the search feature.
+ *
+ * @param base_dir The base directory from which file paths are constructed.
+ * @param search_feature The search type flag specified by the user (-c, -d, or -r).
+ * @return string The corresponding line bound index .bin file path.
+ */
+std::string get_line_bounds_file(const std::string &base_dir, const std::string &search_feature)
+{
+    if (search_feature == "-c")
+    {
+        return base_dir + "/../../scores/indexes/approximate_alignment/chromatic_line_bounds.bin";
+    }
+    else if (search_feature == "-d")
+    {
+        return base_dir + "/../../scores/indexes/approximate_alignment/diatonic_line_bounds.bin";
+    }
+    else
+    {
+        return base_dir + "/../../scores/indexes/approximate_alignment/rhythm_line_bounds.bin";
+    }
+}
+
+/**
+ * @brief Loads the phrase index of the melodic lines from a binary file.
+ *
+ * The index is written at setup time by `common/line_phrases.py`: a header (magic "FLPX",
+ * format version, number of unique lines and of copies) followed by the copy offsets of every
+ * unique line and the start, source and length of every copy, in little-endian order.
+ *
+ * @param filename Path to the binary file containing the phrase index.
+ * @param phrases Reference to the structure that will hold the index.
+ * @return bool `true` if the index was loaded, `false` if the file cannot be opened or is not
+ *         a phrase index of a supported version.
+ */
+bool load_line_phrases(const std::string &filename, LinePhrases &phrases)
+{
+    std::ifstream file(filename, std::ios::binary);
+    if (!file)
+    {
+        return false;
+    }
+
+    char magic[4];
+    uint32_t version;
+    uint64_t num_unique, num_copies;
+    file.read(magic, sizeof(magic));
+    file.read(reinterpret_cast<char *>(&version), sizeof(version));
+    file.read(reinterpret_cast<char *>(&num_unique), sizeof(num_unique));
+    file.read(reinterpret_cast<char *>(&num_copies), sizeof(num_copies));
+    if (!file || std::string(magic, sizeof(magic)) != "FLPX" || version != 1)
+    {
+        std::cerr << "Ignoring invalid line phrase index: " << filename << std::endl;
+        return false;
+    }
+
+    phrases.offsets.resize(num_unique + 1);
+    phrases.starts.resize(num_copies);
+    phrases.sources.resize(num_copies);
+    phrases.lengths.resize(num_copies);
+    file.read(reinterpret_cast<char *>(phrases.offsets.data()), phrases.offsets.size() * sizeof(uint64_t));
+    file.read(reinterpret_cast<char *>(phrases.starts.data()), phrases.starts.size() * sizeof(uint32_t));
+    file.read(reinterpret_cast<char *>(phrases.sources.data()), phrases.sources.size() * sizeof(uint32_t));
+    file.read(reinterpret_cast<char *>(phrases.lengths.data()), phrases.lengths.size() * sizeof(uint32_t));
+    if (!file)
+    {
+        std::cerr << "Ignoring truncated line phrase index: " << filename << std::endl;
+        phrases = LinePhrases();
+        return false;
+    }
+    return true;
+}
+
+/**
+ * @brief Retrieves the phrase index file of the melodic lines based on the search feature.
+ *
+ * @param base_dir The base directory from which file paths are constructed.
+ * @param search_feature The search type flag specified by the user (-c, -d, or -r).
+ * @return string The corresponding line phrase index .bin file path.
+ */
+std::string get_line_phrases_file(const std::string &base_dir, const std::string &search_feature)
+{
+    if (search_feature == "-c")
+    {
+        return base_dir + "/../../scores/indexes/approximate_alignment/chromatic_line_phrases.bin";
+    }
+    else if (search_feature == "-d")
+    {
+        return base_dir + "/../../scores/indexes/approximate_alignment/diatonic_line_phrases.bin";
+    }
+    else
+    {
+        return base_dir + "/../../scores/indexes/approximate_alignment/rhythm_line_phrases.bin";
+    }
+}
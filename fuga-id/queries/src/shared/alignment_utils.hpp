@@ -35,8 +35,13 @@ OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
 #include <string>
 #include <unordered_map>
+#include "data_structures.hpp"
 
 std::unordered_map<char, std::unordered_map<char, float>> load_cost_map(const std::string &filename);
 std::string get_cost_map_file(const std::string &base_dir, const std::string &search_feature);
+bool load_line_bounds(const std::string &filename, LineBounds &bounds);
+std::string get_line_bounds_file(const std::string &base_dir, const std::string &search_feature);
+bool load_line_phrases(const std::string &filename, LinePhrases &phrases);
+std::string get_line_phrases_file(const std::string &base_dir, const std::string &search_feature);
 
 #endif
@@ -48,10 +48,12 @@ using namespace std;
 void print_usage(const char *prog_name, const std::string &context)
 {
 
-    cout << "Usage: " << prog_name << " [-c|-d|-r] query_file\n";
+    cout << "Usage: " << prog_name << " [-c|-d|-r] query_file [workspace]\n";
     cout << "This program computes the " << context << " alignment between a given query and the scores corpus.\n";
     cout << "Arg 1: [-c|-d|-r]   Search type: -c (chromatic), -d (diatonic), -r (rhythm).\n";
     cout << "Arg 2: query_file   Query file. WAV for chromatic/diatonic, MIDI for rhythm.\n";
+    cout << "Arg 3: [workspace]  Optional private directory for the temporary files and results of\n"
+         << "                    this query, so that several queries can run concurrently.\n";
 }
 
 /**
@@ -59,32 +61,36 @@ void print_usage(const char *prog_name, const std::string &context)
  *
  * This function checks that the correct number of arguments are provided and verifies that the
  * search feature argument is one of the valid options ("-c", "-d", or "-r"). It also assigns the
- * values of the arguments to the provided `search_feature` and `query_file` references.
+ * values of the arguments to the provided `search_feature` and `query_file` references, and the
+ * optional third argument to `workspace` (left empty when it is not given).
  *
  * @param argc The number of command-line arguments passed to the program.
  * @param argv An array of command-line argument strings.
  * @param search_feature A reference to a string that will hold the selected search feature
  *                       ("-c", "-d", or "-r").
  * @param query_file A reference to a string that will hold the path to the query file.
+ * @param workspace A reference to a string that will hold the query workspace directory.
  * @param print_usage A function that prints the program's usage instructions.
  * @param context The context in which the function is called ("blast" or "approximate").
  * @return bool `true` if the arguments are valid, `false` otherwise.
  */
 bool validate_args(int argc, char **argv,
                    std::string &search_feature,
-                   std::string &query_file, const std::string &context)
+                   std::string &query_file, std::string &workspace,
+                   const std::string &context)
 {
-    if (argc != 3)
+    if (argc != 3 && argc != 4)
     {
         print_usage(argv[0], context);
         return false;
     }
     search_feature = argv[1];
     query_file = argv[2];
+    workspace = argc == 4 ? argv[3] : "";
     if (search_feature != "-c" && search_feature != "-d" && search_feature != "-r")
     {
         std::cerr << "Error: Invalid search feature. Options: -c, -d, -r.\n";
         return false;
     }
     return true;
-}
\ No newline at end of file
+}
\ No newline at end of file
@@ -39,6 +39,7 @@ OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 void print_usage(const char *prog_name, const std::string &context);
 bool validate_args(int argc, char **argv,
                    std::string &search_feature,
-                   std::string &query_file, const std::string &context);
+                   std::string &query_file, std::string &workspace,
+                   const std::string &context);
 
-#endif
\ No newline at end of file
+#endif
\ No newline at end of file
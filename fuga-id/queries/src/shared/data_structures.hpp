@@ -33,8 +33,10 @@ OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 #ifndef DATA_STRUCTURES_HPP
 #define DATA_STRUCTURES_HPP
 
+#include <cstdint>
 #include <string>
 #include <utility>
+#include <vector>
 
 // Structure representing a cell in the dynamic programming matrix
 struct Cell
@@ -56,4 +58,46 @@ struct AlignmentResult
     std::string retrieved_score_id;      // ID of the musical sheet of the current alignment
 };
 
+/*
+ * Structure holding the bound index of the melodic lines (see `common/line_bounds.py`).
+ * Identical melodic lines are collapsed into unique lines: unique line u is shared by the
+ * melodic lines fanout[fanout_offsets[u]] to fanout[fanout_offsets[u + 1] - 1], and has a
+ * length and a sparse symbol histogram, whose entries are those from offsets[u] to
+ * offsets[u + 1].
+ */
+struct LineBounds
+{
+    std::vector<uint64_t> offsets;        // Offset of the histogram entries of every unique line
+    std::vector<uint64_t> fanout_offsets; // Offset of the fan-out list of every unique line
+    std::vector<uint32_t> lengths;        // Length of every unique line
+    std::vector<uint32_t> fanout;         // Melodic lines of every unique line
+    std::vector<uint32_t> counts;         // Count of every histogram entry
+    std::vector<uint8_t> symbols;         // Symbol of every histogram entry
+};
+
+/*
+ * Structure holding the phrase index of the melodic lines (see `common/line_phrases.py`): the
+ * copies of unique line u are those from offsets[u] to offsets[u + 1] - 1, in increasing order
+ * of their start, and copy k repeats the lengths[k] symbols of the line from sources[k] at
+ * starts[k].
+ */
+struct LinePhrases
+{
+    std::vector<uint64_t> offsets; // Offset of the copies of every unique line
+    std::vector<uint32_t> starts;  // Start of every copy in its line
+    std::vector<uint32_t> sources; // Start of the earlier symbols repeated by every copy
+    std::vector<uint32_t> lengths; // Length of every copy
+};
+
+// Structure counting the melodic lines aligned and skipped by a search
+struct SearchStats
+{
+    size_t total_lines = 0;   // Melodic lines of the corpus
+    size_t unique_lines = 0;  // Distinct melodic lines, each aligned at most once
+    size_t aligned_lines = 0; // Distinct melodic lines aligned
+    size_t skipped_lines = 0; // Distinct melodic lines skipped because their bound could not enter the Top 5
+    size_t aligned_rows = 0;  // Text positions of the aligned lines whose column was computed
+    size_t copied_rows = 0;   // Text positions of the aligned lines whose column was copied from a repeat
+};
+
 #endif
\ No newline at end of file
@@ -101,6 +101,29 @@ string load_file(const string &filename)
     return content;
 }
 
+/**
+ * @brief Splits the contents of a file into its lines.
+ *
+ * The content is scanned once, so splitting takes linear time in its size. As many lines as
+ * newline characters plus one are returned (the last line may be empty).
+ *
+ * @param content The contents of the file, as returned by `load_file`.
+ * @return vector<string> The lines of the content, without their newline characters.
+ */
+vector<string> split_lines(const string &content)
+{
+    vector<string> lines;
+    size_t start = 0;
+    size_t pos;
+    while ((pos = content.find('\n', start)) != string::npos)
+    {
+        lines.emplace_back(content, start, pos - start);
+        start = pos + 1;
+    }
+    lines.emplace_back(content, start); // Add the last line
+    return lines;
+}
+
 /**
  * @brief Retrieves the reference text file and query feature file based on the search type.
  *
@@ -108,29 +131,30 @@ string load_file(const string &filename)
  * feature file (stored in single-byte format) based on the specified search type flag.
  *
  * @param base_dir The base directory from which file paths are constructed.
+ * @param tmp_dir The directory where the query features are extracted.
  * @param search_feature The search type flag specified by the user (-c, -d, or -r).
  * @param query_sf_file Reference to the string that will hold the path of the temporary query
  *                      feature file.
  * @param context The context in which the function is called ("blast" or "approximate").
  * @return string The reference text file path to be used in the alignment.
  */
-string get_search_files(const string &base_dir, const string &search_feature, string &query_sf_file, const string &context)
+string get_search_files(const string &base_dir, const string &tmp_dir, const string &search_feature, string &query_sf_file, const string &context)
 {
     if (context == "blast")
     {
         if (search_feature == "-c")
         {
-            query_sf_file = base_dir + "/../tmp/chromatic_sf_query.fasta";
+            query_sf_file = tmp_dir + "/chromatic_sf_query.fasta";
             return base_dir + "/../../scores/indexes/blast/chromatic_db";
         }
         else if (search_feature == "-d")
         {
-            query_sf_file = base_dir + "/../tmp/diatonic_sf_query.fasta";
+            query_sf_file = tmp_dir + "/diatonic_sf_query.fasta";
             return base_dir + "/../../scores/indexes/blast/diatonic_db";
         }
         else
         {
-            query_sf_file = base_dir + "/../tmp/rhythm_sf_query.fasta";
+            query_sf_file = tmp_dir + "/rhythm_sf_query.fasta";
             return base_dir + "/../../scores/indexes/blast/rhythm_db";
         }
     }
@@ -138,17 +162,17 @@ string get_search_files(const string &base_dir, const string &search_feature, st
     {
         if (search_feature == "-c")
         {
-            query_sf_file = base_dir + "/../tmp/chromatic_sf_query.txt";
+            query_sf_file = tmp_dir + "/chromatic_sf_query.txt";
             return base_dir + "/../../scores/indexes/approximate_alignment/chromatic_text.txt";
         }
         else if (search_feature == "-d")
         {
-            query_sf_file = base_dir + "/../tmp/diatonic_sf_query.txt";
+            query_sf_file = tmp_dir + "/diatonic_sf_query.txt";
             return base_dir + "/../../scores/indexes/approximate_alignment/diatonic_text.txt";
         }
         else
         {
-            query_sf_file = base_dir + "/../tmp/rhythm_sf_query.txt";
+            query_sf_file = tmp_dir + "/rhythm_sf_query.txt";
             return base_dir + "/../../scores/indexes/approximate_alignment/rhythm_text.txt";
         }
     }
@@ -34,11 +34,14 @@ OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 #define FILE_OPERATIONS_HPP
 
 #include <string>
+#include <vector>
 
 bool file_exists(const std::string &filename);
 bool delete_file(const std::string &filename);
 std::string load_file(const std::string &filename);
+std::vector<std::string> split_lines(const std::string &content);
 std::string get_search_files(const std::string &base_dir,
+                             const std::string &tmp_dir,
                              const std::string &search_feature,
                              std::string &query_sf_file,
                              const std::string &context);
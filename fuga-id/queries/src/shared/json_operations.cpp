@@ -112,6 +112,30 @@ string generate_results_json(const vector<AlignmentResult> &results)
     return results_json.str();
 }
 
+/**
+ * @brief Generates the "search" section of the JSON file.
+ *
+ * This function reports how many melodic lines the search covered, how many distinct lines
+ * they have, how many of those the search aligned and skipped, and how many text positions
+ * of the aligned lines were computed and copied from a repeat (see `approximate_alignment()`).
+ *
+ * @param search_stats Counts of the melodic lines of the search.
+ * @return A string representing the "search" section of the JSON file.
+ */
+string generate_search_json(const SearchStats &search_stats)
+{
+    stringstream search_json;
+    search_json << "  \"search\": {\n";
+    search_json << "    \"total_lines\": " << search_stats.total_lines << ",\n";
+    search_json << "    \"unique_lines\": " << search_stats.unique_lines << ",\n";
+    search_json << "    \"aligned_lines\": " << search_stats.aligned_lines << ",\n";
+    search_json << "    \"skipped_lines\": " << search_stats.skipped_lines << ",\n";
+    search_json << "    \"aligned_rows\": " << search_stats.aligned_rows << ",\n";
+    search_json << "    \"copied_rows\": " << search_stats.copied_rows << "\n";
+    search_json << "  },\n";
+    return search_json.str();
+}
+
 /**
  * @brief Generates the "timing" section of the JSON file.
  *
@@ -166,6 +190,8 @@ std::string generate_timing_json(
  * @param alignment_system_time_ms System time in ms for alignment step.
  * @param alignment_clock_time_ms Total clock time in ms for alignment step.
  * @param filename Name of the output file where JSON data is saved.
+ * @param search_stats [optional] Counts of the melodic lines aligned and skipped by the search,
+ *                     saved in a "search" section.
  */
 void save_result_and_timing_to_json(
     const std::vector<AlignmentResult> &results,
@@ -176,7 +202,8 @@ void save_result_and_timing_to_json(
     double alignment_user_time_ms,
     double alignment_system_time_ms,
     long alignment_clock_time_ms,
-    const std::string &filename)
+    const std::string &filename,
+    const SearchStats *search_stats)
 {
     ofstream output_file(filename, ios::trunc);
     if (!output_file)
@@ -193,6 +220,12 @@ void save_result_and_timing_to_json(
     // Add alignment section
     json_output << generate_results_json(results);
 
+    // Add search section
+    if (search_stats != nullptr)
+    {
+        json_output << generate_search_json(*search_stats);
+    }
+
     // Add timing section
     json_output << generate_timing_json(
         extract_features_user_time_ms,
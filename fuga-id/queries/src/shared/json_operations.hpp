@@ -38,6 +38,7 @@ OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 #include "data_structures.hpp"
 
 std::string generate_results_json(const std::vector<AlignmentResult> &results);
+std::string generate_search_json(const SearchStats &search_stats);
 std::string generate_timing_json(
     double extract_features_user_time_ms,
     double extract_features_system_time_ms,
@@ -55,6 +56,7 @@ void save_result_and_timing_to_json(
     double alignment_user_time_ms,
     double alignment_system_time_ms,
     long alignment_clock_time_ms,
-    const std::string &filename);
+    const std::string &filename,
+    const SearchStats *search_stats = nullptr);
 
 #endif
\ No newline at end of file
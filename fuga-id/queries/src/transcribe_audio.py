@@ -0,0 +1,301 @@
+"""
+BSD 2-Clause License
+
+Copyright (c) 2024, Hilda Romero-Velo
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+
+* Redistributions of source code must retain the above copyright notice, this
+  list of conditions and the following disclaimer.
+
+* Redistributions in binary form must reproduce the above copyright notice, this
+  list of conditions and the following disclaimer in the documentation
+  and/or other materials provided with the distribution.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+
+"""
+This script transcribes a WAV query into a MIDI file with basic-pitch. Transcriptions are
+looked up in a persistent content-addressed cache (see `transcription_cache.py`) before
+running the model, so the same audio fragment is only transcribed once regardless of how
+many features and alignment algorithms are computed from it. Cache misses are served by the
+persistent transcription worker (see `transcription_worker.py`) when it is running, and by
+the basic-pitch command line tool otherwise. The model runtime (TensorFlow, ONNX or TFLite)
+is selected with the `--backend` option or the FUGA_ID_TRANSCRIPTION_BACKEND environment
+variable. The 'yin' backend replaces basic-pitch by a lightweight monophonic pitch tracker
+(see `monophonic_transcription.py`). Long recordings can be transcribed by overlapping chunks across several processes
+with the `--chunked` option (see `chunked_transcription.py`).
+
+Example usage:
+    python3 transcribe_audio.py path/to/query.wav -o path/to/query_basic_pitch.mid
+    python3 transcribe_audio.py path/to/query.wav -o path/to/query.mid --backend onnx
+    python3 transcribe_audio.py path/to/recording.wav -o path/to/recording.mid --chunked -j 4
+    python3 transcribe_audio.py --stats
+    python3 transcribe_audio.py --clear_cache
+"""
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from importlib import metadata
+
+import transcription_cache
+import transcription_worker
+
+# basic-pitch settings used to transcribe queries (basic-pitch CLI defaults)
+TRANSCRIPTION_SETTINGS = {
+    "onset_threshold": 0.5,
+    "frame_threshold": 0.3,
+    "minimum_note_length": 127.70,
+}
+
+# basic-pitch model runtimes, and the monophonic pitch tracker, that can transcribe queries
+MODEL_BACKENDS = ["tf", "onnx", "tflite"]
+TRANSCRIPTION_BACKENDS = MODEL_BACKENDS + ["yin"]
+DEFAULT_BACKEND = os.environ.get("FUGA_ID_TRANSCRIPTION_BACKEND", "tf")
+
+
+def get_transcription_settings(backend=DEFAULT_BACKEND):
+    """
+    Returns the settings that identify a transcription: the model version, the runtime
+    backend and the thresholds used to turn the model output into note events.
+
+    Args:
+        backend (str): Model runtime ('tf', 'onnx' or 'tflite'), or 'yin'.
+
+    Returns:
+        dict: Transcription settings.
+    """
+    if backend == "yin":
+        import monophonic_transcription
+
+        return {
+            "model": "yin",
+            "backend": backend,
+            **monophonic_transcription.YIN_SETTINGS,
+        }
+
+    try:
+        model_version = metadata.version("basic-pitch")
+    except metadata.PackageNotFoundError:
+        model_version = "unknown"
+    return {
+        "model": "basic-pitch",
+        "model_version": model_version,
+        "backend": backend,
+        **TRANSCRIPTION_SETTINGS,
+    }
+
+
+def run_basic_pitch(audio_path, midi_path, settings):
+    """
+    Transcribes an audio file by running the basic-pitch command line tool.
+
+    Args:
+        audio_path (str): Path to the WAV file to transcribe.
+        midi_path (str): Path where the resulting MIDI file is saved.
+        settings (dict): Transcription settings.
+
+    Raises:
+        subprocess.CalledProcessError: If basic-pitch fails.
+    """
+    with tempfile.TemporaryDirectory() as output_dir:
+        command = [
+            "basic-pitch",
+            "--onset-threshold",
+            str(settings["onset_threshold"]),
+            "--frame-threshold",
+            str(settings["frame_threshold"]),
+            "--minimum-note-length",
+            str(settings["minimum_note_length"]),
+            "--model-serialization",
+            settings["backend"],
+            output_dir,
+            audio_path,
+        ]
+        subprocess.run(command, check=True, stdout=subprocess.DEVNULL)
+        audio_name = os.path.splitext(os.path.basename(audio_path))[0]
+        shutil.move(
+            os.path.join(output_dir, f"{audio_name}_basic_pitch.mid"), midi_path
+        )
+
+
+def run_transcription(audio_path, midi_path, settings, jobs=1):
+    """
+    Transcribes an audio file with the transcription worker, falling back to the basic-pitch
+    command line tool if the worker is not running or fails. Settings with chunk settings
+    are transcribed by chunks in parallel instead.
+
+    Args:
+        audio_path (str): Path to the WAV file to transcribe.
+        midi_path (str): Path where the resulting MIDI file is saved.
+        settings (dict): Transcription settings.
+        jobs (int): Number of processes used in chunked mode.
+    """
+    if settings["backend"] == "yin":
+        import monophonic_transcription
+
+        monophonic_transcription.transcribe_file(audio_path, midi_path, settings)
+    elif "chunk_seconds" in settings:
+        run_chunked_transcription(audio_path, midi_path, settings, jobs)
+    elif not transcription_worker.request_transcription(
+        audio_path, midi_path, settings
+    ):
+        run_basic_pitch(audio_path, midi_path, settings)
+
+
+def run_chunked_transcription(audio_path, midi_path, settings, jobs):
+    """
+    Transcribes a long audio file by overlapping chunks across a process pool.
+
+    Args:
+        audio_path (str): Path to the WAV file to transcribe.
+        midi_path (str): Path where the resulting MIDI file is saved.
+        settings (dict): Transcription settings, including the chunk settings.
+        jobs (int): Number of processes used to transcribe the chunks.
+    """
+    import chunked_transcription
+
+    notes = chunked_transcription.transcribe_long(
+        audio_path,
+        jobs,
+        settings["backend"],
+        settings["chunk_seconds"],
+        settings["overlap_seconds"],
+    )
+    chunked_transcription.notes_to_midi(notes, midi_path)
+
+
+def transcribe(
+    audio_path,
+    midi_path,
+    use_cache=True,
+    backend=DEFAULT_BACKEND,
+    chunked=False,
+    jobs=1,
+):
+    """
+    Transcribes an audio file into a MIDI file, reusing a cached transcription if the same
+    audio was already transcribed with the same settings.
+
+    Args:
+        audio_path (str): Path to the WAV file to transcribe.
+        midi_path (str): Path where the resulting MIDI file is saved.
+        use_cache (bool): Whether to look up and store the transcription in the cache.
+        backend (str): Model runtime ('tf', 'onnx' or 'tflite'), or 'yin'.
+        chunked (bool): Whether to transcribe the audio by overlapping chunks in parallel
+                        (ignored by the 'yin' backend).
+        jobs (int): Number of processes used in chunked mode. The result does not depend
+                    on it, so it is not part of the cache key.
+
+    Returns:
+        bool: True if the transcription was served from the cache, False otherwise.
+    """
+    settings = get_transcription_settings(backend)
+    if chunked and backend in MODEL_BACKENDS:
+        import chunked_transcription
+
+        settings["chunk_seconds"] = chunked_transcription.DEFAULT_CHUNK_SECONDS
+        settings["overlap_seconds"] = chunked_transcription.DEFAULT_OVERLAP_SECONDS
+
+    if not use_cache:
+        run_transcription(audio_path, midi_path, settings, jobs)
+        return False
+
+    cache_key = transcription_cache.compute_cache_key(audio_path, settings)
+    cached_file = transcription_cache.lookup(cache_key)
+    if cached_file is not None:
+        try:
+            shutil.copyfile(cached_file, midi_path)
+            return True
+        except FileNotFoundError:
+            pass  # Evicted by a concurrent query after the lookup
+
+    run_transcription(audio_path, midi_path, settings, jobs)
+    transcription_cache.store(cache_key, midi_path)
+    return False
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Transcribe a WAV query into MIDI, reusing cached transcriptions."
+    )
+    parser.add_argument("audio", nargs="?", help="Path to the WAV file to transcribe.")
+    parser.add_argument("-o", "--output", help="Path of the resulting MIDI file.")
+    parser.add_argument(
+        "--no_cache",
+        action="store_true",
+        help="Transcribe without looking up or storing the result in the cache.",
+    )
+    parser.add_argument(
+        "-b",
+        "--backend",
+        choices=TRANSCRIPTION_BACKENDS,
+        default=DEFAULT_BACKEND,
+        help="basic-pitch model runtime, or 'yin' for monophonic queries (default: %(default)s).",
+    )
+    parser.add_argument(
+        "--chunked",
+        action="store_true",
+        help="Transcribe by overlapping chunks in parallel (for long recordings).",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=os.cpu_count(),
+        help="Number of processes in chunked mode (default: number of CPUs).",
+    )
+    parser.add_argument(
+        "--stats", action="store_true", help="Print the cache statistics as JSON."
+    )
+    parser.add_argument(
+        "--clear_cache", action="store_true", help="Delete all cached transcriptions."
+    )
+    args = parser.parse_args()
+
+    if args.clear_cache:
+        transcription_cache.clear()
+    if args.stats:
+        print(json.dumps(transcription_cache.get_stats(), indent=4))
+    if args.audio is None:
+        if not (args.stats or args.clear_cache):
+            parser.error(
+                "An audio file is required unless --stats or --clear_cache is used."
+            )
+        sys.exit(0)
+
+    if not os.path.isfile(args.audio):
+        print(f"Error: File {args.audio} does not exist.", file=sys.stderr)
+        sys.exit(1)
+    if args.output is None:
+        parser.error("The output MIDI path (-o) is required.")
+
+    try:
+        transcribe(
+            args.audio,
+            args.output,
+            use_cache=not args.no_cache,
+            backend=args.backend,
+            chunked=args.chunked,
+            jobs=args.jobs,
+        )
+    except subprocess.CalledProcessError as e:
+        print(f"Error transcribing {args.audio}: {e}", file=sys.stderr)
+        sys.exit(1)
@@ -0,0 +1,295 @@
+"""
+BSD 2-Clause License
+
+Copyright (c) 2024, Hilda Romero-Velo
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+
+* Redistributions of source code must retain the above copyright notice, this
+  list of conditions and the following disclaimer.
+
+* Redistributions in binary form must reproduce the above copyright notice, this
+  list of conditions and the following disclaimer in the documentation
+  and/or other materials provided with the distribution.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+
+"""
+This module implements a persistent, content-addressed cache of query transcriptions. The
+note events produced for a WAV file are stored as the MIDI file returned by the transcriber,
+keyed by a hash of the audio bytes and of the transcription settings (model, backend and
+thresholds). The same transcription is therefore shared by every feature, every alignment
+algorithm and every evaluation run that processes an identical audio fragment.
+
+The cache index is a small SQLite database stored next to the cached MIDI files. It keeps
+the size and last access time of every entry, so that the least recently used entries are
+evicted whenever the cache grows beyond its size bound, along with hit and miss counters.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+
+# Default cache location and size bound
+CACHE_DIR = os.path.abspath(os.path.join(script_dir, "../cache/transcriptions"))
+MAX_CACHE_BYTES = 512 * 1024 * 1024  # 512 MB
+
+INDEX_FILE = "index.db"
+READ_CHUNK_SIZE = 1024 * 1024
+
+
+def compute_cache_key(audio_path, settings):
+    """
+    Computes the cache key of a transcription from the audio bytes and the settings used to
+    transcribe them.
+
+    Args:
+        audio_path (str): Path to the audio file.
+        settings (dict): Transcription settings (model, backend, thresholds...).
+
+    Returns:
+        str: Hexadecimal SHA-256 digest identifying the transcription.
+    """
+    digest = hashlib.sha256()
+    with open(audio_path, "rb") as audio_file:
+        for chunk in iter(lambda: audio_file.read(READ_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    digest.update(json.dumps(settings, sort_keys=True).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def connect(cache_dir=CACHE_DIR):
+    """
+    Opens the cache index, creating the cache directory and tables if needed.
+
+    Args:
+        cache_dir (str): Directory holding the cached transcriptions.
+
+    Returns:
+        sqlite3.Connection: Connection to the cache index.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    conn = sqlite3.connect(os.path.join(cache_dir, INDEX_FILE), timeout=30)
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS Entry (
+            cache_key TEXT PRIMARY KEY,
+            size_bytes INTEGER NOT NULL,
+            last_access REAL NOT NULL
+        )
+        """
+    )
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS Counter (
+            name TEXT PRIMARY KEY,
+            value INTEGER NOT NULL
+        )
+        """
+    )
+    conn.execute("INSERT OR IGNORE INTO Counter (name, value) VALUES ('hits', 0)")
+    conn.execute("INSERT OR IGNORE INTO Counter (name, value) VALUES ('misses', 0)")
+    conn.commit()
+    return conn
+
+
+def entry_path(cache_key, cache_dir=CACHE_DIR):
+    """
+    Returns the path of the MIDI file stored for a cache key.
+
+    Args:
+        cache_key (str): Cache key of the transcription.
+        cache_dir (str): Directory holding the cached transcriptions.
+
+    Returns:
+        str: Path to the cached MIDI file.
+    """
+    return os.path.join(cache_dir, cache_key[:2], cache_key + ".mid")
+
+
+def contains(cache_key, cache_dir=CACHE_DIR):
+    """
+    Checks whether a transcription is cached, without updating the hit/miss counters.
+
+    Args:
+        cache_key (str): Cache key of the transcription.
+        cache_dir (str): Directory holding the cached transcriptions.
+
+    Returns:
+        bool: True if the transcription is cached, False otherwise.
+    """
+    conn = connect(cache_dir)
+    try:
+        row = conn.execute(
+            "SELECT cache_key FROM Entry WHERE cache_key = ?", (cache_key,)
+        ).fetchone()
+        return row is not None and os.path.isfile(entry_path(cache_key, cache_dir))
+    finally:
+        conn.close()
+
+
+def lookup(cache_key, cache_dir=CACHE_DIR):
+    """
+    Looks up a transcription in the cache, updating its last access time and the hit/miss
+    counters.
+
+    Args:
+        cache_key (str): Cache key of the transcription.
+        cache_dir (str): Directory holding the cached transcriptions.
+
+    Returns:
+        str: Path to the cached MIDI file, or None if the transcription is not cached.
+    """
+    conn = connect(cache_dir)
+    try:
+        cached_file = entry_path(cache_key, cache_dir)
+        row = conn.execute(
+            "SELECT cache_key FROM Entry WHERE cache_key = ?", (cache_key,)
+        ).fetchone()
+
+        # Entries whose file was removed externally count as misses
+        if row is None or not os.path.isfile(cached_file):
+            if row is not None:
+                conn.execute("DELETE FROM Entry WHERE cache_key = ?", (cache_key,))
+            conn.execute("UPDATE Counter SET value = value + 1 WHERE name = 'misses'")
+            conn.commit()
+            return None
+
+        conn.execute(
+            "UPDATE Entry SET last_access = ? WHERE cache_key = ?",
+            (time.time(), cache_key),
+        )
+        conn.execute("UPDATE Counter SET value = value + 1 WHERE name = 'hits'")
+        conn.commit()
+        return cached_file
+    finally:
+        conn.close()
+
+
+def store(cache_key, midi_path, cache_dir=CACHE_DIR, max_bytes=MAX_CACHE_BYTES):
+    """
+    Stores a transcription in the cache and evicts the least recently used entries if the
+    cache exceeds its size bound.
+
+    Args:
+        cache_key (str): Cache key of the transcription.
+        midi_path (str): Path to the MIDI file with the transcribed note events.
+        cache_dir (str): Directory holding the cached transcriptions.
+        max_bytes (int): Maximum total size of the cached files in bytes.
+
+    Returns:
+        str: Path to the cached MIDI file.
+    """
+    cached_file = entry_path(cache_key, cache_dir)
+    os.makedirs(os.path.dirname(cached_file), exist_ok=True)
+
+    # Copy to a temporary file first so concurrent readers never see partial files
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(cached_file), suffix=".part")
+    os.close(fd)
+    shutil.copyfile(midi_path, tmp_path)
+    os.replace(tmp_path, cached_file)
+
+    conn = connect(cache_dir)
+    try:
+        conn.execute(
+            """
+            INSERT OR REPLACE INTO Entry (cache_key, size_bytes, last_access)
+            VALUES (?, ?, ?)
+            """,
+            (cache_key, os.path.getsize(cached_file), time.time()),
+        )
+        conn.commit()
+        evict(conn, cache_dir, max_bytes)
+    finally:
+        conn.close()
+    return cached_file
+
+
+def evict(conn, cache_dir=CACHE_DIR, max_bytes=MAX_CACHE_BYTES):
+    """
+    Removes the least recently used entries until the cache fits within its size bound.
+
+    Args:
+        conn (sqlite3.Connection): Connection to the cache index.
+        cache_dir (str): Directory holding the cached transcriptions.
+        max_bytes (int): Maximum total size of the cached files in bytes.
+
+    Returns:
+        int: Number of evicted entries.
+    """
+    total_bytes = conn.execute("SELECT COALESCE(SUM(size_bytes), 0) FROM Entry").fetchone()[0]
+    evicted = 0
+    if total_bytes <= max_bytes:
+        return evicted
+
+    for cache_key, size_bytes in conn.execute(
+        "SELECT cache_key, size_bytes FROM Entry ORDER BY last_access ASC"
+    ).fetchall():
+        if total_bytes <= max_bytes:
+            break
+        cached_file = entry_path(cache_key, cache_dir)
+        if os.path.exists(cached_file):
+            os.remove(cached_file)
+        conn.execute("DELETE FROM Entry WHERE cache_key = ?", (cache_key,))
+        total_bytes -= size_bytes
+        evicted += 1
+    conn.commit()
+    return evicted
+
+
+def get_stats(cache_dir=CACHE_DIR):
+    """
+    Returns the cache usage statistics.
+
+    Args:
+        cache_dir (str): Directory holding the cached transcriptions.
+
+    Returns:
+        dict: Number of entries, total size in bytes, hits, misses and hit rate.
+    """
+    conn = connect(cache_dir)
+    try:
+        entries, size_bytes = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size_bytes), 0) FROM Entry"
+        ).fetchone()
+        counters = dict(conn.execute("SELECT name, value FROM Counter").fetchall())
+    finally:
+        conn.close()
+
+    lookups = counters["hits"] + counters["misses"]
+    return {
+        "entries": entries,
+        "size_bytes": size_bytes,
+        "hits": counters["hits"],
+        "misses": counters["misses"],
+        "hit_rate": counters["hits"] / lookups if lookups > 0 else 0.0,
+    }
+
+
+def clear(cache_dir=CACHE_DIR):
+    """
+    Deletes every cached transcription together with the cache index.
+
+    Args:
+        cache_dir (str): Directory holding the cached transcriptions.
+    """
+    if os.path.isdir(cache_dir):
+        shutil.rmtree(cache_dir)
@@ -0,0 +1,393 @@
+"""
+BSD 2-Clause License
+
+Copyright (c) 2024, Hilda Romero-Velo
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+
+* Redistributions of source code must retain the above copyright notice, this
+  list of conditions and the following disclaimer.
+
+* Redistributions in binary form must reproduce the above copyright notice, this
+  list of conditions and the following disclaimer in the documentation
+  and/or other materials provided with the distribution.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+
+"""
+This module implements a long-lived basic-pitch transcription worker. The worker loads the
+transcription model once and serves requests from the query pipeline over a Unix socket,
+so that TensorFlow and the model weights are not loaded again for every query fragment.
+Models are loaded lazily for each runtime backend requested ('tf', 'onnx' or 'tflite').
+Batch requests transcribe several files with shared model batches (see
+`batch_transcription.py`).
+When the worker is not running, callers fall back to the basic-pitch command line tool.
+Connections are authenticated with a key generated for each run and shared with the clients
+through the FUGA_ID_TRANSCRIPTION_WORKER_KEY environment variable. A worker started without
+it generates a key and prints it, and clients without the key do not use the worker.
+
+Example usage:
+    python3 transcription_worker.py start    # Run the worker in the foreground
+    python3 transcription_worker.py status   # Check whether the worker is reachable
+    python3 transcription_worker.py stop     # Ask a running worker to shut down
+    (status and stop need the key of the worker in FUGA_ID_TRANSCRIPTION_WORKER_KEY)
+"""
+
+import argparse
+import os
+import secrets
+import socket
+import sys
+import traceback
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Listener
+
+import transcribe_audio
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+
+# Socket used to reach the worker (can be overridden through the environment)
+WORKER_ADDRESS = os.environ.get(
+    "FUGA_ID_TRANSCRIPTION_WORKER",
+    os.path.abspath(os.path.join(script_dir, "../cache/transcription_worker.sock")),
+)
+# Environment variable holding the authentication key of the running worker
+AUTH_KEY_VARIABLE = "FUGA_ID_TRANSCRIPTION_WORKER_KEY"
+
+
+def get_auth_key():
+    """
+    Returns the authentication key of the worker set in the environment.
+
+    Returns:
+        bytes: The key, or None if it is not set.
+    """
+    key = os.environ.get(AUTH_KEY_VARIABLE)
+    return key.encode() if key else None
+
+
+def generate_auth_key():
+    """
+    Generates a new authentication key and sets it in the environment, so that it is
+    inherited by the client processes started afterwards.
+
+    Returns:
+        bytes: The generated key.
+    """
+    os.environ[AUTH_KEY_VARIABLE] = secrets.token_hex(16)
+    return get_auth_key()
+
+
+def load_model(backend):
+    """
+    Loads the basic-pitch model serialized for the given runtime backend.
+
+    Args:
+        backend (str): Model runtime ('tf', 'onnx' or 'tflite').
+
+    Returns:
+        basic_pitch.inference.Model: The loaded model.
+    """
+    from basic_pitch import FilenameSuffix, build_icassp_2022_model_path
+    from basic_pitch.inference import Model
+
+    return Model(build_icassp_2022_model_path(FilenameSuffix[backend]))
+
+
+def handle_request(request, models):
+    """
+    Transcribes the audio file of a request and writes the resulting MIDI file.
+
+    Args:
+        request (dict): Request with the audio path, MIDI path and transcription settings.
+        models (dict): Loaded models by backend, updated if a new backend is requested.
+
+    Returns:
+        dict: Response with the request status and, on failure, the error message.
+    """
+    try:
+        from basic_pitch.inference import predict
+
+        settings = request["settings"]
+        backend = settings.get("backend", "tf")
+        if backend not in models:
+            models[backend] = load_model(backend)
+        model = models[backend]
+        _, midi_data, _ = predict(
+            request["audio_path"],
+            model,
+            onset_threshold=settings["onset_threshold"],
+            frame_threshold=settings["frame_threshold"],
+            minimum_note_length=settings["minimum_note_length"],
+        )
+        midi_data.write(request["midi_path"])
+        return {"status": "ok"}
+    except Exception:
+        return {"status": "error", "message": traceback.format_exc()}
+
+
+def handle_batch_request(request, models):
+    """
+    Transcribes the audio files of a batch request with shared model batches and writes one
+    MIDI file per audio file.
+
+    Args:
+        request (dict): Request with the audio paths, MIDI paths, transcription settings and
+                        batch size.
+        models (dict): Loaded models by backend, updated if a new backend is requested.
+
+    Returns:
+        dict: Response with the request status and, on failure, the error message.
+    """
+    try:
+        import batch_transcription
+
+        settings = request["settings"]
+        backend = settings.get("backend", "tf")
+        if backend not in models:
+            models[backend] = load_model(backend)
+        batch_transcription.transcribe_files(
+            request["audio_paths"],
+            request["midi_paths"],
+            models[backend],
+            settings,
+            request["batch_size"],
+        )
+        return {"status": "ok"}
+    except Exception:
+        return {"status": "error", "message": traceback.format_exc()}
+
+
+def is_listening(address):
+    """
+    Checks whether a process accepts connections on the given socket, whatever the key of
+    the worker listening on it.
+
+    Args:
+        address (str): Path of the Unix socket.
+
+    Returns:
+        bool: True if the socket accepts connections, False if it does not exist or nothing
+              listens on it.
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(address)
+        except (ConnectionRefusedError, FileNotFoundError):
+            return False
+    return True
+
+
+def serve(address=WORKER_ADDRESS, backend="tf"):
+    """
+    Loads the model and serves transcription requests until a shutdown request is received.
+    Requests are handled one at a time, in the order in which they arrive.
+
+    Args:
+        address (str): Path of the Unix socket to listen on.
+        backend (str): Runtime backend whose model is loaded at startup.
+
+    Raises:
+        RuntimeError: If a worker is already running on the socket, even with another key.
+    """
+    if is_listening(address):
+        raise RuntimeError(f"A transcription worker is already running on {address}.")
+    if os.path.exists(address):
+        os.remove(address)  # Stale socket left by a worker that did not shut down
+    os.makedirs(os.path.dirname(address), exist_ok=True)
+
+    auth_key = get_auth_key()
+    if auth_key is None:
+        auth_key = generate_auth_key()
+        print(f"Clients must set {AUTH_KEY_VARIABLE}={auth_key.decode()}.", flush=True)
+
+    models = {backend: load_model(backend)}
+    with Listener(address, family="AF_UNIX", authkey=auth_key) as listener:
+        print(f"Transcription worker listening on {address}.", flush=True)
+        while True:
+            try:
+                with listener.accept() as conn:
+                    request = conn.recv()
+                    if request.get("command") == "shutdown":
+                        conn.send({"status": "ok"})
+                        break
+                    if request.get("command") == "ping":
+                        conn.send({"status": "ok"})
+                        continue
+                    if request.get("command") == "batch":
+                        conn.send(handle_batch_request(request, models))
+                        continue
+                    conn.send(handle_request(request, models))
+            except (EOFError, OSError, AuthenticationError):
+                continue  # Client went away or did not have the key of the worker
+    if os.path.exists(address):
+        os.remove(address)
+
+
+def send_request(request, address=WORKER_ADDRESS):
+    """
+    Sends a request to the worker and waits for its response.
+
+    Args:
+        request (dict): Request to send.
+        address (str): Path of the Unix socket of the worker.
+
+    Returns:
+        dict: Worker response, or None if the worker cannot be reached or the key of the
+              worker is not set.
+    """
+    auth_key = get_auth_key()
+    if auth_key is None or not os.path.exists(address):
+        return None
+    try:
+        with Client(address, family="AF_UNIX", authkey=auth_key) as conn:
+            conn.send(request)
+            return conn.recv()
+    except (OSError, EOFError, AuthenticationError):
+        return None
+
+
+def is_running(address=WORKER_ADDRESS):
+    """
+    Checks whether a worker is listening on the given address.
+
+    Args:
+        address (str): Path of the Unix socket of the worker.
+
+    Returns:
+        bool: True if the worker answered, False otherwise.
+    """
+    return send_request({"command": "ping"}, address) is not None
+
+
+def request_transcription(audio_path, midi_path, settings, address=WORKER_ADDRESS):
+    """
+    Asks the worker to transcribe an audio file.
+
+    Args:
+        audio_path (str): Path to the WAV file to transcribe.
+        midi_path (str): Path where the resulting MIDI file is saved.
+        settings (dict): Transcription settings.
+        address (str): Path of the Unix socket of the worker.
+
+    Returns:
+        bool: True if the worker transcribed the file, False if it is not available or
+              the transcription failed (so the caller can fall back to the CLI).
+    """
+    response = send_request(
+        {
+            "audio_path": os.path.abspath(audio_path),
+            "midi_path": os.path.abspath(midi_path),
+            "settings": settings,
+        },
+        address,
+    )
+    if response is None:
+        return False
+    if response["status"] != "ok":
+        print(f"Transcription worker error: {response['message']}", file=sys.stderr)
+        return False
+    return os.path.isfile(midi_path)
+
+
+def request_batch_transcription(
+    audio_paths, midi_paths, settings, batch_size, address=WORKER_ADDRESS
+):
+    """
+    Asks the worker to transcribe several audio files with shared model batches.
+
+    Args:
+        audio_paths (list): Paths of the WAV files to transcribe.
+        midi_paths (list): Paths where the resulting MIDI files are saved.
+        settings (dict): Transcription settings.
+        batch_size (int): Number of model windows predicted per batch.
+        address (str): Path of the Unix socket of the worker.
+
+    Returns:
+        bool: True if the worker transcribed all the files, False otherwise.
+    """
+    response = send_request(
+        {
+            "command": "batch",
+            "audio_paths": [os.path.abspath(path) for path in audio_paths],
+            "midi_paths": [os.path.abspath(path) for path in midi_paths],
+            "settings": settings,
+            "batch_size": batch_size,
+        },
+        address,
+    )
+    if response is None:
+        return False
+    if response["status"] != "ok":
+        print(f"Transcription worker error: {response['message']}", file=sys.stderr)
+        return False
+    return all(os.path.isfile(path) for path in midi_paths)
+
+
+def stop(address=WORKER_ADDRESS):
+    """
+    Asks a running worker to shut down.
+
+    Args:
+        address (str): Path of the Unix socket of the worker.
+
+    Returns:
+        bool: True if a worker was stopped, False if none was running.
+    """
+    return send_request({"command": "shutdown"}, address) is not None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Persistent basic-pitch worker serving query transcriptions."
+    )
+    parser.add_argument("action", choices=["start", "stop", "status"])
+    parser.add_argument(
+        "-a",
+        "--address",
+        default=WORKER_ADDRESS,
+        help="Path of the worker Unix socket.",
+    )
+    # The monophonic backend ('yin') does not use a model, so the default model is loaded
+    default_backend = transcribe_audio.DEFAULT_BACKEND
+    if default_backend not in transcribe_audio.TRANSCRIPTION_BACKENDS:
+        parser.error(
+            f"invalid FUGA_ID_TRANSCRIPTION_BACKEND '{default_backend}' "
+            f"(choose from {', '.join(transcribe_audio.TRANSCRIPTION_BACKENDS)})"
+        )
+    if default_backend not in transcribe_audio.MODEL_BACKENDS:
+        default_backend = transcribe_audio.MODEL_BACKENDS[0]
+    parser.add_argument(
+        "-b",
+        "--backend",
+        choices=transcribe_audio.MODEL_BACKENDS,
+        default=default_backend,
+        help="Runtime backend loaded at startup (default: %(default)s).",
+    )
+    args = parser.parse_args()
+
+    if args.action == "start":
+        try:
+            serve(args.address, args.backend)
+        except RuntimeError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            sys.exit(1)
+    elif args.action == "stop":
+        if not stop(args.address):
+            print("No transcription worker is running.")
+    else:
+        running = is_running(args.address)
+        print("running" if running else "stopped")
+        sys.exit(0 if running else 1)
@@ -32,14 +32,15 @@ OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
 : '
  # This script deletes the temporary directory generated during the feature 
- # extraction process of a query.
+ # extraction process of a query. The directory can be given as the first argument
+ # (the workspace of a query); otherwise the default 'tmp' directory is deleted.
  '
 
 #!/bin/bash
 
 # Define the temporary directory path relative to the script's location
 script_dir=$(dirname "$(realpath "$0")")
-temp_dir="$script_dir/../tmp"
+temp_dir="${1:-$script_dir/../tmp}"
 
 # Check if the directory exists before attempting to delete it
 if [ -d "$temp_dir" ]; then
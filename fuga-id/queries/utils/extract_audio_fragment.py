@@ -52,10 +52,16 @@ Output:
 """
 
 import argparse
-import mido
+import numpy as np
 import os
+import sys
 from pydub import AudioSegment
 
+sys.path.append(
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "../../common")
+)
+import midi_reader
+
 
 def prepare_output_path(input_file, start_time, end_time, output_folder):
     """
@@ -79,6 +85,70 @@ def prepare_output_path(input_file, start_time, end_time, output_folder):
     return output_file
 
 
+def fragment_tempo(midi_data):
+    """
+    Returns the tempo used to convert the fragment bounds to ticks: the first set_tempo event
+    of the last track holding one.
+
+    Args:
+        midi_data (dict): Parsed MIDI file (see `midi_reader.read_midi`).
+
+    Returns:
+        int: Tempo in microseconds per beat, or the MIDI default tempo if there is none.
+    """
+    tempo_events = midi_data["tempo_events"]
+    if not len(tempo_events):
+        return midi_reader.DEFAULT_TEMPO
+    last_track = tempo_events["track"] == tempo_events["track"][-1]
+    return int(tempo_events["tempo"][last_track][0])
+
+
+def slice_track(events, messages):
+    """
+    Slices the events of a track that fall within a fragment. Note-offs are kept only if
+    they close a note-on kept before them (notes are matched by pitch), and notes still open
+    at the end of the fragment are closed after its last event.
+
+    Args:
+        events (numpy.ndarray): Events of the track within the fragment (EVENT_DTYPE).
+        messages (list): Bytes of those events.
+
+    Returns:
+        list: (delta, message) events of the fragment track.
+    """
+    kinds = events["kind"]
+    pitches = events["pitch"]
+
+    # Note events by pitch, in time order within each pitch
+    note_events = np.flatnonzero(
+        (kinds == midi_reader.EVENT_NOTE_ON) | (kinds == midi_reader.EVENT_NOTE_OFF)
+    )
+    by_pitch = note_events[np.argsort(pitches[note_events], kind="stable")]
+    is_on = kinds[by_pitch] == midi_reader.EVENT_NOTE_ON
+    same_pitch = pitches[by_pitch[1:]] == pitches[by_pitch[:-1]]
+    follows_on = np.zeros(len(by_pitch), dtype=bool)
+    follows_on[1:] = same_pitch & is_on[:-1]
+
+    keep = np.ones(len(events), dtype=bool)
+    keep[by_pitch] = is_on | follows_on
+    deltas = events["delta"].copy()
+    kept = np.flatnonzero(keep)
+    if len(kept) and kinds[kept[0]] == midi_reader.EVENT_NOTE_ON:
+        deltas[kept[0]] = 0
+    track = [(int(deltas[i]), messages[i]) for i in kept]
+
+    # A pitch is still open if its last note event is a note-on; open notes are closed in
+    # the order in which their pitch was (last) opened
+    is_last = np.ones(len(by_pitch), dtype=bool)
+    is_last[:-1] = ~same_pitch
+    open_last = np.flatnonzero(is_last & is_on)
+    openings = np.flatnonzero(is_on & ~follows_on)
+    opened_at = by_pitch[openings[np.searchsorted(openings, open_last, "right") - 1]]
+    for pitch in pitches[by_pitch[open_last[np.argsort(opened_at)]]]:
+        track.append((0, bytes([0x80, int(pitch), 0])))
+    return track
+
+
 def extract_midi_fragment(input_midi, start_time, end_time, output_file):
     """
     Extract a fragment from a MIDI file.
@@ -89,67 +159,32 @@ def extract_midi_fragment(input_midi, start_time, end_time, output_file):
         end_time (int): End time of the fragment in milliseconds.
         output_file (str): Path to save the extracted fragment.
     """
-    midi_file = mido.MidiFile(input_midi)
-    output_midi = mido.MidiFile()
-    output_midi.ticks_per_beat = midi_file.ticks_per_beat
+    midi_data = midi_reader.read_midi(input_midi, with_events=True)
+    events = midi_data["events"]
+    messages = midi_data["event_messages"]
 
     # Convert milliseconds to ticks
-    tempo = 500000  # Default tempo (microseconds per beat)
-    for track in midi_file.tracks:
-        for msg in track:
-            if msg.type == "set_tempo":
-                tempo = msg.tempo
-                break
-    ticks_per_ms = (midi_file.ticks_per_beat * 1000) / tempo
+    ticks_per_ms = (midi_data["resolution"] * 1000) / fragment_tempo(midi_data)
     start_ticks = int(start_time * ticks_per_ms)
     end_ticks = int(end_time * ticks_per_ms)
 
     # Copy tempo and time signature events
-    output_midi.tracks.append(mido.MidiTrack())
-    for msg in midi_file.tracks[0]:
-        if msg.type in ["set_tempo", "time_signature"]:
-            output_midi.tracks[0].append(msg.copy())
+    tracks = [
+        [
+            (int(events["delta"][i]), messages[i])
+            for i in np.flatnonzero(
+                (events["track"] == 0) & (events["kind"] == midi_reader.EVENT_KEPT_META)
+            )
+        ]
+    ]
 
     # Process each track
-    for track in midi_file.tracks:
-        output_track = mido.MidiTrack()
-        output_midi.tracks.append(output_track)
-
-        current_ticks = 0
-        notes_on = {}  # Keep track of active notes
-
-        for msg in track:
-            current_ticks += msg.time
-
-            if start_ticks <= current_ticks <= end_ticks:
-                # Include note_on events just before start_ticks
-                if msg.type == "note_on" and msg.velocity > 0:
-                    notes_on[msg.note] = msg
-                    new_msg = msg.copy()
-                    new_msg.time = 0 if len(output_track) == 0 else msg.time
-                    output_track.append(new_msg)
-
-                # Include note_off events
-                elif msg.type == "note_off" or (
-                    msg.type == "note_on" and msg.velocity == 0
-                ):
-                    if msg.note in notes_on:
-                        new_msg = msg.copy()
-                        new_msg.time = msg.time
-                        output_track.append(new_msg)
-                        del notes_on[msg.note]
-
-                # Include other message types
-                else:
-                    new_msg = msg.copy()
-                    new_msg.time = msg.time
-                    output_track.append(new_msg)
-
-        # Close any pending notes at end_ticks
-        for note, msg in notes_on.items():
-            output_track.append(mido.Message("note_off", note=note, velocity=0, time=0))
-
-    output_midi.save(output_file)
+    in_fragment = (events["tick"] >= start_ticks) & (events["tick"] <= end_ticks)
+    for track_index in range(midi_data["track_count"]):
+        selected = np.flatnonzero(in_fragment & (events["track"] == track_index))
+        tracks.append(slice_track(events[selected], [messages[i] for i in selected]))
+
+    midi_reader.write_tracks(output_file, tracks, midi_data["resolution"])
 
 
 def extract_audio_fragment(input_audio, start_time, end_time, output_file):
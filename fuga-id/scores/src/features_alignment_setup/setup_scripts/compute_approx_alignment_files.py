@@ -35,7 +35,14 @@ OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
   It combines these values (each represented as a single character) into unified text files 
   (one per feature) where each score feature is separated by a newline character. Additionally,
   it generates and saves cost maps for the global and local approximate alignment based on the 
-  difference of values. The cost maps are saved as binary files.
+  difference of values. The cost maps are saved as binary files, both as dense cost matrices
+  (see `cost_matrix.py`) and as the nested cost maps read by the C++ programs. The melodic
+  lines of each feature and their identifiers are also saved in a binary corpus index (see
+  `corpus_index.py`), with one byte per symbol and every distinct line stored once, along
+  with the inverted index of their k-grams used to prefilter the approximate search (see
+  `kgram_index.py`), the index of their lengths and symbol histograms used to stop the
+  approximate search early and to align identical lines once (see `line_bounds.py`), and
+  the index of their repeated phrases used to skip recomputing them (see `line_phrases.py`).
 
   Input: JSON files with feature values for each score.
   Output: Text files and cost matrix files for each feature.
@@ -44,7 +51,6 @@ OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 import os
 import sys
 import json
-from fractions import Fraction
 import sqlite3
 
 # Calculate base directories
@@ -64,7 +70,13 @@ sys.path.append(utils_directory)
 
 # Import required modules
 import approx_dictionary
-from utility_functions import to_single_notation, save_cost_map, write_text_to_file
+import corpus_index
+import cost_matrix
+import kgram_index
+import line_bounds
+import line_phrases
+import notation_codec
+from utility_functions import save_cost_map, write_text_to_file
 
 # Define source and target directories
 jsons_dir = os.path.join(data_dir, "computed", "features", "corpus_jsons")
@@ -93,6 +105,38 @@ diatonic_text_file = os.path.join(approx_alignment_files_dir, "diatonic_text.txt
 rhythm_text_file = os.path.join(approx_alignment_files_dir, "rhythm_text.txt")
 ids_file = os.path.join(approx_alignment_files_dir, "melodic_line_ids.txt")
 
+# Define feature corpus index file paths
+chromatic_index_file = os.path.join(
+    approx_alignment_files_dir, "chromatic_corpus_index.bin"
+)
+diatonic_index_file = os.path.join(
+    approx_alignment_files_dir, "diatonic_corpus_index.bin"
+)
+rhythm_index_file = os.path.join(approx_alignment_files_dir, "rhythm_corpus_index.bin")
+chromatic_kgram_file = os.path.join(
+    approx_alignment_files_dir, "chromatic_kgram_index.bin"
+)
+diatonic_kgram_file = os.path.join(
+    approx_alignment_files_dir, "diatonic_kgram_index.bin"
+)
+rhythm_kgram_file = os.path.join(approx_alignment_files_dir, "rhythm_kgram_index.bin")
+chromatic_bounds_file = os.path.join(
+    approx_alignment_files_dir, "chromatic_line_bounds.bin"
+)
+diatonic_bounds_file = os.path.join(
+    approx_alignment_files_dir, "diatonic_line_bounds.bin"
+)
+rhythm_bounds_file = os.path.join(approx_alignment_files_dir, "rhythm_line_bounds.bin")
+chromatic_phrases_file = os.path.join(
+    approx_alignment_files_dir, "chromatic_line_phrases.bin"
+)
+diatonic_phrases_file = os.path.join(
+    approx_alignment_files_dir, "diatonic_line_phrases.bin"
+)
+rhythm_phrases_file = os.path.join(
+    approx_alignment_files_dir, "rhythm_line_phrases.bin"
+)
+
 # Map files to store the cost matrix
 chromatic_cost_map = os.path.join(approx_alignment_files_dir, "chromatic_cost_map.bin")
 diatonic_cost_map = os.path.join(approx_alignment_files_dir, "diatonic_cost_map.bin")
@@ -107,6 +151,26 @@ global_rhythm_cost_map = os.path.join(
     global_alignment_files_dir, "rhythmic_cost_map.bin"
 )
 
+# Dense cost matrix files (memory-mapped by the in-process alignment)
+chromatic_cost_matrix = os.path.join(
+    approx_alignment_files_dir, "chromatic_cost_matrix.bin"
+)
+diatonic_cost_matrix = os.path.join(
+    approx_alignment_files_dir, "diatonic_cost_matrix.bin"
+)
+rhythm_cost_matrix = os.path.join(
+    approx_alignment_files_dir, "rhythmic_cost_matrix.bin"
+)
+global_chromatic_cost_matrix = os.path.join(
+    global_alignment_files_dir, "chromatic_cost_matrix.bin"
+)
+global_diatonic_cost_matrix = os.path.join(
+    global_alignment_files_dir, "diatonic_cost_matrix.bin"
+)
+global_rhythm_cost_matrix = os.path.join(
+    global_alignment_files_dir, "rhythmic_cost_matrix.bin"
+)
+
 # Define database file and error log file
 db_file = os.path.join(script_dir, "../../../../database/folkoteca.db")
 error_log = os.path.join(
@@ -202,79 +266,98 @@ def features_to_single_notation():
 
     Returns:
         dict: A dictionary containing combined text for chromatic, diatonic, and rhythm features,
-              along with their corresponding score ranges.
+              along with their corresponding score ranges, and the melodic lines of each
+              feature and their identifiers as lists.
     """
+    scores = []
     with os.scandir(jsons_dir) as files:
-        chromatic_text = ""
-        diatonic_text = ""
-        rhythm_text = ""
-        ids = ""
-
         for file in files:
             with open(file.path) as f:
                 try:
-                    data = json.load(f)
-
-                    # Translate each feature into single-character notation
-                    chromatic = to_single_notation(
-                        data["chromatic"], approx_dictionary.CHROMATIC_DIC
-                    )
-                    chromatic_text += chromatic.strip() + "\n"
-
-                    diatonic = to_single_notation(
-                        data["diatonic"], approx_dictionary.DIATONIC_DIC
-                    )
-                    diatonic_text += diatonic.strip() + "\n"
-
-                    rhythm = to_single_notation(
-                        data["rhythm"], approx_dictionary.RHYTHM_DIC
-                    )
-                    rhythm_text += rhythm.strip() + "\n"
-
-                    ids += data["id"] + "\n"
-                    save_data_to_db(data["id"], chromatic, diatonic, rhythm)
-
+                    scores.append(json.load(f))
                 except json.JSONDecodeError as e:
                     print(f"Error reading JSON from file {file.path}: {e}")
 
-        return {
-            "chromatic_text": chromatic_text,
-            "diatonic_text": diatonic_text,
-            "rhythm_text": rhythm_text,
-            "melodic_lines_ids": ids,
-        }
+    # Translate each feature of the whole corpus into single-character notation at once
+    chromatic = notation_codec.encode_many(
+        (data["chromatic"] for data in scores), approx_dictionary.CHROMATIC_DIC
+    )
+    diatonic = notation_codec.encode_many(
+        (data["diatonic"] for data in scores), approx_dictionary.DIATONIC_DIC
+    )
+    rhythm = notation_codec.encode_many(
+        (data["rhythm"] for data in scores), approx_dictionary.RHYTHM_DIC
+    )
+    chromatic = [notation_codec.to_text(symbols) for symbols in chromatic]
+    diatonic = [notation_codec.to_text(symbols) for symbols in diatonic]
+    rhythm = [notation_codec.to_text(symbols) for symbols in rhythm]
+    ids = [data["id"] for data in scores]
+
+    for data, chromatic_line, diatonic_line, rhythm_line in zip(
+        scores, chromatic, diatonic, rhythm
+    ):
+        save_data_to_db(data["id"], chromatic_line, diatonic_line, rhythm_line)
+
+    chromatic_lines = [line.strip() for line in chromatic]
+    diatonic_lines = [line.strip() for line in diatonic]
+    rhythm_lines = [line.strip() for line in rhythm]
+    return {
+        "chromatic_text": "".join(line + "\n" for line in chromatic_lines),
+        "diatonic_text": "".join(line + "\n" for line in diatonic_lines),
+        "rhythm_text": "".join(line + "\n" for line in rhythm_lines),
+        "melodic_lines_ids": "".join(line_id + "\n" for line_id in ids),
+        "chromatic_lines": chromatic_lines,
+        "diatonic_lines": diatonic_lines,
+        "rhythm_lines": rhythm_lines,
+        "ids": ids,
+    }
+
+
+def save_corpus_index(lines, ids, index_file, kgram_file, bounds_file, phrases_file):
+    """
+    Saves the melodic lines of a feature and their identifiers as a binary corpus index, with
+    one byte per symbol, the k-gram index of the lines, their bound index and their phrase
+    index. The bound and phrase indexes are built from the UTF-8 bytes of the lines, which
+    are the symbols aligned by the C++ program.
+
+    Args:
+        lines (list): Melodic lines in single-character notation (str).
+        ids (list): Identifier of every melodic line.
+        index_file (str): Path of the corpus index file.
+        kgram_file (str): Path of the k-gram index file.
+        bounds_file (str): Path of the line bound index file.
+        phrases_file (str): Path of the line phrase index file.
+    """
+    encoded_lines = [notation_codec.to_bytes(line) for line in lines]
+    corpus_index.write_corpus_index(index_file, encoded_lines, ids)
+    kgram_index.write_kgram_index(
+        kgram_file, kgram_index.build_kgram_index(encoded_lines)
+    )
+    aligned_lines = [line.encode("utf-8") for line in lines]
+    line_bounds.write_line_bounds(
+        bounds_file, line_bounds.build_line_bounds(aligned_lines)
+    )
+    line_phrases.write_line_phrases(
+        phrases_file, line_phrases.build_line_phrases(aligned_lines)
+    )
 
 
-def build_cost_map(dic, match_value, mismatch_sign):
+def save_cost_files(dic, match_value, mismatch_sign, cost_map_file, cost_matrix_file):
     """
-    Builds a cost matrix for alignment based on the difference of dictionary keys.
+    Builds the cost matrix for alignment based on the difference of dictionary keys and saves
+    it both as a dense cost matrix and as a cost map.
 
     Args:
         dic (dict): A dictionary where the keys are numeric values and the values are characters.
-
-    Returns:
-        dict: A dictionary of dictionaries representing the alignment cost matrix.
-              The diagonal elements have a value of 1 (matches), and the off-diagonal
-              elements have negative values based on the absolute difference between the keys.
+        match_value (float): Value of the diagonal elements (matches).
+        mismatch_sign (float): Sign of the off-diagonal elements, whose magnitude is the
+                               absolute difference between the keys.
+        cost_map_file (str): Path of the cost map (dictionary of dictionaries) file.
+        cost_matrix_file (str): Path of the dense cost matrix file.
     """
-    cost_map = {}
-    keys = list(dic.keys())
-    values = list(dic.values())
-
-    for i in range(len(values)):
-        cost_map[values[i]] = {}
-        for j in range(len(values)):
-            if i == j:
-                # Assign 1 for matches (diagonal)
-                cost_map[values[i]][values[j]] = match_value
-            else:
-                # Convert keys to floats, handling fractions if necessary
-                val_i = float(Fraction(keys[i]))
-                val_j = float(Fraction(keys[j]))
-                # Compute penalty as the negative absolute difference
-                cost_map[values[i]][values[j]] = mismatch_sign * abs(val_i - val_j)
-
-    return cost_map
+    matrix = cost_matrix.build_cost_matrix(dic, match_value, mismatch_sign)
+    cost_matrix.save_cost_matrix(matrix, cost_matrix_file)
+    save_cost_map(cost_matrix.to_cost_map(matrix, dic.values()), cost_map_file)
 
 
 if __name__ == "__main__":
@@ -290,46 +373,78 @@ if __name__ == "__main__":
     write_text_to_file(rhythm_text_file, features["rhythm_text"])
     write_text_to_file(ids_file, features["melodic_lines_ids"])
 
+    # Write the binary corpus index, the k-gram, bound and phrase indexes of each feature
+    save_corpus_index(
+        features["chromatic_lines"],
+        features["ids"],
+        chromatic_index_file,
+        chromatic_kgram_file,
+        chromatic_bounds_file,
+        chromatic_phrases_file,
+    )
+    save_corpus_index(
+        features["diatonic_lines"],
+        features["ids"],
+        diatonic_index_file,
+        diatonic_kgram_file,
+        diatonic_bounds_file,
+        diatonic_phrases_file,
+    )
+    save_corpus_index(
+        features["rhythm_lines"],
+        features["ids"],
+        rhythm_index_file,
+        rhythm_kgram_file,
+        rhythm_bounds_file,
+        rhythm_phrases_file,
+    )
+
     # Generate and save local approximate alignment cost maps
     local_aa_match = 1.0
     local_aa_mismatch_sign = -1.0
-    save_cost_map(
-        build_cost_map(
-            approx_dictionary.CHROMATIC_DIC, local_aa_match, local_aa_mismatch_sign
-        ),
+    save_cost_files(
+        approx_dictionary.CHROMATIC_DIC,
+        local_aa_match,
+        local_aa_mismatch_sign,
         chromatic_cost_map,
+        chromatic_cost_matrix,
     )
-    save_cost_map(
-        build_cost_map(
-            approx_dictionary.DIATONIC_DIC, local_aa_match, local_aa_mismatch_sign
-        ),
+    save_cost_files(
+        approx_dictionary.DIATONIC_DIC,
+        local_aa_match,
+        local_aa_mismatch_sign,
         diatonic_cost_map,
+        diatonic_cost_matrix,
     )
-    save_cost_map(
-        build_cost_map(
-            approx_dictionary.RHYTHM_DIC, local_aa_match, local_aa_mismatch_sign
-        ),
+    save_cost_files(
+        approx_dictionary.RHYTHM_DIC,
+        local_aa_match,
+        local_aa_mismatch_sign,
         rhythm_cost_map,
+        rhythm_cost_matrix,
     )
 
     # Generate and save global alignment cost maps
     global_aa_match = 0.0
     global_aa_mismatch_sign = 1.0
-    save_cost_map(
-        build_cost_map(
-            approx_dictionary.CHROMATIC_DIC, global_aa_match, global_aa_mismatch_sign
-        ),
+    save_cost_files(
+        approx_dictionary.CHROMATIC_DIC,
+        global_aa_match,
+        global_aa_mismatch_sign,
         global_chromatic_cost_map,
+        global_chromatic_cost_matrix,
     )
-    save_cost_map(
-        build_cost_map(
-            approx_dictionary.DIATONIC_DIC, global_aa_match, global_aa_mismatch_sign
-        ),
+    save_cost_files(
+        approx_dictionary.DIATONIC_DIC,
+        global_aa_match,
+        global_aa_mismatch_sign,
         global_diatonic_cost_map,
+        global_diatonic_cost_matrix,
     )
-    save_cost_map(
-        build_cost_map(
-            approx_dictionary.RHYTHM_DIC, global_aa_match, global_aa_mismatch_sign
-        ),
+    save_cost_files(
+        approx_dictionary.RHYTHM_DIC,
+        global_aa_match,
+        global_aa_mismatch_sign,
         global_rhythm_cost_map,
+        global_rhythm_cost_matrix,
     )
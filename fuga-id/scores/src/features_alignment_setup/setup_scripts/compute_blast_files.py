@@ -57,9 +57,9 @@ dicts_directory = os.path.abspath(
 sys.path.append(common_directory)
 sys.path.append(dicts_directory)
 
-# Import the blast_dictionary module and utility_functions.py
+# Import the blast_dictionary module and the notation codec
 import blast_dictionary
-from utility_functions import to_single_notation
+import notation_codec
 
 # Compute base directory
 script_dir = os.path.dirname(os.path.abspath(__file__))
@@ -94,13 +94,12 @@ def write_fsa_file(ids, sequences, fsa_file_path, translation_dict):
         fsa_file_path (str): Path to the output FSA file.
         translation_dict (dict): Dictionary for translating feature strings to protein sequences.
     """
+    # Translate all the sequences at once
+    lines = notation_codec.encode_many(sequences, translation_dict)
     with open(fsa_file_path, "w") as fsa_file:  # Open the file in write mode
-        for i in range(len(ids)):  # Iterate through all sequences
-            fsa_file.write(f">{ids[i]}\n")  # Write the identifier in FASTA format
-            line = to_single_notation(
-                sequences[i], translation_dict
-            )  # Translate the sequence
-            fsa_file.write(f"{line}\n")  # Write the translated sequence
+        for sequence_id, line in zip(ids, lines):  # Iterate through all sequences
+            fsa_file.write(f">{sequence_id}\n")  # Write the identifier in FASTA format
+            fsa_file.write(f"{notation_codec.to_text(line)}\n")  # Write the sequence
 
 
 def features_to_fsa():
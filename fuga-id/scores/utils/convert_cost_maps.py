@@ -0,0 +1,101 @@
+"""
+BSD 2-Clause License
+
+Copyright (c) 2024, Hilda Romero-Velo
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+
+* Redistributions of source code must retain the above copyright notice, this
+  list of conditions and the following disclaimer.
+
+* Redistributions in binary form must reproduce the above copyright notice, this
+  list of conditions and the following disclaimer in the documentation
+  and/or other materials provided with the distribution.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+
+"""
+This script converts the cost maps of existing alignment indexes (dictionaries of
+dictionaries saved with `utility_functions.save_cost_map`) to dense cost matrices (see
+`cost_matrix.py`), so indexes built before the cost matrices existed do not need to be
+rebuilt. Every "<name>_cost_map.bin" file is converted to "<name>_cost_matrix.bin" in the
+same directory; the cost maps are kept, since the C++ programs read them.
+
+Usage:
+    python3 convert_cost_maps.py [<indexes_dir> ...]
+
+By default, the approximate and global alignment indexes in scores/indexes are converted.
+"""
+
+import argparse
+import os
+import sys
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(script_dir, "../../common"))
+import cost_matrix
+from utility_functions import load_cost_map
+
+INDEXES_DIR = os.path.join(script_dir, "../indexes")
+DEFAULT_DIRS = [
+    os.path.join(INDEXES_DIR, "approximate_alignment"),
+    os.path.join(INDEXES_DIR, "global_alignment"),
+]
+COST_MAP_SUFFIX = "_cost_map.bin"
+COST_MATRIX_SUFFIX = "_cost_matrix.bin"
+
+
+def convert_cost_map(cost_map_file):
+    """
+    Converts a cost map file to a cost matrix file.
+
+    Args:
+        cost_map_file (str): Path to the cost map file.
+
+    Returns:
+        str: Path to the cost matrix file.
+    """
+    cost_matrix_file = cost_map_file[: -len(COST_MAP_SUFFIX)] + COST_MATRIX_SUFFIX
+    matrix = cost_matrix.from_cost_map(load_cost_map(cost_map_file))
+    cost_matrix.save_cost_matrix(matrix, cost_matrix_file)
+    return cost_matrix_file
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Convert the cost maps of alignment indexes to dense cost matrices."
+    )
+    parser.add_argument(
+        "indexes_dirs",
+        nargs="*",
+        default=DEFAULT_DIRS,
+        help="Directories with cost map files (default: the alignment indexes).",
+    )
+    args = parser.parse_args()
+
+    converted = 0
+    for indexes_dir in args.indexes_dirs:
+        if not os.path.isdir(indexes_dir):
+            print(f"Skipping '{indexes_dir}': directory not found.")
+            continue
+        for filename in sorted(os.listdir(indexes_dir)):
+            if filename.endswith(COST_MAP_SUFFIX):
+                try:
+                    output = convert_cost_map(os.path.join(indexes_dir, filename))
+                    print(f"Converted '{filename}' to '{os.path.basename(output)}'.")
+                    converted += 1
+                except (OSError, ValueError) as e:
+                    print(f"Error converting '{filename}': {e}")
+    print(f"{converted} cost maps converted.")